@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark du chemin de réponse JSON pré-encodé (services/response_cache.py).
+
+Compare, par requête, sur des charges représentatives des plus gros GET
+(/youtube, /api/getN2, /) :
+  - stdlib    : JSONResponse(content=data) — re-sérialisation json à chaque hit
+  - stdlib+gz : idem + compression gzip par requête (équivalent GZipMiddleware)
+  - encode    : encodeur rapide (orjson si installé) sans cache
+  - cache     : octets pré-encodés servis tels quels (json_response)
+  - cache+gz  : variante gzip pré-calculée (Accept-Encoding: gzip)
+
+Usage : python3 bench_json_response.py [itérations]
+"""
+
+import gzip
+import sys
+import time
+from types import SimpleNamespace
+
+from fastapi.responses import JSONResponse
+
+from services.response_cache import encode, json_response, orjson
+
+
+def youtube_payload(videos=600, channels=25):
+    items = [{
+        "title": f"Vidéo {i} — UPlanet ẐEN", "uploader": f"user{i % 40}",
+        "content": "Description " * 20, "duration": 60 + i, "ipfs_url": f"/ipfs/Qm{i:044d}/video.mp4",
+        "thumbnail_ipfs": f"/ipfs/Qm{i:044d}/thumb.jpg", "channel_name": f"chan{i % channels}",
+        "topic_keywords": "nature,musique,voyage", "created_at": "2026-10-01T12:00:00Z",
+        "latitude": 43.6 + i / 1000, "longitude": 1.44 + i / 1000, "compliance": {"score": 3},
+        "upload_chain_list": ["a" * 64, "b" * 64], "tmdb_metadata": {}, "youtube_metadata": {},
+    } for i in range(videos)]
+    chans = {}
+    for item in items:
+        chans.setdefault(item["channel_name"], []).append(item)
+    return {"success": True, "total_videos": videos, "total_channels": len(chans),
+            "channels": {name: {"videos": vids, "count": len(vids)} for name, vids in chans.items()},
+            "timestamp": "2026-10-19T00:00:00"}
+
+
+def n2_payload(nodes=1500):
+    return {"center_pubkey": "c" * 64, "total_n1": 150, "total_n2": nodes - 151, "total_nodes": nodes,
+            "range_mode": "full", "timestamp": "2026-10-19T00:00:00", "processing_time_ms": 1234,
+            "nodes": [{"pubkey": f"{i:064x}", "level": 1 + (i > 150), "is_follower": i % 3 == 0,
+                       "is_followed": True, "mutual": i % 6 == 0, "connections": [f"{j:064x}" for j in range(i % 5)],
+                       "npub": None, "email": None, "display_name": f"User {i}", "name": None,
+                       "picture": None, "about": None} for i in range(nodes)],
+            "connections": [{"from": "c" * 64, "to": f"{i:064x}"} for i in range(nodes)]}
+
+
+def bench(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    plain = SimpleNamespace(headers={})
+    gz_req = SimpleNamespace(headers={"accept-encoding": "gzip, deflate"})
+    print(f"Encodeur : {'orjson ' + orjson.__version__ if orjson else 'json (stdlib)'} — {iterations} itérations\n")
+    print(f"{'charge':<10}{'taille':>10}{'stdlib':>11}{'stdlib+gz':>11}{'encode':>11}{'cache':>11}{'cache+gz':>11}   (µs/requête)")
+    for name, data in (("youtube", youtube_payload()), ("getN2", n2_payload())):
+        entry = encode(data)
+        results = [
+            bench(lambda: JSONResponse(content=data), iterations),
+            bench(lambda: gzip.compress(JSONResponse(content=data).body, compresslevel=6), iterations),
+            bench(lambda: encode(data, compress=False), iterations),
+            bench(lambda: json_response(plain, entry), iterations),
+            bench(lambda: json_response(gz_req, entry), iterations),
+        ]
+        print(f"{name:<10}{len(entry.body) // 1024:>8} K" + "".join(f"{r:>11.1f}" for r in results))
+        print(f"{'':<10}{'gzip':>8} {len(entry.gzip) // 1024} K — CPU économisé/requête : "
+              f"{results[0] - results[3]:.1f} µs (brut), {results[1] - results[4]:.1f} µs (gzip)\n")
+
+
+if __name__ == "__main__":
+    main()
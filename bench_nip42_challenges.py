@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark du stockage des nonces NIP-42 (services/nip42_challenges.py).
+
+Remplit le store avec N nonces en attente (100 000 par défaut, la capacité),
+puis mesure par opération :
+  - issue    : émission d'un nonce pour un nouveau pubkey (store plein →
+               éviction du plus ancien)
+  - peek     : lecture sans consommation
+  - consume  : lecture + suppression (usage unique)
+et, pour la variante mémoire, la taille du processus après remplissage.
+
+Variantes : mémoire du processus, SQLite partagée (fichier temporaire).
+Référence : l'ancien dict de module (sans borne ni expiration active).
+
+Usage : python3 bench_nip42_challenges.py [nonces en attente]
+"""
+
+import os
+import resource
+import secrets
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from services.nip42_challenges import ChallengeStore
+
+
+def keys(n, offset=0):
+    return [f"{i + offset:064x}" for i in range(n)]
+
+
+def bench(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def run(name, store, outstanding, sample):
+    fill = keys(outstanding)
+    start = time.perf_counter()
+    for k in fill:
+        store.issue(k)
+    fill_s = time.perf_counter() - start
+    probe = fill[-sample:]
+    results = [
+        bench(store.issue, keys(sample, outstanding)),
+        bench(store.peek, probe),
+        bench(store.consume, probe),
+    ]
+    print(f"{name:<10}{fill_s:>9.2f} s" + "".join(f"{r:>11.1f}" for r in results) + f"{len(store):>10}")
+
+
+def legacy(outstanding, sample):
+    store = {}
+
+    def issue(k):
+        store[k] = (secrets.token_hex(32), time.time())
+
+    fill = keys(outstanding)
+    start = time.perf_counter()
+    for k in fill:
+        issue(k)
+    fill_s = time.perf_counter() - start
+    probe = fill[-sample:]
+    results = [bench(issue, keys(sample, outstanding)), bench(store.get, probe), bench(lambda k: store.pop(k, None), probe)]
+    print(f"{'dict':<10}{fill_s:>9.2f} s" + "".join(f"{r:>11.1f}" for r in results) + f"{len(store):>10}  (sans borne)")
+
+
+def main():
+    outstanding = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    sample = min(10_000, outstanding)
+    print(f"{outstanding} nonces en attente, {sample} opérations mesurées\n")
+    print(f"{'store':<10}{'remplir':>11}{'issue':>11}{'peek':>11}{'consume':>11}{'taille':>10}   (µs/opération)")
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    run("mémoire", ChallengeStore(capacity=outstanding, db_path=None), outstanding, sample)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "challenges.sqlite"
+        run("sqlite", ChallengeStore(capacity=outstanding, db_path=db), outstanding, sample)
+        db_size = os.path.getsize(db)
+    legacy(outstanding, sample)
+    print(f"\nMémoire : ~{(rss_after - rss_before) // 1024} M de RSS pour le store plein")
+    print(f"SQLite : {db_size // 1024} K sur disque (hors WAL)")
+
+
+if __name__ == "__main__":
+    main()
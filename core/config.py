@@ -1,7 +1,7 @@
 import os
 import base64
 from pathlib import Path
-from typing import Set, List
+from typing import Dict, List, Optional, Set
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -36,6 +36,7 @@ class Settings(BaseSettings):
     
     # External Services
     IPFS_GATEWAY: str = "http://127.0.0.1:8080"
+    IPFS_API: str = "http://127.0.0.1:5001"  # API HTTP Kubo (/api/v0)
     
     # Secrets
     COINFLIP_SECRET: str = base64.urlsafe_b64encode(os.urandom(32)).decode()
@@ -81,6 +82,84 @@ class Settings(BaseSettings):
         "wss://g1.axiom-team.fr:443/ws/",
     ]
 
+    # Pool de dérivation de clés (PBKDF2 /g1nostr — services/keyderive.py)
+    KEYDERIVE_WORKERS: int = 2         # processus dédiés (hors executor par défaut)
+    KEYDERIVE_MAX_PENDING: int = 16    # au-delà → 429 + Retry-After
+    KEYDERIVE_MAX_PER_IP: int = 2      # dérivations simultanées max par IP
+    KEYDERIVE_NOSTR_INPROCESS: bool = True  # False → tools/keygen -t nostr (sous-processus)
+    GEOGRID_MAX_KEYS: int = 50000      # clés de cellules en mémoire (LRU) ; JSONL compacté au double
+
+    # Cookie Vault (services/cookie_store.py)
+    COOKIE_CACHE_TTL: int = 120                    # s — cookies déchiffrés gardés en mémoire
+    COOKIE_CACHE_MAX_BYTES: int = 8 * 1024 * 1024  # borne mémoire du cache
+    COOKIE_MANIFEST_DEBOUNCE: int = 15             # s — une publication kind 31903 par fenêtre
+
+    # État des mémoires (services/memory_status.py)
+    MEMORY_STATUS_QDRANT_TTL: int = 120     # s — fraîcheur des compteurs Qdrant en cache
+    MEMORY_STATUS_ACTIVE_WINDOW: int = 900  # s — comptes rafraîchis en tâche de fond
+
+    # Pages utilisateur (/mailjet, /atom4love/profile — services/page_context.py)
+    PAGE_LOADER_TIMEOUT: float = 4.0  # s — au-delà, section rendue avec sa valeur par défaut
+    PAGE_SNAPSHOT_TTL: int = 20       # s — vues par utilisateur partagées entre pages
+
+    # Index du cache swarm (services/swarm_index.py)
+    SWARM_INDEX_REFRESH: int = 30  # s — intervalle min. entre deux contrôles de ~/.zen/tmp/swarm
+
+    # Réponses JSON pré-encodées (services/response_cache.py)
+    JSON_COMPRESS_MIN_BYTES: int = 1024  # gzip/brotli pré-calculés au-delà de cette taille
+    USTATS_CACHE_TTL: int = 60           # s — GET / et /api/ustats (services/ustats.py)
+    USTATS_STALE_TTL: int = 600          # s — réponse périmée encore servie pendant le rafraîchissement
+    USTATS_SCRIPT_TIMEOUT: int = 120     # s — au-delà Ustats.sh est tué
+    YOUTUBE_CACHE_TTL: int = 30          # s — GET /youtube (JSON) par jeu de filtres
+    N2_CACHE_TTL: int = 60               # s — GET /api/getN2 par (hex, range)
+
+    # Blobs Blossom (services/blob_store.py)
+    BLOSSOM_DIR: Path = Path.home() / ".zen" / "blossom"  # blobs/ab/cd/<sha256> + index.jsonl
+
+    # uDRIVE incrémental (services/udrive.py)
+    UDRIVE_INCREMENTAL: bool = False     # livré désactivé : activer après `pytest -m live_ipfs` (parité CID avec le script)
+    UDRIVE_COALESCE_WINDOW: float = 2.0  # s — dépôts regroupés en une seule reconstruction
+    UDRIVE_BUILD_TIMEOUT: int = 600      # s — au-delà la reconstruction est abandonnée
+
+    # File de tâches post-upload (services/jobs.py)
+    JOBS_DB: Path = Path.home() / ".zen" / "tmp" / "upassport_jobs.sqlite"
+    JOB_WORKERS: int = 2            # workers asyncio
+    JOB_MAX_ATTEMPTS: int = 5       # au-delà → status "failed"
+    JOB_RETRY_BASE: float = 30.0    # s — délai de la 1re relance, doublé à chaque échec
+    JOB_POLL_INTERVAL: float = 5.0  # s — contrôle max. des tâches différées
+    JOB_RETENTION: int = 7 * 86400  # s — tâches done/failed conservées (GET /api/upload/status)
+
+    # Client Kubo (services/kubo.py) — options d'ajout non définies = réglages du nœud
+    KUBO_MAX_CONCURRENCY: int = 8              # appels simultanés à l'API Kubo
+    IPFS_CHUNKER: str = ""                     # ex. "size-1048576", "rabin" ; vide = défaut Kubo
+    IPFS_RAW_LEAVES: Optional[bool] = None     # feuilles raw (implicite en CIDv1)
+    IPFS_CID_VERSION: Optional[int] = None     # 0 ou 1
+
+    # Sessions NIP-42 en mémoire (services/nip42_sessions.py)
+    NIP42_SCAN_INTERVAL: float = 2.0  # s — relecture des markers .nip42_auth_<hex> nouveaux/modifiés
+    NIP42_NOTIFY_SOCKET: Path = Path.home() / ".zen" / "tmp" / "upassport_nip42.sock"  # notifications du relai
+
+    # Nonces NIP-42 à usage unique (services/nip42_challenges.py)
+    NIP42_CHALLENGE_CAPACITY: int = 100_000   # au-delà, les plus anciens sont évincés
+    NIP42_CHALLENGE_BUCKET: float = 10.0      # s — largeur d'un créneau d'expiration
+    NIP42_CHALLENGE_DB: Optional[Path] = None  # SQLite partagée entre workers ; None = mémoire du processus
+
+    # Cache des events NIP-98 vérifiés (services/nostr.py)
+    NIP98_CACHE_SIZE: int = 4096      # events gardés (clé = id)
+    NIP98_CHECK_SCOPE: bool = True    # tags u/method liés à la requête ; False = comportement historique
+
+    # Caches nommés (services/cache.py) — bornes par nom, ex. CACHE_SIZES='{"nostr_profiles": 200}'
+    CACHE_SIZES: Dict[str, int] = {}    # surcharge de maxsize
+    CACHE_TTLS: Dict[str, float] = {}   # surcharge du TTL (s)
+    CACHE_DIR: Path = Path.home() / ".zen" / "tmp" / "upassport_cache"  # caches persistants (persist=True)
+
+    # Profils NOSTR kind 0 (services/nostr_profiles.py)
+    NOSTR_PROFILE_QUERY_TIMEOUT: float = 5.0  # s — attente de l'EOSE du relai pour un lot d'auteurs
+
+    # Analytics /ping (services/analytics.py)
+    ANALYTICS_FLUSH_INTERVAL: int = 300   # s — une note de synthèse kind 10600 par intervalle
+    ANALYTICS_QUEUE_MAX: int = 5000       # événements bruts en attente ; au-delà → comptés perdus
+
     # Logging
     LOG_LEVEL: str = "INFO"  # DEBUG | INFO | WARNING | ERROR
 
@@ -2,7 +2,6 @@ import asyncio
 import logging
 import importlib.util
 from typing import Optional, Any
-from cachetools import TTLCache
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 
@@ -18,23 +17,11 @@ ORACLE_ENABLED: bool = importlib.util.find_spec("oracle_system") is not None
 
 class AppState:
     def __init__(self):
-        # Caches
-        self.nostr_auth_cache = TTLCache(maxsize=1000, ttl=settings.NOSTR_CACHE_TTL)
-        self.nostr_profile_cache = TTLCache(maxsize=1000, ttl=settings.NOSTR_PROFILE_CACHE_TTL)
-
-        # Hex to Email cache (built once)
-        self.hex_to_email_cache = {}
-        self.hex_to_directory_cache = TTLCache(maxsize=1000, ttl=3600)
-        self.hex_cache_built = False
+        # Les caches vivent dans services/cache.py (registre nommé, métriques)
 
         # Oracle System — typage générique pour éviter l'import circulaire
         self.oracle_system: Optional[Any] = None
 
-        # Cache Ustats.sh — réponse GET / servie depuis RAM, rafraîchie toutes les 60s
-        self.ustats_cache: Optional[Any] = None
-        self.ustats_cache_time: float = 0.0
-        self.USTATS_CACHE_TTL: int = 60
-
 app_state = AppState()
 
 @asynccontextmanager
@@ -58,30 +45,17 @@ async def lifespan(app: FastAPI):
         os.makedirs(directory, exist_ok=True)
         logging.info(f"Ensured directory exists: {directory}")
     
-    # Build hex index cache
-    logging.info("🔍 Building hex -> email index cache for MULTIPASS detection...")
-    nostr_base_path = settings.GAME_PATH / "nostr"
-    
-    if nostr_base_path.exists():
-        count = 0
-        for email_dir in nostr_base_path.iterdir():
-            if email_dir.is_dir() and '@' in email_dir.name:
-                hex_file_path = email_dir / "HEX"
-                if hex_file_path.exists():
-                    try:
-                        with open(hex_file_path, 'r') as f:
-                            stored_hex = f.read().strip().lower()
-                        if stored_hex:
-                            app_state.hex_to_email_cache[stored_hex] = email_dir.name
-                            count += 1
-                    except Exception as e:
-                        logging.warning(f"⚠️  Error reading {hex_file_path}: {e}")
-                        continue
-        app_state.hex_cache_built = True
-        logging.info(f"✅ Hex index cache built: {count} users indexed")
-    else:
-        logging.debug(f"ℹ️  NOSTR directory not found: {nostr_base_path}")
-        app_state.hex_cache_built = True
+    # Pool de dérivation de clés : forké tôt, avant les threads de l'API
+    from services.keyderive import start_pool, shutdown_pool
+    start_pool()
+
+    # Index hex -> email (détection MULTIPASS) construit dès le démarrage
+    from utils.security import _build_hex_index
+    _build_hex_index()
+
+    # Caches persistants (services/cache.py) : contenu de la session précédente
+    from services.cache import load_all as _load_caches, save_all as _save_caches
+    _load_caches()
 
     # Import lazy de OracleSystem pour éviter la dépendance circulaire
     # oracle_system.py peut importer core.config ; on diffère l'import au démarrage
@@ -113,48 +87,39 @@ async def lifespan(app: FastAPI):
         logging.error(f"❌ Failed to initialise OracleSystem: {e}")
         app.state.oracle = None
     
-    # Cache Ustats.sh : boucle de rafraîchissement toutes les 60 secondes
-    async def _refresh_ustats_loop():
-        import json as _json
-        import os as _os
-        import time as _time
-        from utils.helpers import run_script as _run_script
-        script_path = settings.ZEN_PATH / "Astroport.ONE" / "Ustats.sh"
-        if not script_path.exists():
-            logging.warning("⚠️  Ustats.sh introuvable — cache désactivé")
-            return
-        consecutive_failures = 0
-        while True:
-            try:
-                rc, last_line = await _run_script(script_path)
-                if rc == 0:
-                    if _os.path.exists(last_line.strip()):
-                        with open(last_line.strip(), 'r') as f:
-                            data = _json.load(f)
-                    else:
-                        data = _json.loads(last_line)
-                    app_state.ustats_cache = data
-                    app_state.ustats_cache_time = _time.time()
-                    consecutive_failures = 0
-                    logging.info("✅ Cache Ustats.sh rafraîchi")
-                else:
-                    consecutive_failures += 1
-                    logging.warning(f"⚠️  Ustats.sh rc={rc} (échec {consecutive_failures}/3)")
-                    if consecutive_failures >= 3:
-                        app_state.ustats_cache = None
-                        logging.error("❌ Cache Ustats.sh invalidé après 3 échecs consécutifs")
-            except Exception as e:
-                consecutive_failures += 1
-                logging.warning(f"⚠️  Rafraîchissement Ustats.sh échoué : {e} (échec {consecutive_failures}/3)")
-                if consecutive_failures >= 3:
-                    app_state.ustats_cache = None
-                    logging.error("❌ Cache Ustats.sh invalidé après 3 échecs consécutifs")
-            await asyncio.sleep(app_state.USTATS_CACHE_TTL)
+    # Cache Ustats.sh (services/ustats.py) : vue globale gardée chaude
+    from services.ustats import refresh_loop as _ustats_refresh_loop
+    asyncio.create_task(_ustats_refresh_loop())
+
+    # Analytics /ping : agrégation et flush périodique
+    from services.analytics import analytics_pipeline
+    analytics_pipeline.start()
+
+    # État des mémoires : compteurs Qdrant des comptes actifs rafraîchis en fond
+    from services.memory_status import refresh_loop as _memory_status_refresh_loop
+    asyncio.create_task(_memory_status_refresh_loop())
+
+    # Tâches post-upload (description, publication NOSTR, DM roaming)
+    from services.jobs import job_queue
+    job_queue.start()
 
-    asyncio.create_task(_refresh_ustats_loop())
+    # Sessions NIP-42 en mémoire (scan des markers + socket du relai)
+    from services.nip42_sessions import nip42_sessions
+    await nip42_sessions.start()
 
     yield
 
     # Shutdown
     logging.info("Shutting down application...")
+    await job_queue.stop()
+    await nip42_sessions.stop()
+    await analytics_pipeline.stop()
+    from services.cookie_store import flush_manifest_publishes
+    await flush_manifest_publishes()
+    shutdown_pool()
+    from services.kubo import kubo
+    await kubo.close()
+    from services.relay_pool import relay_pool
+    await relay_pool.close()
+    _save_caches()
     # Clean up resources if needed
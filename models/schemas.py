@@ -32,6 +32,7 @@ class UploadResponse(BaseModel):
     dimensions: Optional[str] = None
     upload_chain: Optional[str] = None
     file_cid: Optional[str] = None
+    status_url: Optional[str] = None  # GET → état des traitements différés (services/jobs.py)
 
 class CoinflipStartRequest(BaseModel):
     token: str
@@ -1,6 +1,5 @@
 """Cookie management — list / get (decrypted) / delete cookies stored via IPFS + NOSTR DID."""
 
-import asyncio
 import logging
 logger = logging.getLogger(__name__)
 from datetime import datetime, timezone
@@ -11,7 +10,8 @@ from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import HTMLResponse, PlainTextResponse
 
 from core.config import settings
-from services.cookie_store import decrypt_from_ipfs, load_manifest, save_manifest, publish_manifest_to_nostr
+from services.cookie_store import get_cookie_content, forget_cookie, load_manifest, save_manifest, schedule_manifest_publish
+from services.ipfs import kubo_pin_rm
 from services.nostr import require_nostr_auth
 from utils.crypto import npub_to_hex
 from utils.security import find_user_directory_by_hex
@@ -118,7 +118,7 @@ async def get_cookie(
 
     # Try IPFS decrypt (primary — encrypted, private)
     if cid:
-        content = await decrypt_from_ipfs(cid, user_dir)
+        content = await get_cookie_content(cid, user_dir)
         if content:
             return PlainTextResponse(content.decode("utf-8", errors="replace"))
 
@@ -165,7 +165,9 @@ async def delete_cookie(
     cid = manifest[resolved].get("cid")
     del manifest[resolved]
     save_manifest(user_dir, manifest)
-    asyncio.create_task(publish_manifest_to_nostr(user_dir, manifest))
+    schedule_manifest_publish(user_dir)
+    if cid:
+        forget_cookie(cid, user_dir)
 
     # Remove disk file (utiliser resolved, pas domain)
     disk = user_dir / f".{resolved}.cookie"
@@ -174,15 +176,7 @@ async def delete_cookie(
 
     # Unpin from IPFS (non-fatal)
     if cid:
-        try:
-            proc = await asyncio.create_subprocess_exec(
-                "ipfs", "pin", "rm", cid,
-                stdout=asyncio.subprocess.DEVNULL,
-                stderr=asyncio.subprocess.DEVNULL,
-            )
-            await asyncio.wait_for(proc.communicate(), timeout=10)
-        except Exception:
-            pass
+        await kubo_pin_rm(cid)
 
     return {"success": True, "domain": resolved, "requested": domain, "cid_unpinned": cid}
 
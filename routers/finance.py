@@ -11,7 +11,6 @@ import httpx
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional, Dict, Any
-from cachetools import TTLCache
 
 from fastapi import APIRouter, Request, Form, HTTPException
 from fastapi.responses import JSONResponse, HTMLResponse
@@ -40,15 +39,20 @@ from models.schemas import (
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
-# Cache balance : TTL 30 s, max 2000 entrées
-app_state.balance_cache = TTLCache(maxsize=2000, ttl=30)
+# Cache balance : TTL 30 s, max 2000 entrées — partagé par /check_balance
+# (g1pub et email), /check_balances et utils.helpers.check_balance via
+# services.g1_balance (coalescence des requêtes en un seul batch Squid).
+from services.g1_balance import balance_service, format_balance, zen_from_centimes
+from services.cache import named_cache
+from services.response_cache import fast_json
+app_state.balance_cache = balance_service.cache
 
 # Cache vérification OC : TTL 1h, max 500 entrées
-_oc_member_cache: "TTLCache" = TTLCache(maxsize=500, ttl=3600)
+_oc_member_cache = named_cache("oc_members", maxsize=500, ttl=3600)
 
 # Cache classement public des parrains : TTL 1h — évite de solliciter l'API
 # OpenCollective à chaque visite de UPlanet/earth/parrains.html
-_parrains_ranking_cache: "TTLCache" = TTLCache(maxsize=1, ttl=3600)
+_parrains_ranking_cache = named_cache("parrains_ranking", maxsize=1, ttl=3600)
 
 # --- Coinflip server-authoritative state ---
 import base64
@@ -112,14 +116,12 @@ def verify_token(token: str) -> Optional[Dict[str, Any]]:
     except Exception:
         return None
 
-from utils.helpers import check_balance
 # Service natif Python : remplace G1history.sh, G1balance.sh et gcli
-# Chaîne : Squid GraphQL → SubstrateInterface RPC → gcli → G1check.sh
+# Chaîne : Squid GraphQL → JSON-RPC natif → gcli → G1check.sh
+from services.g1_history import get_wallet_history, get_wallet_summary
 from services.g1_squid import (
-    get_g1_history_native,
     get_g1_balance_native,
     get_g1_balance_rpc_native,
-    get_g1_balances_batch,
     get_squid_urls,
     g1pub_to_ss58,
 )
@@ -423,7 +425,7 @@ async def _zen_send_impl(request: Request):
         })
 
 @router.get("/check_balance")
-async def check_balance_route(g1pub: str, html: Optional[str] = None):
+async def check_balance_route(request: Request, g1pub: str, html: Optional[str] = None):
     try:
         if '@' in g1pub:
             email = g1pub
@@ -431,25 +433,8 @@ async def check_balance_route(g1pub: str, html: Optional[str] = None):
             if not is_safe_email(email):
                 raise HTTPException(status_code=400, detail="Format d'email invalide")
             
-            nostr_g1pub = None
-            nostr_g1pub_path = get_safe_user_path("nostr", email, "G1PUBNOSTR")
-            
-            if nostr_g1pub_path and os.path.exists(nostr_g1pub_path):
-                try:
-                    with open(nostr_g1pub_path, 'r') as f:
-                        nostr_g1pub = f.read().strip()
-                except Exception:
-                    pass
-            
-            zencard_g1pub = None
-            zencard_g1pub_path = get_safe_user_path("players", email, ".g1pub")
-            
-            if zencard_g1pub_path and os.path.exists(zencard_g1pub_path):
-                try:
-                    with open(zencard_g1pub_path, 'r') as f:
-                        zencard_g1pub = f.read().strip()
-                except Exception:
-                    pass
+            # G1PUBNOSTR + ZenCard .g1pub lus ensemble (un thread), mis en cache
+            nostr_g1pub, zencard_g1pub = await balance_service.resolve_email(email)
             
             if not nostr_g1pub and not zencard_g1pub:
                 raise HTTPException(status_code=404, detail="Aucune g1pub trouvée pour cet email")
@@ -458,9 +443,9 @@ async def check_balance_route(g1pub: str, html: Optional[str] = None):
             
             if nostr_g1pub:
                 try:
-                    nostr_balance = await check_balance(nostr_g1pub)
+                    balances = await balance_service.get(nostr_g1pub)
                     result.update({
-                        "balance": nostr_balance,
+                        "balance": format_balance(balances.get("total", 0)),
                         "g1pub": nostr_g1pub
                     })
                 except Exception:
@@ -480,28 +465,16 @@ async def check_balance_route(g1pub: str, html: Optional[str] = None):
             if not is_safe_g1pub(g1pub):
                 raise HTTPException(status_code=400, detail="Format de g1pub invalide")
 
-            if g1pub in app_state.balance_cache:
-                cached = app_state.balance_cache[g1pub]
-                # Invalider le cache s'il n'a pas encore le champ zen
-                if "zen" not in cached:
-                    del app_state.balance_cache[g1pub]
-                else:
-                    return cached
-
-            balance = await check_balance(g1pub)
+            # Cache partagé + coalescence : les appels concurrents pour des
+            # g1pub différentes partent dans la même requête Squid batch.
+            balances = await balance_service.get(g1pub)
+            centimes = balances.get("total", 0)
             # Calcul zen : (solde_Ğ1 - 1_PAF) × 10, min 0
-            zen_float = None
-            try:
-                clean = balance.replace('Ğ1', '').replace('G1', '').strip()
-                zen_float = round(max(0.0, (float(clean) - 1.0) * 10.0), 2)
-            except (ValueError, TypeError):
-                pass
-            result = {"balance": balance, "g1pub": g1pub}
-            if zen_float is not None:
-                result["zen"] = zen_float
-
-            app_state.balance_cache[g1pub] = result
-            return result
+            return fast_json(request, {
+                "balance": format_balance(centimes),
+                "g1pub": g1pub,
+                "zen": zen_from_centimes(centimes),
+            })
             
     except HTTPException:
         raise
@@ -511,10 +484,13 @@ async def check_balance_route(g1pub: str, html: Optional[str] = None):
         raise HTTPException(status_code=500, detail="Erreur interne du serveur")
 
 @router.get("/check_g1history")
-async def check_g1history_route(g1pub: str, limit: int = 100):
+async def check_g1history_route(g1pub: str, limit: int = 100, offset: int = 0, summary: bool = False):
     """Historique des transactions G1 d'un portefeuille MULTIPASS.
     Accepte un g1pub SS58/Base58 ou un email (résolution locale puis swarm).
-    Retourne {"history": [...], "g1pub": "...", "total": N}
+    Servi depuis le store local incrémental (services.g1_history) : seuls les
+    transferts postérieurs au dernier curseur sont demandés au Squid.
+    Retourne {"history": [...], "g1pub": "...", "total": N, "count": <en store>}
+    (+ "monthly" / "counterparties" si summary=true).
     """
     try:
         if '@' in g1pub:
@@ -538,9 +514,14 @@ async def check_g1history_route(g1pub: str, limit: int = 100):
         if not is_safe_g1pub(g1pub):
             raise HTTPException(status_code=400, detail="Format g1pub invalide")
 
-        data = await get_g1_history_native(g1pub, limit)
-        history = data.get("history", [])
-        return {"history": history, "g1pub": g1pub, "total": len(history)}
+        limit = max(1, min(limit, 1000))
+        offset = max(0, offset)
+        data = await get_wallet_history(g1pub, limit=limit, offset=offset)
+        history = data["history"]
+        result = {"history": history, "g1pub": g1pub, "total": len(history), "count": data["count"]}
+        if summary:
+            result.update(await get_wallet_summary(g1pub))
+        return result
 
     except HTTPException:
         raise
@@ -551,7 +532,8 @@ async def check_g1history_route(g1pub: str, limit: int = 100):
 async def check_balances_route(g1pubs: str):
     """
     Balance batch pour plusieurs clés G1 (séparées par virgule, max 20).
-    Utilise une seule requête Squid GraphQL via get_g1_balances_batch().
+    Servi depuis le cache partagé de services.g1_balance ; les clés manquantes
+    rejoignent un seul batch Squid GraphQL (get_g1_balances_batch()).
     Réponse : {"balances": {"<g1pub>": {"balance": "2.48", "zen": "14.80"}, ...}}
     """
     pubkey_list = [p.strip() for p in g1pubs.split(",") if p.strip()][:20]
@@ -559,7 +541,7 @@ async def check_balances_route(g1pubs: str):
     if not valid:
         raise HTTPException(status_code=400, detail="Aucune g1pub valide")
 
-    batch_raw = await get_g1_balances_batch(valid)
+    batch_raw = await balance_service.get_many(valid)
 
     result = {}
     for g1pub in valid:
@@ -593,20 +575,15 @@ async def _resolve_g1pubnostr_from_swarm(email: str) -> str:
       3. IPFS gateway IPNS  : http://localhost:8080/ipns/{IPFSNODEID}/TW/{email}/G1PUBNOSTR
     Retourne le G1PUBNOSTR (str) si trouvé, sinon chaîne vide.
     """
-    import glob
-
     home = os.path.expanduser("~")
 
-    # 1. Swarm cache local : ~/.zen/tmp/swarm/*/TW/{email}/G1PUBNOSTR
-    pattern = os.path.join(home, ".zen", "tmp", "swarm", "*", "TW", email, "G1PUBNOSTR")
-    for fpath in glob.glob(pattern):
-        try:
-            g1pub = Path(fpath).read_text().strip()
-            if g1pub:
-                logger.info(f"🔍 G1PUBNOSTR trouvé en cache swarm local pour {email}: {g1pub[:12]}…")
-                return g1pub
-        except Exception:
-            continue
+    # 1. Swarm cache local : ~/.zen/tmp/swarm/*/TW/{email}/G1PUBNOSTR (index swarm)
+    from services.swarm_index import swarm_index
+    for account in swarm_index.accounts(email):
+        g1pub = account.get("g1", "")
+        if g1pub:
+            logger.info(f"🔍 G1PUBNOSTR trouvé en cache swarm local pour {email}: {g1pub[:12]}…")
+            return g1pub
 
     # 2. Script search_for_this_email_in_nostr.sh (lookup étendu swarm)
     from core.config import settings
@@ -1195,8 +1172,9 @@ async def get_oc_member_info(email: str) -> dict:
         raise HTTPException(status_code=400, detail="Email invalide")
 
     cache_key = f"oc_member_{email_lc}"
-    if cache_key in _oc_member_cache:
-        return _oc_member_cache[cache_key]
+    cached = _oc_member_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
     from core.config import settings
 
@@ -1674,8 +1652,9 @@ async def parrains_ranking():
     initiale) côté bash — la route ne fait que relayer/cacher. Cache 1h pour éviter
     de solliciter l'API OpenCollective à chaque visite d'une page publique."""
     cache_key = "ranking"
-    if cache_key in _parrains_ranking_cache:
-        return JSONResponse(_parrains_ranking_cache[cache_key])
+    cached = _parrains_ranking_cache.get(cache_key)
+    if cached is not None:
+        return JSONResponse(cached)
 
     script = OC2UPLANET_PATH / "oc2uplanet.sh"
     if not script.exists():
@@ -1833,7 +1812,7 @@ async def oc_admin_g1n2_wallets(request: Request, uplanetname: Optional[str] = N
     wallets.sort(key=lambda w: w["balance"], reverse=True)
 
     # Ẑen (MULTIPASS existant, Duniter) des comptes résolus — UN SEUL appel batch
-    # Squid GraphQL (get_g1_balances_batch, déjà utilisé par /check_balances)
+    # Cache partagé services.g1_balance (batch Squid, comme /check_balances)
     # plutôt qu'un appel réseau par wallet.
     g1pub_by_hex = {}
     for w in wallets:
@@ -1847,7 +1826,7 @@ async def oc_admin_g1n2_wallets(request: Request, uplanetname: Optional[str] = N
                 pass
 
     if g1pub_by_hex:
-        batch_raw = await get_g1_balances_batch(list(g1pub_by_hex.values())[:20])
+        batch_raw = await balance_service.get_many(list(g1pub_by_hex.values())[:20])
         for w in wallets:
             g1pub = g1pub_by_hex.get(w["hex"])
             if not g1pub:
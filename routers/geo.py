@@ -16,11 +16,13 @@ from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 
 from core.config import settings
+from core.middleware import get_client_ip
 from utils.helpers import get_myipfs_gateway, get_env_from_mysh
 from services.nostr import verify_nostr_auth, generate_nip42_challenge, NIP42_CHALLENGE_TTL
 from utils.crypto import hex_to_npub, npub_to_hex
 from utils.security import find_user_directory_by_hex
 from services.roaming import resolve_home_station as _resolve_home_station
+from services import geogrid, keyderive
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -36,8 +38,11 @@ class UmapGeolinksResponse(BaseModel):
     timestamp: str
     processing_time_ms: int
 
-async def get_umap_geolinks(lat: float, lon: float) -> Dict[str, Any]:
-    """Récupérer les liens géographiques des UMAPs, SECTORs et REGIONs adjacentes"""
+async def get_umap_geolinks(lat: float, lon: float, client_ip: Optional[str] = None) -> Dict[str, Any]:
+    """Récupérer les liens géographiques des UMAPs, SECTORs et REGIONs adjacentes
+    (ex-Umap_geonostr.sh : mêmes clés, sans fork ni dérivation répétée).
+    Les dérivations sont imputées à `client_ip` : keyderive.KeyDerivationBusy
+    est propagée à l'appelant (429)."""
     start_time = time.time()
     
     try:
@@ -50,49 +55,11 @@ async def get_umap_geolinks(lat: float, lon: float) -> Dict[str, Any]:
         if lon < -180 or lon > 180:
             raise ValueError("Longitude doit être entre -180 et 180")
         
-        script_path = settings.TOOLS_PATH / "Umap_geonostr.sh"
-        
-        if not os.path.exists(script_path):
-            raise FileNotFoundError(f"Script Umap_geonostr.sh non trouvé: {script_path}")
-        
-        if not os.access(script_path, os.X_OK):
-            os.chmod(script_path, 0o755)
-        
-        import asyncio
-        process = await asyncio.create_subprocess_exec(
-            script_path, str(lat), str(lon),
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        stdout, stderr = await process.communicate()
-        
-        if process.returncode != 0:
-            error_msg = stderr.decode().strip() if stderr else "Erreur inconnue"
-            raise RuntimeError(f"Script Umap_geonostr.sh a échoué: {error_msg}")
-        
-        from utils.helpers import safe_json_load
-        try:
-            raw_data = safe_json_load(stdout.decode().strip())
-        except ValueError as e:
-            raise ValueError(f"Sortie JSON invalide du script: {e}")
-        
-        required_sections = ['umaps', 'sectors', 'regions']
-        missing_sections = [section for section in required_sections if section not in raw_data]
-        
-        if missing_sections:
-            raise ValueError(f"Format invalide - sections manquantes: {missing_sections}")
-        
-        umaps_data = raw_data['umaps']
-        sectors_data = raw_data['sectors']
-        regions_data = raw_data['regions']
-        
-        expected_keys = ['north', 'south', 'east', 'west', 'northeast', 'northwest', 'southeast', 'southwest', 'here']
-        
-        for section_name, section_data in [('umaps', umaps_data), ('sectors', sectors_data), ('regions', regions_data)]:
-            missing_keys = [key for key in expected_keys if key not in section_data]
-            if missing_keys:
-                raise ValueError(f"Clés manquantes dans {section_name}: {missing_keys}")
+        # Grille calculée en Python, clés de cellules mémoïsées (services.geogrid)
+        links = await geogrid.get_geolinks(lat, lon, client_ip)
+        umaps_data = links['umaps']
+        sectors_data = links['sectors']
+        regions_data = links['regions']
         
         adjacent_count = len([k for k in umaps_data.keys() if k != 'here'])
         processing_time = int((time.time() - start_time) * 1000)
@@ -109,6 +76,8 @@ async def get_umap_geolinks(lat: float, lon: float) -> Dict[str, Any]:
             "processing_time_ms": processing_time
         }
         
+    except keyderive.KeyDerivationBusy:
+        raise
     except Exception as e:
         processing_time = int((time.time() - start_time) * 1000)
         logger.error(f"Erreur lors de la récupération des liens UMAP: {str(e)}")
@@ -147,7 +116,7 @@ async def chat_route(request: Request, room: Optional[str] = None):
                     umap_lat = round(umap_lat * 100) / 100
                     umap_lon = round(umap_lon * 100) / 100
                     
-                    geolinks_result = await get_umap_geolinks(umap_lat, umap_lon)
+                    geolinks_result = await get_umap_geolinks(umap_lat, umap_lon, get_client_ip(request))
                     
                     if geolinks_result.get('success'):
                         if geolinks_result.get('umaps'):
@@ -161,7 +130,7 @@ async def chat_route(request: Request, room: Optional[str] = None):
         else:
             umap_lat = 0.00
             umap_lon = 0.00
-            geolinks_result = await get_umap_geolinks(umap_lat, umap_lon)
+            geolinks_result = await get_umap_geolinks(umap_lat, umap_lon, get_client_ip(request))
             
             if geolinks_result.get('success'):
                 if geolinks_result.get('umaps'):
@@ -180,15 +149,19 @@ async def chat_route(request: Request, room: Optional[str] = None):
             "sector_hex": sector_hex,
             "region_hex": region_hex
         })
+    except keyderive.KeyDerivationBusy as busy:
+        raise HTTPException(status_code=429, detail="KEYDERIVE_BUSY",
+                            headers={"Retry-After": str(busy.retry_after)})
     except Exception as e:
         logger.error(f"Error serving chat page: {e}")
         raise HTTPException(status_code=500, detail=f"Error loading chat page: {str(e)}")
 
 @router.get("/api/umap/geolinks", response_model=UmapGeolinksResponse)
-async def get_umap_geolinks_api(lat: float, lon: float):
-    """Récupérer les liens géographiques des UMAPs, SECTORs et REGIONs adjacentes"""
+async def get_umap_geolinks_api(request: Request, lat: float, lon: float):
+    """Récupérer les liens géographiques des UMAPs, SECTORs et REGIONs adjacentes.
+    Les dérivations sont imputées à l'IP appelante (429 si le pool est saturé)."""
     try:
-        result = await get_umap_geolinks(lat, lon)
+        result = await get_umap_geolinks(lat, lon, get_client_ip(request))
         
         if not result["success"]:
             raise HTTPException(status_code=500, detail=result["message"])
@@ -204,11 +177,42 @@ async def get_umap_geolinks_api(lat: float, lon: float):
             timestamp=result["timestamp"],
             processing_time_ms=result["processing_time_ms"]
         )
+    except keyderive.KeyDerivationBusy as busy:
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(busy.retry_after)},
+            content={"success": False, "error": "KEYDERIVE_BUSY", "retry_after": busy.retry_after},
+        )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur interne: {str(e)}")
 
+@router.get("/api/umap/geolinks/bbox")
+async def get_umap_bbox_api(request: Request, south: float, west: float, north: float, east: float,
+                            level: str = "umap"):
+    """Clés hex de toutes les cellules (umap, sector ou region) d'une bounding box
+    en un seul appel — pour les clients cartographiques (pan/zoom). Les
+    dérivations sont imputées à l'IP appelante (429 si le pool est saturé)."""
+    start_time = time.time()
+    try:
+        cells = await geogrid.resolve_bbox(south, west, north, east, level, get_client_ip(request))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except keyderive.KeyDerivationBusy as busy:
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(busy.retry_after)},
+            content={"success": False, "error": "KEYDERIVE_BUSY", "retry_after": busy.retry_after},
+        )
+    return {
+        "success": True,
+        "level": level,
+        "cells": cells,
+        "count": len(cells),
+        "processing_time_ms": int((time.time() - start_time) * 1000),
+    }
+
 @router.get("/api/nip42/challenge")
 async def get_nip42_challenge(npub: str):
     """
@@ -301,11 +305,15 @@ async def get_my_gps_coordinates(npub: str):
             user_dir = find_user_directory_by_hex(pubkey_hex)
         except HTTPException:
             # Fallback : chercher via le marker .nip42_auth_<hex> créé par filter/22242.sh
-            # (le fichier HEX peut avoir été écrasé par la copie du TW swarm)
+            # (le fichier HEX peut avoir été écrasé par la copie du TW swarm).
+            # La session NIP-42 en mémoire connaît déjà son répertoire.
+            from services.nip42_sessions import nip42_sessions
+            session = nip42_sessions.get(pubkey_hex)
             nostr_base = settings.GAME_PATH / "nostr"
             auth_marker_name = f".nip42_auth_{pubkey_hex}"
             try:
-                for d in nostr_base.iterdir():
+                candidates = [session.user_dir] if session and session.user_dir else nostr_base.iterdir()
+                for d in candidates:
                     if d.is_dir() and (d / auth_marker_name).exists():
                         user_dir = d
                         # Réparer HEX pour les prochaines requêtes
@@ -20,10 +20,12 @@ from fastapi.templating import Jinja2Templates
 
 from core.config import settings
 from utils.helpers import run_script, get_myipfs_gateway, is_origin_mode, get_oc_tier_urls, get_uplanet_home_url
-from utils.security import is_multipass_user, is_safe_email
+from utils.security import is_multipass_user, is_safe_email, find_email_by_hex
 from utils.crypto import npub_to_hex, hex_to_npub, verify_nostr_event
 from utils.observability import log_node_event, log_user_event
 from services.nostr import generate_nip42_challenge, consume_nip42_challenge, get_nip42_challenge, get_n1_follows
+from services import keyderive
+from core.middleware import get_client_ip
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -73,26 +75,25 @@ class G1NostrForm(BaseModel):
 from fastapi import Depends
 
 
-async def _stretch_credentials(salt: str, pepper: str) -> tuple[str, str]:
+async def _stretch_credentials(salt: str, pepper: str, client_ip: str) -> tuple[str, str]:
     """PBKDF2-HMAC-SHA256 (600k iter, domain-salt 'uplanet-a4l-v1') sur salt et pepper bruts.
-    Identique à la Phase 1 de atomic.html côté client.  Exécuté dans un thread executor
-    pour ne pas bloquer la boucle asyncio (~0.5 s sur serveur moderne).
+    Identique à la Phase 1 de atomic.html côté client.  Exécuté dans le pool de
+    processus dédié (services.keyderive) : file bornée, équité par IP, résultats
+    réutilisés pour des entrées identiques. Lève KeyDerivationBusy si saturé.
     """
-    domain = b"uplanet-a4l-v1"
-    loop = asyncio.get_event_loop()
-    salt_bytes, pepper_bytes = await asyncio.gather(
-        loop.run_in_executor(None, hashlib.pbkdf2_hmac, "sha256", salt.encode(), domain, 600000),
-        loop.run_in_executor(None, hashlib.pbkdf2_hmac, "sha256", pepper.encode(), domain, 600000),
-    )
-    return (
-        base64.urlsafe_b64encode(salt_bytes).rstrip(b"=").decode(),
-        base64.urlsafe_b64encode(pepper_bytes).rstrip(b"=").decode(),
-    )
-
-
-async def _derive_npub_from_credentials(salt: str, pepper: str) -> Optional[str]:
-    """Dérive le npub NOSTR depuis stretchedSalt/stretchedPepper via keygen.
-    Identique à keygen -t nostr : scrypt(pepper, salt) → ed25519."""
+    return await keyderive.stretch_credentials(salt, pepper, client_ip)
+
+
+async def _derive_npub_from_credentials(salt: str, pepper: str, client_ip: str) -> Optional[str]:
+    """Dérive le npub NOSTR depuis stretchedSalt/stretchedPepper.
+    Identique à keygen -t nostr : scrypt(pepper, salt) → secp256k1, calculé en
+    mémoire dans le pool services.keyderive (ni fork, ni fichier /dev/shm).
+    Lève KeyDerivationBusy si le pool est saturé."""
+    if settings.KEYDERIVE_NOSTR_INPROCESS:
+        return await keyderive.derive_nostr_npub(salt, pepper, client_ip)
+    cached = keyderive.get_cached("npub", salt, pepper)
+    if cached:
+        return cached
     keygen = settings.TOOLS_PATH / "keygen"
     if not keygen.exists():
         return None
@@ -105,7 +106,10 @@ async def _derive_npub_from_credentials(salt: str, pepper: str) -> Optional[str]
             stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
         )
         stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=10.0)
-        return stdout.decode().strip() or None
+        npub = stdout.decode().strip() or None
+        if npub:
+            keyderive.put_cached("npub", npub, salt, pepper)
+        return npub
     except Exception as e:
         logger.warning(f"[npub_derive] {e}")
         return None
@@ -114,18 +118,22 @@ async def _derive_npub_from_credentials(salt: str, pepper: str) -> Optional[str]
 
 
 def _find_email_by_npub(npub: str) -> Optional[str]:
-    """Scan ~/.zen/game/nostr/*/.secret.nostr → email existant pour ce npub."""
-    pattern = f"NPUB={npub}"
-    try:
-        for secret in (settings.GAME_PATH / "nostr").glob("*/.secret.nostr"):
-            try:
-                if pattern in secret.read_text():
-                    return secret.parent.name
-            except OSError:
-                continue
-    except Exception as e:
-        logger.warning(f"[npub_scan] {e}")
-    return None
+    """Email existant pour ce npub — lookup O(1) dans l'index HEX → email
+    (utils.security), tenu à jour à chaque nouveau répertoire MULTIPASS."""
+    hex_pubkey = npub_to_hex(npub)
+    return find_email_by_hex(hex_pubkey) if hex_pubkey else None
+
+
+def _keyderive_busy(busy: keyderive.KeyDerivationBusy) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(busy.retry_after)},
+        content={
+            "error": "KEYDERIVE_BUSY",
+            "retry_after": busy.retry_after,
+            "message": "Serveur occupé par d'autres créations de MULTIPASS, réessayez dans quelques secondes."
+        }
+    )
 
 
 def _resolve_pass_file(email: str) -> Optional[Path]:
@@ -305,7 +313,10 @@ async def _scan_qr_impl(
     pepper = form_data.pepper
     # ── Pre-stretching serveur : Cabine-33 et clients légers sans PBKDF2 natif ─
     if not form_data.pre_stretched and salt and pepper:
-        salt, pepper = await _stretch_credentials(salt, pepper)
+        try:
+            salt, pepper = await _stretch_credentials(salt, pepper, get_client_ip(request))
+        except keyderive.KeyDerivationBusy as busy:
+            return _keyderive_busy(busy)
     format = form_data.format
     pass_code = (form_data.pass_code or "").strip()
     birth_datetime      = form_data.birth_datetime or ""
@@ -325,7 +336,10 @@ async def _scan_qr_impl(
     # Dérive le npub localement avant toute création pour détecter les conflits.
     derived_npub: Optional[str] = None
     if salt and pepper and format == "json":
-        derived_npub = await _derive_npub_from_credentials(salt, pepper)
+        try:
+            derived_npub = await _derive_npub_from_credentials(salt, pepper, get_client_ip(request))
+        except keyderive.KeyDerivationBusy as busy:
+            return _keyderive_busy(busy)
 
     # ── Cas : email différent, même npub → IDENTITY_CONFLICT ─────────────────
     if derived_npub and not email_exists:
@@ -897,6 +911,7 @@ async def atom4love_dream(
 # ═══════════════════════════════════════════════════════════════════════════
 
 from services.memory_status import get_memory_status, _flashmem_dir  # noqa: E402
+from services.page_context import snapshot, invalidate_user  # noqa: E402
 
 
 def _love_profile_path(email: str) -> Path:
@@ -985,7 +1000,8 @@ async def get_atom4love_profile(
 
     hex_love_file = settings.GAME_PATH / "nostr" / email / "HEX_LOVE"
     profile = _read_love_profile(email)
-    mem_status = await asyncio.to_thread(get_memory_status, email)
+    # Vue partagée avec /mailjet (cache court, invalidé à chaque écriture)
+    mem_status = await snapshot("memory_status", email, get_memory_status, email)
 
     is_public = bool(profile.get("public", False))
     is_owner = False
@@ -1075,6 +1091,7 @@ async def atom4love_profile(
             "error": data.get("error", "PUBLISH_FAILED"),
             "message": "Échec de la publication du profil."})
 
+    invalidate_user(email)
     logger.info(f"ATOM4LOVE profile published for {email}")
     return JSONResponse(data)
 
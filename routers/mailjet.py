@@ -23,11 +23,13 @@ from fastapi.templating import Jinja2Templates
 
 from core.config import settings
 from services.memory_status import (
-    get_memory_status, reset_memory, RESET_SCOPES, regenerate_lifeos_from_mastodon,
+    get_memory_status, empty_memory_status, reset_memory, RESET_SCOPES, regenerate_lifeos_from_mastodon,
     get_identity_content, save_identity_file, IDENTITY_FILENAMES, IDENTITY_LABELS,
     IDENTITY_PLACEHOLDERS,
 )
 from services.roaming import resolve_home_http_url
+from services.swarm_index import swarm_index
+from services.page_context import Loader, build_context, invalidate_user
 from utils.crypto import verify_nostr_event as _verify_nostr_event
 from utils.crypto import _pt_mul, _SECP256K1_G as _G  # ECDH auto-chiffrement NIP-04 ci-dessous
 from utils.security import safe_json_body
@@ -252,18 +254,10 @@ def _check_roaming(npub: str, hex_pk: str = "") -> dict:
         home_http_url = resolve_home_http_url(home_ipfsnodeid, user_dir.name)
         return {"state": "roaming", "email": user_dir.name, "home_http_url": home_http_url}
 
-    swarm = Path.home() / ".zen" / "tmp" / "swarm"
-    if swarm.exists():
-        for f in swarm.glob("**/NPUB"):
-            v = _read_marker(f)
-            if not v or (v != npub and not (hex_pk and v == hex_pk)):
-                continue
-            try:
-                home_ipfsnodeid = f.relative_to(swarm).parts[0]
-            except Exception:
-                home_ipfsnodeid = None
-            return {"state": "roaming", "email": None,
-                    "home_http_url": resolve_home_http_url(home_ipfsnodeid, None)}
+    found = swarm_index.find_pubkey(npub, hex_pk)
+    if found:
+        return {"state": "roaming", "email": None,
+                "home_http_url": resolve_home_http_url(found[0], None)}
     return {"state": "unknown", "email": None, "home_http_url": None}
 
 
@@ -522,13 +516,28 @@ def _scraper_log_tail(email: str, domain: str, lines: int = 100) -> str:
     return ""
 
 
+def _scraper_last_runs(email: str) -> dict[str, str]:
+    """Dernière date (YYYYMMDD) de passage de chaque scraper (fichiers
+    {domain}_sync_{email}_{date}.done) — un seul parcours de tmp/."""
+    suffix = f"_sync_{email}_"
+    last: dict[str, str] = {}
+    try:
+        with os.scandir(Path.home() / ".zen" / "tmp") as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.endswith(".done") or suffix not in name:
+                    continue
+                domain, _, date = name[:-len(".done")].rpartition(suffix)
+                if domain and date > last.get(domain, ""):
+                    last[domain] = date
+    except OSError:
+        pass
+    return last
+
+
 def _scraper_last_run(email: str, domain: str) -> str:
     """Dernière date (YYYYMMDD) où le scraper a tourné (fichier .done)."""
-    tmp_dir = Path.home() / ".zen" / "tmp"
-    matches = sorted(tmp_dir.glob(f"{domain}_sync_{email}_*.done"), reverse=True)
-    if not matches:
-        return ""
-    return matches[0].stem.rsplit("_", 1)[-1]
+    return _scraper_last_runs(email).get(domain, "")
 
 
 def _has_raw_cookie(email: str, domain: str) -> bool:
@@ -547,6 +556,7 @@ def _list_scrapers_status(email: str) -> list[dict]:
     result = []
     user_domains = set(_cookie_domains(email))
     station_map = {s["domain"]: s for s in bro_watch_core.list_station_scrapers()}
+    last_runs = _scraper_last_runs(email)
 
     for domain in sorted(user_domains):
         script = _find_scraper_script(domain)
@@ -558,7 +568,7 @@ def _list_scrapers_status(email: str) -> list[dict]:
             "has_cookie":    _has_raw_cookie(email, domain),
             "available":     script is not None,
             "enabled":       bro_watch_core.is_scraper_enabled(email, domain),
-            "last_run":      _scraper_last_run(email, domain),
+            "last_run":      last_runs.get(domain, ""),
             "watch_entries": bro_watch_core.load_watch_list(email, domain),
             "icon":          info.get("icon", "🍪"),
             "description":   info.get("description", ""),
@@ -837,13 +847,23 @@ async def get_mailjet(
     for _fk, _fd in _FLUX_CHANNEL_DEFAULTS.items():
         _fc[_fk] = {**_fd, **_fc_saved.get(_fk, {})}
 
-    # Mise à jour silencieuse du catalogue scrapers dans le manifest kind 31903
-    try:
-        bro_watch_core.update_bro_capabilities(email)
-    except Exception:
-        pass
-
-    _pass_file = _resolve_pass_file(email)
+    # Chargeurs indépendants exécutés en parallèle (services/page_context.py) :
+    # le rendu attend le plus lent, borné par PAGE_LOADER_TIMEOUT.
+    page = await build_context({
+        # Mise à jour silencieuse du catalogue scrapers dans le manifest kind 31903
+        "_capabilities":    Loader(bro_watch_core.update_bro_capabilities, (email,)),
+        # Scrapers BRO (cookies déposés + smart contracts disponibles)
+        "scrapers":         Loader(_list_scrapers_status, (email,), default=[]),
+        # État des mémoires (fichiers + Qdrant) — self-service, cf. services/memory_status.py
+        "memory_status":    Loader(get_memory_status, (email,), default=empty_memory_status(email),
+                                   snapshot="memory_status", user=email),
+        # Profil LifeOS — contenu texte éditable des 5 fichiers identity/*.md
+        "identity_content": Loader(get_identity_content, (email,), default={},
+                                   snapshot="identity_content", user=email),
+        # Code PASS — récupération de compte par email+PASS sur /g1nostr
+        "_pass":            Loader(_pass_state, (email,), default=(False, "", False)),
+    })
+    pass_active, pass_code, pass_restore_disabled = page.values["_pass"]
 
     return templates.TemplateResponse(request, "mailjet_prefs.html", {
         "email":                email,
@@ -867,22 +887,30 @@ async def get_mailjet(
         "flux_milestones_off":  not _flux.get("milestones", True),
         # Canaux par catégorie (email ON/OFF, nostr ON/OFF)
         "fc": _fc,
-        # Scrapers BRO (cookies déposés + smart contracts disponibles)
-        "scrapers": _list_scrapers_status(email),
-        # État des mémoires (fichiers + Qdrant) — self-service, cf. services/memory_status.py
-        "memory_status": await asyncio.to_thread(get_memory_status, email),
-        # Profil LifeOS — contenu texte éditable des 5 fichiers identity/*.md
-        "identity_content":      await asyncio.to_thread(get_identity_content, email),
+        "scrapers":              page.values["scrapers"],
+        "memory_status":         page.values["memory_status"],
+        "identity_content":      page.values["identity_content"],
         "identity_filenames":    IDENTITY_FILENAMES,
         "identity_labels":       IDENTITY_LABELS,
         "identity_placeholders": IDENTITY_PLACEHOLDERS,
-        # Code PASS — récupération de compte par email+PASS sur /g1nostr
-        "pass_active":           _pass_file is not None,
-        "pass_code":             _pass_file.read_text().strip() if _pass_file else "",
-        "pass_restore_disabled": _is_pass_restore_disabled(email),
+        "pass_active":           pass_active,
+        "pass_code":             pass_code,
+        "pass_restore_disabled": pass_restore_disabled,
+        # Sections non chargées à temps (rendu partiel)
+        "degraded_sections":     [n for n in page.degraded if not n.startswith("_")],
     })
 
 
+def _pass_state(email: str) -> tuple[bool, str, bool]:
+    """(PASS actif, code PASS, restauration désactivée) — lecture disque."""
+    pass_file = _resolve_pass_file(email)
+    return (
+        pass_file is not None,
+        pass_file.read_text().strip() if pass_file else "",
+        _is_pass_restore_disabled(email),
+    )
+
+
 @router.post("/mailjet", response_class=HTMLResponse)
 async def post_mailjet(
     request: Request,
@@ -1125,6 +1153,7 @@ async def post_memory_reset(
         )
 
     report = await asyncio.to_thread(reset_memory, email, scope)
+    invalidate_user(email)
     logger.info("Mémoire %s réinitialisée pour %s (%d élément(s))", scope, email, len(report["deleted"]))
 
     return RedirectResponse(f"/mailjet?email={email}&token={token}#memoire", status_code=303)
@@ -1147,6 +1176,7 @@ async def post_memory_regenerate(
         return err
 
     result = await asyncio.to_thread(regenerate_lifeos_from_mastodon, email)
+    invalidate_user(email)
     logger.info("Régénération LifeOS depuis Mastodon pour %s → %s", email, result)
 
     if not result.get("ok"):
@@ -1190,6 +1220,7 @@ async def post_identity_save(
         )
 
     ok, msg = await asyncio.to_thread(save_identity_file, email, filename, content)
+    invalidate_user(email)
     logger.info("Identity %s sauvegardé pour %s (ok=%s)", filename, email, ok)
     if not ok:
         return templates.TemplateResponse(
@@ -41,28 +41,18 @@ router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
 from utils.helpers import send_server_side_analytics
-
-# Cache permanent CID → source.* de info.json (les CID sont content-addressed,
-# jamais besoin d'invalider). Alimente tmdb_metadata/youtube_metadata ci-dessous.
-_INFO_JSON_SOURCE_CACHE: Dict[str, Dict[str, Any]] = {}
+from services.response_cache import ResponseCache, json_response
+from services.ipfs import fetch_info_json
 
 async def _fetch_info_json_source(info_cid: str) -> Dict[str, Any]:
-    """Récupère la section `source` (tmdb/youtube) de info.json pour un info_cid.
+    """Récupère la section `source` (tmdb/youtube) de info.json pour un info_cid,
+    via le cache info.json partagé de services.ipfs (content-addressed).
     Retourne {} si absent/inaccessible — ne doit jamais lever d'exception."""
-    if info_cid in _INFO_JSON_SOURCE_CACHE:
-        return _INFO_JSON_SOURCE_CACHE[info_cid]
-    result: Dict[str, Any] = {}
     try:
-        clean_cid = info_cid.replace("/ipfs/", "").replace("ipfs://", "").strip()
-        url = f"{settings.IPFS_GATEWAY}/ipfs/{clean_cid}"
-        async with httpx.AsyncClient(timeout=3.0) as client:
-            resp = await client.get(url)
-            if resp.status_code == 200:
-                result = resp.json().get("source", {}) or {}
+        return (await fetch_info_json(info_cid)).get("source") or {}
     except Exception as e:
         logger.debug(f"[youtube] info.json source non récupéré pour {info_cid}: {e}")
-    _INFO_JSON_SOURCE_CACHE[info_cid] = result
-    return result
+        return {}
 
 @router.head("/theater")
 async def theater_modal_head(request: Request, video: Optional[str] = None):
@@ -242,6 +232,243 @@ async def contrib_route(request: Request, video: Optional[str] = None, kind: Opt
         "video_kind": kind or "21"
     })
 
+class _VideoChannelModuleMissing(Exception):
+    """Astroport.ONE/IA/create_video_channel.py introuvable."""
+
+
+class _RelayUnavailable(Exception):
+    """Lecture des vidéos sur le relai local en échec (délai ou erreur)."""
+
+
+async def _build_youtube_data(
+    channel, search, keyword, date_from, date_to,
+    duration_min, duration_max, sort_by, lat, lon, radius, strict=False,
+):
+    """Vidéos NOSTR enrichies, filtrées, triées et regroupées en playlists.
+    Retourne (response_data, video_messages). `strict` : un échec du relai
+    lève _RelayUnavailable au lieu de donner une liste vide (réponses mises
+    en cache : l'entrée précédente reste servie)."""
+    import sys
+    sys.path.append(str(settings.ZEN_PATH / "Astroport.ONE" / "IA"))
+    try:
+        from create_video_channel import fetch_and_process_nostr_events, create_channel_playlist
+    except ImportError:
+        logger.error("Could not import create_video_channel")
+        raise _VideoChannelModuleMissing()
+
+    try:
+        video_messages = await asyncio.wait_for(
+            fetch_and_process_nostr_events("ws://127.0.0.1:7777", 200),
+            timeout=15.0
+        )
+    except asyncio.TimeoutError:
+        if strict:
+            raise _RelayUnavailable("timeout fetching NOSTR events")
+        logger.warning("⚠️ Timeout fetching NOSTR events, using empty list")
+        video_messages = []
+    except Exception as fetch_error:
+        if strict:
+            raise _RelayUnavailable(f"error fetching NOSTR events: {fetch_error}") from fetch_error
+        logger.error(f"❌ Error fetching NOSTR events: {fetch_error}")
+        video_messages = []
+    
+    valid_video_items = [
+        v for v in video_messages if v.get('title') and v.get('ipfs_url')
+    ]
+
+    # Enrichissement tmdb_metadata/youtube_metadata depuis info.json (source.tmdb/source.youtube) —
+    # récupéré en parallèle, mis en cache par CID (content-addressed, jamais invalidé).
+    unique_info_cids = {v.get('info_cid') for v in valid_video_items if v.get('info_cid')}
+    if unique_info_cids:
+        fetched_sources = await asyncio.gather(
+            *[_fetch_info_json_source(cid) for cid in unique_info_cids],
+            return_exceptions=True
+        )
+        info_json_sources = {
+            cid: (src if isinstance(src, dict) else {})
+            for cid, src in zip(unique_info_cids, fetched_sources)
+        }
+    else:
+        info_json_sources = {}
+
+    validated_videos = []
+    for video_item in valid_video_items:
+        info_cid = video_item.get('info_cid', '')
+        metadata_ipfs = video_item.get('metadata_ipfs', '') or info_cid
+
+        source_data = info_json_sources.get(info_cid, {}) or {}
+        tmdb_source = source_data.get('tmdb') or {}
+        youtube_source = source_data.get('youtube') or {}
+
+        normalized_video = {
+            'title': video_item.get('title', ''),
+            'uploader': video_item.get('uploader', ''),
+            'content': video_item.get('content', ''),
+            'duration': int(video_item.get('duration', 0)) if str(video_item.get('duration', 0)).isdigit() else 0,
+            'ipfs_url': video_item.get('ipfs_url', ''),
+            'youtube_url': video_item.get('youtube_url', '') or video_item.get('original_url', ''),
+            'thumbnail_ipfs': video_item.get('thumbnail_ipfs', ''),
+            'gifanim_ipfs': video_item.get('gifanim_ipfs', ''),
+            'metadata_ipfs': metadata_ipfs,
+            'subtitles': video_item.get('subtitles', []),
+            'channel_name': video_item.get('channel_name', ''),
+            'topic_keywords': video_item.get('topic_keywords', ''),
+            'created_at': video_item.get('created_at', ''),
+            'download_date': video_item.get('download_date', '') or video_item.get('created_at', ''),
+            'file_size': int(video_item.get('file_size', 0)) if str(video_item.get('file_size', 0)).isdigit() else 0,
+            'message_id': video_item.get('message_id', ''),
+            'author_id': video_item.get('author_id', ''),
+            'latitude': video_item.get('latitude'),
+            'longitude': video_item.get('longitude'),
+            'provenance': video_item.get('provenance', 'unknown'),
+            'source_type': video_item.get('source_type', 'webcam'),
+            'compliance': video_item.get('compliance', {}),
+            'compliance_score': video_item.get('compliance_score', 0),
+            'compliance_percent': video_item.get('compliance_percent', 0),
+            'compliance_level': video_item.get('compliance_level', 'non-compliant'),
+            'is_compliant': video_item.get('is_compliant', False),
+            'file_hash': video_item.get('file_hash', ''),
+            'info_cid': info_cid,
+            'upload_chain': video_item.get('upload_chain', ''),
+            'upload_chain_list': video_item.get('upload_chain_list', []),
+            'event_kind': video_item.get('event_kind', 21),
+            'tmdb_metadata': {'tmdb_id': tmdb_source['id'], 'year': tmdb_source.get('year')} if tmdb_source.get('id') else {},
+            'youtube_metadata': {'video_id': youtube_source['id']} if youtube_source.get('id') else {}
+        }
+        validated_videos.append(normalized_video)
+    
+    video_messages = validated_videos
+    filtered_videos = []
+    
+    for video_item in video_messages:
+        if channel and video_item.get('channel_name', '').lower() != channel.lower():
+            continue
+        
+        if search:
+            search_lower = search.lower()
+            if not (search_lower in video_item.get('title', '').lower() or 
+                   search_lower in video_item.get('topic_keywords', '').lower()):
+                continue
+        
+        if keyword:
+            keywords = [k.strip().lower() for k in keyword.split(',')]
+            video_keywords = video_item.get('topic_keywords', '').lower()
+            if not any(k in video_keywords for k in keywords):
+                continue
+        
+        if date_from or date_to:
+            video_date = video_item.get('created_at', '')
+            if video_date:
+                try:
+                    from datetime import datetime as dt
+                    video_datetime = dt.fromisoformat(video_date.replace('Z', '+00:00'))
+                    video_date_str = video_datetime.strftime('%Y-%m-%d')
+                    
+                    if date_from and video_date_str < date_from:
+                        continue
+                    if date_to and video_date_str > date_to:
+                        continue
+                except:
+                    continue
+        
+        if duration_min is not None or duration_max is not None:
+            video_duration = video_item.get('duration', 0)
+            if isinstance(video_duration, str):
+                try:
+                    video_duration = int(video_duration)
+                except:
+                    video_duration = 0
+            
+            if duration_min is not None and video_duration < duration_min:
+                continue
+            if duration_max is not None and video_duration > duration_max:
+                continue
+        
+        if lat is not None and lon is not None:
+            video_lat = video_item.get('latitude')
+            video_lon = video_item.get('longitude')
+            
+            if video_lat is None or video_lon is None:
+                continue
+            
+            from math import radians, sin, cos, sqrt, atan2
+            def haversine_distance(lat1, lon1, lat2, lon2):
+                R = 6371
+                lat1_rad = radians(lat1)
+                lat2_rad = radians(lat2)
+                delta_lat = radians(lat2 - lat1)
+                delta_lon = radians(lon2 - lon1)
+                a = sin(delta_lat/2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(delta_lon/2)**2
+                c = 2 * atan2(sqrt(a), sqrt(1-a))
+                return R * c
+            
+            distance = haversine_distance(lat, lon, video_lat, video_lon)
+            filter_radius = radius if radius is not None else 2.0
+            
+            if distance > filter_radius:
+                continue
+        
+        filtered_videos.append(video_item)
+    
+    video_messages = filtered_videos
+    
+    if sort_by:
+        if sort_by == 'date':
+            video_messages.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        elif sort_by == 'duration':
+            video_messages.sort(key=lambda x: int(x.get('duration', 0)) if str(x.get('duration', 0)).isdigit() else 0, reverse=True)
+        elif sort_by == 'title':
+            video_messages.sort(key=lambda x: x.get('title', '').lower())
+        elif sort_by == 'channel':
+            video_messages.sort(key=lambda x: x.get('channel_name', '').lower())
+    
+    channels = {}
+    for video_item in video_messages:
+        channel_name = video_item.get('channel_name', 'unknown')
+        if channel_name not in channels:
+            channels[channel_name] = []
+        channels[channel_name].append(video_item)
+    
+    channel_playlists = {}
+    for channel_name, videos in channels.items():
+        playlist = create_channel_playlist(videos, channel_name)
+        channel_playlists[channel_name] = playlist
+    
+    response_data = {
+        "success": True,
+        "total_videos": len(video_messages),
+        "total_channels": len(channels),
+        "channels": channel_playlists,
+        "filters": {
+            "channel": channel,
+            "search": search,
+            "keyword": keyword,
+            "date_from": date_from,
+            "date_to": date_to,
+            "duration_min": duration_min,
+            "duration_max": duration_max,
+            "sort_by": sort_by,
+            "lat": lat,
+            "lon": lon,
+            "radius": radius if radius is not None else 2.0 if lat is not None and lon is not None else None
+        },
+        "timestamp": datetime.now().isoformat()
+    }
+    return response_data, video_messages
+
+
+async def _youtube_json(*filters):
+    response_data, _ = await _build_youtube_data(*filters, strict=True)
+    return response_data
+
+
+# Réponses JSON /youtube pré-encodées par jeu de filtres
+_youtube_cache = ResponseCache(
+    "youtube", ttl=settings.YOUTUBE_CACHE_TTL, stale_ttl=4 * settings.YOUTUBE_CACHE_TTL, maxsize=128,
+    meta=lambda d: {"total_videos": d["total_videos"], "total_channels": d["total_channels"]},
+)
+
+
 @router.get("/youtube")
 async def youtube_route(
     request: Request, 
@@ -261,302 +488,110 @@ async def youtube_route(
 ):
     """YouTube video channels and search from NOSTR events"""
     use_local_js = True
+    filters = (channel, search, keyword, date_from, date_to,
+               duration_min, duration_max, sort_by, lat, lon, radius)
     
     try:
-        import sys
-        from core.config import settings
-        sys.path.append(str(settings.ZEN_PATH / "Astroport.ONE" / "IA"))
-        try:
-            from create_video_channel import fetch_and_process_nostr_events, create_channel_playlist
-        except ImportError:
-            logger.error("Could not import create_video_channel")
-            if html is not None:
-                return HTMLResponse(content="<html><body><h1>Error</h1><p>Video channel module not found</p></body></html>", status_code=500)
-            raise HTTPException(status_code=500, detail="Video channel module not found")
-        
-        try:
-            video_messages = await asyncio.wait_for(
-                fetch_and_process_nostr_events("ws://127.0.0.1:7777", 200),
-                timeout=15.0
-            )
-        except asyncio.TimeoutError:
-            logger.warning("⚠️ Timeout fetching NOSTR events, using empty list")
-            video_messages = []
-        except Exception as fetch_error:
-            logger.error(f"❌ Error fetching NOSTR events: {fetch_error}")
-            video_messages = []
-        
-        valid_video_items = [
-            v for v in video_messages if v.get('title') and v.get('ipfs_url')
-        ]
-
-        # Enrichissement tmdb_metadata/youtube_metadata depuis info.json (source.tmdb/source.youtube) —
-        # récupéré en parallèle, mis en cache par CID (content-addressed, jamais invalidé).
-        unique_info_cids = {v.get('info_cid') for v in valid_video_items if v.get('info_cid')}
-        if unique_info_cids:
-            fetched_sources = await asyncio.gather(
-                *[_fetch_info_json_source(cid) for cid in unique_info_cids],
-                return_exceptions=True
-            )
-            info_json_sources = {
-                cid: (src if isinstance(src, dict) else {})
-                for cid, src in zip(unique_info_cids, fetched_sources)
-            }
-        else:
-            info_json_sources = {}
-
-        validated_videos = []
-        for video_item in valid_video_items:
-            info_cid = video_item.get('info_cid', '')
-            metadata_ipfs = video_item.get('metadata_ipfs', '') or info_cid
-
-            source_data = info_json_sources.get(info_cid, {}) or {}
-            tmdb_source = source_data.get('tmdb') or {}
-            youtube_source = source_data.get('youtube') or {}
-
-            normalized_video = {
-                'title': video_item.get('title', ''),
-                'uploader': video_item.get('uploader', ''),
-                'content': video_item.get('content', ''),
-                'duration': int(video_item.get('duration', 0)) if str(video_item.get('duration', 0)).isdigit() else 0,
-                'ipfs_url': video_item.get('ipfs_url', ''),
-                'youtube_url': video_item.get('youtube_url', '') or video_item.get('original_url', ''),
-                'thumbnail_ipfs': video_item.get('thumbnail_ipfs', ''),
-                'gifanim_ipfs': video_item.get('gifanim_ipfs', ''),
-                'metadata_ipfs': metadata_ipfs,
-                'subtitles': video_item.get('subtitles', []),
-                'channel_name': video_item.get('channel_name', ''),
-                'topic_keywords': video_item.get('topic_keywords', ''),
-                'created_at': video_item.get('created_at', ''),
-                'download_date': video_item.get('download_date', '') or video_item.get('created_at', ''),
-                'file_size': int(video_item.get('file_size', 0)) if str(video_item.get('file_size', 0)).isdigit() else 0,
-                'message_id': video_item.get('message_id', ''),
-                'author_id': video_item.get('author_id', ''),
-                'latitude': video_item.get('latitude'),
-                'longitude': video_item.get('longitude'),
-                'provenance': video_item.get('provenance', 'unknown'),
-                'source_type': video_item.get('source_type', 'webcam'),
-                'compliance': video_item.get('compliance', {}),
-                'compliance_score': video_item.get('compliance_score', 0),
-                'compliance_percent': video_item.get('compliance_percent', 0),
-                'compliance_level': video_item.get('compliance_level', 'non-compliant'),
-                'is_compliant': video_item.get('is_compliant', False),
-                'file_hash': video_item.get('file_hash', ''),
-                'info_cid': info_cid,
-                'upload_chain': video_item.get('upload_chain', ''),
-                'upload_chain_list': video_item.get('upload_chain_list', []),
-                'event_kind': video_item.get('event_kind', 21),
-                'tmdb_metadata': {'tmdb_id': tmdb_source['id'], 'year': tmdb_source.get('year')} if tmdb_source.get('id') else {},
-                'youtube_metadata': {'video_id': youtube_source['id']} if youtube_source.get('id') else {}
-            }
-            validated_videos.append(normalized_video)
-        
-        video_messages = validated_videos
-        filtered_videos = []
-        
-        for video_item in video_messages:
-            if channel and video_item.get('channel_name', '').lower() != channel.lower():
-                continue
-            
-            if search:
-                search_lower = search.lower()
-                if not (search_lower in video_item.get('title', '').lower() or 
-                       search_lower in video_item.get('topic_keywords', '').lower()):
-                    continue
-            
-            if keyword:
-                keywords = [k.strip().lower() for k in keyword.split(',')]
-                video_keywords = video_item.get('topic_keywords', '').lower()
-                if not any(k in video_keywords for k in keywords):
-                    continue
-            
-            if date_from or date_to:
-                video_date = video_item.get('created_at', '')
-                if video_date:
-                    try:
-                        from datetime import datetime as dt
-                        video_datetime = dt.fromisoformat(video_date.replace('Z', '+00:00'))
-                        video_date_str = video_datetime.strftime('%Y-%m-%d')
-                        
-                        if date_from and video_date_str < date_from:
-                            continue
-                        if date_to and video_date_str > date_to:
-                            continue
-                    except:
-                        continue
-            
-            if duration_min is not None or duration_max is not None:
-                video_duration = video_item.get('duration', 0)
-                if isinstance(video_duration, str):
-                    try:
-                        video_duration = int(video_duration)
-                    except:
-                        video_duration = 0
-                
-                if duration_min is not None and video_duration < duration_min:
-                    continue
-                if duration_max is not None and video_duration > duration_max:
-                    continue
-            
-            if lat is not None and lon is not None:
-                video_lat = video_item.get('latitude')
-                video_lon = video_item.get('longitude')
-                
-                if video_lat is None or video_lon is None:
-                    continue
-                
-                from math import radians, sin, cos, sqrt, atan2
-                def haversine_distance(lat1, lon1, lat2, lon2):
-                    R = 6371
-                    lat1_rad = radians(lat1)
-                    lat2_rad = radians(lat2)
-                    delta_lat = radians(lat2 - lat1)
-                    delta_lon = radians(lon2 - lon1)
-                    a = sin(delta_lat/2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(delta_lon/2)**2
-                    c = 2 * atan2(sqrt(a), sqrt(1-a))
-                    return R * c
-                
-                distance = haversine_distance(lat, lon, video_lat, video_lon)
-                filter_radius = radius if radius is not None else 2.0
-                
-                if distance > filter_radius:
-                    continue
-            
-            filtered_videos.append(video_item)
-        
-        video_messages = filtered_videos
-        
-        if sort_by:
-            if sort_by == 'date':
-                video_messages.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-            elif sort_by == 'duration':
-                video_messages.sort(key=lambda x: int(x.get('duration', 0)) if str(x.get('duration', 0)).isdigit() else 0, reverse=True)
-            elif sort_by == 'title':
-                video_messages.sort(key=lambda x: x.get('title', '').lower())
-            elif sort_by == 'channel':
-                video_messages.sort(key=lambda x: x.get('channel_name', '').lower())
-        
-        channels = {}
-        for video_item in video_messages:
-            channel_name = video_item.get('channel_name', 'unknown')
-            if channel_name not in channels:
-                channels[channel_name] = []
-            channels[channel_name].append(video_item)
-        
-        channel_playlists = {}
-        for channel_name, videos in channels.items():
-            playlist = create_channel_playlist(videos, channel_name)
-            channel_playlists[channel_name] = playlist
-        
-        response_data = {
-            "success": True,
-            "total_videos": len(video_messages),
-            "total_channels": len(channels),
-            "channels": channel_playlists,
-            "filters": {
-                "channel": channel,
-                "search": search,
-                "keyword": keyword,
-                "date_from": date_from,
-                "date_to": date_to,
-                "duration_min": duration_min,
-                "duration_max": duration_max,
-                "sort_by": sort_by,
-                "lat": lat,
-                "lon": lon,
-                "radius": radius if radius is not None else 2.0 if lat is not None and lon is not None else None
-            },
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        if html is not None:
-            hostname = request.headers.get("host", "u.copylaradio.com")
-            if hostname.startswith("u."):
-                ipfs_gateway = f"https://ipfs.{hostname[2:]}"
-            elif hostname.startswith("127.0.0.1") or hostname.startswith("localhost"):
-                ipfs_gateway = "http://127.0.0.1:8080"
-            else:
-                ipfs_gateway = "https://ipfs.copylaradio.com"
-            
-            auto_open_video = None
-            if video:
-                for channel_name, channel_playlist in channel_playlists.items():
-                    playlist_videos = channel_playlist.get('videos', []) if isinstance(channel_playlist, dict) else getattr(channel_playlist, 'videos', [])
-                    for v in playlist_videos:
-                        if v.get('message_id') == video:
-                            auto_open_video = {
-                                'event_id': v.get('message_id', ''),
-                                'title': v.get('title', ''),
-                                'ipfs_url': v.get('ipfs_url', ''),
-                                'thumbnail_ipfs': v.get('thumbnail_ipfs', ''),
-                                'gifanim_ipfs': v.get('gifanim_ipfs', ''),
-                                'author_id': v.get('author_id', ''),
-                                'uploader': v.get('uploader', ''),
-                                'channel': v.get('channel_name', ''),
-                                'duration': v.get('duration', 0),
-                                'content': v.get('content', '')
-                            }
-                            break
-                    if auto_open_video:
-                        break
-                
-                if not auto_open_video:
-                    for v in video_messages:
-                        if v.get('message_id') == video:
-                            auto_open_video = {
-                                'event_id': v.get('message_id', ''),
-                                'title': v.get('title', ''),
-                                'ipfs_url': v.get('ipfs_url', ''),
-                                'thumbnail_ipfs': v.get('thumbnail_ipfs', ''),
-                                'gifanim_ipfs': v.get('gifanim_ipfs', ''),
-                                'author_id': v.get('author_id', ''),
-                                'uploader': v.get('uploader', ''),
-                                'channel': v.get('channel_name', ''),
-                                'duration': v.get('duration', 0),
-                                'content': v.get('content', '')
-                            }
-                            break
-            
-            user_pubkey = None
-            try:
-                auth_header = request.headers.get("Authorization", "")
-                if auth_header.startswith("Nostr "):
-                    token = auth_header.replace("Nostr ", "")
-                    decoded = base64.b64decode(token)
-                    auth_event = json.loads(decoded)
-                    if auth_event.get("kind") == 27235:
-                        user_pubkey = auth_event.get("pubkey")
-            except Exception:
-                pass
-            
+        if html is None:
+            entry = await _youtube_cache.get(filters, lambda: _youtube_json(*filters))
             analytics_data = {
-                "type": "youtube_page_view",
+                "type": "youtube_api_view",
                 "video_event_id": video or "",
-                "total_videos": len(video_messages),
-                "total_channels": len(channels),
+                "total_videos": entry.meta["total_videos"],
+                "total_channels": entry.meta["total_channels"],
                 "has_javascript": True
             }
             await send_server_side_analytics(analytics_data, request)
+            return json_response(request, entry, max_age=settings.YOUTUBE_CACHE_TTL)
+
+        response_data, video_messages = await _build_youtube_data(*filters)
+        channel_playlists = response_data["channels"]
+        
+        hostname = request.headers.get("host", "u.copylaradio.com")
+        if hostname.startswith("u."):
+            ipfs_gateway = f"https://ipfs.{hostname[2:]}"
+        elif hostname.startswith("127.0.0.1") or hostname.startswith("localhost"):
+            ipfs_gateway = "http://127.0.0.1:8080"
+        else:
+            ipfs_gateway = "https://ipfs.copylaradio.com"
+        
+        auto_open_video = None
+        if video:
+            for channel_name, channel_playlist in channel_playlists.items():
+                playlist_videos = channel_playlist.get('videos', []) if isinstance(channel_playlist, dict) else getattr(channel_playlist, 'videos', [])
+                for v in playlist_videos:
+                    if v.get('message_id') == video:
+                        auto_open_video = {
+                            'event_id': v.get('message_id', ''),
+                            'title': v.get('title', ''),
+                            'ipfs_url': v.get('ipfs_url', ''),
+                            'thumbnail_ipfs': v.get('thumbnail_ipfs', ''),
+                            'gifanim_ipfs': v.get('gifanim_ipfs', ''),
+                            'author_id': v.get('author_id', ''),
+                            'uploader': v.get('uploader', ''),
+                            'channel': v.get('channel_name', ''),
+                            'duration': v.get('duration', 0),
+                            'content': v.get('content', '')
+                        }
+                        break
+                if auto_open_video:
+                    break
             
-            return templates.TemplateResponse(request, "youtube.html", {
-                "youtube_data": response_data,
-                "myIPFS": ipfs_gateway,
-                "auto_open_video": auto_open_video,
-                "user_pubkey": user_pubkey,
-                "use_local_js": use_local_js
-            })
+            if not auto_open_video:
+                for v in video_messages:
+                    if v.get('message_id') == video:
+                        auto_open_video = {
+                            'event_id': v.get('message_id', ''),
+                            'title': v.get('title', ''),
+                            'ipfs_url': v.get('ipfs_url', ''),
+                            'thumbnail_ipfs': v.get('thumbnail_ipfs', ''),
+                            'gifanim_ipfs': v.get('gifanim_ipfs', ''),
+                            'author_id': v.get('author_id', ''),
+                            'uploader': v.get('uploader', ''),
+                            'channel': v.get('channel_name', ''),
+                            'duration': v.get('duration', 0),
+                            'content': v.get('content', '')
+                        }
+                        break
+        
+        user_pubkey = None
+        try:
+            auth_header = request.headers.get("Authorization", "")
+            if auth_header.startswith("Nostr "):
+                token = auth_header.replace("Nostr ", "")
+                decoded = base64.b64decode(token)
+                auth_event = json.loads(decoded)
+                if auth_event.get("kind") == 27235:
+                    user_pubkey = auth_event.get("pubkey")
+        except Exception:
+            pass
         
         analytics_data = {
-            "type": "youtube_api_view",
+            "type": "youtube_page_view",
             "video_event_id": video or "",
             "total_videos": len(video_messages),
-            "total_channels": len(channels),
+            "total_channels": response_data["total_channels"],
             "has_javascript": True
         }
         await send_server_side_analytics(analytics_data, request)
         
-        return JSONResponse(content=response_data)
+        return templates.TemplateResponse(request, "youtube.html", {
+            "youtube_data": response_data,
+            "myIPFS": ipfs_gateway,
+            "auto_open_video": auto_open_video,
+            "user_pubkey": user_pubkey,
+            "use_local_js": use_local_js
+        })
         
+    except _VideoChannelModuleMissing:
+        if html is not None:
+            return HTMLResponse(content="<html><body><h1>Error</h1><p>Video channel module not found</p></body></html>", status_code=500)
+        raise HTTPException(status_code=500, detail="Video channel module not found")
+    except _RelayUnavailable as e:
+        # Aucune entrée en cache encore servable : rien de vide n'est mis en cache
+        logger.warning(f"⚠️ /youtube : {e}")
+        raise HTTPException(status_code=503, detail="NOSTR relay unavailable",
+                            headers={"Retry-After": str(settings.YOUTUBE_CACHE_TTL)})
     except Exception as e:
         logger.error(f"Error in youtube_route: {e}", exc_info=True)
         if html is not None:
@@ -18,11 +18,17 @@ from fastapi import APIRouter, Request, Form, UploadFile, File, HTTPException, D
 from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse, FileResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
+from starlette.convertors import Convertor, register_url_convertor
 
 from utils.helpers import run_script, get_myipfs_gateway, as_form, safe_json_load
 from core.middleware import get_client_ip
 from core.config import settings, ASTRO_PYTHON
-from services.ipfs import run_uDRIVE_generation_script
+from services.ipfs import fetch_info_json, run_uDRIVE_generation_script
+from services.kubo import KuboError, kubo
+from services.udrive import find_file as udrive_find_file
+from services.video_publish import build_video_event, publish_video_event
+from services.blob_store import BlobResponse, SHA256_RE, blob_store
+from services.jobs import job_queue
 from utils.security import (
     get_authenticated_user_directory,
     get_max_file_size_for_user,
@@ -32,14 +38,30 @@ from utils.security import (
     find_user_directory_by_hex,
     is_safe_email
 )
-from services.nostr import verify_nostr_auth, require_nostr_auth
-from utils.crypto import npub_to_hex, hex_to_npub
+from services.nostr import verify_nostr_auth, require_nostr_auth, verify_nip98_auth
+from utils.crypto import decode_nsec, extract_nsec_from_keyfile, npub_to_hex, hex_to_npub, verify_nostr_event
 from utils.observability import log_node_event, log_user_event
 from services.nostr import fetch_video_event_from_nostr, parse_video_metadata
 from models.schemas import UploadResponse, UploadFromDriveResponse
-from services.cookie_store import store_cookie_encrypted
+from services.cookie_store import store_cookies_encrypted
+from services.cookie_file import CookieFileError, parse_cookie_file
 
 router = APIRouter()
+
+
+class _BlossomConvertor(Convertor):
+    """Segment /<sha256>[.ext] : ne capture que les noms de blobs, pour ne pas
+    masquer les routes racine des autres routeurs."""
+    regex = SHA256_RE.pattern.strip("^$") + r"(?:\.[A-Za-z0-9]{1,10})?"
+
+    def convert(self, value: str) -> str:
+        return value
+
+    def to_string(self, value: str) -> str:
+        return value
+
+
+register_url_convertor("blossom", _BlossomConvertor())
 templates = Jinja2Templates(directory="templates")
 
 
@@ -73,7 +95,7 @@ async def _resolve_home_node_hex(user_dir: Path) -> str:
     Ordre de priorité (du plus rapide au plus lent) :
       1. home.station local (cache d'une résolution précédente)
       2. Scan strfry kind 0 du joueur → champ home_station (local, rapide)
-      3. Scan swarm TW : swarm/*/TW/{email}/ → 12345.json → NODEHEX
+      3. Index swarm TW : swarm/*/TW/{email}/ → 12345.json → NODEHEX
       4. IPFS via NOSTRNS (réseau, peut échouer)
       5. IPFS via HOME_IPFSNODEID (réseau, peut échouer)
 
@@ -137,27 +159,21 @@ async def _resolve_home_node_hex(user_dir: Path) -> str:
             except Exception as e:
                 logger.debug(f"Roaming: strfry scan kind 0 échec: {e}")
 
-    # 3. Scan swarm TW : trouver la station qui héberge cet email
-    swarm_dir = settings.ZEN_PATH / "tmp" / "swarm"
-    if swarm_dir.exists():
-        for station_dir in swarm_dir.iterdir():
-            if not station_dir.is_dir():
-                continue
-            if (station_dir / "TW" / user_email).exists():
-                station_12345 = station_dir / "12345.json"
-                if station_12345.exists():
-                    try:
-                        data = json.loads(station_12345.read_text())
-                        candidate = data.get("NODEHEX", "")
-                        if len(candidate) == 64:
-                            hid = data.get("ipfsnodeid", station_dir.name)
-                            home_station_file.write_text(f"{hid}:{candidate}\n")
-                            logger.info(
-                                f"Roaming: home_station résolu via swarm TW pour {user_email}"
-                            )
-                            return candidate
-                    except Exception:
-                        pass
+    # 3. Index swarm TW : trouver la station qui héberge cet email
+    from services.swarm_index import swarm_index
+    for account in swarm_index.accounts(user_email):
+        data = swarm_index.station(account["station"]) or {}
+        candidate = data.get("NODEHEX", "")
+        if len(candidate) == 64:
+            hid = data.get("ipfsnodeid", account["station"])
+            try:
+                home_station_file.write_text(f"{hid}:{candidate}\n")
+            except OSError:
+                pass
+            logger.info(
+                f"Roaming: home_station résolu via swarm TW pour {user_email}"
+            )
+            return candidate
 
     # 4. IPFS via NOSTRNS (lent, peut échouer si non pinné)
     nostrns_file = user_dir / "NOSTRNS"
@@ -165,13 +181,7 @@ async def _resolve_home_node_hex(user_dir: Path) -> str:
         nostrns = nostrns_file.read_text().strip()
         if nostrns:
             try:
-                proc = await asyncio.create_subprocess_exec(
-                    "ipfs", "--timeout", "10s", "cat",
-                    f"{nostrns}/{user_email}/home.station",
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.DEVNULL,
-                )
-                out, _ = await asyncio.wait_for(proc.communicate(), timeout=12)
+                out = await kubo.cat(f"{nostrns}/{user_email}/home.station", max_size=1024, timeout=10)
                 content = out.decode().strip()
                 if ":" in content:
                     candidate = content.split(":", 1)[1].strip()
@@ -187,13 +197,7 @@ async def _resolve_home_node_hex(user_dir: Path) -> str:
         home_ipfsnodeid = home_ipfsnodeid_file.read_text().strip()
         if home_ipfsnodeid:
             try:
-                proc = await asyncio.create_subprocess_exec(
-                    "ipfs", "--timeout", "10s", "cat",
-                    f"/ipns/{home_ipfsnodeid}/{user_email}/home.station",
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.DEVNULL,
-                )
-                out, _ = await asyncio.wait_for(proc.communicate(), timeout=12)
+                out = await kubo.cat(f"/ipns/{home_ipfsnodeid}/{user_email}/home.station", max_size=1024, timeout=10)
                 content = out.decode().strip()
                 if ":" in content:
                     candidate = content.split(":", 1)[1].strip()
@@ -323,6 +327,122 @@ async def _send_roaming_media_event_dm(
         logger.warning(f"✈️ Roaming {channel} DM erreur: {e}")
     return False
 
+# ---------------------------------------------------------------------------
+# Tâches post-upload (services/jobs.py) — exécutées hors requête, réessayées
+# ---------------------------------------------------------------------------
+
+_DESCRIBE_PROMPT = "Décris ce qui se trouve sur cette image en 10-30 mots clés concis et précis. Ne génère qu'une description courte sans phrase complète, ni introduction."
+
+
+async def _describe_image(image_path: str) -> Optional[str]:
+    """describe_image.py sur l'image déjà écrite dans le uDRIVE (None si indisponible)."""
+    describe_script = settings.ZEN_PATH / "Astroport.ONE" / "IA" / "describe_image.py"
+    if not describe_script.exists() or not os.path.exists(image_path):
+        return None
+    process = await asyncio.create_subprocess_exec(
+        "python3", str(describe_script), image_path, "--json", "--prompt", _DESCRIBE_PROMPT,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout=60)
+    except asyncio.TimeoutError:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        raise
+    if process.returncode != 0:
+        return None
+    try:
+        return (safe_json_load(stdout.decode()).get('description') or '').strip() or None
+    except ValueError:
+        return None
+
+
+@job_queue.handler("upload.publish")
+async def _job_upload_publish(payload: dict) -> dict:
+    """Description IA (images) puis publication NOSTR (publish_nostr_file.sh)."""
+    description = None
+    if payload.get("image_path"):
+        try:
+            description = await _describe_image(payload["image_path"])
+        except asyncio.TimeoutError:
+            logger.warning(f"describe_image timeout: {payload['fileName']}")
+    if not payload.get("publish"):
+        return {"description": description, "published": False}
+
+    secret_file = Path(payload["user_dir"]) / ".secret.nostr"
+    publish_script = settings.TOOLS_PATH / "publish_nostr_file.sh"
+    if not secret_file.exists() or not publish_script.exists():
+        return {"description": description, "published": False}
+
+    file_name = payload["fileName"]
+    event_description = description or f"{payload['file_type'].capitalize()}: {file_name}"
+    info_path = settings.ZEN_PATH / "tmp" / f"temp_{uuid.uuid4()}.json"
+    info_path.write_text(json.dumps(payload["info"]))
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "bash", str(publish_script),
+            "--auto", str(info_path),
+            "--nsec", str(secret_file),
+            "--title", _safe_arg(file_name),
+            "--description", _safe_arg(event_description),
+            "--json",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=30)
+        except asyncio.TimeoutError:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            raise RuntimeError("publish_nostr_file.sh timeout")
+        if process.returncode != 0:
+            raise RuntimeError(f"publish_nostr_file.sh code {process.returncode}: {stderr.decode()[:200]}")
+    finally:
+        info_path.unlink(missing_ok=True)
+    return {"description": description, "published": True}
+
+
+@job_queue.handler("upload.roaming_dm")
+async def _job_roaming_dm(payload: dict) -> dict:
+    """DM NIP-04 à la home station ; la copie locale est supprimée une fois relayée."""
+    user_dir = Path(payload["user_dir"])
+    if not (user_dir / ".roaming").exists():
+        # Pas de marqueur roaming : NOSTRCARD.refresh.sh reprendra le fichier
+        return {"sent": False}
+    sent = await _maybe_send_roaming_dm(
+        user_dir=user_dir,
+        file_cid=payload["file_cid"],
+        sanitized_filename=payload["filename"],
+        file_type=payload["file_type"],
+    )
+    if not sent:
+        raise RuntimeError("DM roaming non envoyé")
+    Path(payload["file_path"]).unlink(missing_ok=True)
+    return {"sent": True}
+
+
+@router.get("/api/upload/status/{sha256}")
+async def upload_jobs_status(sha256: str, pubkey: str = Depends(verify_nip98_auth)):
+    """État des traitements différés d'un fichier (description, publication NOSTR,
+    DM roaming) — NIP-98 requis, seules les tâches de l'uploader sont visibles."""
+    sha256 = sha256.lower()
+    if not SHA256_RE.match(sha256):
+        raise HTTPException(status_code=400, detail="Invalid sha256")
+    jobs = await job_queue.status(sha256, owner=pubkey)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="No job for this file")
+    return JSONResponse(content={
+        "sha256": sha256,
+        "done": all(j["status"] in ("done", "failed") for j in jobs),
+        "jobs": jobs,
+    })
+
+
 @as_form
 class WebcamForm(BaseModel):
     player: str
@@ -403,55 +523,53 @@ async def process_webcam_video(
         thumbnail_ipfs_from_info = thumbnail_ipfs if thumbnail_ipfs else ""
         gifanim_ipfs_from_info = gifanim_ipfs if gifanim_ipfs else ""
         
+        info_data: Dict[str, Any] = {}
         if info_cid:
             try:
-                import httpx
-                gateway = await get_myipfs_gateway()
-                info_url = f"{gateway}/ipfs/{info_cid}"
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    info_response = await client.get(info_url)
-                    if info_response.status_code == 200:
-                        info_data = info_response.json()
-                        if info_data.get("file") and info_data["file"].get("hash"):
-                            file_hash = info_data["file"]["hash"]
-                        if info_data.get("provenance") and info_data["provenance"].get("upload_chain"):
-                            upload_chain = info_data["provenance"]["upload_chain"]
-                        
-                        protocol_version = info_data.get("protocol", {}).get("version", "1.0.0")
-                        is_v2 = protocol_version.startswith("2.")
-                        
-                        if info_data.get("media"):
-                            media = info_data["media"]
-                            if media.get("dimensions"):
-                                video_dimensions = media["dimensions"]
-                            if media.get("duration"):
-                                duration = float(media["duration"])
-                            if file_size == 0 and media.get("file_size"):
-                                try: file_size = int(media["file_size"])
-                                except (ValueError, TypeError): pass
-                            
-                            if not thumbnail_ipfs:
-                                if is_v2 and media.get("thumbnails"):
-                                    thumbnail_cid = media["thumbnails"].get("static") or media["thumbnails"].get("animated")
-                                    if thumbnail_cid:
-                                        thumbnail_ipfs_from_info = thumbnail_cid.replace("/ipfs/", "").replace("ipfs://", "")
-                                elif not is_v2 and media.get("thumbnail_ipfs"):
-                                    thumbnail_ipfs_from_info = media["thumbnail_ipfs"].replace("/ipfs/", "").replace("ipfs://", "")
-                            
-                            if not gifanim_ipfs:
-                                if is_v2 and media.get("thumbnails"):
-                                    gifanim_cid = media["thumbnails"].get("animated")
-                                    if gifanim_cid:
-                                        gifanim_ipfs_from_info = gifanim_cid.replace("/ipfs/", "").replace("ipfs://", "")
-                                elif not is_v2 and media.get("gifanim_ipfs"):
-                                    gifanim_ipfs_from_info = media["gifanim_ipfs"].replace("/ipfs/", "").replace("ipfs://", "")
-                        
-                        if file_size == 0 and info_data.get("file_size"):
-                            try: file_size = int(info_data["file_size"])
-                            except (ValueError, TypeError): pass
-                        if file_size == 0 and info_data.get("fileSize"):
-                            try: file_size = int(info_data["fileSize"])
-                            except (ValueError, TypeError): pass
+                info_data = await fetch_info_json(info_cid)
+                if info_data.get("file") and info_data["file"].get("hash"):
+                    file_hash = info_data["file"]["hash"]
+                if info_data.get("provenance") and info_data["provenance"].get("upload_chain"):
+                    upload_chain = info_data["provenance"]["upload_chain"]
+                
+                protocol_version = info_data.get("protocol", {}).get("version", "1.0.0")
+                is_v2 = protocol_version.startswith("2.")
+                
+                if info_data.get("media"):
+                    media = info_data["media"]
+                    if media.get("dimensions"):
+                        video_dimensions = media["dimensions"]
+                    if media.get("duration"):
+                        duration = float(media["duration"])
+                    if file_size == 0 and media.get("file_size"):
+                        try: file_size = int(media["file_size"])
+                        except (ValueError, TypeError): pass
+                    
+                    if not thumbnail_ipfs:
+                        if is_v2 and media.get("thumbnails"):
+                            thumbnail_cid = media["thumbnails"].get("static") or media["thumbnails"].get("animated")
+                            if thumbnail_cid:
+                                thumbnail_ipfs_from_info = thumbnail_cid.replace("/ipfs/", "").replace("ipfs://", "")
+                        elif not is_v2 and media.get("thumbnail_ipfs"):
+                            thumbnail_ipfs_from_info = media["thumbnail_ipfs"].replace("/ipfs/", "").replace("ipfs://", "")
+                    
+                    if not gifanim_ipfs:
+                        if is_v2 and media.get("thumbnails"):
+                            gifanim_cid = media["thumbnails"].get("animated")
+                            if gifanim_cid:
+                                gifanim_ipfs_from_info = gifanim_cid.replace("/ipfs/", "").replace("ipfs://", "")
+                        elif not is_v2 and media.get("gifanim_ipfs"):
+                            gifanim_ipfs_from_info = media["gifanim_ipfs"].replace("/ipfs/", "").replace("ipfs://", "")
+                
+                if file_size == 0 and info_data.get("file_size"):
+                    try: file_size = int(info_data["file_size"])
+                    except (ValueError, TypeError): pass
+                if file_size == 0 and info_data.get("fileSize"):
+                    try: file_size = int(info_data["fileSize"])
+                    except (ValueError, TypeError): pass
+                if file_size == 0 and (info_data.get("file") or {}).get("size"):
+                    try: file_size = int(info_data["file"]["size"])
+                    except (ValueError, TypeError): pass
             except Exception as e:
                 logger.warning(f"Could not load metadata from info.json: {e}")
         
@@ -459,7 +577,7 @@ async def process_webcam_video(
         final_gifanim_ipfs = gifanim_ipfs if gifanim_ipfs else gifanim_ipfs_from_info
         
         hex_pubkey = npub_to_hex(npub) if npub else None
-        filename = None
+        filename = (info_data.get("file") or {}).get("name") or None
         
         if hex_pubkey:
             try:
@@ -473,13 +591,13 @@ async def process_webcam_video(
                     if directory_email and is_safe_email(directory_email):
                         player = directory_email
                 
-                user_drive_path = user_dir / "APP" / "uDRIVE" / "Videos"
-                if user_drive_path.exists():
-                    video_files = sorted(user_drive_path.glob("*.*"), key=lambda p: p.stat().st_mtime, reverse=True)
-                    if video_files:
-                        filename = video_files[0].name
-                        if file_size == 0:
-                            file_size = video_files[0].stat().st_size
+                # Nom du fichier : info.json, sinon index CID du uDRIVE
+                direct_cid = (info_data.get("ipfs") or {}).get("cidirect") or ipfs_cid
+                entry = await udrive_find_file(user_dir / "APP" / "uDRIVE", direct_cid)
+                if entry:
+                    filename = filename or Path(entry[0]).name
+                    if file_size == 0:
+                        file_size = entry[1]
             except Exception:
                 if not player or not re.match(r"[^@]+@[^@]+\.[^@]+", player) or not is_safe_email(player):
                     return templates.TemplateResponse(request, "webcam.html", {
@@ -570,94 +688,40 @@ async def process_webcam_video(
                     lat = 0.00
                     lon = 0.00
                 
-                publish_script = settings.TOOLS_PATH / "publish_nostr_video.sh"
-                if not os.path.exists(publish_script):
-                    return templates.TemplateResponse(request, "webcam.html", {
-                        "error": "NOSTR publish script not found.", 
-                        "recording": False
-                    })
-                
-                publish_cmd = [
-                    "bash", publish_script,
-                    "--nsec", str(secret_file),
-                    "--ipfs-cid", ipfs_cid,
-                    "--filename", _safe_arg(filename),
-                    "--title", _safe_arg(title),
-                    "--json"
-                ]
-
-                if description: publish_cmd.extend(["--description", _safe_arg(description)])
-                if final_thumbnail_ipfs: publish_cmd.extend(["--thumbnail-cid", final_thumbnail_ipfs])
-                if final_gifanim_ipfs: publish_cmd.extend(["--gifanim-cid", final_gifanim_ipfs])
-                if info_cid: publish_cmd.extend(["--info-cid", info_cid])
-                if file_hash: publish_cmd.extend(["--file-hash", file_hash])
-                if mime_type: publish_cmd.extend(["--mime-type", mime_type])
-                if upload_chain:
-                    if isinstance(upload_chain, (list, dict)):
-                        upload_chain_str = json.dumps(upload_chain)
-                    else:
-                        upload_chain_str = str(upload_chain)
-                    publish_cmd.extend(["--upload-chain", upload_chain_str])
-                
-                if isinstance(video_dimensions, dict):
-                    width = video_dimensions.get('width', '')
-                    height = video_dimensions.get('height', '')
-                    if width and height:
-                        dimensions_str = f"{width}x{height}"
-                    else:
-                        dimensions_str = json.dumps(video_dimensions)
-                else:
-                    dimensions_str = str(video_dimensions)
-                
-                publish_cmd.extend([
-                    "--duration", str(duration),
-                    "--dimensions", dimensions_str,
-                    "--file-size", str(file_size),
-                    "--latitude", str(lat),
-                    "--longitude", str(lon),
-                    "--channel", player
-                ])
-                
-                if youtube_url:
-                    publish_cmd.extend(["--source-type", "youtube"])
-                else:
-                    publish_cmd.extend(["--source-type", "webcam"])
-                
+                if isinstance(upload_chain, (list, dict)):
+                    upload_chain = json.dumps(upload_chain)
+
+                genre_list = []
                 if genres and genres.strip():
                     try:
                         genres_json = json.loads(genres)
-                        if isinstance(genres_json, list) and len(genres_json) > 0:
-                            genres_compact = json.dumps(genres_json, ensure_ascii=False, separators=(',', ':'))
-                            publish_cmd.extend(["--genres", genres_compact])
+                        if isinstance(genres_json, list):
+                            genre_list = [str(g) for g in genres_json]
                     except (json.JSONDecodeError, ValueError):
                         pass
-                
-                process = await asyncio.create_subprocess_exec(
-                    *publish_cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                try:
-                    stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=90)
-                except asyncio.TimeoutError:
-                    try:
-                        process.kill()
-                    except ProcessLookupError:
-                        pass
-                    raise
 
-                if process.returncode == 0:
-                    try:
-                        result_json = safe_json_load(stdout.decode().strip())
-                        nostr_event_id = result_json.get('event_id', '')
-                    except ValueError:
-                        event_id_match = re.search(r'"event_id"\s*:\s*"([a-f0-9]{64})"', stdout.decode())
-                        if event_id_match:
-                            nostr_event_id = event_id_match.group(1)
-                        else:
-                            nostr_event_id = stdout.decode().strip().split('\n')[-1] if stdout.decode() else ""
-                            if not re.match(r'^[a-f0-9]{64}$', nostr_event_id):
-                                nostr_event_id = ""
+                event = build_video_event(
+                    cid=ipfs_cid,
+                    filename=filename,
+                    title=title,
+                    description=description or "",
+                    mime_type=mime_type or "video/webm",
+                    file_hash=file_hash or "",
+                    file_size=file_size,
+                    duration=duration,
+                    dimensions=video_dimensions,
+                    thumbnail_ipfs=final_thumbnail_ipfs or "",
+                    gifanim_ipfs=final_gifanim_ipfs or "",
+                    info_cid=info_cid or "",
+                    upload_chain=str(upload_chain or ""),
+                    latitude=lat,
+                    longitude=lon,
+                    channel=player,
+                    source_type="youtube" if youtube_url else "webcam",
+                    genres=genre_list,
+                )
+                seckey = decode_nsec(extract_nsec_from_keyfile(str(secret_file)))
+                nostr_event_id = await publish_video_event(event, seckey)
             except Exception as e:
                 logger.error(f"Error during NOSTR publishing: {e}")
 
@@ -1108,28 +1172,11 @@ async def upload_encrypted_file_to_ipfs(
         raise HTTPException(status_code=500, detail=f"Erreur de chiffrement: {e}")
 
     # Upload sur IPFS via API locale
+    original_filename = sanitize_filename_python(file.filename or "file")
+    enc_filename = f"enc_{os.urandom(4).hex()}_{original_filename}"
     try:
-        import aiohttp as _aiohttp
-        original_filename = sanitize_filename_python(file.filename or "file")
-        enc_filename = f"enc_{os.urandom(4).hex()}_{original_filename}"
-        form_data = _aiohttp.FormData()
-        form_data.add_field(
-            "file", encrypted_payload,
-            filename=enc_filename,
-            content_type="application/octet-stream",
-        )
-        ipfs_api = "http://127.0.0.1:5001"
-        timeout = _aiohttp.ClientTimeout(total=30)
-        async with _aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(f"{ipfs_api}/api/v0/add", data=form_data) as resp:
-                if resp.status != 200:
-                    body = await resp.text()
-                    raise HTTPException(status_code=502, detail=f"Erreur IPFS: {body[:200]}")
-                result = await resp.json()
-                cid = result["Hash"]
-    except HTTPException:
-        raise
-    except Exception as e:
+        cid = await kubo.add_bytes(encrypted_payload, enc_filename)
+    except KuboError as e:
         raise HTTPException(status_code=502, detail=f"Upload IPFS échoué: {e}")
 
     logger.info(
@@ -1253,136 +1300,51 @@ async def _upload_file_to_ipfs_impl(
         
         if file.filename and file.filename.endswith('.txt'):
             try:
-                content_text = file_content.decode('utf-8')
-                is_netscape_format = False
-                detected_domain = None
-                
-                if '# Netscape HTTP Cookie File' in content_text or '# HTTP Cookie File' in content_text:
-                    is_netscape_format = True
-                elif '\t' in content_text:
-                    lines = [l.strip() for l in content_text.split('\n') if l.strip() and not l.strip().startswith('#')]
-                    if lines:
-                        first_line = lines[0]
-                        parts = first_line.split('\t')
-                        if len(parts) >= 7:
-                            is_netscape_format = True
-                
-                if is_netscape_format:
-                    domains = set()
-                    lines = content_text.split('\n')
-                    for line in lines:
-                        line = line.strip()
-                        if not line or line.startswith('#'):
-                            continue
-                        parts = line.split('\t')
-                        if len(parts) >= 7:
-                            domain = parts[0].strip()
-                            if domain.startswith('.'):
-                                domain = domain[1:]
-                            domains.add(domain)
-                    
-                    if domains:
-                        base_domains = set()
-                        for domain in domains:
-                            parts = domain.split('.')
-                            if len(parts) >= 2:
-                                base_domain = '.'.join(parts[-2:])
-                                base_domains.add(base_domain)
-                            else:
-                                base_domains.add(domain)
-                        
-                        if len(base_domains) > 1:
-                            raise HTTPException(
-                                status_code=400, 
-                                detail=f"Multi-domain cookie files are not supported."
-                            )
-                        
-                        # LCA : sous-domaine commun le plus spécifique
-                        # ex: {notebooklm.google.com} → "notebooklm.google.com"
-                        #     {notebooklm.google.com, google.com} → "google.com"
-                        _parts_list = [list(reversed(d.split("."))) for d in domains]
-                        _common = []
-                        _min_len = min(len(p) for p in _parts_list)
-                        for _i in range(_min_len):
-                            _labels = {p[_i] for p in _parts_list}
-                            if len(_labels) == 1:
-                                _common.append(next(iter(_labels)))
-                            else:
-                                break
-                        detected_domain = ".".join(reversed(_common)) if _common else next(iter(domains))
-                    else:
-                        raise HTTPException(
-                            status_code=400, 
-                            detail="Invalid cookie file: no domains detected"
-                        )
-                    
-                    hex_pubkey = npub_to_hex(npub)
-                    user_root_dir = find_user_directory_by_hex(hex_pubkey)
-                    
-                    cookie_filename = f".{detected_domain}.cookie"
-                    cookie_path = user_root_dir / cookie_filename
-
-                    async with aiofiles.open(cookie_path, 'wb') as cookie_file:
-                        await cookie_file.write(file_content)
-
-                    os.chmod(cookie_path, 0o600)
-
-                    # ── Split sous-domaines (flag=FALSE = host-only) ───────────────────
-                    # Ex: fichier avec .google.com (TRUE) + notebooklm.google.com (FALSE)
-                    # → crée aussi .notebooklm.google.com.cookie pour sessions privées
-                    _subdomains: dict[str, list[str]] = {}
-                    _header_lines = []
-                    for _line in content_text.split('\n'):
-                        _ls = _line.strip()
-                        if not _ls or _ls.startswith('#'):
-                            _header_lines.append(_line)
-                            continue
-                        _parts = _ls.split('\t')
-                        if len(_parts) < 7:
-                            continue
-                        _col_domain = _parts[0].lstrip('.')
-                        _col_flag   = _parts[1].strip().upper()
-                        if _col_flag == 'FALSE' and _col_domain != detected_domain:
-                            _subdomains.setdefault(_col_domain, []).append(_line)
-
-                    for _subdomain, _lines in _subdomains.items():
-                        _sub_path = user_root_dir / f".{_subdomain}.cookie"
-                        _sub_bytes = ('\n'.join(_header_lines) + '\n' + '\n'.join(_lines) + '\n').encode()
-                        async with aiofiles.open(_sub_path, 'wb') as _sf:
-                            await _sf.write(_sub_bytes)
-                        os.chmod(_sub_path, 0o600)
-                        logger.info(f"Cookie sous-domaine {_subdomain} → {_sub_path.name}")
-                        try:
-                            await store_cookie_encrypted(user_root_dir, _subdomain, _sub_bytes)
-                        except Exception as _e:
-                            logger.warning(f"Cookie subdomain IPFS store failed (non-fatal): {_e}")
-
-                    # Encrypt with user G1 key → IPFS pin → manifest + NOSTR kind 31903
-                    cid = None
-                    try:
-                        cid = await store_cookie_encrypted(user_root_dir, detected_domain, file_content)
-                    except Exception as _e:
-                        logger.warning(f"Cookie IPFS/NOSTR store failed (non-fatal): {_e}")
+                cookies = parse_cookie_file(file_content)
+            except CookieFileError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+            if cookies is not None:
+                detected_domain = cookies.domain
+                user_root_dir = find_user_directory_by_hex(npub_to_hex(npub))
+                cookie_path = user_root_dir / f".{detected_domain}.cookie"
+
+                # Fichier complet + splits host-only (flag=FALSE) pour sessions privées
+                # Ex: .google.com (TRUE) + notebooklm.google.com (FALSE)
+                # → crée aussi .notebooklm.google.com.cookie
+                cookie_files = cookies.files()
+                for _domain, _content in cookie_files.items():
+                    _path = user_root_dir / f".{_domain}.cookie"
+                    async with aiofiles.open(_path, 'wb') as _cf:
+                        await _cf.write(_content)
+                    os.chmod(_path, 0o600)
+                    if _domain != detected_domain:
+                        logger.info(f"Cookie sous-domaine {_domain} → {_path.name}")
+
+                # Encrypt with user G1 key → un seul pin IPFS → manifest + NOSTR kind 31903
+                cids = {}
+                try:
+                    cids = await store_cookies_encrypted(user_root_dir, cookie_files)
+                except Exception as _e:
+                    logger.warning(f"Cookie IPFS/NOSTR store failed (non-fatal): {_e}")
+                cid = cids.get(detected_domain)
 
-                    _sub_info = f" + sous-domaines: {', '.join(_subdomains)}" if _subdomains else ""
-                    return UploadResponse(
-                        success=True,
-                        message=f"Cookie file uploaded successfully for {detected_domain}{_sub_info}",
-                        file_path=str(cookie_path.relative_to(user_root_dir.parent)),
-                        file_type="netscape_cookies",
-                        target_directory=str(user_root_dir),
-                        new_cid=cid,
-                        timestamp=datetime.now().isoformat(),
-                        auth_verified=True,
-                        description=(
-                            f"Domain: {detected_domain} — IPFS: {cid[:20]}…"
-                            if cid else f"Domain: {detected_domain or 'unknown'}"
-                        ),
-                    )
-            except UnicodeDecodeError:
-                pass
-            except Exception as e:
-                logger.warning(f"Cookie file processing error: {e}")
+                _subdomains = [d for d in cookie_files if d != detected_domain]
+                _sub_info = f" + sous-domaines: {', '.join(_subdomains)}" if _subdomains else ""
+                return UploadResponse(
+                    success=True,
+                    message=f"Cookie file uploaded successfully for {detected_domain}{_sub_info}",
+                    file_path=str(cookie_path.relative_to(user_root_dir.parent)),
+                    file_type="netscape_cookies",
+                    target_directory=str(user_root_dir),
+                    new_cid=cid,
+                    timestamp=datetime.now().isoformat(),
+                    auth_verified=True,
+                    description=(
+                        f"Domain: {detected_domain} — IPFS: {cid[:20]}…"
+                        if cid else f"Domain: {detected_domain}"
+                    ),
+                )
 
         if file_type == 'image':
             target_dir = user_drive_path / "Images"
@@ -1403,43 +1365,6 @@ async def _upload_file_to_ipfs_impl(
         sanitized_filename = sanitize_filename_python(original_filename)
         
         description = None
-        if file_type == 'image':
-            try:
-                temp_image_path = target_dir / f"temp_{uuid.uuid4()}_{sanitized_filename}"
-                async with aiofiles.open(temp_image_path, 'wb') as out_file:
-                    await out_file.write(file_content)
-                
-                describe_script = settings.ZEN_PATH / "Astroport.ONE" / "IA" / "describe_image.py"
-                
-                custom_prompt = "Décris ce qui se trouve sur cette image en 10-30 mots clés concis et précis. Ne génère qu'une description courte sans phrase complète, ni introduction."
-                desc_process = await asyncio.create_subprocess_exec(
-                    "python3", describe_script, str(temp_image_path), "--json", "--prompt", custom_prompt,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                try:
-                    desc_stdout, desc_stderr = await asyncio.wait_for(desc_process.communicate(), timeout=60)
-                except asyncio.TimeoutError:
-                    try:
-                        desc_process.kill()
-                    except ProcessLookupError:
-                        pass
-                    raise
-
-                if desc_process.returncode == 0:
-                    try:
-                        desc_json = safe_json_load(desc_stdout.decode())
-                        description = desc_json.get('description', '')
-                        if description:
-                            description = description.strip()
-                    except ValueError:
-                        pass
-                
-                if os.path.exists(temp_image_path):
-                    os.remove(temp_image_path)
-            except Exception:
-                pass
-        
         file_path = target_dir / sanitized_filename
         
         async with aiofiles.open(file_path, 'wb') as out_file:
@@ -1517,51 +1442,32 @@ async def _upload_file_to_ipfs_impl(
                 
                 file_mime = mime_type or json_output.get('mimeType', '')
                 
-                if not file_mime.startswith('video/') and not file_mime.startswith('audio/') and user_pubkey_hex:
-                    if is_reupload:
-                        # Conformité UPlanet_FILE_CONTRACT §3.4 : pas de nouvel événement NOSTR
-                        # pour un fichier déjà publié (même SHA256). La chaîne de provenance
-                        # est mise à jour dans info.json par upload2ipfs.sh.
-                        original_author = provenance_info.get('original_author', '')[:16]
-                        logger.info(f"Re-upload détecté — publication NOSTR ignorée (auteur original: {original_author}...)")
-                    else:
-                        try:
-                            user_dir = get_authenticated_user_directory(npub)
-                            secret_file = user_dir / ".secret.nostr"
-
-                            if secret_file.exists():
-                                publish_script = settings.TOOLS_PATH / "publish_nostr_file.sh"
-
-                                if os.path.exists(publish_script):
-                                    file_type_display = file_type.capitalize()
-                                    event_description = f"{file_type_display}: {response_fileName}"
-                                    if description:
-                                        event_description = f"{description}"
-
-                                    publish_cmd = [
-                                        "bash", publish_script,
-                                        "--auto", temp_file_path,
-                                        "--nsec", str(secret_file),
-                                        "--title", _safe_arg(response_fileName),
-                                        "--description", _safe_arg(event_description),
-                                        "--json"
-                                    ]
-
-                                    process = await asyncio.create_subprocess_exec(
-                                        *publish_cmd,
-                                        stdout=asyncio.subprocess.PIPE,
-                                        stderr=asyncio.subprocess.PIPE
-                                    )
-                                    try:
-                                        await asyncio.wait_for(process.communicate(), timeout=30)
-                                    except asyncio.TimeoutError:
-                                        try:
-                                            process.kill()
-                                        except ProcessLookupError:
-                                            pass
-                        except Exception:
-                            pass
-                
+                # ── Enrichissement différé (services/jobs.py) ───────────────
+                # Description IA et publication NOSTR ne retardent plus la réponse.
+                file_sha256 = file_hash or hashlib.sha256(file_content).hexdigest()
+                publish = (not file_mime.startswith('video/') and not file_mime.startswith('audio/')
+                           and bool(user_pubkey_hex))
+                if publish and is_reupload:
+                    # Conformité UPlanet_FILE_CONTRACT §3.4 : pas de nouvel événement NOSTR
+                    # pour un fichier déjà publié (même SHA256). La chaîne de provenance
+                    # est mise à jour dans info.json par upload2ipfs.sh.
+                    original_author = provenance_info.get('original_author', '')[:16]
+                    logger.info(f"Re-upload détecté — publication NOSTR ignorée (auteur original: {original_author}...)")
+                    publish = False
+                status_url = None
+                publish_key = None
+                if publish or file_type == 'image':
+                    publish_key = f"upload.publish:{file_sha256}:{user_pubkey_hex}"
+                    await job_queue.enqueue("upload.publish", {
+                        "info": json_output,
+                        "user_dir": str(user_NOSTR_path),
+                        "file_type": file_type,
+                        "fileName": response_fileName,
+                        "image_path": str(file_path) if file_type == 'image' else None,
+                        "publish": publish,
+                    }, key=publish_key, group=file_sha256, owner=user_pubkey_hex)
+                    status_url = f"/api/upload/status/{file_sha256}"
+
                 if os.path.exists(temp_file_path):
                     os.remove(temp_file_path)
 
@@ -1573,45 +1479,20 @@ async def _upload_file_to_ipfs_impl(
                 # Dans les deux cas, la home station se charge du manifest et de la publication IPNS.
                 is_roaming = (user_NOSTR_path / ".roaming").exists() or not user_drive_path.exists()
                 if is_roaming and file_cid:
-                    dm_sent = await _maybe_send_roaming_dm(
-                        user_dir=user_NOSTR_path,
-                        file_cid=file_cid,
-                        sanitized_filename=sanitized_filename,
-                        file_type=file_type,
-                    )
-                    if dm_sent:
-                        try:
-                            file_path.unlink(missing_ok=True)
-                        except Exception:
-                            pass
-                        if os.path.exists(temp_file_path):
-                            os.remove(temp_file_path)
-                        return UploadResponse(
-                            success=True,
-                            message="Fichier relayé à la home station via DM",
-                            file_path=str(file_path),
-                            file_type=file_type,
-                            target_directory=str(target_dir),
-                            new_cid=file_cid,
-                            file_cid=file_cid if file_cid else None,
-                            timestamp=datetime.now().isoformat(),
-                            auth_verified=True,
-                            fileName=sanitized_filename,
-                            description=description,
-                            info=info_cid,
-                            cidirect=cidirect if cidirect else None,
-                            thumbnail_ipfs=thumbnail_cid if thumbnail_cid else None,
-                            gifanim_ipfs=gifanim_cid if gifanim_cid else None,
-                            fileHash=file_hash if file_hash else None,
-                            mimeType=mime_type if mime_type else None,
-                            duration=int(duration) if duration is not None else None,
-                            dimensions=dimensions if dimensions else None,
-                        )
-                    # DM échoué → conserver le fichier localement, retourner le CID brut
-                    # La home station seule publie l'IPNS — pas de régénération locale
+                    # La tâche supprime la copie locale une fois le DM envoyé ;
+                    # la home station seule publie l'IPNS — pas de régénération locale.
+                    # Elle attend la tâche de publication, qui lit encore le fichier.
+                    await job_queue.enqueue("upload.roaming_dm", {
+                        "user_dir": str(user_NOSTR_path),
+                        "file_cid": file_cid,
+                        "filename": sanitized_filename,
+                        "file_type": file_type,
+                        "file_path": str(file_path),
+                    }, key=f"upload.roaming_dm:{file_sha256}:{user_NOSTR_path.name}", group=file_sha256,
+                       owner=user_pubkey_hex, after=publish_key)
                     return UploadResponse(
                         success=True,
-                        message="Fichier IPFS uploadé. Sync home station en attente (DM différé).",
+                        message="Fichier IPFS uploadé. Relais vers la home station en file d'attente (DM).",
                         file_path=str(file_path),
                         file_type=file_type,
                         target_directory=str(target_dir),
@@ -1629,6 +1510,7 @@ async def _upload_file_to_ipfs_impl(
                         mimeType=mime_type if mime_type else None,
                         duration=int(duration) if duration is not None else None,
                         dimensions=dimensions if dimensions else None,
+                        status_url=f"/api/upload/status/{file_sha256}",
                     )
 
                 # ── Régénérer la structure uDRIVE (utilisateurs locaux uniquement) ──
@@ -1660,7 +1542,8 @@ async def _upload_file_to_ipfs_impl(
                     mimeType=mime_type if mime_type else None,
                     duration=int(duration) if duration is not None else None,
                     dimensions=dimensions if dimensions else None,
-                    upload_chain=upload_chain if upload_chain else None
+                    upload_chain=upload_chain if upload_chain else None,
+                    status_url=status_url,
                 )
                 
             except (json.JSONDecodeError, FileNotFoundError) as e:
@@ -1678,6 +1561,26 @@ async def _upload_file_to_ipfs_impl(
 
 from models.schemas import UploadFromDriveRequest, UploadFromDriveResponse
 
+async def _ipfs_get_directory(ipfs_path: str, target: Path, timeout: float = 60) -> None:
+    """`ipfs get -o target` d'un répertoire (kubo.cat_to_file ne lit que les
+    fichiers). Lève KuboError en cas d'échec ou de timeout."""
+    process = await asyncio.create_subprocess_exec(
+        "ipfs", "get", "-o", str(target), ipfs_path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except asyncio.TimeoutError as e:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        raise KuboError(f"get {ipfs_path}: timeout") from e
+    if process.returncode != 0:
+        raise KuboError(f"get {ipfs_path}: {stderr.decode().strip()}")
+
+
 @router.post("/api/upload_from_drive", response_model=UploadFromDriveResponse)
 async def upload_from_drive(request: Request, payload: UploadFromDriveRequest):
     if payload.owner_hex_pubkey or payload.owner_email:
@@ -1721,27 +1624,19 @@ async def upload_from_drive(request: Request, payload: UploadFromDriveRequest):
         full_ipfs_url = f"/ipfs/{payload.ipfs_link}"
         logger.info(f"Attempting to download IPFS link: {full_ipfs_url} to {target_file_path}")
 
-        ipfs_get_command = ["ipfs", "get", "-o", str(target_file_path), full_ipfs_url]
-        process = await asyncio.create_subprocess_exec(
-            *ipfs_get_command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
         try:
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=60)
-        except asyncio.TimeoutError:
-            try:
-                process.kill()
-            except ProcessLookupError:
-                pass
-            raise HTTPException(status_code=504, detail="IPFS download timeout")
-
-        if process.returncode != 0:
-            error_message = stderr.decode().strip()
-            logger.error(f"IPFS download failed for {full_ipfs_url}: {error_message}")
-            raise Exception(f"IPFS download failed: {error_message}")
+            node = await kubo.stat(full_ipfs_url, timeout=60)
+            if node.get("Type") == "directory":
+                await _ipfs_get_directory(full_ipfs_url, target_file_path)
+                file_size = int(node.get("CumulativeSize") or 0)
+            else:
+                file_size = await kubo.cat_to_file(full_ipfs_url, target_file_path, timeout=60)
+        except KuboError as e:
+            logger.error(f"IPFS download failed for {full_ipfs_url}: {e}")
+            if isinstance(e.__cause__, TimeoutError):
+                raise HTTPException(status_code=504, detail="IPFS download timeout")
+            raise Exception(f"IPFS download failed: {e}")
 
-        file_size = target_file_path.stat().st_size
         logger.info(f"File '{sanitized_filename}' downloaded from IPFS and saved to '{target_file_path}' (Size: {file_size} bytes)")
 
         ipfs_result = await run_uDRIVE_generation_script(user_drive_path)
@@ -1953,25 +1848,12 @@ def _validate_image_file(filename: str, file_content: bytes) -> tuple:
 async def _upload_image_to_ipfs(data: bytes, filename: str = "file") -> tuple:
     """Upload bytes directement vers IPFS (sans passer par le disque)."""
     try:
-        import aiohttp
-        ipfs_api_url = "http://127.0.0.1:5001"
-        form_data = aiohttp.FormData()
-        form_data.add_field('file', data,
-                            filename=filename,
-                            content_type='application/octet-stream')
-        timeout = aiohttp.ClientTimeout(total=30)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(f'{ipfs_api_url}/api/v0/add', data=form_data) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    cid = result['Hash']
-                    ipfs_gateway = (await get_myipfs_gateway()).rstrip('/')
-                    ipfs_url = f"{ipfs_gateway}/ipfs/{cid}"
-                    return cid, ipfs_url
-        return None, None
-    except Exception as e:
+        cid = await kubo.add_bytes(data, filename)
+    except KuboError as e:
         logger.error(f"IPFS image upload error: {e}")
         return None, None
+    ipfs_gateway = (await get_myipfs_gateway()).rstrip('/')
+    return cid, f"{ipfs_gateway}/ipfs/{cid}"
 
 @router.post("/api/upload/image")
 async def upload_image(
@@ -2067,26 +1949,15 @@ async def blossom_upload(request: Request):
     conforme au protocole Blossom.
     """
     # ── 1. Lire le header d'autorisation ──────────────────────────────────
-    auth_header = request.headers.get("Authorization", "")
-    pubkey_hex: Optional[str] = None
+    # Dépôt anonyme toléré (Coracle) ; seul un event signé rend propriétaire
+    # du blob (droit de DELETE) : un blob déposé anonymement n'est jamais supprimable.
+    event = _blossom_auth(request, "upload")
+    owner = event["pubkey"] if event else ""
     expected_sha256: Optional[str] = None
-
-    if auth_header.startswith("Nostr "):
-        try:
-            raw = auth_header[6:]
-            # base64url ou base64 standard
-            padded = raw + "=" * (-len(raw) % 4)
-            event_json = base64.urlsafe_b64decode(padded).decode("utf-8")
-            event = json.loads(event_json)
-            pubkey_hex = event.get("pubkey")
-            # Le tag ["x", "<sha256>"] contient le hash attendu du fichier
-            for tag in event.get("tags", []):
-                if tag[0] == "x" and len(tag) > 1:
-                    expected_sha256 = tag[1]
-                    break
-            logger.info(f"[Blossom] Auth event from pubkey={pubkey_hex[:16] if pubkey_hex else 'unknown'}…")
-        except Exception as e:
-            logger.warning(f"[Blossom] Could not parse Authorization header: {e}")
+    if event:
+        # Le tag ["x", "<sha256>"] contient le hash attendu du fichier
+        expected_sha256 = next((t[1] for t in event.get("tags", []) if t[0] == "x" and len(t) > 1), None)
+        logger.info(f"[Blossom] Auth event from pubkey={owner[:16]}…")
 
     # ── 2. Lire le corps brut ─────────────────────────────────────────────
     content = await request.body()
@@ -2110,38 +1981,78 @@ async def blossom_upload(request: Request):
     }
     ext = _ct_ext_map.get(content_type.split(";")[0].strip(), "bin")
 
-    # ── 5. Construire le nom de fichier ───────────────────────────────────
-    prefix = pubkey_hex[:16] if pubkey_hex else file_hash[:16]
-    timestamp = int(datetime.now().timestamp())
-    new_filename = f"{prefix}_blossom_{timestamp}.{ext}"
-
-    # ── 6. Upload depuis la mémoire — pas de fichier local si IPFS répond ─
-    cid, ipfs_url = await _upload_image_to_ipfs(content, new_filename)
-
-    if not cid:
-        uploads_dir = Path("uploads")
-        uploads_dir.mkdir(exist_ok=True)
-        filepath = uploads_dir / new_filename
-        async with aiofiles.open(str(filepath), 'wb') as f_out:
-            await f_out.write(content)
-        final_url = f"/uploads/{new_filename}"
-        logger.warning(f"[Blossom] IPFS indisponible — fallback local: {final_url}")
-    else:
-        final_url = ipfs_url
-        logger.info(f"[Blossom] IPFS OK cid={cid[:16]}… ({len(content)} bytes, pas de fichier local)")
+    # ── 5. Dépôt dédupliqué (blob local + pin IPFS unique) ───────────────
+    mime = content_type.split(";")[0].strip() or "application/octet-stream"
+    rec, created = await blob_store.put(file_hash, content, mime, owner=owner)
+    cid = rec["c"] or None
+    ipfs_url = f"{(await get_myipfs_gateway()).rstrip('/')}/ipfs/{cid}" if cid else None
+    logger.info(f"[Blossom] {'stocké' if created else 'dédupliqué'} {file_hash[:16]}… "
+                f"({len(content)} bytes, cid={cid[:16] + '…' if cid else 'aucun'})")
 
-    # ── 7. Réponse format Blossom ─────────────────────────────────────────
+    # ── 6. Réponse format Blossom (blob descriptor) ──────────────────────
     return JSONResponse(content={
-        "url": final_url,
+        "url": f"{str(request.base_url).rstrip('/')}/{file_hash}.{ext}",
         "sha256": file_hash,
-        "size": len(content),
-        "type": content_type.split(";")[0].strip(),
-        "uploaded": timestamp,
+        "size": rec["n"],
+        "type": rec["t"],
+        "uploaded": rec["u"],
         # Extensions non-standard utiles pour Coracle
         "ipfs_cid": cid,
         "ipfs_url": ipfs_url,
     }, status_code=200)
 
+
+def _blossom_auth(request: Request, action: str) -> Optional[Dict[str, Any]]:
+    """Événement kind 24242 vérifié (signature, t=<action>, non expiré) ou None."""
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Nostr "):
+        return None
+    try:
+        raw = auth_header[6:]
+        event = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)).decode("utf-8"))
+    except Exception as e:
+        logger.warning(f"[Blossom] Could not parse Authorization header: {e}")
+        return None
+    if not isinstance(event, dict) or event.get("kind") != 24242 or not verify_nostr_event(event):
+        return None
+    tags = {t[0]: t[1] for t in event.get("tags", []) if isinstance(t, list) and len(t) > 1}
+    if tags.get("t") != action:
+        return None
+    if "expiration" in tags and tags["expiration"].isdigit() and int(tags["expiration"]) < time.time():
+        return None
+    return event
+
+
+@router.api_route("/{blob:blossom}", methods=["GET", "HEAD"])
+async def blossom_get(blob: str, request: Request):
+    """GET/HEAD /<sha256>[.ext] (BUD-01) : Range, ETag immuable, envoi zéro-copie."""
+    sha256 = blob[:64]
+    rec = blob_store.get(sha256)
+    if rec is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return BlobResponse(
+        blob_store.path(sha256), rec,
+        range_header=request.headers.get("range"),
+        if_none_match=request.headers.get("if-none-match"),
+        head=request.method == "HEAD",
+    )
+
+
+@router.delete("/{blob:blossom}")
+async def blossom_delete(blob: str, request: Request):
+    """DELETE /<sha256> (BUD-02) : retire le propriétaire ; le blob disparaît
+    (fichier + pin IPFS) quand plus aucun propriétaire ne le référence."""
+    sha256 = blob[:64]
+    event = _blossom_auth(request, "delete")
+    if event is None:
+        raise HTTPException(status_code=401, detail="Signed kind 24242 delete authorization required")
+    if not any(t[0] == "x" and len(t) > 1 and t[1] == sha256 for t in event.get("tags", [])):
+        raise HTTPException(status_code=403, detail="Authorization does not cover this blob")
+    if not await blob_store.remove(sha256, event["pubkey"]):
+        raise HTTPException(status_code=404, detail="Blob not found for this pubkey")
+    return JSONResponse(content={"deleted": sha256})
+
+
 @router.get("/uploads/{filename}")
 async def serve_upload(filename: str):
     uploads_dir = Path("uploads").resolve()
@@ -69,9 +69,13 @@ from fastapi.responses import JSONResponse
 from fastapi.templating import Jinja2Templates
 from services.nostr import analyze_n2_network
 from models.schemas import N2NetworkResponse
+from services.response_cache import ResponseCache, json_response
 
 templates = Jinja2Templates(directory="templates")
 
+# Réponses N2 JSON pré-encodées par (hex, range) — analyse relais coûteuse
+_n2_cache = ResponseCache("getN2", ttl=settings.N2_CACHE_TTL, stale_ttl=4 * settings.N2_CACHE_TTL, maxsize=512)
+
 @router.get("/api/getN2", response_model=N2NetworkResponse)
 async def get_n2_network(
     request: Request,
@@ -109,6 +113,12 @@ async def get_n2_network(
         
         logger.info(f"Analyse N2 pour {hex[:12]}... (range={range}, output={output})")
         
+        if output == "json":
+            async def build():
+                return N2NetworkResponse(**await analyze_n2_network(hex, range)).model_dump()
+            entry = await _n2_cache.get((hex, range), build)
+            return json_response(request, entry, max_age=settings.N2_CACHE_TTL)
+
         network_data = await analyze_n2_network(hex, range)
         
         if output == "html":
@@ -138,8 +148,6 @@ async def get_n2_network(
                 }
             )
         
-        return N2NetworkResponse(**network_data)
-        
     except HTTPException:
         raise
     except Exception as e:
@@ -650,6 +658,8 @@ async def admin_memory_reset(request: Request):
         raise HTTPException(status_code=400, detail=f"scope invalide (attendu: {', '.join(RESET_SCOPES)})")
 
     report = await asyncio.to_thread(reset_memory, email, scope)
+    from services.page_context import invalidate_user
+    invalidate_user(email)
     logger.info(f"Admin memory_reset: {email} scope={scope} — {len(report['deleted'])} élément(s) supprimé(s)")
     return JSONResponse(report)
 
@@ -670,6 +680,8 @@ async def admin_memory_regenerate(request: Request):
 
     from services.memory_status import regenerate_lifeos_from_mastodon
     result = await asyncio.to_thread(regenerate_lifeos_from_mastodon, email)
+    from services.page_context import invalidate_user
+    invalidate_user(email)
     logger.info(f"Admin memory_regenerate (Mastodon): {email} → {result}")
     return JSONResponse(result)
 
@@ -712,6 +724,8 @@ async def admin_identity_save(request: Request):
                              detail=f"filename invalide (attendu : {', '.join(IDENTITY_FILENAMES)})")
 
     ok, msg = await asyncio.to_thread(save_identity_file, email, filename, content)
+    from services.page_context import invalidate_user
+    invalidate_user(email)
     if not ok:
         raise HTTPException(status_code=500, detail=msg)
 
@@ -873,17 +887,8 @@ async def admin_constellation_delete(request: Request):
 
     # 3. Trouver les NODEHEX constellation via ~/.zen/tmp/swarm/*/HEX
     # (chaque nœud publie son HEX dans /ipns/{IPFSNODEID}/HEX, mis en cache localement)
-    swarm_dir = Path.home() / ".zen" / "tmp" / "swarm"
-    node_hexes: list = []
-    if swarm_dir.exists():
-        for hex_file in swarm_dir.glob("*/HEX"):
-            try:
-                nodehex = hex_file.read_text().strip()
-                if nodehex and len(nodehex) == 64:
-                    int(nodehex, 16)
-                    node_hexes.append(nodehex)
-            except Exception:
-                pass
+    from services.swarm_index import swarm_index
+    node_hexes: list = swarm_index.node_hexes()
 
     # 4. Envoyer DM BRO channel "nostr_delete" à chaque NODE constellation
     intercom = Path.home() / ".zen" / "Astroport.ONE" / "tools" / "nostr_node_intercom.py"
@@ -13,6 +13,7 @@ from services.nostr import verify_nostr_auth, fetch_nostr_profiles
 from utils.crypto import hex_to_npub, npub_to_hex
 from utils.helpers import get_env_from_mysh, run_script
 from core.config import settings
+from services.response_cache import ResponseCache, json_response
 
 router = APIRouter()
 
@@ -82,6 +83,7 @@ async def create_permit_definition(request: PermitDefinitionCreateRequest):
         success = app_state.oracle_system.create_permit_definition(definition, creator_npub=request.npub)
         
         if success:
+            _definitions_cache.invalidate()
             response_data = {
                 "success": True,
                 "message": f"Permit definition {permit_req.id} created",
@@ -284,8 +286,11 @@ async def get_composites_eligibility(npub: Optional[str] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_definitions_cache = ResponseCache("permit_definitions", ttl=60, stale_ttl=0, maxsize=4)
+
+
 @router.get("/api/permit/definitions")
-async def list_permit_definitions():
+async def list_permit_definitions(request: Request):
     from core.state import app_state, ORACLE_ENABLED
     if not ORACLE_ENABLED or app_state.oracle_system is None:
         raise HTTPException(status_code=503, detail="Oracle system not available")
@@ -302,24 +307,33 @@ async def list_permit_definitions():
             except Exception as e:
                 logger.warning(f"⚠️  Could not fetch definitions from NOSTR: {e}")
         
-        definitions = [
-            {
-                "id": d.id,
-                "name": d.name,
-                "description": d.description,
-                "min_attestations": d.min_attestations,
-                "required_license": d.required_license,
-                "valid_duration_days": d.valid_duration_days,
-                "verification_method": d.verification_method
+        async def build():
+            definitions = [
+                {
+                    "id": d.id,
+                    "name": d.name,
+                    "description": d.description,
+                    "min_attestations": d.min_attestations,
+                    "required_license": d.required_license,
+                    "valid_duration_days": d.valid_duration_days,
+                    "verification_method": d.verification_method
+                }
+                for d in app_state.oracle_system.definitions.values()
+            ]
+            return {
+                "success": True,
+                "count": len(definitions),
+                "definitions": definitions
             }
+
+        # Octets pré-encodés réutilisés tant que les définitions servies ne changent pas
+        key = tuple(
+            (d.id, d.name, d.description, d.min_attestations, d.required_license,
+             d.valid_duration_days, d.verification_method)
             for d in app_state.oracle_system.definitions.values()
-        ]
-        
-        return JSONResponse({
-            "success": True,
-            "count": len(definitions),
-            "definitions": definitions
-        })
+        )
+        entry = await _definitions_cache.get(key, build)
+        return json_response(request, entry)
     
     except Exception as e:
         logger.error(f"Error listing definitions: {e}")
@@ -698,28 +712,25 @@ async def get_available_masters(
             
             seen_pubkeys.add(cred.holder_npub)
             
-            profile_info = {}
-            try:
-                holder_hex = npub_to_hex(cred.holder_npub) if cred.holder_npub.startswith("npub") else cred.holder_npub
-                if holder_hex:
-                    profiles = await fetch_nostr_profiles([holder_hex])
-                    if holder_hex in profiles:
-                        profile_info = profiles[holder_hex]
-            except Exception as e:
-                logger.debug(f"Could not fetch profile for {cred.holder_npub}: {e}")
-            
             masters.append({
                 "npub": cred.holder_npub,
                 "hex_pubkey": npub_to_hex(cred.holder_npub) if cred.holder_npub.startswith("npub") else cred.holder_npub,
-                "name": profile_info.get("name", ""),
-                "display_name": profile_info.get("display_name", ""),
-                "picture": profile_info.get("picture", ""),
+                "name": "",
+                "display_name": "",
+                "picture": "",
                 "level": cred_level,
                 "competencies": [],
                 "credential_id": cred.credential_id,
                 "credential_expires_at": cred.expires_at.isoformat() if cred.expires_at else None
             })
         
+        # Profils de tous les titulaires en une seule requête
+        profiles = await fetch_nostr_profiles([m["hex_pubkey"] for m in masters if m["hex_pubkey"]])
+        for master in masters:
+            profile_info = profiles.get(master["hex_pubkey"]) or {}
+            for field in ("name", "display_name", "picture"):
+                master[field] = profile_info.get(field) or ""
+        
         return JSONResponse({
             "success": True,
             "permit_id": permit_id,
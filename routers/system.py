@@ -30,56 +30,20 @@ for route_path, template_name in SIMPLE_UI_ROUTES.items():
 
 @router.get("/", summary="UPlanet Status", description="UPlanet Status (specify lat, lon, deg to select grid level)")
 async def ustats(request: Request, lat: str = None, lon: str = None, deg: str = None):
-    import os
-    import json
-    import time
-    import aiofiles
-    from utils.helpers import run_script
+    from services.ustats import grid_key, get_ustats, UstatsError
+    from services.response_cache import json_response
 
-    from core.config import settings
-    script_path = settings.ZEN_PATH / "Astroport.ONE" / "Ustats.sh"
-
-    # Servir depuis le cache RAM si disponible et récent (< 60s), sans paramètre de grille
-    if lat is None and lon is None:
-        age = time.time() - app_state.ustats_cache_time
-        if app_state.ustats_cache is not None and age < app_state.USTATS_CACHE_TTL:
-            return JSONResponse(content=app_state.ustats_cache)
-
-    args = []
-    if lat is not None and lon is not None:
-        # deg est optionnel côté requête, mais asyncio.create_subprocess_exec exige
-        # des str — un None ici plante le subprocess (TypeError) avant même de lancer
-        # le script. Ustats.sh accepte une chaîne vide (positionnel $3 non renseigné).
-        args.extend([lat, lon, deg if deg is not None else ""])
-
-    return_code, last_line = await run_script(script_path, *args)
+    try:
+        key = grid_key(lat, lon, deg)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="lat, lon et deg doivent être des nombres finis (lat entre -90 et 90, lon entre -180 et 180)")
 
-    if return_code == 0:
-        if os.path.exists(last_line.strip()):
-            try:
-                async with aiofiles.open(last_line.strip(), 'r') as f:
-                    content = await f.read()
-                data = json.loads(content)
-                # Mettre à jour le cache si pas de filtre géographique
-                if lat is None:
-                    app_state.ustats_cache = data
-                    app_state.ustats_cache_time = time.time()
-                return JSONResponse(content=data)
-            except Exception as e:
-                logger.error(f"Error reading file: {e}")
-                raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
-        else:
-            try:
-                data = json.loads(last_line)
-                if lat is None:
-                    app_state.ustats_cache = data
-                    app_state.ustats_cache_time = time.time()
-                return JSONResponse(content=data)
-            except json.JSONDecodeError as e:
-                logger.error(f"Error parsing JSON: {e}")
-                raise HTTPException(status_code=500, detail=f"Error parsing JSON: {str(e)}")
-    else:
+    try:
+        entry = await get_ustats(key)
+    except UstatsError as e:
+        logger.error(f"Ustats: {e}")
         raise HTTPException(status_code=500, detail="Une erreur s'est produite lors de l'exécution du script. Veuillez consulter les logs dans ./tmp/54321.log.")
+    return json_response(request, entry, max_age=settings.USTATS_CACHE_TTL)
 
 @router.get("/api/ustats", summary="Station stats (alias)", description="Alias de GET / pour les widgets frontend.")
 async def api_ustats(request: Request, lat: str = None, lon: str = None, deg: str = None):
@@ -128,9 +92,13 @@ async def get_n8n_workflow_builder(request: Request):
 @router.get("/health", summary="Health Check", description="Health check endpoint.")
 async def health_check():
     from datetime import datetime
+    from services.cache import cache_metrics
+    from services.kubo import kubo
     return {
         "status": "healthy",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "kubo": kubo.metrics(),
+        "caches": cache_metrics(),
     }
 
 CREDENTIALS_CONTEXT_V1 = {
@@ -0,0 +1,240 @@
+"""
+services/analytics.py
+─────────────────────
+Ingestion analytics par lots pour POST /ping.
+
+Avant : chaque ping = une note NOSTR kind 10600 (fork de nostr_send_note.py)
++ résolution de l'email capitaine (symlink, my.sh) à chaque hit, et
+send_server_side_analytics lançait un create_task HTTP vers /ping par page vue.
+
+Ici :
+  - ingest() est O(1) : l'événement rejoint une file mémoire bornée
+    (settings.ANALYTICS_QUEUE_MAX ; au-delà il est compté comme perdu) et les
+    compteurs de l'intervalle (type, source, url) sont incrémentés.
+  - Toutes les settings.ANALYTICS_FLUSH_INTERVAL secondes (tâche lancée au
+    lifespan) : les événements bruts sont ajoutés au store local compact
+      ~/.zen/tmp/analytics/YYYY-MM-DD.jsonl   (une ligne JSON compacte / événement)
+    puis UNE seule note kind 10600 résume l'intervalle pour le capitaine.
+  - load_events(day) relit le store pour les consultations ultérieures.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_DIR = Path.home() / ".zen" / "tmp" / "analytics"
+_SUMMARY_TOP = 20          # lignes (type, source, url) détaillées dans la note
+_CAPTAIN_TTL = 300         # s — résolution de l'email capitaine mise en cache
+
+
+class AnalyticsPipeline:
+    """File bornée + agrégation par intervalle + flush périodique."""
+
+    def __init__(self, max_queue: Optional[int] = None):
+        self.max_queue = max_queue or settings.ANALYTICS_QUEUE_MAX
+        self._events: Deque[dict] = deque()
+        self._counts: Counter = Counter()
+        self._dropped = 0
+        self._interval_start = time.time()
+        self._task: Optional[asyncio.Task] = None
+        self._captain: Tuple[float, Optional[str]] = (0.0, None)
+
+    # ── Ingestion ────────────────────────────────────────────────────────────
+
+    def ingest(self, data: dict, referer: Optional[str] = None) -> bool:
+        """Enregistre un événement. Retourne False s'il a été perdu (file pleine)."""
+        key = (
+            str(data.get("type", "unknown")),
+            str(data.get("source", "unknown")),
+            str(data.get("current_url") or referer or ""),
+        )
+        if key not in self._counts and len(self._counts) >= self.max_queue:
+            key = key[:2] + ("(other)",)   # cardinalité des URL bornée elle aussi
+        self._counts[key] += 1
+        if len(self._events) >= self.max_queue:
+            self._dropped += 1
+            return False
+        event = dict(data)
+        event.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+        if referer:
+            event.setdefault("referer", referer)
+        self._events.append(event)
+        return True
+
+    # ── Flush ────────────────────────────────────────────────────────────────
+
+    def _drain(self) -> Tuple[List[dict], Counter, int, float]:
+        events, self._events = list(self._events), deque()
+        counts, self._counts = self._counts, Counter()
+        dropped, self._dropped = self._dropped, 0
+        start, self._interval_start = self._interval_start, time.time()
+        return events, counts, dropped, start
+
+    @staticmethod
+    def _store(events: List[dict]) -> None:
+        """Ajoute les événements bruts au store du jour (JSON compact)."""
+        if not events:
+            return
+        ANALYTICS_DIR.mkdir(parents=True, exist_ok=True)
+        path = ANALYTICS_DIR / f"{datetime.now(timezone.utc):%Y-%m-%d}.jsonl"
+        with open(path, "a", encoding="utf-8") as f:
+            f.writelines(
+                json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in events
+            )
+
+    async def flush(self) -> Optional[dict]:
+        """Vide l'intervalle courant : store local + une note de synthèse."""
+        events, counts, dropped, start = self._drain()
+        total = sum(counts.values())
+        if not total:
+            return None
+        try:
+            await asyncio.to_thread(self._store, events)
+        except OSError as e:
+            logger.warning(f"⚠️ Analytics store write failed: {e}")
+        summary = {
+            "from": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+            "to": datetime.now(timezone.utc).isoformat(),
+            "total": total,
+            "dropped": dropped,
+            "by_type": dict(_sum_by(counts, 0)),
+            "by_source": dict(_sum_by(counts, 1)),
+            "top": [
+                {"type": t, "source": s, "url": u, "count": n}
+                for (t, s, u), n in counts.most_common(_SUMMARY_TOP)
+            ],
+        }
+        await self._publish(summary)
+        return summary
+
+    async def _captain_email(self) -> Optional[str]:
+        """Email du capitaine : .current → CAPTAINEMAIL (my.sh) → env. Mis en cache."""
+        checked, email = self._captain
+        if email and time.time() - checked < _CAPTAIN_TTL:
+            return email
+        from utils.helpers import get_env_from_mysh
+        current_player_link = settings.GAME_PATH / "players" / ".current"
+        email = None
+        if current_player_link.is_symlink():
+            try:
+                email = current_player_link.readlink().name or None
+            except OSError as e:
+                logger.warning(f"⚠️ Could not read .current symlink: {e}")
+        if not email:
+            email = await get_env_from_mysh("CAPTAINEMAIL", "") or settings.CAPTAINEMAIL or None
+        self._captain = (time.time(), email)
+        return email
+
+    async def _publish(self, summary: dict) -> None:
+        """Une note NOSTR kind 10600 pour tout l'intervalle."""
+        captain_email = await self._captain_email()
+        if not captain_email:
+            logger.warning("⚠️ No current player email found, analytics summary kept local only")
+            return
+        captain_keyfile = settings.GAME_PATH / "nostr" / captain_email / ".secret.nostr"
+        nostr_script = settings.TOOLS_PATH / "nostr_send_note.py"
+        if not captain_keyfile.exists() or not os.path.exists(nostr_script):
+            logger.warning("⚠️ Analytics summary not sent (keyfile or nostr_send_note.py missing)")
+            return
+
+        lines = [
+            "📊 Analytics Summary",
+            "",
+            f"Period: {summary['from']} → {summary['to']}",
+            f"Events: {summary['total']}" + (f" (dropped: {summary['dropped']})" if summary["dropped"] else ""),
+            "",
+            "By type:",
+            *(f"  {t}: {n}" for t, n in sorted(summary["by_type"].items(), key=lambda i: -i[1])),
+            "",
+            "Top pages:",
+            *(f"  {row['count']:>5}  {row['type']}  {row['source']}  {row['url']}" for row in summary["top"]),
+        ]
+        tags = [["t", "analytics"], ["t", "analytics-summary"]]
+        tags += [["t", t] for t in list(summary["by_type"])[:10]]
+
+        from core.config import ASTRO_PYTHON
+        cmd = [
+            ASTRO_PYTHON, str(nostr_script),
+            "--keyfile", str(captain_keyfile),
+            "--content", "\n".join(lines),
+            "--kind", "10600",
+            "--tags", json.dumps(tags),
+            "--relays", settings.myRELAY.split()[0],
+            "--json",
+        ]
+        process = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            )
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=10)
+            if process.returncode == 0:
+                logger.info(f"✅ Analytics summary sent to captain via NOSTR ({summary['total']} events)")
+            else:
+                logger.warning(f"⚠️ NOSTR send failed: {stderr.decode()}")
+        except asyncio.TimeoutError:
+            if process is not None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+            logger.warning("⚠️ NOSTR send timeout")
+        except Exception as e:
+            logger.warning(f"⚠️ NOSTR send error: {e}")
+
+    # ── Cycle de vie ────────────────────────────────────────────────────────
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.ANALYTICS_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"⚠️ Analytics flush failed: {e}")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Arrête la boucle et vide l'intervalle en cours (arrêt propre)."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"⚠️ Analytics final flush failed: {e}")
+
+
+def _sum_by(counts: Counter, index: int) -> Counter:
+    total: Counter = Counter()
+    for key, n in counts.items():
+        total[key[index]] += n
+    return total
+
+
+def load_events(day: str) -> Iterator[dict]:
+    """Événements bruts stockés pour un jour (YYYY-MM-DD)."""
+    path = ANALYTICS_DIR / f"{day}.jsonl"
+    if not path.exists():
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+analytics_pipeline = AnalyticsPipeline()
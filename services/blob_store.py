@@ -0,0 +1,292 @@
+"""
+services/blob_store.py
+──────────────────────
+Store local de blobs adressés par SHA-256, compatible Blossom (BUD-01/02).
+
+  ~/.zen/blossom/blobs/ab/cd/<sha256>    contenu (répertoires shardés)
+  ~/.zen/blossom/index.jsonl             index append-only, dernière ligne gagne :
+      {"s": sha256, "c": cid, "n": taille, "t": mime, "o": [pubkeys], "u": ts}
+      {"s": sha256, "d": 1}              (blob supprimé)
+
+  - put() déduplique : un blob déjà présent est renvoyé immédiatement (seul son
+    propriétaire est ajouté), sans réécriture ni nouveau pin IPFS. Deux dépôts
+    simultanés du même contenu partagent le même verrou.
+  - Chaque blob est épinglé une fois dans Kubo (services.ipfs, client poolé) ;
+    si IPFS est indisponible il reste servi localement (cid vide).
+  - remove() retire un propriétaire ; au dernier, fichier supprimé et dépinné.
+    Un blob déposé anonymement (aucun propriétaire) n'est jamais supprimable
+    par DELETE : seul un dépôt signé ouvre ce droit.
+  - BlobResponse sert GET/HEAD avec Range (un intervalle), ETag immuable et
+    envoi zéro-copie quand le serveur ASGI le propose (extensions
+    http.response.pathsend / http.response.zerocopysend), lecture par blocs sinon.
+    Le Content-Type vient du client : seuls les types de SAFE_MEDIA_TYPES sont
+    renvoyés tels quels (application/octet-stream sinon), toujours avec nosniff
+    et « Content-Security-Policy: sandbox » — ni HTML ni SVG actif sur l'origine.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+_CHUNK = 256 * 1024
+
+# Types servis tels quels ; tout autre (text/html, image/svg+xml, …) devient
+# application/octet-stream.
+SAFE_MEDIA_TYPES = frozenset({
+    "image/jpeg", "image/png", "image/gif", "image/webp", "image/avif",
+    "video/mp4", "video/webm", "video/ogg", "video/quicktime",
+    "audio/mpeg", "audio/ogg", "audio/wav", "audio/webm", "audio/mp4", "audio/flac",
+    "application/pdf", "text/plain",
+})
+
+
+def safe_media_type(mime: Optional[str]) -> str:
+    """`mime` s'il fait partie de SAFE_MEDIA_TYPES, sinon application/octet-stream."""
+    mime = (mime or "").split(";")[0].strip().lower()
+    return mime if mime in SAFE_MEDIA_TYPES else "application/octet-stream"
+
+
+class BlobStore:
+    """Blobs SHA-256 sur disque + index (CID, taille, type, propriétaires)."""
+
+    def __init__(self, root: Optional[Path] = None):
+        self._root = root
+        self._index: Optional[Dict[str, dict]] = None
+        self._log_lines = 0
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @property
+    def root(self) -> Path:
+        return self._root or settings.BLOSSOM_DIR
+
+    @property
+    def index_path(self) -> Path:
+        return self.root / "index.jsonl"
+
+    def path(self, sha256: str) -> Path:
+        return self.root / "blobs" / sha256[:2] / sha256[2:4] / sha256
+
+    # ── Index ───────────────────────────────────────────────────────────────
+
+    def _entries(self) -> Dict[str, dict]:
+        if self._index is None:
+            index: Dict[str, dict] = {}
+            lines = 0
+            try:
+                with open(self.index_path) as f:
+                    for line in f:
+                        lines += 1
+                        try:
+                            rec = json.loads(line)
+                            if rec.get("d"):
+                                index.pop(rec["s"], None)
+                            else:
+                                index[rec["s"]] = rec
+                        except (ValueError, KeyError):
+                            continue
+            except FileNotFoundError:
+                pass
+            self._index, self._log_lines = index, lines
+            if lines > 2 * len(index) + 100:
+                self._compact()
+        return self._index
+
+    def _append(self, rec: dict) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path, "a") as f:
+            f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        self._log_lines += 1
+
+    def _compact(self) -> None:
+        tmp = self.index_path.with_suffix(".tmp")
+        try:
+            with open(tmp, "w") as f:
+                for rec in self._index.values():
+                    f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+            os.replace(tmp, self.index_path)
+            self._log_lines = len(self._index)
+        except OSError as e:
+            logger.warning(f"[blossom] compaction de {self.index_path} : {e}")
+
+    def get(self, sha256: str) -> Optional[dict]:
+        """Entrée d'index si le blob est présent sur disque, sinon None."""
+        rec = self._entries().get(sha256)
+        if rec is None or not self.path(sha256).is_file():
+            return None
+        return rec
+
+    # ── Écriture ────────────────────────────────────────────────────────────
+
+    def _write_blob(self, sha256: str, content: bytes) -> None:
+        target = self.path(sha256)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{sha256}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, target)
+
+    @asynccontextmanager
+    async def _locked(self, sha256: str):
+        """Verrou par blob : dépôts et suppressions d'un même sha256 en série."""
+        lock = self._locks.setdefault(sha256, asyncio.Lock())
+        try:
+            async with lock:
+                yield
+        finally:
+            if not lock.locked() and not getattr(lock, "_waiters", None):
+                self._locks.pop(sha256, None)
+
+    async def put(self, sha256: str, content: bytes, mime: str, owner: str = "") -> Tuple[dict, bool]:
+        """Dépose un blob (sha256 déjà vérifié par l'appelant).
+        Retourne (entrée, créé) — créé=False si dédupliqué. Sans `owner`
+        (dépôt anonyme), le blob ne pourra pas être supprimé par remove()."""
+        async with self._locked(sha256):
+            rec = self.get(sha256)
+            if rec is not None:
+                if owner and owner not in rec["o"]:
+                    rec = {**rec, "o": rec["o"] + [owner]}
+                    self._index[sha256] = rec
+                    await asyncio.to_thread(self._append, rec)
+                return rec, False
+
+            await asyncio.to_thread(self._write_blob, sha256, content)
+            from services.ipfs import kubo_add_bytes
+            cid = await kubo_add_bytes(content, sha256, pin=True) or ""
+            rec = {"s": sha256, "c": cid, "n": len(content), "t": mime,
+                   "o": [owner] if owner else [], "u": int(time.time())}
+            self._entries()[sha256] = rec
+            await asyncio.to_thread(self._append, rec)
+            return rec, True
+
+    async def remove(self, sha256: str, owner: str) -> bool:
+        """Retire `owner` du blob ; supprime et dépinne au dernier propriétaire.
+        False si le blob est absent ou n'appartient pas à `owner`."""
+        if not owner:
+            return False
+        async with self._locked(sha256):
+            rec = self.get(sha256)
+            if rec is None or owner not in rec["o"]:
+                return False
+            owners: List[str] = [o for o in rec["o"] if o != owner]
+            if owners:
+                rec = {**rec, "o": owners}
+                self._index[sha256] = rec
+                await asyncio.to_thread(self._append, rec)
+                return True
+            self._index.pop(sha256, None)
+            await asyncio.to_thread(self._append, {"s": sha256, "d": 1})
+            try:
+                self.path(sha256).unlink()
+            except FileNotFoundError:
+                pass
+        if rec.get("c"):
+            from services.ipfs import kubo_pin_rm
+            await kubo_pin_rm(rec["c"])
+        return True
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(début, fin incluse) d'un en-tête Range à un seul intervalle.
+    None : en-tête absent, multiple ou illisible (réponse complète).
+    Lève ValueError si l'intervalle est insatisfiable (416)."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, _, end_s = header[6:].strip().partition("-")
+    if not (start_s or end_s) or any(p and not p.isdigit() for p in (start_s, end_s)):
+        return None
+    if not start_s:
+        length = int(end_s)
+        if length == 0 or size == 0:
+            raise ValueError("suffixe vide")
+        return max(size - length, 0), size - 1
+    start = int(start_s)
+    end = min(int(end_s), size - 1) if end_s else size - 1
+    if end_s and int(end_s) < start:
+        return None
+    if start >= size:
+        raise ValueError("intervalle hors du blob")
+    return start, end
+
+
+class BlobResponse(Response):
+    """GET/HEAD d'un blob : Range, ETag immuable, envoi zéro-copie si disponible."""
+
+    def __init__(self, path: Path, rec: dict, range_header: Optional[str] = None,
+                 if_none_match: Optional[str] = None, head: bool = False):
+        self.path = path
+        self.head = head
+        self.offset, self.length = 0, rec["n"]
+        etag = f'"{rec["s"]}"'
+        self.status_code = 200
+        self.body = b""
+        self.background = None
+        headers = {
+            "Accept-Ranges": "bytes",
+            "ETag": etag,
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "Access-Control-Allow-Origin": "*",
+            "X-Content-Type-Options": "nosniff",
+            "Content-Security-Policy": "sandbox",
+        }
+        if if_none_match and etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+            self.status_code, self.length = 304, 0
+        else:
+            try:
+                span = parse_range(range_header, rec["n"])
+            except ValueError:
+                span = None
+                self.status_code, self.length = 416, 0
+                headers["Content-Range"] = f"bytes */{rec['n']}"
+            if span is not None:
+                start, end = span
+                self.status_code = 206
+                self.offset, self.length = start, end - start + 1
+                headers["Content-Range"] = f"bytes {start}-{end}/{rec['n']}"
+        headers["Content-Length"] = str(self.length)
+        self.media_type = safe_media_type(rec.get("t"))
+        self.init_headers(headers)
+        if self.status_code == 304:
+            del self.headers["content-length"]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.head or self.status_code not in (200, 206) or self.length == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        extensions = scope.get("extensions") or {}
+        if self.status_code == 200 and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+        async with await anyio.open_file(self.path, "rb") as f:
+            if "http.response.zerocopysend" in extensions:
+                await send({"type": "http.response.zerocopysend", "file": f.wrapped.fileno(),
+                            "offset": self.offset, "count": self.length})
+                return
+            await f.seek(self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await f.read(min(_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+
+
+blob_store = BlobStore()
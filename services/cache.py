@@ -0,0 +1,303 @@
+"""
+services/cache.py
+─────────────────
+Caches mémoire nommés, bornés et instrumentés.
+
+Chaque module déclarait le sien (TTLCache de AppState, dicts sans borne
+comme hex_to_email_cache ou nostr_profile_cache, tuples (valeur, date)
+vérifiés à la main…), sans moyen de savoir lesquels servent vraiment ni de
+les réduire sur une petite station. Ici :
+
+  - named_cache(nom, maxsize, ttl) crée (ou retrouve) un Cache enregistré ;
+    register(cache) enregistre un Cache construit à part (attribut
+    d'instance) ; settings.CACHE_SIZES / settings.CACHE_TTLS ({"nom":
+    valeur}, JSON dans .env) surchargent les bornes déclarées dans le code ;
+  - Cache s'utilise comme un dict (get, [], in, pop, clear, len, itération),
+    LRU borné en nombre d'entrées (ou en octets avec `getsizeof`), avec
+    expiration si `ttl` ; toutes les opérations passent par un verrou, les
+    caches lus depuis des threads (asyncio.to_thread) restent cohérents ;
+  - await cache.get_or_load(clé, loader) : un seul chargement par clé
+    absente, les appels simultanés attendent le même résultat ; avec
+    `miss_ttl`, un loader qui retourne None est retenu comme absent pendant
+    miss_ttl secondes ;
+  - persist=True : contenu (valeurs JSON, clés str) relu au démarrage depuis
+    settings.CACHE_DIR/<nom>.json par load_all() et écrit par save_all() à
+    l'arrêt ; les entrées gardent leur âge d'origine ;
+  - compteurs hits / misses / évictions / expirations / chargements par
+    cache : cache_metrics(), exposé par GET /health.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, Optional
+
+from cachetools import LRUCache, TLRUCache, TTLCache
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class _LRU(LRUCache):
+    def __init__(self, owner: "Cache", maxsize, getsizeof=None):
+        super().__init__(maxsize, getsizeof)
+        self._owner = owner
+
+    def popitem(self):
+        item = super().popitem()
+        self._owner._evictions += 1
+        return item
+
+
+class _TLRU(TLRUCache):
+    """LRU à échéance par entrée (horloge murale, pour la persistance)."""
+
+    def __init__(self, owner: "Cache", maxsize, getsizeof=None):
+        super().__init__(maxsize, owner._ttu, timer=time.time, getsizeof=getsizeof)
+        self._owner = owner
+
+    def popitem(self):
+        item = super().popitem()
+        self._owner._evictions += 1
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self._owner._expirations += len(expired)
+        return expired
+
+
+class Cache:
+    def __init__(self, name: str, maxsize: float, ttl: Optional[float] = None,
+                 getsizeof: Optional[Callable[[Any], int]] = None,
+                 miss_ttl: Optional[float] = None, persist: bool = False):
+        maxsize = settings.CACHE_SIZES.get(name, maxsize)
+        ttl = settings.CACHE_TTLS.get(name, ttl)
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.persist = persist
+        self._lock = threading.RLock()
+        self._born: Optional[float] = None   # date d'origine d'une entrée relue du disque
+        self._stamps: Dict[Hashable, float] = {}  # persist : clé → date d'origine
+        self._data = _TLRU(self, maxsize, getsizeof) if ttl else _LRU(self, maxsize, getsizeof)
+        self._misses_ttl: Optional[TTLCache] = TTLCache(maxsize=1024, ttl=miss_ttl) if miss_ttl else None
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._hits = self._misses = self._evictions = self._expirations = 0
+        self._loads = self._load_errors = 0
+
+    def _ttu(self, key, value, now: float) -> float:
+        born = self._born if self._born is not None else now
+        if self.persist:
+            if len(self._stamps) > 2 * len(self._data) + 1024:
+                self._stamps = {k: self._stamps[k] for k in self._data if k in self._stamps}
+            self._stamps[key] = born
+        return born + self.ttl
+
+    # ── Mapping ─────────────────────────────────────────────────────────────
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self._misses += 1
+                return default
+            self._hits += 1
+            return value
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            if self._misses_ttl is not None:
+                self._misses_ttl.pop(key, None)
+
+    def __delitem__(self, key: Hashable) -> None:
+        with self._lock:
+            del self._data[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        with self._lock:
+            return iter(list(self._data))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            if self._misses_ttl is not None:
+                self._misses_ttl.clear()
+
+    @property
+    def currsize(self) -> float:
+        return self._data.currsize
+
+    # ── Chargement single-flight ────────────────────────────────────────────
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          default: Any = None) -> Any:
+        """Valeur de `key`, chargée par `loader()` si absente. Les appels
+        simultanés pour une même clé partagent un seul chargement ; si
+        l'appelant qui le porte est annulé, un appelant en attente le reprend.
+        Un résultat None n'est pas mis en cache (retenu comme absent si
+        miss_ttl)."""
+        while True:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            if self._misses_ttl is not None and key in self._misses_ttl:
+                return default
+            fut = self._inflight.get(key)
+            if fut is None:
+                break
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                # Annulation de cet appelant, ou seulement du chargement partagé ?
+                if not fut.cancelled() or asyncio.current_task().cancelling():
+                    raise
+        fut = asyncio.get_running_loop().create_future()
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = fut
+        self._loads += 1
+        try:
+            value = await loader()
+            if value is None:
+                if self._misses_ttl is not None:
+                    self._misses_ttl[key] = True
+                value = default
+            else:
+                self[key] = value
+            fut.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            self._load_errors += 1
+            fut.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    # ── Persistance ─────────────────────────────────────────────────────────
+
+    def _path(self):
+        return settings.CACHE_DIR / f"{self.name}.json"
+
+    def load(self) -> int:
+        """Relit settings.CACHE_DIR/<nom>.json ; retourne le nombre d'entrées."""
+        try:
+            with open(self._path(), encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cache {self.name} : lecture de {self._path()} impossible ({e})")
+            return 0
+        now, count = time.time(), 0
+        with self._lock:
+            for key, (value, born) in saved.items():
+                if self.ttl and born + self.ttl <= now:
+                    continue
+                self._born = born
+                try:
+                    self._data[key] = value
+                    count += 1
+                finally:
+                    self._born = None
+        return count
+
+    def save(self) -> None:
+        with self._lock:
+            now = time.time()
+            if self.ttl:
+                self._data.expire()
+            items = {k: [v, self._stamps.get(k, now)] for k, v in self._data.items()}
+        items = {k: v for k, v in items.items() if isinstance(k, str)}
+        path = self._path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.part")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(items, f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+
+    # ── Métriques ───────────────────────────────────────────────────────────
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "size": len(self), "maxsize": None if self.maxsize == float("inf") else self.maxsize,
+            "ttl": self.ttl,
+            "hits": self._hits, "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+            "evictions": self._evictions, "expirations": self._expirations,
+            "loads": self._loads, "load_errors": self._load_errors,
+        }
+
+
+_registry: Dict[str, Cache] = {}
+_loaded = False   # load_all() passé : les caches persistants créés ensuite se relisent seuls
+
+
+def named_cache(name: str, maxsize: float, ttl: Optional[float] = None, *,
+                getsizeof: Optional[Callable[[Any], int]] = None,
+                miss_ttl: Optional[float] = None, persist: bool = False) -> Cache:
+    """Cache `name` du registre, créé au premier appel avec ces bornes (ou
+    celles de settings.CACHE_SIZES / CACHE_TTLS pour ce nom)."""
+    cache = _registry.get(name)
+    if cache is None:
+        cache = register(Cache(name, maxsize, ttl, getsizeof=getsizeof, miss_ttl=miss_ttl, persist=persist))
+    return cache
+
+
+def register(cache: Cache) -> Cache:
+    """Ajoute au registre un Cache créé ailleurs (ex. attribut d'instance)."""
+    _registry[cache.name] = cache
+    if cache.persist and _loaded:
+        cache.load()
+    return cache
+
+
+def cache_metrics() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.metrics() for name, cache in sorted(_registry.items())}
+
+
+def load_all() -> None:
+    global _loaded
+    _loaded = True
+    for cache in _registry.values():
+        if cache.persist:
+            count = cache.load()
+            if count:
+                logger.info(f"Cache {cache.name} : {count} entrées relues")
+
+
+def save_all() -> None:
+    for cache in _registry.values():
+        if cache.persist:
+            try:
+                cache.save()
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning(f"Cache {cache.name} non sauvegardé : {e}")
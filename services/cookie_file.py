@@ -0,0 +1,100 @@
+"""
+services/cookie_file.py
+───────────────────────
+Lecture d'un fichier cookies Netscape (export navigateur, yt-dlp…) en une passe.
+
+parse_cookie_file() parcourt les lignes une seule fois et produit :
+  - l'en-tête (commentaires et lignes vides, dans l'ordre),
+  - les lignes de cookies regroupées par domaine (sans point initial),
+  - les lignes host-only (flag FALSE) par domaine,
+  - le domaine commun le plus spécifique (LCA), calculé au fil de l'eau :
+      {notebooklm.google.com}              → "notebooklm.google.com"
+      {notebooklm.google.com, google.com}  → "google.com"
+
+CookieFile.files() donne ensuite les fichiers à stocker : le fichier complet
+pour le LCA, plus un fichier par sous-domaine host-only (sessions privées),
+remis en un lot à cookie_store.store_cookies_encrypted().
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+NETSCAPE_MARKERS = ("# Netscape HTTP Cookie File", "# HTTP Cookie File")
+
+
+class CookieFileError(ValueError):
+    """Fichier Netscape reconnu mais inutilisable (multi-domaines, sans domaine)."""
+
+
+@dataclass
+class CookieFile:
+    raw: bytes
+    header: List[str] = field(default_factory=list)
+    rows: Dict[str, List[str]] = field(default_factory=dict)
+    host_only: Dict[str, List[str]] = field(default_factory=dict)
+    domain: str = ""
+
+    def files(self) -> Dict[str, bytes]:
+        """{domaine: contenu} : fichier d'origine pour le LCA + splits host-only."""
+        out = {self.domain: self.raw}
+        head = "\n".join(self.header) + "\n"
+        for sub, lines in self.host_only.items():
+            if sub != self.domain:
+                out[sub] = (head + "\n".join(lines) + "\n").encode()
+        return out
+
+
+def parse_cookie_file(data: bytes) -> Optional[CookieFile]:
+    """CookieFile, ou None si `data` n'est pas un fichier cookies Netscape.
+    Lève CookieFileError si le fichier mélange plusieurs domaines de base."""
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+    parsed = CookieFile(raw=data)
+    marker = False
+    first_row: Optional[bool] = None  # la 1re ligne de données a-t-elle ≥ 7 champs ?
+    common: Optional[List[str]] = None  # labels inversés communs à tous les domaines
+    bases = set()
+
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            parsed.header.append(line)
+            if not marker and stripped.startswith(NETSCAPE_MARKERS):
+                marker = True
+            continue
+        parts = stripped.split("\t")
+        if first_row is None:
+            first_row = len(parts) >= 7
+        if len(parts) < 7:
+            continue
+        domain = parts[0].strip()
+        if domain.startswith("."):
+            domain = domain[1:]
+        rows = parsed.rows.get(domain)
+        if rows is None:
+            rows = parsed.rows[domain] = []
+            labels = domain.split(".")
+            bases.add(".".join(labels[-2:]))
+            labels.reverse()
+            if common is None:
+                common = labels
+            else:
+                n = 0
+                while n < min(len(common), len(labels)) and common[n] == labels[n]:
+                    n += 1
+                del common[n:]
+        rows.append(line)
+        if parts[1].strip().upper() == "FALSE":
+            parsed.host_only.setdefault(domain, []).append(line)
+
+    if not (marker or first_row):
+        return None
+    if not parsed.rows:
+        raise CookieFileError("Invalid cookie file: no domains detected")
+    if len(bases) > 1:
+        raise CookieFileError("Multi-domain cookie files are not supported.")
+    parsed.domain = ".".join(reversed(common)) if common else next(iter(parsed.rows))
+    return parsed
@@ -1,4 +1,10 @@
-"""Cookie encrypted storage — encrypt with natools.py seal + IPFS + NOSTR kind 31903 (Cookie Vault)."""
+"""Cookie encrypted storage — natools seal (in-process) + IPFS (Kubo API) + NOSTR kind 31903 (Cookie Vault).
+
+Lectures : cache mémoire des cookies récemment déchiffrés, re-chiffrés au
+repos (SecretBox, clé aléatoire propre au processus), TTL court et borne en
+octets. Écritures : le manifest kind 31903 est publié au plus une fois par
+utilisateur et par fenêtre COOKIE_MANIFEST_DEBOUNCE (rafales coalescées).
+"""
 
 import os
 import json
@@ -8,9 +14,13 @@ logger = logging.getLogger(__name__)
 import tempfile
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
+
 
 from core.config import settings, ASTRO_PYTHON
+from services import natools
+from services.cache import named_cache
+from services.ipfs import kubo_add_bytes, kubo_add_many, kubo_cat
 
 NATOOLS    = settings.ZEN_PATH / "Astroport.ONE" / "tools" / "natools.py"
 NOSTR_SEND = settings.ZEN_PATH / "Astroport.ONE" / "tools" / "nostr_send_note.py"
@@ -44,83 +54,120 @@ def save_manifest(user_dir: Path, manifest: dict):
     os.chmod(p, 0o600)
 
 
-async def encrypt_and_pin(content: bytes, pubkey: str) -> Optional[str]:
-    """Seal-encrypt cookie bytes with G1 pubkey, add to IPFS. Returns CID or None."""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        plain = Path(tmpdir) / "cookie.txt"
-        enc   = Path(tmpdir) / "cookie.enc"
-        plain.write_bytes(content)
+def _find_dunikey(user_dir: Path) -> Optional[Path]:
+    for name in (".secret.dunikey", "secret.dunikey"):
+        if (user_dir / name).exists():
+            return user_dir / name
+    return None
 
+
+async def _natools_cli(args: list, data: bytes) -> Optional[bytes]:
+    """Repli sans PyNaCl : natools.py en sous-processus (fichiers temporaires)."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "in"
+        dst = Path(tmpdir) / "out"
+        src.write_bytes(data)
         proc = await asyncio.create_subprocess_exec(
-            ASTRO_PYTHON, str(NATOOLS), "encrypt",
-            "-p", pubkey, "-i", str(plain), "-o", str(enc),
+            ASTRO_PYTHON, str(NATOOLS), *args, "-i", str(src), "-o", str(dst),
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
         )
         try:
             _, err = await asyncio.wait_for(proc.communicate(), timeout=15)
         except asyncio.TimeoutError:
-            logger.warning("natools encrypt timed out")
+            logger.warning(f"natools {args[0]} timed out")
             return None
-        if proc.returncode != 0 or not enc.exists():
-            logger.warning(f"natools encrypt failed: {err.decode()[:200]}")
+        if proc.returncode != 0 or not dst.exists():
+            logger.warning(f"natools {args[0]} failed: {err.decode()[:200]}")
             return None
+        return dst.read_bytes()
 
-        proc2 = await asyncio.create_subprocess_exec(
-            "ipfs", "add", "-q", str(enc),
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
+
+async def _seal(content: bytes, pubkey: str) -> Optional[bytes]:
+    if natools.NACL_AVAILABLE:
         try:
-            out, _ = await asyncio.wait_for(proc2.communicate(), timeout=30)
-        except asyncio.TimeoutError:
-            logger.warning("ipfs add timed out for cookie")
-            return None
-        if proc2.returncode != 0:
+            return natools.seal(content, pubkey)
+        except natools.NatoolsError as e:
+            logger.warning(f"natools encrypt failed: {e}")
             return None
-        return out.decode().strip() or None
+    return await _natools_cli(["encrypt", "-p", pubkey], content)
 
 
-async def decrypt_from_ipfs(cid: str, user_dir: Path) -> Optional[bytes]:
-    """Download encrypted cookie from IPFS and decrypt with .secret.dunikey."""
-    dunikey = user_dir / ".secret.dunikey"
-    if not dunikey.exists():
-        dunikey = user_dir / "secret.dunikey"
-    if not dunikey.exists():
+async def encrypt_and_pin(content: bytes, pubkey: str) -> Optional[str]:
+    """Seal-encrypt cookie bytes with G1 pubkey, add to IPFS. Returns CID or None.
+    Chiffrement en mémoire (services.natools) + `add` via l'API Kubo."""
+    sealed = await _seal(content, pubkey)
+    if sealed is None:
         return None
+    return await kubo_add_bytes(sealed, filename="cookie.enc")
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        enc   = Path(tmpdir) / "cookie.enc"
-        plain = Path(tmpdir) / "cookie.txt"
 
-        proc = await asyncio.create_subprocess_exec(
-            "ipfs", "get", "-o", str(enc), f"/ipfs/{cid}",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        try:
-            await asyncio.wait_for(proc.communicate(), timeout=30)
-        except asyncio.TimeoutError:
-            logger.warning(f"ipfs get timed out for CID {cid[:20]}")
-            return None
-        if not enc.exists():
-            return None
+async def encrypt_and_pin_many(contents: Dict[str, bytes], pubkey: str) -> Dict[str, str]:
+    """encrypt_and_pin pour plusieurs domaines : un seul `add` Kubo pour le lot.
+    Retourne {domaine: CID} pour les domaines chiffrés et épinglés."""
+    sealed = {}
+    for domain, content in contents.items():
+        blob = await _seal(content, pubkey)
+        if blob is not None:
+            sealed[domain] = blob
+    cids = await kubo_add_many({f"{domain}.enc": blob for domain, blob in sealed.items()})
+    return {domain: cids[f"{domain}.enc"] for domain in sealed if f"{domain}.enc" in cids}
 
-        proc2 = await asyncio.create_subprocess_exec(
-            ASTRO_PYTHON, str(NATOOLS), "decrypt",
-            "-f", "pubsec", "-k", str(dunikey),
-            "-i", str(enc), "-o", str(plain),
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
+
+async def decrypt_from_ipfs(cid: str, user_dir: Path) -> Optional[bytes]:
+    """Download encrypted cookie from IPFS and decrypt with .secret.dunikey.
+    Un aller-retour HTTP Kubo (`cat`) + déchiffrement en mémoire."""
+    dunikey = _find_dunikey(user_dir)
+    if dunikey is None:
+        return None
+    sealed = await kubo_cat(cid)
+    if not sealed:
+        return None
+    if natools.NACL_AVAILABLE:
         try:
-            _, err = await asyncio.wait_for(proc2.communicate(), timeout=15)
-        except asyncio.TimeoutError:
-            return None
-        if proc2.returncode != 0:
-            logger.warning(f"natools decrypt failed: {err.decode()[:200]}")
+            return natools.unseal(sealed, dunikey)
+        except (natools.NatoolsError, OSError) as e:
+            logger.warning(f"natools decrypt failed: {e}")
             return None
-        return plain.read_bytes() if plain.exists() else None
+    return await _natools_cli(["decrypt", "-f", "pubsec", "-k", str(dunikey)], sealed)
+
+
+# ── Cache des cookies déchiffrés (chiffrés au repos en mémoire) ─────────────
+
+_plain_cache = named_cache(
+    "cookies", maxsize=settings.COOKIE_CACHE_MAX_BYTES, ttl=settings.COOKIE_CACHE_TTL, getsizeof=len,
+)
+_cache_box = None
+
+
+def _box():
+    global _cache_box
+    if _cache_box is None and natools.NACL_AVAILABLE:
+        from nacl.secret import SecretBox
+        from nacl.utils import random as nacl_random
+        _cache_box = SecretBox(nacl_random(SecretBox.KEY_SIZE))
+    return _cache_box
+
+
+async def get_cookie_content(cid: str, user_dir: Path) -> Optional[bytes]:
+    """decrypt_from_ipfs avec cache lecture (clé = utilisateur + CID, donc
+    invalidé de fait par toute mise à jour qui change le CID)."""
+    box = _box()
+    key = f"{user_dir.name}:{cid}"
+    if box is not None:
+        sealed = _plain_cache.get(key)
+        if sealed is not None:
+            return box.decrypt(sealed)
+    content = await decrypt_from_ipfs(cid, user_dir)
+    if content and box is not None:
+        sealed = bytes(box.encrypt(content))
+        if len(sealed) <= _plain_cache.maxsize:
+            _plain_cache[key] = sealed
+    return content
+
+
+def forget_cookie(cid: str, user_dir: Path) -> None:
+    _plain_cache.pop(f"{user_dir.name}:{cid}", None)
 
 
 async def publish_manifest_to_nostr(user_dir: Path, manifest: dict):
@@ -158,33 +205,76 @@ async def publish_manifest_to_nostr(user_dir: Path, manifest: dict):
         logger.warning(f"NOSTR kind 31903 cookie manifest publish failed: {e}")
 
 
-async def store_cookie_encrypted(user_dir: Path, domain: str, content: bytes, private: bool = False) -> Optional[str]:
-    """Full pipeline: encrypt → IPFS pin → manifest update → NOSTR kind 31903 (d=cookies).
+# ── Publication différée du manifest ────────────────────────────────────────
+
+_publish_tasks: Dict[str, asyncio.Task] = {}
 
-    Returns CID on success, None if encryption/IPFS unavailable (non-fatal).
-    Disk file (plain Netscape) is written by the caller before this function.
+
+def schedule_manifest_publish(user_dir: Path) -> None:
+    """Programme la publication kind 31903 de ce manifest dans
+    COOKIE_MANIFEST_DEBOUNCE secondes. Les appels suivants dans la fenêtre sont
+    absorbés : le manifest publié est celui sur disque au moment de l'envoi."""
+    key = str(user_dir)
+    task = _publish_tasks.get(key)
+    if task is not None and not task.done():
+        return
+
+    async def _publish_later():
+        try:
+            await asyncio.sleep(settings.COOKIE_MANIFEST_DEBOUNCE)
+        finally:
+            _publish_tasks.pop(key, None)
+        await publish_manifest_to_nostr(user_dir, load_manifest(user_dir))
+
+    _publish_tasks[key] = asyncio.create_task(_publish_later())
+
+
+async def flush_manifest_publishes() -> None:
+    """Arrêt : publie immédiatement les manifests encore en attente."""
+    pending = list(_publish_tasks.items())
+    for _, task in pending:
+        task.cancel()
+    for key, _ in pending:
+        await publish_manifest_to_nostr(Path(key), load_manifest(Path(key)))
+
+
+async def store_cookies_encrypted(user_dir: Path, contents: Dict[str, bytes]) -> Dict[str, str]:
+    """Full pipeline pour un lot de domaines : encrypt → un seul `add` IPFS →
+    une mise à jour du manifest → une publication NOSTR kind 31903 (d=cookies).
+
+    Returns {domain: CID} for the stored domains ({} if encryption/IPFS
+    unavailable — non-fatal). Disk files (plain Netscape) are written by the
+    caller before this function.
     """
     pubkey = get_user_pubkey(user_dir)
     if not pubkey:
         logger.info(f"No G1 pubkey for {user_dir.name} — cookie stored on disk only")
-        return None
+        return {}
 
-    cid = await encrypt_and_pin(content, pubkey)
-    if not cid:
+    cids = await encrypt_and_pin_many(contents, pubkey)
+    for domain in contents.keys() - cids.keys():
         logger.warning(f"encrypt_and_pin failed for {domain} — disk-only fallback")
-        return None
+    if not cids:
+        return {}
 
     manifest = load_manifest(user_dir)
-    manifest[domain] = {
-        "cid": cid,
-        "uploaded_at": datetime.now(timezone.utc).isoformat(),
-        "size": len(content),
-        "domain": domain,
-    }
+    uploaded_at = datetime.now(timezone.utc).isoformat()
+    for domain, cid in cids.items():
+        manifest[domain] = {
+            "cid": cid,
+            "uploaded_at": uploaded_at,
+            "size": len(contents[domain]),
+            "domain": domain,
+        }
+        logger.info(f"Cookie {domain} encrypted → IPFS {cid[:20]}…")
     save_manifest(user_dir, manifest)
-    logger.info(f"Cookie {domain} encrypted → IPFS {cid[:20]}… manifest updated")
 
-    # NOSTR publish est fire-and-forget — publie le manifest entier (kind 31903 d=cookies)
-    asyncio.create_task(publish_manifest_to_nostr(user_dir, manifest))
+    # NOSTR publish différé et coalescé — publie le manifest entier (kind 31903 d=cookies)
+    schedule_manifest_publish(user_dir)
 
-    return cid
+    return cids
+
+
+async def store_cookie_encrypted(user_dir: Path, domain: str, content: bytes, private: bool = False) -> Optional[str]:
+    """store_cookies_encrypted pour un seul domaine. Returns CID or None."""
+    return (await store_cookies_encrypted(user_dir, {domain: content})).get(domain)
@@ -0,0 +1,254 @@
+"""
+services/g1_balance.py
+──────────────────────
+Service de balance Ğ1 unifié : coalescence des requêtes + cache TTL partagé.
+
+Toutes les lectures de solde (/check_balance par g1pub ou par email,
+/check_balances, utils.helpers.check_balance) passent par une seule instance
+`balance_service` :
+
+  - Coalescence : les g1pub demandées dans une courte fenêtre (BATCH_WINDOW,
+    20 ms par défaut) sont regroupées en UN SEUL appel get_g1_balances_batch()
+    (une requête Squid GraphQL `accounts(filter:{id:{in:…}})`). Une g1pub déjà
+    en vol n'est jamais demandée deux fois : les appelants partagent le même
+    Future.
+  - Cache : un seul Cache "g1_balances" {g1pub → entrée} commun aux trois routes
+    (exposé aussi via app_state.balance_cache pour compatibilité).
+  - Refresh-ahead : une entrée consultée au moins HOT_HITS fois et proche de
+    son expiration (< REFRESH_AHEAD s) est rafraîchie en tâche de fond avant
+    d'expirer — les portefeuilles « chauds » ne subissent jamais de cache miss.
+
+Les lectures « exactes » (route simple / email, utils.helpers.check_balance)
+conservent la chaîne de fallback historique de get_g1_balance_native()
+(linkedAccount, RPC, gcli, G1check.sh) pour les comptes absents du batch
+(solde 0). Les lectures multi (/check_balances) s'en tiennent au batch, comme
+avant. Chaque entrée retient si elle est exacte : un solde 0 issu du seul
+batch ne répond jamais à une lecture exacte, et le refresh-ahead garde le
+mode de l'entrée rafraîchie.
+
+Les montants sont en centimes : {"pending": 0, "blockchain": <c>, "total": <c>}.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+from services.cache import Cache, register
+from services.g1_squid import get_g1_balances_batch, get_g1_balance_native
+
+logger = logging.getLogger(__name__)
+
+BALANCE_TTL = 30          # secondes (identique à l'ancien app_state.balance_cache)
+BATCH_WINDOW = 0.02       # fenêtre de coalescence (s)
+MAX_BATCH = 100           # nombre max de g1pub par requête Squid
+REFRESH_AHEAD = 5         # rafraîchir si l'entrée expire dans moins de N s…
+HOT_HITS = 3              # …et a été servie au moins N fois
+FALLBACK_CONCURRENCY = 4  # fallbacks get_g1_balance_native simultanés max
+
+_EMPTY = {"pending": 0, "blockchain": 0, "total": 0}
+
+
+def format_balance(centimes: int) -> str:
+    """Centimes → chaîne "2.48 Ğ1" (format historique de check_balance)."""
+    return f"{centimes / 100:.2f} Ğ1"
+
+
+def zen_from_centimes(centimes: int) -> float:
+    """(solde_Ğ1 - 1_PAF) × 10, min 0 — arrondi à 2 décimales."""
+    return round(max(0.0, (centimes / 100 - 1.0) * 10.0), 2)
+
+
+class G1BalanceService:
+    """Agrégateur de balances Ğ1 avec coalescence et cache TTL partagé."""
+
+    def __init__(self, ttl: int = BALANCE_TTL, window: float = BATCH_WINDOW,
+                 max_batch: int = MAX_BATCH, maxsize: int = 2000):
+        self.ttl = ttl
+        self.window = window
+        self.max_batch = max_batch
+        # g1pub → {"balances": {...}, "fetched_at": float, "hits": int, "exact": bool}
+        self.cache = Cache("g1_balances", maxsize=maxsize, ttl=ttl)
+        # email → (G1PUBNOSTR, ZenCard .g1pub) — fichiers quasi immuables
+        self.email_cache = Cache("g1_email_pubkeys", maxsize=maxsize, ttl=600)
+        # g1pub → Future partagé par tous les appelants en attente
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # g1pub → True si au moins un appelant exige la chaîne de fallback
+        self._pending: Dict[str, bool] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._fallback_sem: Optional[asyncio.Semaphore] = None
+        self.stats = {"hits": 0, "misses": 0, "batches": 0, "coalesced": 0, "refreshes": 0}
+
+    # ── API publique ─────────────────────────────────────────────────────────
+
+    async def get(self, g1pub: str, exact: bool = True) -> dict:
+        """Balance d'une g1pub (centimes). Servie depuis le cache si fraîche."""
+        result = await self.get_many([g1pub], exact=exact)
+        return result.get(g1pub, dict(_EMPTY))
+
+    async def get_many(self, g1pubs: Iterable[str], exact: bool = False,
+                       _retry: bool = True) -> Dict[str, dict]:
+        """Balances de plusieurs g1pub. Les absentes du cache rejoignent le
+        prochain batch ; les appels concurrents partagent la même requête."""
+        loop = asyncio.get_running_loop()
+        result: Dict[str, dict] = {}
+        waiting: List[Tuple[str, asyncio.Future]] = []
+
+        for g1pub in dict.fromkeys(g1pubs):
+            entry = self.cache.get(g1pub)
+            if _serves(entry, exact):
+                self.stats["hits"] += 1
+                entry["hits"] += 1
+                result[g1pub] = dict(entry["balances"])
+                self._maybe_refresh_ahead(g1pub, entry)
+                continue
+
+            self.stats["misses"] += 1
+            fut = self._inflight.get(g1pub)
+            if fut is None:
+                fut = loop.create_future()
+                self._inflight[g1pub] = fut
+                self._enqueue(g1pub, exact)
+            else:
+                self.stats["coalesced"] += 1
+                if exact and g1pub in self._pending:
+                    self._pending[g1pub] = True
+            waiting.append((g1pub, fut))
+
+        if waiting:
+            done = await asyncio.gather(*(asyncio.shield(f) for _, f in waiting), return_exceptions=True)
+            for (g1pub, _), balances in zip(waiting, done):
+                result[g1pub] = dict(_EMPTY) if isinstance(balances, BaseException) else dict(balances)
+            if exact and _retry:
+                # Futur partagé avec un batch non exact déjà parti : une seule relance
+                again = [g1pub for g1pub, _ in waiting if not _serves(self.cache.get(g1pub), True)]
+                if again:
+                    result.update(await self.get_many(again, exact=True, _retry=False))
+        return result
+
+    def invalidate(self, g1pub: str) -> None:
+        """Retire une g1pub du cache (ex. après un virement émis par l'API)."""
+        self.cache.pop(g1pub, None)
+
+    async def resolve_email(self, email: str) -> Tuple[Optional[str], Optional[str]]:
+        """(G1PUBNOSTR, ZenCard .g1pub) d'un email local — lu une seule fois
+        dans un thread (les deux fichiers ensemble), puis mis en cache."""
+        if email in self.email_cache:
+            return self.email_cache[email]
+        pair = await asyncio.to_thread(_read_email_g1pubs, email)
+        if pair[0] or pair[1]:
+            self.email_cache[email] = pair
+        return pair
+
+    # ── Mécanique de batch ───────────────────────────────────────────────────
+
+    def _enqueue(self, g1pub: str, exact: bool) -> None:
+        self._pending[g1pub] = self._pending.get(g1pub, False) or exact
+        if len(self._pending) >= self.max_batch:
+            self._schedule_flush(0)
+        elif self._flush_handle is None:
+            self._schedule_flush(self.window)
+
+    def _schedule_flush(self, delay: float) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._flush_handle = loop.call_later(delay, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._flush_handle = None
+        if not self._pending:
+            return
+        batch = dict(list(self._pending.items())[: self.max_batch])
+        for g1pub in batch:
+            del self._pending[g1pub]
+        if self._pending:
+            self._schedule_flush(self.window)
+        asyncio.ensure_future(self._flush(batch))
+
+    async def _flush(self, batch: Dict[str, bool]) -> None:
+        self.stats["batches"] += 1
+        g1pubs = list(batch)
+        try:
+            raw = await get_g1_balances_batch(g1pubs)
+        except Exception as exc:
+            logger.warning("G1balance batch échec (%d g1pubs) : %s", len(g1pubs), exc)
+            raw = {}
+
+        # Comptes absents / à 0 pour une lecture exacte → chaîne de fallback native
+        fallback = [p for p in g1pubs if batch[p] and not (raw.get(p) or {}).get("total")]
+        failed = set()
+        if fallback:
+            results = await asyncio.gather(*(self._native(p) for p in fallback), return_exceptions=True)
+            for g1pub, res in zip(fallback, results):
+                if isinstance(res, BaseException):
+                    failed.add(g1pub)
+                else:
+                    raw[g1pub] = res.get("balances", dict(_EMPTY))
+
+        now = time.time()
+        for g1pub in g1pubs:
+            balances = raw.get(g1pub)
+            fut = self._inflight.pop(g1pub, None)
+            if balances is not None:
+                previous = self.cache.get(g1pub)
+                self.cache[g1pub] = {
+                    "balances": dict(balances),
+                    "fetched_at": now,
+                    "hits": previous["hits"] if previous else 0,
+                    "refreshing": False,
+                    "exact": batch[g1pub] and g1pub not in failed,
+                }
+            if fut is not None and not fut.done():
+                fut.set_result(balances if balances is not None else dict(_EMPTY))
+        logger.debug("G1balance batch : %d g1pubs (%d fallback)", len(g1pubs), len(fallback))
+
+    async def _native(self, g1pub: str) -> dict:
+        if self._fallback_sem is None:
+            self._fallback_sem = asyncio.Semaphore(FALLBACK_CONCURRENCY)
+        async with self._fallback_sem:
+            return await get_g1_balance_native(g1pub)
+
+    def _maybe_refresh_ahead(self, g1pub: str, entry: dict) -> None:
+        if entry.get("refreshing") or entry["hits"] < HOT_HITS:
+            return
+        if time.time() - entry["fetched_at"] < self.ttl - REFRESH_AHEAD:
+            return
+        if g1pub in self._inflight:
+            return
+        entry["refreshing"] = True
+        self.stats["refreshes"] += 1
+        self._inflight[g1pub] = asyncio.get_running_loop().create_future()
+        self._enqueue(g1pub, entry.get("exact", False))
+
+
+def _serves(entry: Optional[dict], exact: bool) -> bool:
+    """L'entrée en cache répond-elle à une lecture (exacte ou non) ? Un solde
+    non nul du batch vaut pour les deux ; un 0 non exact, seulement en multi."""
+    if entry is None:
+        return False
+    return not exact or entry.get("exact", False) or bool(entry["balances"].get("total"))
+
+
+def _read_email_g1pubs(email: str) -> Tuple[Optional[str], Optional[str]]:
+    from utils.security import get_safe_user_path
+
+    def _read(path) -> Optional[str]:
+        try:
+            with open(path, "r") as f:
+                return f.read().strip() or None
+        except Exception:
+            return None
+
+    nostr_path = get_safe_user_path("nostr", email, "G1PUBNOSTR")
+    zencard_path = get_safe_user_path("players", email, ".g1pub")
+    return (
+        _read(nostr_path) if nostr_path else None,
+        _read(zencard_path) if zencard_path else None,
+    )
+
+
+balance_service = G1BalanceService()
+register(balance_service.cache)
+register(balance_service.email_cache)
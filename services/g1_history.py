@@ -0,0 +1,323 @@
+"""
+services/g1_history.py
+──────────────────────
+Historique Ğ1 incrémental : store local par portefeuille + synchronisation
+par curseur (numéro de bloc) depuis le Squid Duniter v2.
+
+Remplace le re-téléchargement complet de get_g1_history_native() à chaque
+appel de /check_g1history :
+
+  - Store append-only par portefeuille (clé = id du transfert Squid) :
+      ~/.zen/tmp/g1history/<ss58>.jsonl     une ligne JSON par transfert
+      ~/.zen/tmp/g1history/<ss58>.meta.json curseur, horizon, dernière sync
+  - Sync incrémentale : seuls les transferts au-delà du curseur
+    (`blockNumber > cursor`) sont demandés au Squid.
+  - Portefeuille inactif : aucune requête Squid tant que le solde
+    (services.g1_balance) n'a pas bougé depuis la dernière sync. Sans entrée
+    en cache, le solde est relu (RPC, bien plus léger) passé SYNC_INTERVAL ;
+    il est aussi relu après chaque sync pour servir de référence.
+  - Backfill paresseux : une page plus ancienne que le store déclenche le
+    téléchargement des transferts antérieurs à l'horizon du store.
+  - Vues servies depuis le store : pagination, totaux mensuels, contreparties.
+
+Les enregistrements gardent le format de _parse_history() (compatible
+G1history.sh) + le champ "id".
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from services.cache import named_cache
+from services.g1_squid import _parse_history, g1pub_to_ss58, get_squid_urls
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = Path.home() / ".zen" / "tmp" / "g1history"
+SYNC_INTERVAL = 60       # s — pas de requête Squid en deçà (portefeuille inactif)
+SYNC_PAGE = 200          # transferts par direction et par requête
+MAX_SYNC_PAGES = 10      # garde-fou pagination d'une sync
+INITIAL_FETCH = 100      # transferts par direction lors de la première sync
+
+_INT_MAX = 2 ** 31 - 1
+
+# {order} : BLOCK_NUMBER_ASC pour la sync incrémentale (le curseur avance sans
+# trou même si la pagination est interrompue), BLOCK_NUMBER_DESC pour le backfill.
+_HISTORY_RANGE_QUERY = """
+query($a: String!, $n: Int!, $after: Int!, $before: Int!) {{
+  received: transfers(condition: {{toId: $a}},
+                      filter: {{blockNumber: {{greaterThan: $after, lessThan: $before}}}},
+                      orderBy: {order}, first: $n) {{
+    nodes {{ id fromId toId amount timestamp blockNumber comment {{ remark }} }}
+  }}
+  sent: transfers(condition: {{fromId: $a}},
+                  filter: {{blockNumber: {{greaterThan: $after, lessThan: $before}}}},
+                  orderBy: {order}, first: $n) {{
+    nodes {{ id fromId toId amount timestamp blockNumber comment {{ remark }} }}
+  }}
+}}
+"""
+
+
+def _record_key(rec: dict) -> str:
+    """Clé d'unicité d'un transfert (id Squid, ou empreinte si absent)."""
+    return rec.get("id") or "{}-{}-{}-{}".format(
+        rec.get("blockNumber"), rec.get("direction"),
+        rec.get("Issuers/Recipients"), rec.get("Amounts Ğ1"),
+    )
+
+
+class WalletHistory:
+    """Store local d'un portefeuille (en mémoire + fichiers JSONL/meta)."""
+
+    def __init__(self, ss58: str):
+        self.ss58 = ss58
+        self.path = HISTORY_DIR / f"{ss58}.jsonl"
+        self.meta_path = HISTORY_DIR / f"{ss58}.meta.json"
+        self.records: List[dict] = []
+        self.keys = set()
+        # cursor  : tous les transferts de bloc > cursor restent à télécharger
+        # horizon : tous les transferts de bloc >= horizon sont dans le store
+        self.meta = {"cursor": -1, "horizon": None, "complete": False, "last_sync": 0, "balance": None}
+        self.lock = asyncio.Lock()
+        self.loaded = False
+
+    async def load(self) -> None:
+        """Relit le store disque (une fois, hors boucle asyncio). Sous self.lock."""
+        if not self.loaded:
+            await asyncio.to_thread(self._load)
+            self.loaded = True
+
+    def _load(self) -> None:
+        try:
+            if self.meta_path.exists():
+                self.meta.update(json.loads(self.meta_path.read_text()))
+            if self.path.exists():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            rec = json.loads(line)
+                        except ValueError:
+                            continue
+                        key = _record_key(rec)
+                        if key not in self.keys:
+                            self.keys.add(key)
+                            self.records.append(rec)
+            self.records.sort(key=lambda r: r.get("blockNumber", 0), reverse=True)
+        except Exception as exc:
+            logger.warning("G1history store illisible pour %s… : %s", self.ss58[:12], exc)
+
+    async def append(self, new_records: List[dict]) -> int:
+        """Ajoute les transferts inconnus (append-only). Retourne le nombre ajouté."""
+        fresh = []
+        for rec in new_records:
+            key = _record_key(rec)
+            if key not in self.keys:
+                self.keys.add(key)
+                fresh.append(rec)
+        if not fresh:
+            return 0
+        self.records.extend(fresh)
+        self.records.sort(key=lambda r: r.get("blockNumber", 0), reverse=True)
+        await asyncio.to_thread(self._write, fresh)
+        return len(fresh)
+
+    def _write(self, fresh: List[dict]) -> None:
+        try:
+            HISTORY_DIR.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                for rec in fresh:
+                    f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+        except Exception as exc:
+            logger.warning("G1history écriture store échouée pour %s… : %s", self.ss58[:12], exc)
+
+    async def save_meta(self) -> None:
+        await asyncio.to_thread(self._save_meta, dict(self.meta))
+
+    def _save_meta(self, meta: dict) -> None:
+        try:
+            HISTORY_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = self.meta_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(meta))
+            os.replace(tmp, self.meta_path)
+        except Exception as exc:
+            logger.debug("G1history meta non sauvegardée pour %s… : %s", self.ss58[:12], exc)
+
+
+# ss58 → WalletHistory (borne mémoire ; le store disque reste la source de vérité)
+_stores = named_cache("g1_history_stores", maxsize=256, ttl=3600)
+
+
+def _get_store(ss58: str) -> WalletHistory:
+    store = _stores.get(ss58)
+    if store is None:
+        store = WalletHistory(ss58)
+        _stores[ss58] = store
+    return store
+
+
+async def _fetch_range(ss58: str, after: int, before: int, n: int, ascending: bool) -> Optional[dict]:
+    """Une requête Squid sur ]after, before[ — réponse brute, ou None."""
+    order = "BLOCK_NUMBER_ASC" if ascending else "BLOCK_NUMBER_DESC"
+    payload = {
+        "query": _HISTORY_RANGE_QUERY.format(order=order),
+        "variables": {"a": ss58, "n": n, "after": after, "before": before},
+    }
+    async with httpx.AsyncClient(timeout=15.0) as client:
+        for url in get_squid_urls():
+            try:
+                resp = await client.post(url, json=payload)
+                if resp.status_code != 200:
+                    continue
+                data = resp.json()
+                if (data.get("data") or {}).get("received") is not None:
+                    return data
+                logger.debug("Réponse Squid incomplète depuis %s", url)
+            except Exception as exc:
+                logger.debug("G1history range échec sur %s : %s", url, exc)
+    return None
+
+
+async def _download(ss58: str, after: int, before: int, n: int, max_pages: int,
+                    ascending: bool = False) -> Optional[Tuple[List[dict], bool, int]]:
+    """Télécharge les transferts de ]after, before[, en pages de n par direction.
+    Retourne (transferts, tronqué, borne) — tronqué si max_pages a été atteint
+    (ou un Squid a décroché) alors qu'une direction renvoyait encore des pages
+    pleines ; borne = `after` (ascendant) ou `before` (descendant) à utiliser
+    pour reprendre sans trou. None si aucun Squid n'a répondu."""
+    collected: List[dict] = []
+    for _ in range(max_pages):
+        raw = await _fetch_range(ss58, after, before, n, ascending)
+        if raw is None:
+            return (collected, True, after if ascending else before) if collected else None
+        data = raw.get("data", {})
+        received = (data.get("received") or {}).get("nodes") or []
+        sent = (data.get("sent") or {}).get("nodes") or []
+        collected.extend(_parse_history(raw, ss58)["history"])
+        full = [nodes for nodes in (received, sent) if len(nodes) >= n]
+        if not full:
+            return collected, False, after if ascending else before
+        # Page suivante à partir du bloc limite d'une direction tronquée
+        # (bloc inclus : les doublons sont éliminés par clé).
+        if ascending:
+            after = min(nodes[-1].get("blockNumber", 0) for nodes in full) - 1
+        else:
+            before = max(nodes[-1].get("blockNumber", 0) for nodes in full) + 1
+    return collected, True, after if ascending else before
+
+
+async def _current_balance(g1pub: str, fetch: bool) -> Optional[int]:
+    """Solde total (centimes) en cache dans services.g1_balance ; avec `fetch`,
+    relu s'il est absent. None si inconnu."""
+    from services.g1_balance import balance_service
+    entry = balance_service.cache.get(g1pub)
+    if entry is None and fetch:
+        await balance_service.get(g1pub)
+        entry = balance_service.cache.get(g1pub)   # absente si la lecture a échoué
+    return entry["balances"].get("total") if entry else None
+
+
+async def _balance_changed(g1pub: str, store: WalletHistory, fetch: bool) -> bool:
+    """Vrai si le solde diffère de la dernière sync. Inconnu (pas d'entrée en
+    cache, ou pas de référence) : changé seulement si `fetch`."""
+    balance = await _current_balance(g1pub, fetch)
+    if balance is None or store.meta.get("balance") is None:
+        return fetch
+    return balance != store.meta["balance"]
+
+
+async def _sync(g1pub: str, store: WalletHistory) -> None:
+    now = time.time()
+    if store.meta["last_sync"]:
+        stale = now - store.meta["last_sync"] >= SYNC_INTERVAL
+        if not await _balance_changed(g1pub, store, fetch=stale):
+            return
+
+    initial = store.meta["cursor"] < 0
+    if initial:
+        result = await _download(store.ss58, -1, _INT_MAX, INITIAL_FETCH, 1)
+    else:
+        result = await _download(store.ss58, store.meta["cursor"], _INT_MAX, SYNC_PAGE,
+                                 MAX_SYNC_PAGES, ascending=True)
+    if result is None:
+        logger.warning("G1history : aucun Squid disponible pour %s…, store local servi", g1pub[:12])
+        return
+
+    records, truncated, boundary = result
+    added = await store.append(records)
+    newest = max((r.get("blockNumber", 0) for r in records), default=store.meta["cursor"])
+    if initial:
+        store.meta["cursor"] = max(newest, 0)
+        store.meta["complete"] = not truncated
+        store.meta["horizon"] = (boundary - 1) if truncated else 0
+    else:
+        # Sync interrompue : reprendre à la borne, sans sauter de bloc
+        store.meta["cursor"] = boundary if truncated else max(newest, store.meta["cursor"])
+    store.meta["last_sync"] = now
+    # Référence des syncs suivantes (relue si absente du cache)
+    store.meta["balance"] = await _current_balance(g1pub, fetch=True)
+    await store.save_meta()
+    logger.info("G1history sync %s… : +%d transferts (store %d)", g1pub[:12], added, len(store.records))
+
+
+async def _backfill(store: WalletHistory, needed: int) -> None:
+    """Complète le store vers le passé jusqu'à `needed` transferts (ou complet)."""
+    if store.meta["complete"] or len(store.records) >= needed:
+        return
+    horizon = store.meta.get("horizon")
+    before = (horizon + 1) if horizon is not None else _INT_MAX
+    result = await _download(store.ss58, -1, before, SYNC_PAGE, max(1, needed // SYNC_PAGE + 1))
+    if result is None:
+        return
+    older, truncated, boundary = result
+    await store.append(older)
+    store.meta["complete"] = not truncated
+    store.meta["horizon"] = (boundary - 1) if truncated else 0
+    await store.save_meta()
+
+
+async def get_wallet_history(g1pub: str, limit: int = 100, offset: int = 0) -> dict:
+    """
+    Page d'historique servie depuis le store local (sync incrémentale au besoin).
+    Retourne {"history": [...], "count": <transferts en store>, "complete": bool}.
+    """
+    store = _get_store(g1pub_to_ss58(g1pub))
+    async with store.lock:
+        await store.load()
+        await _sync(g1pub, store)
+        await _backfill(store, offset + limit)
+    return {
+        "history": store.records[offset:offset + limit],
+        "count": len(store.records),
+        "complete": bool(store.meta["complete"]),
+    }
+
+
+async def get_wallet_summary(g1pub: str) -> dict:
+    """
+    Agrégats calculés sur le store local :
+      {"monthly": {"YYYY-MM": {"received", "sent", "count"}},
+       "counterparties": {pubkey: {"received", "sent", "count"}}}
+    """
+    store = _get_store(g1pub_to_ss58(g1pub))
+    async with store.lock:
+        await store.load()
+        await _sync(g1pub, store)
+
+    monthly: Dict[str, dict] = {}
+    counterparties: Dict[str, dict] = {}
+    for rec in store.records:
+        amount = rec.get("Amounts Ğ1", 0) or 0
+        side = "received" if amount >= 0 else "sent"
+        for bucket, key in ((monthly, (rec.get("Date") or "")[:7] or "unknown"),
+                            (counterparties, rec.get("Issuers/Recipients") or "unknown")):
+            agg = bucket.setdefault(key, {"received": 0.0, "sent": 0.0, "count": 0})
+            agg[side] = round(agg[side] + abs(amount), 2)
+            agg["count"] += 1
+    return {"monthly": monthly, "counterparties": counterparties}
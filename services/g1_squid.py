@@ -6,7 +6,7 @@ Remplace G1history.sh, G1balance.sh et gcli par des appels Python directs.
 
 Chaîne de résolution de la balance (ordre de priorité) :
   1. Squid GraphQL     (httpx, ~100ms si le compte est indexé)
-  2. SubstrateInterface Python RPC  (websocket natif, ~800ms, sans gcli)
+  2. JSON-RPC asyncio natif         (services.substrate_rpc, websocket persistant)
   3. gcli subprocess  (PATH étendu ~/.astro/bin, si installé)
   4. G1check.sh       (super-fallback garanti, source + PATH étendu)
 
@@ -22,7 +22,7 @@ API publique
   get_squid_urls()                             → list[str]  (ordre latence)
   get_g1_history_native(g1pub, limit)          → dict  {"history": [...]}
   get_g1_balance_native(g1pub)                 → dict  {"balances": {...}}
-  get_g1_balance_rpc_native(g1pub)             → dict  (SubstrateInterface direct)
+  get_g1_balance_rpc_native(g1pub)             → dict  (JSON-RPC System.Account direct)
 """
 
 import asyncio
@@ -37,12 +37,9 @@ from typing import Dict, List, Optional
 
 import httpx
 
-logger = logging.getLogger(__name__)
+from services.cache import named_cache
 
-# ── Cache SubstrateInterface : connexions WebSocket réutilisées ───────────────
-# { url → (SubstrateInterface, created_at) }
-_substrate_pool: Dict[str, tuple] = {}
-_SUBSTRATE_POOL_TTL = 300   # 5 minutes — fermer les connexions inutilisées
+logger = logging.getLogger(__name__)
 
 # ── Constantes ────────────────────────────────────────────────────────────────
 _CACHE_FILE = Path.home() / ".zen" / "tmp" / "duniter_nodes.json"
@@ -66,8 +63,9 @@ _BOOTSTRAP_RPC = [
     "wss://g1.axiom-team.fr:443/ws/",
 ]
 
-# Cache en mémoire : url_base → url_résolue (path /ws détecté automatiquement)
-_rpc_url_cache: dict = {}
+# url_base → url_résolue (path /ws détecté automatiquement), gardé un jour
+# et entre deux redémarrages
+_rpc_url_cache = named_cache("g1_rpc_url", maxsize=64, ttl=86400, persist=True)
 
 # ── Alphabet Base58 Bitcoin (identique à Substrate / Duniter) ─────────────────
 _B58_ALPHABET = b"123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
@@ -256,12 +254,14 @@ async def _resolve_rpc_url(url: str) -> str:
     Stratégie : tente une requête HTTP JSON-RPC (system_chain) sur les variantes
     https://host, https://host/ws, https://host/ws/ en ordre, puis
     retourne l'URL wss:// correspondante qui répond.
-    Le résultat est mis en cache en mémoire (_rpc_url_cache) pour la durée
-    de vie du processus — aucune re-probe inutile.
+    Le résultat est mis en cache (_rpc_url_cache, un jour) ; les appels
+    simultanés pour un même nœud partagent une seule probe. Si aucune variante
+    ne répond, l'URL d'origine est retournée sans être mise en cache.
     """
-    if url in _rpc_url_cache:
-        return _rpc_url_cache[url]
+    return await _rpc_url_cache.get_or_load(url, lambda: _probe_rpc_url(url), default=url)
 
+
+async def _probe_rpc_url(url: str) -> Optional[str]:
     base = url.rstrip("/")
     # Génère toutes les variantes wss://, avec probe via https://
     variants_ws = [base]
@@ -284,7 +284,6 @@ async def _resolve_rpc_url(url: str) -> str:
                 try:
                     resp = await client.post(http_probe, json=_probe_payload)
                     if resp.status_code == 200 and resp.json().get("result"):
-                        _rpc_url_cache[url] = ws_url
                         logger.info("RPC URL résolue : %s → %s", url, ws_url)
                         return ws_url
                 except Exception:
@@ -292,10 +291,10 @@ async def _resolve_rpc_url(url: str) -> str:
     except Exception as exc:
         logger.debug("_resolve_rpc_url probe échec pour %s : %s", url, exc)
 
-    # Aucun ne répond via HTTP : conserver l'URL originale
-    _rpc_url_cache[url] = url
+    # Aucun ne répond via HTTP : l'appelant garde l'URL originale, la probe
+    # sera retentée au prochain appel
     logger.debug("RPC URL non résolue, fallback original : %s", url)
-    return url
+    return None
 
 
 # ── Requêtes GraphQL ──────────────────────────────────────────────────────────
@@ -347,6 +346,8 @@ def _parse_history(raw: dict, g1pub: str) -> dict:
       {"history": [{"Date", "Amounts Ğ1", "Issuers/Recipients",
                     "Reference", "blockNumber", "direction"}, ...]}
     Montants en Ğ1 (centimes/100). Positif = reçu, négatif = envoyé.
+    L'id Squid du transfert est conservé ("id") s'il a été demandé
+    (clé d'unicité du store services.g1_history).
     """
     data = raw.get("data", {})
     received_nodes = (data.get("received") or {}).get("nodes") or []
@@ -361,6 +362,7 @@ def _parse_history(raw: dict, g1pub: str) -> dict:
             "Reference": (node.get("comment") or {}).get("remark", "") or "",
             "blockNumber": node.get("blockNumber", 0),
             "direction": "received",
+            **({"id": node["id"]} if node.get("id") else {}),
         })
     for node in sent_nodes:
         history.append({
@@ -370,6 +372,7 @@ def _parse_history(raw: dict, g1pub: str) -> dict:
             "Reference": (node.get("comment") or {}).get("remark", "") or "",
             "blockNumber": node.get("blockNumber", 0),
             "direction": "sent",
+            **({"id": node["id"]} if node.get("id") else {}),
         })
     # Tri descendant par blockNumber (identique à G1history.sh)
     history.sort(key=lambda x: x["blockNumber"], reverse=True)
@@ -496,7 +499,7 @@ async def get_g1_balance_native(g1pub: str) -> dict:
                 # inutile d'essayer les autres Squids pour ce compte
                 break
 
-    # ── Fallback niveau 2 : SubstrateInterface Python RPC (sans gcli) ─────────
+    # ── Fallback niveau 2 : JSON-RPC asyncio natif (sans gcli) ───────────────
     logger.info(
         "G1balance : Squid sans données pour %s…, tentative RPC Python natif",
         g1pub[:12],
@@ -513,96 +516,26 @@ async def get_g1_balance_native(g1pub: str) -> dict:
     return await _get_g1_balance_gcli_fallback(g1pub, ss58)
 
 
-def _get_substrate_interface(url: str):
-    """
-    Retourne une instance SubstrateInterface depuis le pool de connexions (TTL 5min).
-    Crée une nouvelle connexion si absente ou expirée.
-    """
-    now = time.time()
-    if url in _substrate_pool:
-        substrate, created_at = _substrate_pool[url]
-        if now - created_at < _SUBSTRATE_POOL_TTL:
-            return substrate
-        # Connexion expirée : fermer
-        try:
-            substrate.close()
-        except Exception:
-            pass
-        del _substrate_pool[url]
-
-    from substrateinterface import SubstrateInterface
-    substrate = SubstrateInterface(url=url)
-    _substrate_pool[url] = (substrate, now)
-    logger.debug("SubstrateInterface nouvelle connexion : %s", url)
-    return substrate
-
-
 async def get_g1_balance_rpc_native(g1pub: str) -> dict:
     """
-    Interroge directement les nœuds RPC Duniter v2 via SubstrateInterface Python.
-    Équivalent de `gcli account balance` — sans subprocess, ~800ms premier appel,
-    réutilise les connexions WebSocket du pool (_substrate_pool, TTL 5min).
+    Interroge directement les nœuds RPC Duniter v2 via le client JSON-RPC
+    asyncio de services.substrate_rpc (state_getStorage sur System.Account).
+    Équivalent de `gcli account balance` — sans subprocess ni thread : la
+    connexion WebSocket est persistante et partagée par toutes les coroutines.
 
     Source de vérité on-chain : System.Account[ss58].data.free + reserved
     (identique à ce que lit gcli-v2s via subxt).
 
     Retourne {"balances": {"pending": 0, "blockchain": <centimes>, "total": <centimes>}}.
     """
-    _empty = {"balances": {"pending": 0, "blockchain": 0, "total": 0}}
+    from services.substrate_rpc import rpc_client
 
-    try:
-        from substrateinterface import SubstrateInterface  # noqa — import test
-    except ImportError:
-        logger.debug("substrate-interface non installé — pip install substrate-interface")
-        return _empty
-
-    ss58 = g1pub_to_ss58(g1pub)
-    loop = asyncio.get_event_loop()
-
-    for node in get_rpc_nodes():
-        def _query(url=node, addr=ss58):
-            substrate = _get_substrate_interface(url)
-            result = substrate.query("System", "Account", [addr])
-            if result is None or result.value is None:
-                return None
-            data = result.value.get("data", {})
-            free     = int(data.get("free", 0))
-            reserved = int(data.get("reserved", 0))
-            return free + reserved
-
-        try:
-            total = await asyncio.wait_for(
-                loop.run_in_executor(None, _query),
-                timeout=12.0,
-            )
-            if total is not None:
-                logger.info(
-                    "G1balance RPC Python OK pour %s… : %d centimes via %s",
-                    g1pub[:12], total, node,
-                )
-                return {
-                    "balances": {
-                        "pending": 0,
-                        "blockchain": total,
-                        "total": total,
-                    }
-                }
-        except asyncio.TimeoutError:
-            logger.debug("SubstrateInterface timeout sur %s", node)
-            # Supprimer la connexion potentiellement bloquée du pool
-            if node in _substrate_pool:
-                try:
-                    _substrate_pool[node][0].close()
-                except Exception:
-                    pass
-                del _substrate_pool[node]
-        except Exception as exc:
-            logger.debug("SubstrateInterface erreur sur %s : %s", node, exc)
-            if node in _substrate_pool:
-                del _substrate_pool[node]
-
-    logger.warning("G1balance RPC Python : tous les nœuds ont échoué pour %s…", g1pub[:12])
-    return _empty
+    total = await rpc_client.get_balance(g1pub)
+    if total is None:
+        logger.warning("G1balance RPC natif : aucun nœud disponible pour %s…", g1pub[:12])
+        return {"balances": {"pending": 0, "blockchain": 0, "total": 0}}
+    logger.info("G1balance RPC natif OK pour %s… : %d centimes", g1pub[:12], total)
+    return {"balances": {"pending": 0, "blockchain": total, "total": total}}
 
 
 def _get_extended_env() -> dict:
@@ -703,9 +636,10 @@ async def get_g1_balances_batch(g1pubs: List[str]) -> Dict[str, dict]:
     Si le Squid ne supporte pas ce filtre, bascule sur asyncio.gather()
     avec des requêtes individuelles get_g1_balance_native().
 
+    Si aucun Squid ne répond, un seul `state_queryStorageAt` RPC couvre tous
+    les comptes (services.substrate_rpc) avant le repli compte par compte.
+
     Retourne {g1pub: {"pending": 0, "blockchain": <centimes>, "total": <centimes>}}.
-    WebSocket RPC : les connexions SubstrateInterface restent dans le pool (_substrate_pool)
-    et ne sont PAS fermées entre les appels (TTL 5 min).
     """
     _empty = {"pending": 0, "blockchain": 0, "total": 0}
     if not g1pubs:
@@ -754,7 +688,17 @@ async def get_g1_balances_batch(g1pubs: List[str]) -> Dict[str, dict]:
             except Exception as exc:
                 logger.debug("Batch balance erreur sur %s : %s", url, exc)
 
-    # Fallback : requêtes individuelles en parallèle (connexions WS réutilisées)
+    # Fallback RPC : un seul state_queryStorageAt pour tous les comptes
+    from services.substrate_rpc import rpc_client
+    rpc_totals = await rpc_client.get_balances(g1pubs)
+    if rpc_totals is not None:
+        logger.info("G1balance batch RPC OK : %d comptes", len(rpc_totals))
+        return {
+            g1pub: {"pending": 0, "blockchain": total, "total": total}
+            for g1pub, total in rpc_totals.items()
+        }
+
+    # Fallback : requêtes individuelles en parallèle
     logger.info("G1balance batch : fallback gather pour %d pubkeys", len(g1pubs))
     tasks = [get_g1_balance_native(g1pub) for g1pub in g1pubs]
     results_list = await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,306 @@
+"""
+services/geogrid.py
+───────────────────
+Moteur de grille géographique UPlanet (UMAP / SECTOR / REGION) en Python —
+remplace le fork de tools/Umap_geonostr.sh à chaque /api/umap/geolinks.
+
+La grille est déterministe :
+  UMAP   cellule 0.01°  "LAT" "LON" au format %.2f        (ex. 43.60 / 1.44)
+  SECTOR cellule 0.1°   "_SLAT_SLON", SLAT = ${LAT::-1}     (ex. _43.6_1.4)
+  REGION cellule 1°     "_RLAT_RLON", RLAT = partie entière (ex. _43_1)
+
+Identifiants et voisins (here + 8 directions) sont calculés arithmétiquement.
+La clé NOSTR de chaque cellule est celle de `keygen -t nostr` (cf.
+NOSTR.UMAP.refresh.sh) :
+  UMAP   : salt = UPLANETNAME+LAT,    pepper = UPLANETNAME+LON
+  SECTOR : salt = pepper = UPLANETNAME+_SLAT_SLON
+  REGION : salt = pepper = UPLANETNAME+_RLAT_RLON
+
+Ces dérivations (scrypt + secp256k1) sont mémoïsées dans un store persistant
+append-only indexé par identifiant de cellule :
+  ~/.zen/tmp/geogrid/<empreinte UPLANETNAME>.jsonl   {"c": "umap:43.60:1.44", "h": hex}
+En mémoire, un LRU de GEOGRID_MAX_KEYS cellules ; le JSONL est réécrit avec
+ce seul contenu dès qu'il dépasse le double.
+Les cellules manquantes sont dérivées par lots dans le pool services.keyderive ;
+deux requêtes simultanées sur la même cellule partagent la même dérivation.
+Les routes publiques (geolinks, bbox) passent par l'admission du pool,
+imputées à l'IP appelante : une place de la file, lots dérivés l'un après l'autre.
+
+API publique
+------------
+  umap_coords(lat, lon)                     → ("43.60", "1.44")
+  neighbours(level, lat, lon)               → {direction: (lat_str, lon_str)}
+  await get_geolinks(lat, lon, ip)          → {"umaps": {…}, "sectors": {…}, "regions": {…}}
+  await resolve_bbox(s, w, n, e, level, ip) → [{"lat", "lon", "hex"}, …]
+                                              (KeyDerivationBusy si file pleine)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from cachetools import LRUCache
+
+from core.config import settings
+from services import keyderive
+from services.admin_auth import get_uplanetname
+
+logger = logging.getLogger(__name__)
+
+GEOGRID_DIR = Path.home() / ".zen" / "tmp" / "geogrid"
+MAX_BBOX_CELLS = 100     # cellules par requête bbox (dérivation à froid ≈ 0,1 s/cellule)
+_DERIVE_CHUNK = 16       # cellules par appel worker
+
+# Pas de grille en centièmes de degré et décimales d'affichage
+LEVELS: Dict[str, Tuple[int, int]] = {"umap": (1, 2), "sector": (10, 1), "region": (100, 0)}
+
+DIRECTIONS: Dict[str, Tuple[int, int]] = {
+    "here": (0, 0),
+    "north": (1, 0), "south": (-1, 0), "east": (0, 1), "west": (0, -1),
+    "northeast": (1, 1), "northwest": (1, -1), "southeast": (-1, 1), "southwest": (-1, -1),
+}
+
+
+def _umap_centi(lat: float, lon: float) -> Tuple[int, int]:
+    return int(round(lat * 100)), int(round(lon * 100))
+
+
+def _index(centi: int, step: int) -> int:
+    """Indice de cellule d'une coordonnée UMAP (centièmes de degré).
+
+    SECTOR/REGION tronquent la chaîne UMAP (${LAT::-1}, cut -d '.' -f 1) :
+    le signe est conservé, donc "-0.0" et "0.0" sont deux cellules distinctes.
+    Côté négatif l'indice est décalé d'un cran pour rester contigu."""
+    if step == 1:
+        return centi
+    k = abs(centi) // step
+    return k if centi >= 0 else -k - 1
+
+
+def _label(index: int, level: str) -> str:
+    """Coordonnée textuelle (format de la grille) d'un indice de cellule."""
+    step, decimals = LEVELS[level]
+    if step == 1:
+        sign, mag = ("-" if index < 0 else ""), abs(index)
+    else:
+        sign, mag = ("" if index >= 0 else "-"), (index if index >= 0 else -index - 1) * step
+    whole, frac = divmod(mag, 100)
+    if decimals == 0:
+        return f"{sign}{whole}"
+    return f"{sign}{whole}.{frac:02d}"[:len(f"{sign}{whole}.") + decimals]
+
+
+def umap_coords(lat: float, lon: float) -> Tuple[str, str]:
+    """Coordonnées UMAP (%.2f) de la cellule contenant (lat, lon)."""
+    clat, clon = _umap_centi(lat, lon)
+    return _label(clat, "umap"), _label(clon, "umap")
+
+
+def neighbours(level: str, lat: float, lon: float) -> Dict[str, Tuple[str, str]]:
+    """Cellule `level` contenant (lat, lon) et ses 8 voisines : {direction: (lat, lon)}."""
+    step, _ = LEVELS[level]
+    clat, clon = _umap_centi(lat, lon)
+    ilat, ilon = _index(clat, step), _index(clon, step)
+    return {
+        direction: (_label(ilat + dlat, level), _label(ilon + dlon, level))
+        for direction, (dlat, dlon) in DIRECTIONS.items()
+    }
+
+
+def cell_id(level: str, lat_s: str, lon_s: str) -> str:
+    return f"{level}:{lat_s}:{lon_s}"
+
+
+def _credentials(level: str, lat_s: str, lon_s: str, uplanetname: str) -> Tuple[str, str]:
+    if level == "umap":
+        return f"{uplanetname}{lat_s}", f"{uplanetname}{lon_s}"
+    tag = f"{uplanetname}_{lat_s}_{lon_s}"
+    return tag, tag
+
+
+class GeoKeyStore:
+    """Clés NOSTR des cellules déjà dérivées (LRU en mémoire + JSONL append-only
+    compacté au-delà de 2 × GEOGRID_MAX_KEYS lignes)."""
+
+    def __init__(self, uplanetname: str):
+        self.uplanetname = uplanetname
+        digest = hashlib.sha256(uplanetname.encode()).hexdigest()[:16]
+        self.path = GEOGRID_DIR / f"{digest}.jsonl"
+        self.keys: LRUCache = LRUCache(maxsize=max(1, settings.GEOGRID_MAX_KEYS))
+        self._log_lines = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._load()
+
+    def _load(self) -> None:
+        # Lignes les plus récentes en dernier : le LRU garde naturellement la fin du fichier
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                        self.keys[rec["c"]] = rec["h"]
+                    except (ValueError, KeyError):
+                        continue
+                    self._log_lines += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"[geogrid] lecture {self.path} : {e}")
+        if self._log_lines > 2 * self.keys.maxsize:
+            self._compact()
+
+    def _append(self, derived: Dict[str, str]) -> None:
+        try:
+            GEOGRID_DIR.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                for cid, pubkey in derived.items():
+                    f.write(json.dumps({"c": cid, "h": pubkey}) + "\n")
+            self._log_lines += len(derived)
+        except OSError as e:
+            logger.warning(f"[geogrid] écriture {self.path} : {e}")
+        if self._log_lines > 2 * self.keys.maxsize:
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            with open(tmp, "w") as f:
+                for cid, pubkey in self.keys.items():
+                    f.write(json.dumps({"c": cid, "h": pubkey}) + "\n")
+            os.replace(tmp, self.path)
+            self._log_lines = len(self.keys)
+        except OSError as e:
+            logger.warning(f"[geogrid] compaction de {self.path} : {e}")
+
+    async def resolve(self, cells: List[Tuple[str, str, str]],
+                      client_ip: Optional[str] = None) -> Dict[str, Optional[str]]:
+        """Clés hex de cellules (level, lat, lon) → {cell_id: hex}. Avec
+        `client_ip`, les dérivations passent par keyderive.admitted()."""
+        result: Dict[str, Optional[str]] = {}
+        waits: Dict[str, asyncio.Future] = {}
+        missing: Dict[str, Tuple[str, str]] = {}
+        for level, lat_s, lon_s in cells:
+            cid = cell_id(level, lat_s, lon_s)
+            if cid in self.keys:
+                result[cid] = self.keys[cid]
+            elif cid in self._inflight:
+                waits[cid] = self._inflight[cid]
+            elif cid not in missing:
+                missing[cid] = _credentials(level, lat_s, lon_s, self.uplanetname)
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = {cid: loop.create_future() for cid in missing}
+            self._inflight.update(futures)
+            waits.update(futures)
+            try:
+                ids = list(missing)
+                chunks = [ids[i:i + _DERIVE_CHUNK] for i in range(0, len(ids), _DERIVE_CHUNK)]
+                if client_ip is None:
+                    outputs = await asyncio.gather(*(
+                        keyderive.run_internal(keyderive._nostr_hex_many, [missing[c] for c in chunk])
+                        for chunk in chunks
+                    ))
+                else:
+                    with keyderive.admitted(client_ip):
+                        outputs = [
+                            await keyderive.run_internal(keyderive._nostr_hex_many, [missing[c] for c in chunk])
+                            for chunk in chunks
+                        ]
+                derived = {
+                    cid: pubkey
+                    for chunk, pubkeys in zip(chunks, outputs)
+                    for cid, pubkey in zip(chunk, pubkeys) if pubkey
+                }
+                self.keys.update(derived)
+                self._append(derived)
+                for cid, fut in futures.items():
+                    fut.set_result(derived.get(cid))
+            except BaseException as exc:
+                for fut in futures.values():
+                    if fut.done():
+                        continue
+                    if isinstance(exc, asyncio.CancelledError):
+                        fut.cancel()
+                    else:
+                        fut.set_exception(exc)
+                        fut.exception()
+                raise
+            finally:
+                for cid in futures:
+                    self._inflight.pop(cid, None)
+
+        for cid, fut in waits.items():
+            result[cid] = await asyncio.shield(fut)
+        return result
+
+
+_store: Optional[GeoKeyStore] = None
+
+
+def _get_store() -> GeoKeyStore:
+    global _store
+    uplanetname = get_uplanetname()
+    if _store is None or _store.uplanetname != uplanetname:
+        _store = GeoKeyStore(uplanetname)
+    return _store
+
+
+def _check_coords(lat: float, lon: float) -> None:
+    if not (-90 <= lat <= 90):
+        raise ValueError("Latitude doit être entre -90 et 90")
+    if not (-180 <= lon <= 180):
+        raise ValueError("Longitude doit être entre -180 et 180")
+
+
+async def get_geolinks(lat: float, lon: float,
+                       client_ip: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+    """Clés hex de l'UMAP, du SECTOR et de la REGION de (lat, lon) et de leurs
+    8 voisines — même structure que la sortie JSON de Umap_geonostr.sh.
+    Avec `client_ip`, les dérivations sont imputées à cette IP
+    (keyderive.KeyDerivationBusy si la file est pleine)."""
+    _check_coords(lat, lon)
+    grid = {level: neighbours(level, lat, lon) for level in LEVELS}
+    keys = await _get_store().resolve([
+        (level, lat_s, lon_s) for level, cells in grid.items() for lat_s, lon_s in cells.values()
+    ], client_ip)
+    return {
+        f"{level}s": {
+            direction: keys.get(cell_id(level, lat_s, lon_s)) or ""
+            for direction, (lat_s, lon_s) in cells.items()
+        }
+        for level, cells in grid.items()
+    }
+
+
+async def resolve_bbox(south: float, west: float, north: float, east: float,
+                       level: str = "umap", client_ip: str = "") -> List[Dict[str, str]]:
+    """Toutes les cellules `level` couvrant la bounding box, avec leur clé hex.
+    Lève ValueError si la box est invalide ou dépasse MAX_BBOX_CELLS cellules,
+    keyderive.KeyDerivationBusy si des dérivations sont refusées pour cette IP."""
+    if level not in LEVELS:
+        raise ValueError(f"Niveau inconnu : {level} (umap, sector, region)")
+    _check_coords(south, west)
+    _check_coords(north, east)
+    if south > north or west > east:
+        raise ValueError("Bounding box invalide (south ≤ north, west ≤ east)")
+    step, _ = LEVELS[level]
+    (slat, wlon), (nlat, elon) = _umap_centi(south, west), _umap_centi(north, east)
+    lat0, lon0 = _index(slat, step), _index(wlon, step)
+    rows = _index(nlat, step) - lat0 + 1
+    cols = _index(elon, step) - lon0 + 1
+    if rows * cols > MAX_BBOX_CELLS:
+        raise ValueError(f"Bounding box trop grande : {rows * cols} cellules (max {MAX_BBOX_CELLS})")
+    cells = [
+        (level, _label(lat0 + i, level), _label(lon0 + j, level))
+        for i in range(rows) for j in range(cols)
+    ]
+    keys = await _get_store().resolve(cells, client_ip=client_ip)
+    return [
+        {"lat": lat_s, "lon": lon_s, "hex": keys.get(cell_id(level, lat_s, lon_s)) or ""}
+        for level, lat_s, lon_s in cells
+    ]
@@ -1,14 +1,59 @@
 import os
+import json
 import logging
 logger = logging.getLogger(__name__)
 import asyncio
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from fastapi import Request, HTTPException
 from starlette.responses import StreamingResponse
 import httpx
 
 from core.config import settings
+from services.cache import named_cache
+from services.kubo import KuboError, kubo
+
+# Helpers tolérants au-dessus de services.kubo : None/{}/False si Kubo est
+# indisponible, pour les appelants qui ont un repli (disque local, etc.).
+
+
+async def kubo_add_bytes(data: bytes, filename: str = "data", pin: bool = True) -> Optional[str]:
+    """`ipfs add -q` d'un buffer mémoire via l'API Kubo. Retourne le CID ou None."""
+    try:
+        return await kubo.add_bytes(data, filename, pin=pin)
+    except KuboError as e:
+        logger.warning(f"⚠️ Kubo add failed: {e}")
+        return None
+
+
+async def kubo_add_many(items: Dict[str, bytes], pin: bool = True) -> Dict[str, str]:
+    """Plusieurs buffers en un seul `ipfs add` (multipart). Retourne {nom: CID}
+    pour les entrées ajoutées ; {} si Kubo est indisponible."""
+    try:
+        return {name: res["Hash"] for name, res in (await kubo.add(items, pin=pin)).items()}
+    except KuboError as e:
+        logger.warning(f"⚠️ Kubo add ({len(items)} fichiers) failed: {e}")
+        return {}
+
+
+async def kubo_cat(cid: str, max_size: Optional[int] = None, timeout: Optional[float] = 30.0) -> Optional[bytes]:
+    """`ipfs cat` via l'API Kubo (contenu en mémoire). Retourne None si indisponible."""
+    try:
+        return await kubo.cat(cid, max_size=max_size, timeout=timeout)
+    except KuboError as e:
+        logger.warning(f"⚠️ Kubo cat failed for {cid[:20]}: {e}")
+        return None
+
+
+async def kubo_pin_rm(cid: str) -> bool:
+    """`ipfs pin rm` via l'API Kubo. False si indisponible ou déjà dépinné."""
+    try:
+        await kubo.pin_rm(cid)
+        return True
+    except KuboError as e:
+        logger.warning(f"⚠️ Kubo pin rm failed for {cid[:20]}: {e}")
+        return False
+
 
 async def proxy_ipfs_gateway(request: Request):
     """Proxy /ipfs/ and /ipns/ requests to the local IPFS gateway."""
@@ -44,14 +89,12 @@ async def proxy_ipfs_gateway(request: Request):
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="IPFS gateway timeout")
 
-async def run_uDRIVE_generation_script(source_dir: Path, enable_logging: bool = False) -> Dict[str, Any]:
-    """Exécuter le script de génération IPFS spécifique à l'utilisateur dans le répertoire de son uDRIVE."""
-    
-    app_udrive_path = source_dir 
+def _link_udrive_script(app_udrive_path: Path) -> Path:
+    """Lien generate_ipfs_structure.sh dans le uDRIVE (script Astroport.ONE,
+    sinon celui du dépôt), rendu exécutable."""
     script_path = app_udrive_path / "generate_ipfs_structure.sh"
-    
     app_udrive_path.mkdir(parents=True, exist_ok=True)
-    
+
     if not script_path.exists() or not script_path.is_symlink():
         generic_script_path = settings.ZEN_PATH / "Astroport.ONE" / "tools" / "generate_ipfs_structure.sh"
         
@@ -85,6 +128,22 @@ async def run_uDRIVE_generation_script(source_dir: Path, enable_logging: bool =
         except Exception as e:
             logger.error(f"Impossible de rendre exécutable le script cible {script_path.resolve()}: {e}")
             raise HTTPException(status_code=500, detail=f"Script IPFS non exécutable: {e}")
+    return script_path
+
+
+async def run_uDRIVE_generation_script(source_dir: Path, enable_logging: bool = False) -> Dict[str, Any]:
+    """Exécuter le script de génération IPFS spécifique à l'utilisateur dans le répertoire de son uDRIVE.
+
+    Avec settings.UDRIVE_INCREMENTAL (désactivé par défaut, cf. services/udrive.py),
+    la construction incrémentale est tentée d'abord ; un répertoire que Kubo
+    sharderait (UDriveTooLarge) repasse par le script."""
+    if settings.UDRIVE_INCREMENTAL:
+        result = await _run_incremental_build(source_dir, enable_logging)
+        if result is not None:
+            return result
+
+    app_udrive_path = source_dir
+    script_path = await asyncio.to_thread(_link_udrive_script, app_udrive_path)
 
     cmd = [str(script_path)]
     if enable_logging:
@@ -130,16 +189,65 @@ async def run_uDRIVE_generation_script(source_dir: Path, enable_logging: bool =
         logger.error(f"Exception lors de l'exécution du script: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur interne: {str(e)}")
 
-async def fetch_info_json(cid: str) -> Dict[str, Any]:
-    """Fetch info.json from IPFS"""
+
+async def _run_incremental_build(source_dir: Path, enable_logging: bool) -> Optional[Dict[str, Any]]:
+    """Construction incrémentale (services/udrive.py) ; None si le uDRIVE doit
+    passer par generate_ipfs_structure.sh."""
+    from services.udrive import UDriveTooLarge, rebuild
+
+    await asyncio.to_thread(source_dir.mkdir, parents=True, exist_ok=True)
     try:
-        clean_cid = cid.replace("/ipfs/", "").replace("ipfs://", "")
-        info_url = f"{settings.IPFS_GATEWAY}/ipfs/{clean_cid}/info.json"
-        
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            info_response = await client.get(info_url)
-            if info_response.status_code == 200:
-                return info_response.json()
+        result = await rebuild(source_dir)
+    except UDriveTooLarge as e:
+        logger.info(f"uDRIVE incrémental : {e} — repli sur generate_ipfs_structure.sh")
+        return None
+    except asyncio.TimeoutError:
+        logger.error(f"uDRIVE build timeout ({settings.UDRIVE_BUILD_TIMEOUT}s): {source_dir}")
+        raise HTTPException(status_code=504, detail="uDRIVE build timeout")
     except Exception as e:
-        logger.warning(f"⚠️ Could not fetch info.json from IPFS: {e}")
-    return {}
+        logger.error(f"Exception lors de la construction du uDRIVE: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur interne: {str(e)}")
+
+    logger.info(f"Nouveau CID généré: {result['final_cid']}")
+    logger.info(f"Répertoire traité: {source_dir}")
+    return {
+        "success": True,
+        "final_cid": result["final_cid"],
+        "files_added": result["added"],
+        "files_reused": result["reused"],
+        "total_files": result["total_files"],
+        "stdout": json.dumps(result) if enable_logging else None,
+        "stderr": None,
+        "working_directory": str(source_dir),
+        "processed_directory": str(source_dir),
+    }
+
+# Cache info.json par CID. Un CID désigne un contenu immuable : une entrée
+# trouvée n'expire jamais (LRU borné) ; un échec n'est retenu que brièvement
+# (CID pas encore propagé, Kubo redémarré). Les appels simultanés pour un même
+# CID partagent une seule lecture Kubo.
+_INFO_JSON_MAX = 1024 * 1024  # octets lus au plus par info.json
+_info_json_cache = named_cache("info_json", maxsize=4096, miss_ttl=60)
+
+
+async def _load_info_json(cid: str) -> Optional[Dict[str, Any]]:
+    # `cid` est soit l'info.json lui-même (tag NIP-71 "info", formulaires),
+    # soit le répertoire qui le contient.
+    for arg in (cid, f"{cid}/info.json"):
+        try:
+            data = json.loads(await kubo.cat(arg, max_size=_INFO_JSON_MAX, timeout=5.0))
+            if isinstance(data, dict):
+                return data
+        except (KuboError, ValueError):
+            pass
+    logger.warning(f"⚠️ Could not fetch info.json for {cid[:20]}")
+    return None
+
+
+async def fetch_info_json(cid: str) -> Dict[str, Any]:
+    """info.json d'un CID (fichier ou répertoire), via le cache partagé.
+    Retourne {} si introuvable. Le dict retourné est partagé : ne pas le modifier."""
+    cid = cid.replace("/ipfs/", "").replace("ipfs://", "").strip().strip("/")
+    if not cid:
+        return {}
+    return await _info_json_cache.get_or_load(cid, lambda: _load_info_json(cid), default={})
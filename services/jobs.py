@@ -0,0 +1,256 @@
+"""
+services/jobs.py
+────────────────
+File de tâches locale persistante (SQLite) pour les traitements post-upload.
+
+/api/fileupload décrivait l'image (describe_image.py, jusqu'à 60 s), publiait
+l'événement NOSTR (publish_nostr_file.sh, 30 s) et envoyait le DM roaming
+avant de répondre. Ces étapes deviennent des tâches :
+
+  - enqueue(kind, payload, key, group, owner, after) insère une ligne dans
+    ~/.zen/tmp/upassport_jobs.sqlite ; `key` est une clé d'idempotence
+    (ex. "upload.publish:<sha256>:<hex>") : un second dépôt du même fichier
+    ne crée pas de seconde tâche, sauf si la précédente a échoué ("failed")
+    — elle est alors réarmée. `after` = clé d'une tâche à attendre : la
+    tâche ne part qu'une fois celle-ci terminée (done ou failed).
+  - JobQueue.start() lance settings.JOB_WORKERS workers asyncio ; chaque
+    worker réclame atomiquement la plus ancienne tâche prête
+    (UPDATE … RETURNING) et appelle le handler enregistré pour son `kind`.
+  - Un handler qui lève une exception est réessayé avec un délai exponentiel
+    (JOB_RETRY_BASE · 2^tentatives) jusqu'à JOB_MAX_ATTEMPTS, puis "failed".
+  - Les tâches "running" au démarrage (arrêt brutal) repassent "queued".
+  - Les tâches terminées depuis plus de settings.JOB_RETENTION sont purgées
+    (au démarrage puis au plus une fois par heure).
+  - status(group, owner) alimente GET /api/upload/status/{sha256} : seules
+    les tâches du propriétaire (pubkey hex de l'uploader) sont visibles.
+
+Les handlers s'enregistrent à l'import de leur routeur :
+
+    @job_queue.handler("upload.publish")
+    async def _publish(payload: dict) -> dict: ...
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[Optional[dict]]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind       TEXT NOT NULL,
+    key        TEXT UNIQUE,
+    grp        TEXT,
+    owner      TEXT,
+    after_key  TEXT,
+    payload    TEXT NOT NULL,
+    status     TEXT NOT NULL DEFAULT 'queued',
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    run_after  REAL NOT NULL,
+    result     TEXT,
+    error      TEXT,
+    created    REAL NOT NULL,
+    updated    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS jobs_grp ON jobs (grp);
+"""
+
+# Colonnes ajoutées après la première version du schéma
+_MIGRATIONS = {"owner": "ALTER TABLE jobs ADD COLUMN owner TEXT",
+               "after_key": "ALTER TABLE jobs ADD COLUMN after_key TEXT"}
+
+# Tâche prête à partir : en file, et sa tâche préalable (after_key) terminée
+_READY = ("status = 'queued' AND (after_key IS NULL OR NOT EXISTS ("
+          "SELECT 1 FROM jobs AS prev WHERE prev.key = jobs.after_key "
+          "AND prev.status IN ('queued', 'running')))")
+
+_PURGE_INTERVAL = 3600  # s
+
+
+class JobQueue:
+    """Tâches persistées en SQLite + pool de workers asyncio."""
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self._db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._handlers: Dict[str, Handler] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self._last_purge = 0.0
+
+    # ── Base ────────────────────────────────────────────────────────────────
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            path = self._db_path or settings.JOBS_DB
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, sql in _MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(sql)
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._db_lock:
+            return self._db().execute(sql, params).fetchall()
+
+    async def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    # ── API ─────────────────────────────────────────────────────────────────
+
+    def handler(self, kind: str) -> Callable[[Handler], Handler]:
+        def register(fn: Handler) -> Handler:
+            self._handlers[kind] = fn
+            return fn
+        return register
+
+    async def enqueue(self, kind: str, payload: dict, key: Optional[str] = None,
+                      group: Optional[str] = None, delay: float = 0,
+                      owner: Optional[str] = None, after: Optional[str] = None) -> int:
+        """Ajoute une tâche ; retourne l'id existant si `key` est déjà connue
+        (une tâche "failed" de même clé est réarmée avec ce payload)."""
+        now = time.time()
+        rows = await self._query(
+            "INSERT INTO jobs (kind, key, grp, owner, after_key, payload, run_after, created, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+            "status = 'queued', attempts = 0, error = NULL, result = NULL, payload = excluded.payload, "
+            "owner = excluded.owner, after_key = excluded.after_key, "
+            "run_after = excluded.run_after, updated = excluded.updated "
+            "WHERE jobs.status = 'failed' RETURNING id",
+            (kind, key, group, owner, after, json.dumps(payload), now + delay, now, now),
+        )
+        if rows:
+            if self._wakeup is not None:
+                self._wakeup.set()
+            return rows[0]["id"]
+        rows = await self._query("SELECT id FROM jobs WHERE key = ?", (key,))
+        logger.info(f"[jobs] {kind} déjà en file ({key})")
+        return rows[0]["id"]
+
+    async def status(self, group: str, owner: Optional[str] = None) -> List[dict]:
+        """Tâches du groupe ; avec `owner`, seulement celles de ce propriétaire."""
+        sql = ("SELECT id, kind, status, attempts, result, error, created, updated "
+               "FROM jobs WHERE grp = ?")
+        params: tuple = (group,)
+        if owner is not None:
+            sql, params = sql + " AND owner = ?", params + (owner,)
+        rows = await self._query(sql + " ORDER BY id", params)
+        return [{
+            "id": r["id"], "kind": r["kind"], "status": r["status"], "attempts": r["attempts"],
+            "result": json.loads(r["result"]) if r["result"] else None,
+            "error": r["error"], "created": r["created"], "updated": r["updated"],
+        } for r in rows]
+
+    # ── Exécution ───────────────────────────────────────────────────────────
+
+    async def purge(self, older_than: Optional[float] = None) -> int:
+        """Supprime les tâches done/failed non modifiées depuis `older_than`
+        secondes (settings.JOB_RETENTION par défaut) ; retourne leur nombre."""
+        retention = settings.JOB_RETENTION if older_than is None else older_than
+        rows = await self._query(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ? RETURNING id",
+            (time.time() - retention,),
+        )
+        self._last_purge = time.time()
+        if rows:
+            logger.info(f"[jobs] {len(rows)} tâches terminées purgées")
+        return len(rows)
+
+    async def _claim(self) -> Optional[sqlite3.Row]:
+        now = time.time()
+        rows = await self._query(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated = ? "
+            f"WHERE id = (SELECT id FROM jobs WHERE {_READY} AND run_after <= ? "
+            "ORDER BY run_after, id LIMIT 1) RETURNING *",
+            (now, now),
+        )
+        return rows[0] if rows else None
+
+    async def run_one(self) -> bool:
+        """Exécute une tâche prête ; False si la file est vide."""
+        job = await self._claim()
+        if job is None:
+            return False
+        kind, attempts = job["kind"], job["attempts"]
+        handler = self._handlers.get(kind)
+        try:
+            if handler is None:
+                raise LookupError(f"aucun handler pour {kind}")
+            result = await handler(json.loads(job["payload"]))
+            await self._query(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, updated = ? WHERE id = ?",
+                (json.dumps(result) if result is not None else None, time.time(), job["id"]),
+            )
+        except Exception as e:
+            final = attempts >= settings.JOB_MAX_ATTEMPTS or handler is None
+            retry_at = time.time() + settings.JOB_RETRY_BASE * 2 ** (attempts - 1)
+            await self._query(
+                "UPDATE jobs SET status = ?, error = ?, run_after = ?, updated = ? WHERE id = ?",
+                ("failed" if final else "queued", str(e)[:500], retry_at, time.time(), job["id"]),
+            )
+            log = logger.error if final else logger.warning
+            log(f"[jobs] {kind}#{job['id']} tentative {attempts} : {e}")
+        return True
+
+    async def _next_delay(self) -> float:
+        rows = await self._query(f"SELECT MIN(run_after) AS t FROM jobs WHERE {_READY}")
+        t = rows[0]["t"] if rows else None
+        return settings.JOB_POLL_INTERVAL if t is None else min(max(t - time.time(), 0.05), settings.JOB_POLL_INTERVAL)
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                if await self.run_one():
+                    continue
+                if time.time() - self._last_purge >= _PURGE_INTERVAL:
+                    await self.purge()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), await self._next_delay())
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[jobs] worker : {e}")
+                await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        # Tâches interrompues par un arrêt brutal : rejouées
+        self._execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(settings.JOB_WORKERS)]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._conn is not None:
+            with self._db_lock:
+                self._conn.close()
+                self._conn = None
+
+
+job_queue = JobQueue()
@@ -0,0 +1,253 @@
+"""
+services/keyderive.py
+─────────────────────
+Pool de processus dédié à la dérivation de clés (PBKDF2 600k itérations) avec
+contrôle d'admission.
+
+Le pre-stretching serveur de /g1nostr (Cabine-33, clients sans PBKDF2 natif)
+coûte ~1 s de CPU par requête. Exécuté sur l'executor par défaut, il saturait
+le pool de threads partagé avec tous les `asyncio.to_thread` de l'API
+(memory status, QR, coinflip…). Ici :
+
+  - ProcessPoolExecutor séparé (settings.KEYDERIVE_WORKERS processus), démarré
+    au lifespan — le GIL et l'executor par défaut ne sont plus touchés.
+  - File bornée : au-delà de settings.KEYDERIVE_MAX_PENDING dérivations en
+    cours/en attente, refus immédiat (KeyDerivationBusy → HTTP 429 +
+    Retry-After estimé sur la durée moyenne observée d'une dérivation).
+  - Équité par IP : une même IP ne peut avoir plus de
+    settings.KEYDERIVE_MAX_PER_IP dérivations en vol.
+  - Réutilisation : résultats mis en cache quelques minutes (clé = SHA-256
+    des entrées, jamais les entrées elles-mêmes) et requêtes identiques
+    simultanées fusionnées sur le même Future ; si l'appelant qui porte la
+    dérivation est annulé, un appelant en attente la reprend.
+  - Salt et pepper sont étirés par deux jobs parallèles sous une seule
+    place d'admission : la latence d'un /g1nostr est celle d'un PBKDF2.
+
+La dérivation du npub (ex-`tools/keygen -t nostr` via un fichier /dev/shm)
+tourne aussi dans ce pool, en mémoire : même chaîne que keygen —
+scrypt(pepper, salt, N=4096, r=16, p=1, 32 octets) (ScryptParams duniterpy
+par défaut) → clé privée secp256k1 → pubkey x-only → bech32 npub.
+
+API publique
+------------
+  start_pool() / shutdown_pool()                 (lifespan)
+  await stretch_credentials(salt, pepper, ip)    → (stretched_salt, stretched_pepper)
+  await derive_nostr_npub(salt, pepper, ip)      → npub1…
+  await run_internal(func, *args)                travaux serveur (sans admission)
+  with admitted(client_ip): …                    même admission pour un travail client
+                                                 (ex. clés d'une bbox, services/geogrid.py)
+  get_cached(kind, *inputs) / put_cached(...)    réutilisation entre étapes
+  KeyDerivationBusy(retry_after)                 exception d'admission
+"""
+
+import asyncio
+import base64
+import hashlib
+import logging
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+from core.config import settings
+from services.cache import named_cache
+
+logger = logging.getLogger(__name__)
+
+_PBKDF2_DOMAIN = b"uplanet-a4l-v1"
+_PBKDF2_ITERATIONS = 600000
+# ScryptParams duniterpy par défaut (SigningKey.from_credentials, keygen)
+_SCRYPT_N, _SCRYPT_R, _SCRYPT_P, _SEED_LENGTH = 4096, 16, 1, 32
+_RESULT_TTL = 120          # s — réutilisation des dérivations identiques
+
+_executor: Optional[ProcessPoolExecutor] = None
+_results = named_cache("keyderive", maxsize=512, ttl=_RESULT_TTL)
+_inflight: Dict[str, asyncio.Future] = {}
+_pending_by_ip: Dict[str, int] = {}
+_pending_total = 0
+_avg_job_seconds = 1.0     # moyenne glissante, sert au calcul de Retry-After
+
+
+class KeyDerivationBusy(Exception):
+    """Pool de dérivation saturé (globalement ou pour cette IP)."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Key derivation pool saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+# ── Fonctions exécutées dans les processus workers (doivent rester picklables) ─
+
+def _pbkdf2(value: str) -> str:
+    """PBKDF2-HMAC-SHA256 (600k iter, domain-salt 'uplanet-a4l-v1') d'une valeur.
+    Identique à la Phase 1 de atomic.html côté client."""
+    raw = hashlib.pbkdf2_hmac("sha256", value.encode(), _PBKDF2_DOMAIN, _PBKDF2_ITERATIONS)
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _credentials_seed(salt: str, pepper: str) -> bytes:
+    """Seed 32 octets de duniterpy SigningKey.from_credentials(salt, pepper)."""
+    return hashlib.scrypt(
+        pepper.encode(), salt=salt.encode(),
+        n=_SCRYPT_N, r=_SCRYPT_R, p=_SCRYPT_P, dklen=_SEED_LENGTH,
+    )
+
+
+def _nostr_hex(salt: str, pepper: str) -> Optional[str]:
+    """Pubkey NOSTR (hex x-only) dérivée des identifiants."""
+    from utils.crypto import _pt_mul, _SECP256K1_G, _SECP256K1_N
+    secret = int.from_bytes(_credentials_seed(salt, pepper), "big")
+    if not 0 < secret < _SECP256K1_N:
+        return None
+    x, _ = _pt_mul(_SECP256K1_G, secret)
+    return x.to_bytes(32, "big").hex()
+
+
+def _nostr_npub(salt: str, pepper: str) -> Optional[str]:
+    """npub NOSTR dérivé des identifiants — équivalent de `keygen -t nostr`."""
+    from utils.crypto import hex_to_npub
+    pubkey = _nostr_hex(salt, pepper)
+    return hex_to_npub(pubkey) if pubkey else None
+
+
+def _nostr_hex_many(pairs: List[Tuple[str, str]]) -> List[Optional[str]]:
+    """_nostr_hex sur un lot de (salt, pepper) — un seul aller-retour worker."""
+    return [_nostr_hex(salt, pepper) for salt, pepper in pairs]
+
+
+def _noop() -> None:
+    return None
+
+
+# ── Cycle de vie ────────────────────────────────────────────────────────────
+
+def start_pool() -> None:
+    """Démarre les workers (au lifespan, avant que l'API ne crée ses threads)."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max(1, settings.KEYDERIVE_WORKERS))
+        _executor.submit(_noop)
+        logger.info("Key derivation pool démarré (%d workers)", settings.KEYDERIVE_WORKERS)
+
+
+def shutdown_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _retry_after() -> int:
+    workers = max(1, settings.KEYDERIVE_WORKERS)
+    return max(1, math.ceil(_pending_total / workers * _avg_job_seconds))
+
+
+def _cache_key(kind: str, *parts: str) -> str:
+    h = hashlib.sha256(kind.encode())
+    for part in parts:
+        h.update(b"\0" + part.encode())
+    return h.hexdigest()
+
+
+@contextmanager
+def admitted(client_ip: str):
+    """Réserve une place dans la file (globale et par IP) le temps du bloc.
+    Lève KeyDerivationBusy si la file est pleine."""
+    global _pending_total
+    ip = client_ip or "unknown"
+    if _pending_total >= settings.KEYDERIVE_MAX_PENDING \
+            or _pending_by_ip.get(ip, 0) >= settings.KEYDERIVE_MAX_PER_IP:
+        retry = _retry_after()
+        logger.warning("Key derivation refusée (ip=%s, file=%d) — Retry-After %ds", ip, _pending_total, retry)
+        raise KeyDerivationBusy(retry)
+    _pending_total += 1
+    _pending_by_ip[ip] = _pending_by_ip.get(ip, 0) + 1
+    try:
+        yield
+    finally:
+        _pending_total -= 1
+        if _pending_by_ip.get(ip, 0) <= 1:
+            _pending_by_ip.pop(ip, None)
+        else:
+            _pending_by_ip[ip] -= 1
+
+
+async def run_derivation(kind: str, func: Callable, args: tuple, client_ip: str,
+                         per_arg: bool = False):
+    """Exécute func(*args) dans le pool, avec cache, fusion et admission.
+    Avec `per_arg`, func(arg) est soumis pour chaque argument en jobs parallèles
+    (une seule place d'admission) et le résultat est le tuple des sorties.
+    Lève KeyDerivationBusy si la file (globale ou IP) est pleine."""
+    global _avg_job_seconds
+    key = _cache_key(kind, *args)
+    while True:
+        if key in _results:
+            return _results[key]
+        fut = _inflight.get(key)
+        if fut is None:
+            break
+        try:
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            # Annulation de cet appelant, ou seulement de la dérivation partagée ?
+            if not fut.cancelled() or asyncio.current_task().cancelling():
+                raise
+
+    with admitted(client_ip):
+        if _executor is None:
+            start_pool()
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        _inflight[key] = fut
+        started = time.monotonic()
+        try:
+            if per_arg:
+                result = tuple(await asyncio.gather(*(
+                    loop.run_in_executor(_executor, func, arg) for arg in args
+                )))
+            else:
+                result = await loop.run_in_executor(_executor, func, *args)
+            _avg_job_seconds = 0.8 * _avg_job_seconds + 0.2 * (time.monotonic() - started)
+            _results[key] = result
+            fut.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as exc:
+            fut.set_exception(exc)
+            raise
+        finally:
+            _inflight.pop(key, None)
+
+
+async def run_internal(func: Callable, *args):
+    """Travail serveur dans le pool, hors admission : l'appelant borne lui-même
+    le volume soumis, ou l'encadre par admitted() s'il agit pour un client."""
+    if _executor is None:
+        start_pool()
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+
+def get_cached(kind: str, *parts: str):
+    """Résultat récent d'une dérivation `kind` sur ces entrées, ou None."""
+    return _results.get(_cache_key(kind, *parts))
+
+
+def put_cached(kind: str, value, *parts: str) -> None:
+    """Mémorise le résultat d'une dérivation faite hors pool (ex. keygen)."""
+    _results[_cache_key(kind, *parts)] = value
+
+
+async def stretch_credentials(salt: str, pepper: str, client_ip: str) -> Tuple[str, str]:
+    """Pre-stretching serveur (PBKDF2) de salt/pepper bruts dans le pool dédié,
+    un job par valeur."""
+    return await run_derivation("pbkdf2", _pbkdf2, (salt, pepper), client_ip, per_arg=True)
+
+
+async def derive_nostr_npub(salt: str, pepper: str, client_ip: str) -> Optional[str]:
+    """npub NOSTR de (salt, pepper) calculé dans le pool dédié, sans fichier temporaire."""
+    return await run_derivation("npub", _nostr_npub, (salt, pepper), client_ip)
@@ -0,0 +1,248 @@
+"""
+services/kubo.py
+────────────────
+Client unique de l'API HTTP Kubo (settings.IPFS_API, /api/v0).
+
+Les accès IPFS passaient par des chemins différents : `ipfs add`/`get`/`cat`
+/`pin rm` en sous-processus, une session aiohttp jetable pour les images, un
+httpx.AsyncClient partagé pour le reste. Tout passe désormais par KuboClient :
+
+  - une seule connexion keep-alive (httpx) vers le démon ;
+  - add en flux (bytes ou fichiers disque, un seul multipart pour plusieurs
+    entrées), options chunker / raw-leaves / cid-version issues de la
+    configuration (vides = réglages du nœud, donc mêmes CID que la CLI),
+    `only_hash=True` pour calculer un CID sans rien écrire (dédup) ;
+  - cat en mémoire, en flux ou vers un fichier ; stat (fichier ou répertoire) ;
+  - au plus settings.KUBO_MAX_CONCURRENCY appels simultanés ;
+  - latence par opération (nombre, erreurs, moyenne, max) : kubo.metrics(),
+    exposée par GET /health.
+
+Les méthodes lèvent KuboError ; les helpers tolérants de services/ipfs.py
+(kubo_add_bytes, kubo_cat…) retournent None/{} à la place.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+from urllib.parse import quote
+
+import httpx
+
+from core.config import settings
+
+Content = Union[bytes, Path]
+
+_READ_CHUNK = 256 * 1024  # octets lus par appel dans un thread
+
+
+async def _multipart(items: Dict[str, Content], boundary: str) -> AsyncIterator[bytes]:
+    """Corps multipart de /add ; les fichiers disque sont lus par blocs dans un
+    thread. Kubo décode les noms comme une URL (url.QueryUnescape) : ils sont
+    donc encodés de la même façon que par la CLI."""
+    for name, content in items.items():
+        yield (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+               f'filename="{quote(name, safe="")}"\r\n'
+               f"Content-Type: application/octet-stream\r\n\r\n").encode()
+        if isinstance(content, Path):
+            f = await asyncio.to_thread(open, content, "rb")
+            try:
+                while chunk := await asyncio.to_thread(f.read, _READ_CHUNK):
+                    yield chunk
+            finally:
+                f.close()
+        else:
+            yield content
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+class KuboError(Exception):
+    """Échec d'un appel à l'API Kubo (démon injoignable, erreur HTTP, timeout)."""
+
+
+class KuboClient:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        # {opération: [appels, erreurs, durée totale (s), durée max (s)]}
+        self._stats: Dict[str, List[float]] = {}
+
+    # ── Connexion ───────────────────────────────────────────────────────────
+
+    def http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=f"{settings.IPFS_API.rstrip('/')}/api/v0",
+                timeout=httpx.Timeout(30.0, connect=3.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @asynccontextmanager
+    async def _op(self, name: str):
+        """Limite de concurrence + mesure de latence ; convertit les erreurs en KuboError."""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(settings.KUBO_MAX_CONCURRENCY)
+        async with self._sem:
+            started = time.monotonic()
+            failed = True
+            try:
+                yield
+                failed = False
+            except (httpx.HTTPError, ValueError, KeyError, OSError) as e:
+                raise KuboError(f"{name}: {e}") from e
+            finally:
+                elapsed = time.monotonic() - started
+                stat = self._stats.setdefault(name, [0, 0, 0.0, 0.0])
+                stat[0] += 1
+                stat[1] += failed
+                stat[2] += elapsed
+                stat[3] = max(stat[3], elapsed)
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        return {name: {
+            "count": int(n), "errors": int(err),
+            "avg_ms": round(total / n * 1000, 1) if n else 0.0,
+            "max_ms": round(peak * 1000, 1),
+        } for name, (n, err, total, peak) in sorted(self._stats.items())}
+
+    # ── add ─────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _add_params(pin: bool, only_hash: bool) -> Dict[str, str]:
+        params = {"pin": str(pin and not only_hash).lower()}
+        if only_hash:
+            params["only-hash"] = "true"
+        if settings.IPFS_CHUNKER:
+            params["chunker"] = settings.IPFS_CHUNKER
+        if settings.IPFS_RAW_LEAVES is not None:
+            params["raw-leaves"] = str(settings.IPFS_RAW_LEAVES).lower()
+        if settings.IPFS_CID_VERSION is not None:
+            params["cid-version"] = str(settings.IPFS_CID_VERSION)
+        return params
+
+    async def add(self, items: Dict[str, Content], pin: bool = True,
+                  only_hash: bool = False, timeout: Optional[float] = 30.0) -> Dict[str, dict]:
+        """Ajoute plusieurs entrées en un seul multipart ; les fichiers disque sont
+        lus en flux hors de la boucle. Retourne {nom: {"Hash", "Size"}} (une
+        entrée par nom fourni)."""
+        if not items:
+            return {}
+        boundary = uuid.uuid4().hex
+        async with self._op("add.only_hash" if only_hash else "add"):
+            resp = await self.http().post(
+                "/add", params=self._add_params(pin, only_hash), content=_multipart(items, boundary),
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}, timeout=timeout,
+            )
+            resp.raise_for_status()
+            out = {}
+            for line in resp.text.splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    if entry.get("Name") in items and entry.get("Hash"):
+                        out[entry["Name"]] = {"Hash": entry["Hash"], "Size": int(entry.get("Size") or 0)}
+            return out
+
+    async def add_bytes(self, data: bytes, filename: str = "data", pin: bool = True,
+                        only_hash: bool = False) -> str:
+        res = await self.add({filename: data}, pin=pin, only_hash=only_hash)
+        if filename not in res:
+            raise KuboError(f"add: pas de CID pour {filename}")
+        return res[filename]["Hash"]
+
+    async def add_file(self, path: Path, pin: bool = True, only_hash: bool = False,
+                       timeout: Optional[float] = None) -> dict:
+        """Ajout en flux d'un fichier disque ; {"Hash", "Size"} (Size = taille DAG)."""
+        path = Path(path)
+        res = await self.add({path.name: path}, pin=pin, only_hash=only_hash, timeout=timeout)
+        if path.name not in res:
+            raise KuboError(f"add: pas de CID pour {path.name}")
+        return res[path.name]
+
+    # ── cat ─────────────────────────────────────────────────────────────────
+
+    async def cat(self, path: str, max_size: Optional[int] = None,
+                  timeout: Optional[float] = 30.0) -> bytes:
+        params = {"arg": path}
+        if max_size:
+            params["length"] = str(max_size)
+        async with self._op("cat"):
+            resp = await self.http().post("/cat", params=params, timeout=timeout)
+            resp.raise_for_status()
+            return resp.content
+
+    async def cat_stream(self, path: str, timeout: Optional[float] = 60.0) -> AsyncIterator[bytes]:
+        async with self._op("cat.stream"):
+            async with self.http().stream("POST", "/cat", params={"arg": path}, timeout=timeout) as resp:
+                resp.raise_for_status()
+                async for chunk in resp.aiter_bytes():
+                    yield chunk
+
+    async def cat_to_file(self, path: str, target: Path, timeout: float = 60.0) -> int:
+        """Équivalent de `ipfs get -o target` pour un fichier (pas un répertoire,
+        voir stat()) ; écriture atomique. Retourne la taille écrite."""
+        tmp = Path(target).with_name(f".{Path(target).name}.part")
+
+        async def download() -> int:
+            size = 0
+            f = await asyncio.to_thread(open, tmp, "wb")
+            try:
+                async for chunk in self.cat_stream(path, timeout=timeout):
+                    await asyncio.to_thread(f.write, chunk)
+                    size += len(chunk)
+            finally:
+                f.close()
+            return size
+
+        try:
+            size = await asyncio.wait_for(download(), timeout)
+            await asyncio.to_thread(os.replace, tmp, target)
+            return size
+        except asyncio.TimeoutError as e:
+            raise KuboError(f"cat {path}: timeout") from e
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    async def stat(self, path: str, timeout: Optional[float] = 30.0) -> dict:
+        """`ipfs files stat` d'un chemin /ipfs/… : {"Hash", "Type" ("file" ou
+        "directory"), "Size", "CumulativeSize", …}."""
+        return await self._post("files.stat", "/files/stat", {"arg": path}, timeout=timeout)
+
+    # ── pin / dag ───────────────────────────────────────────────────────────
+
+    async def _post(self, op: str, endpoint: str, params: dict, **kw) -> Any:
+        async with self._op(op):
+            resp = await self.http().post(endpoint, params=params, **kw)
+            resp.raise_for_status()
+            return resp.json()
+
+    async def pin_add(self, cid: str) -> None:
+        await self._post("pin.add", "/pin/add", {"arg": cid}, timeout=None)
+
+    async def pin_rm(self, cid: str) -> None:
+        await self._post("pin.rm", "/pin/rm", {"arg": cid})
+
+    async def pin_update(self, old: str, new: str) -> None:
+        await self._post("pin.update", "/pin/update", {"arg": [old, new], "unpin": "true"}, timeout=None)
+
+    async def dag_put(self, node: dict, store_codec: str = "dag-pb") -> str:
+        res = await self._post(
+            "dag.put", "/dag/put",
+            {"store-codec": store_codec, "input-codec": "dag-json", "pin": "false"},
+            files={"file": ("node.json", json.dumps(node).encode(), "application/json")},
+        )
+        return res["Cid"]["/"]
+
+
+kubo = KuboClient()
@@ -10,14 +10,28 @@ que Astroport.ONE/IA/memory_manager.py, bro/identity.py, bro/love_handler.sh —
 jamais de duplication. Les appels Qdrant passent par memory_manager.py en
 sous-processus (mêmes creds/URL Qdrant que le reste de BRO, une seule logique
 d'auth Qdrant dans tout le projet).
+
+Coût par appel réduit à quelques stat() :
+  - Résultats par fichier (nombre de messages, de lignes…) mis en cache,
+    indexés par (mtime, taille) : un fichier inchangé n'est jamais re-parsé.
+  - Compteurs Qdrant (un seul appel `slot-counts` groupé pour tous les slots)
+    mis en cache par compte ; une tâche de fond (lancée au lifespan) les
+    rafraîchit pour les comptes consultés récemment, si bien que les pages
+    /mailjet et /atom4love/profile ne lancent plus le sous-processus.
 """
 
+import asyncio
+import functools
 import json
+import logging
 import subprocess
 import sys
+import time
 from pathlib import Path
+from typing import Callable, Dict
 
 from core.config import settings, ASTRO_PYTHON
+from services.cache import named_cache
 
 _IA_PATH    = settings.ZEN_PATH / "Astroport.ONE" / "IA"
 _MEMORY_MGR = _IA_PATH / "memory_manager.py"
@@ -78,6 +92,32 @@ def _file_stat(path: Path) -> dict:
         return {"exists": False, "size_bytes": 0, "modified_at": None}
 
 
+# ── Cache des résultats par fichier, indexé par (mtime_ns, taille) ──────────
+
+_file_cache = named_cache("memory_files", maxsize=8192)
+
+
+def _cached_by_stat(kind: str):
+    """Décorateur : compute(path) réutilisé tant que le fichier n'a pas changé."""
+    def decorator(compute: Callable[[Path], object]) -> Callable[[Path], object]:
+        @functools.wraps(compute)
+        def wrapper(path: Path):
+            try:
+                st = path.stat()
+            except OSError:
+                return compute(path)
+            key, sig = (kind, str(path)), (st.st_mtime_ns, st.st_size)
+            hit = _file_cache.get(key)
+            if hit is not None and hit[0] == sig:
+                return hit[1]
+            value = compute(path)
+            _file_cache[key] = (sig, value)
+            return value
+        return wrapper
+    return decorator
+
+
+@_cached_by_stat("json")
 def _json_message_count(path: Path) -> int:
     """Nombre de messages dans un fichier slot*.json ({"messages": [...]})
     ou dans un array JSON simple (love/memories.json, love/dialog.json)."""
@@ -92,6 +132,7 @@ def _json_message_count(path: Path) -> int:
     return 0
 
 
+@_cached_by_stat("lines")
 def _count_lines(path: Path) -> int:
     try:
         with open(path, encoding="utf-8") as f:
@@ -100,6 +141,7 @@ def _count_lines(path: Path) -> int:
         return 0
 
 
+@_cached_by_stat("prefs")
 def _preferences_line_count(path: Path) -> int:
     try:
         return sum(1 for line in path.read_text(encoding="utf-8").splitlines()
@@ -108,6 +150,15 @@ def _preferences_line_count(path: Path) -> int:
         return 0
 
 
+@_cached_by_stat("cookies")
+def _cookie_domains(path: Path) -> list:
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return []
+    return sorted(d for d in manifest if not d.startswith("_"))
+
+
 def _qdrant_slot_counts(email: str, slots: list) -> dict:
     if not _MEMORY_MGR.exists():
         return {}
@@ -122,6 +173,57 @@ def _qdrant_slot_counts(email: str, slots: list) -> dict:
         return {}
 
 
+# ── Compteurs Qdrant en cache, rafraîchis en tâche de fond ──────────────────
+
+_QDRANT_STALE_FACTOR = 5   # au-delà de TTL × 5, recalcul synchrone (tâche de fond absente)
+# email → (date du calcul, compteurs) ; une entrée plus vieille que
+# TTL × _QDRANT_STALE_FACTOR n'est plus servie, elle peut donc expirer
+_qdrant_cache = named_cache(
+    "qdrant_counts", maxsize=4096, ttl=settings.MEMORY_STATUS_QDRANT_TTL * _QDRANT_STALE_FACTOR,
+)
+_recently_viewed: Dict[str, float] = {}
+
+
+def _qdrant_counts_cached(email: str) -> dict:
+    """Compteurs Qdrant de tous les slots, depuis le cache si disponible."""
+    now = time.time()
+    _recently_viewed[email] = now
+    entry = _qdrant_cache.get(email)
+    if entry is not None and now - entry[0] < settings.MEMORY_STATUS_QDRANT_TTL * _QDRANT_STALE_FACTOR:
+        return entry[1]
+    counts = _qdrant_slot_counts(email, ALL_SLOTS)
+    _qdrant_cache[email] = (time.time(), counts)
+    return counts
+
+
+def refresh_active_qdrant_counts() -> int:
+    """Rafraîchit les compteurs périmés des comptes consultés dans la fenêtre
+    MEMORY_STATUS_ACTIVE_WINDOW. Retourne le nombre de comptes rafraîchis.
+    Appel bloquant — via asyncio.to_thread()."""
+    now = time.time()
+    refreshed = 0
+    for email, seen in list(_recently_viewed.items()):
+        if now - seen > settings.MEMORY_STATUS_ACTIVE_WINDOW:
+            _recently_viewed.pop(email, None)
+            _qdrant_cache.pop(email, None)
+            continue
+        entry = _qdrant_cache.get(email)
+        if entry is None or now - entry[0] >= settings.MEMORY_STATUS_QDRANT_TTL:
+            _qdrant_cache[email] = (time.time(), _qdrant_slot_counts(email, ALL_SLOTS))
+            refreshed += 1
+    return refreshed
+
+
+async def refresh_loop() -> None:
+    """Tâche de fond (lifespan) : compteurs Qdrant des comptes actifs."""
+    while True:
+        await asyncio.sleep(settings.MEMORY_STATUS_QDRANT_TTL / 2)
+        try:
+            await asyncio.to_thread(refresh_active_qdrant_counts)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"memory_status refresh failed: {e}")
+
+
 def _delete_qdrant_slots(email: str, slots: list) -> None:
     if not _MEMORY_MGR.exists():
         return
@@ -140,8 +242,9 @@ def get_memory_status(email: str) -> dict:
     """État complet des mémoires d'un MULTIPASS — fichiers locaux + Qdrant.
     Best-effort : un module indisponible (Qdrant down) donne juste des
     compteurs à 0/indisponible, jamais une exception qui casserait la page.
-    Appel bloquant (I/O disque + un sous-processus) — à exécuter via
-    asyncio.to_thread() depuis un handler FastAPI."""
+    Appel bloquant (quelques stat(), parfois un sous-processus Qdrant au
+    premier appel d'un compte) — à exécuter via asyncio.to_thread() depuis
+    un handler FastAPI."""
     user_dir     = _user_dir(email)
     fm_dir       = _flashmem_dir(email)
     love_dir     = fm_dir / "love"
@@ -174,16 +277,9 @@ def get_memory_status(email: str) -> dict:
         "preferences_history_entries": _count_lines(identity_dir / ".Preferences.history.jsonl"),
     }
 
-    cookie_manifest = {}
-    manifest_path = user_dir / ".cookie_manifest.json"
-    if manifest_path.exists():
-        try:
-            cookie_manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
-        except Exception:
-            cookie_manifest = {}
-    cookie_domains = sorted(d for d in cookie_manifest if not d.startswith("_"))
+    cookie_domains = _cookie_domains(user_dir / ".cookie_manifest.json")
 
-    qdrant_counts = _qdrant_slot_counts(email, ALL_SLOTS)
+    qdrant_counts = _qdrant_counts_cached(email)
     qdrant_available = bool(qdrant_counts)
 
     def _qc(slot: int) -> int:
@@ -212,6 +308,25 @@ def get_memory_status(email: str) -> dict:
     }
 
 
+def empty_memory_status(email: str) -> dict:
+    """Même structure que get_memory_status, compteurs à zéro et Qdrant
+    indisponible — valeur de repli d'une page rendue en mode dégradé."""
+    missing = {"exists": False, "size_bytes": 0, "modified_at": None}
+    return {
+        "email": email,
+        "conversations": {"slots_present": [], "message_count": 0, "size_bytes": 0, "qdrant_points": 0},
+        "bro_memory": {**missing, "message_count": 0, "qdrant_points": 0},
+        "persona": {**missing, "message_count": 0, "qdrant_points": 0},
+        "love": {"memories_count": 0, "dialog_count": 0, "matches_count": 0, "has_profile": False,
+                 "size_bytes": 0, "qdrant_points": 0},
+        "identity": {"core_bytes": 0, "style_bytes": 0, "rules_bytes": 0, "objectifs_bytes": 0,
+                     "preferences_lines": 0, "preferences_history_entries": 0},
+        "cookies": {"domains": [], "count": 0},
+        "can_regenerate_from_mastodon": False,
+        "qdrant": {"available": False, "slots": {}, "total_points": 0},
+    }
+
+
 IDENTITY_LABELS = {
     ".Core.md": "Qui je suis", ".Style.md": "Mon style", ".Rules.md": "Mes limites",
     ".Preferences.md": "Mes préférences", ".Objectifs.md": "Mes objectifs",
@@ -284,6 +399,7 @@ def reset_memory(email: str, scope: str) -> dict:
     journal). Appel bloquant — à exécuter via asyncio.to_thread()."""
     if scope not in RESET_SCOPES:
         raise ValueError(f"scope inconnu : {scope}")
+    _qdrant_cache.pop(email, None)
 
     user_dir     = _user_dir(email)
     fm_dir       = _flashmem_dir(email)
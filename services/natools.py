@@ -0,0 +1,81 @@
+"""
+services/natools.py
+───────────────────
+Sealed box NaCl en mémoire, compatible avec tools/natools.py (format pubsec
+duniterpy) — sans interpréteur externe ni fichier temporaire.
+
+  seal(data, g1pub)        ≡ natools.py encrypt -p <g1pub>
+                             PublicKey(g1pub).encrypt_seal(data) : crypto_box_seal
+                             vers la clé curve25519 dérivée de la pubkey ed25519.
+  unseal(data, dunikey)    ≡ natools.py decrypt -f pubsec -k <dunikey>
+                             SigningKey.from_pubsec_file(dunikey).decrypt_seal(data)
+
+Nécessite PyNaCl (libsodium) ; NACL_AVAILABLE indique sa présence pour que
+les appelants puissent retomber sur natools.py.
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional, Tuple
+
+try:
+    from nacl import bindings as _nacl
+    NACL_AVAILABLE = True
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    _nacl = None
+    NACL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class NatoolsError(Exception):
+    """Clé invalide ou message scellé illisible."""
+
+
+def _b58decode(value: str) -> bytes:
+    from services.g1_squid import _b58decode as b58
+    try:
+        return b58(value.strip())
+    except ValueError as e:
+        raise NatoolsError(f"Base58 invalide : {e}")
+
+
+def read_pubsec(path: Path) -> Tuple[bytes, bytes]:
+    """(seed ed25519 32 octets, pubkey 32 octets) depuis un fichier .dunikey PubSec."""
+    fields = {}
+    for line in Path(path).read_text().splitlines():
+        if ":" in line:
+            key, value = line.split(":", 1)
+            fields[key.strip().lower()] = value.strip()
+    if "sec" not in fields:
+        raise NatoolsError(f"{path} n'est pas un fichier PubSec")
+    sec = _b58decode(fields["sec"])
+    if len(sec) != 64:
+        raise NatoolsError(f"Clé secrète PubSec de longueur {len(sec)} (64 attendus)")
+    return sec[:32], sec[32:]
+
+
+def seal(data: bytes, g1pub: str) -> bytes:
+    """Chiffre `data` pour la g1pub (Base58) — sortie identique au format natools."""
+    pk = _b58decode(g1pub)
+    if len(pk) != 32:
+        raise NatoolsError(f"Clé publique de longueur {len(pk)} (32 attendus)")
+    try:
+        return _nacl.crypto_box_seal(data, _nacl.crypto_sign_ed25519_pk_to_curve25519(pk))
+    except Exception as e:
+        raise NatoolsError(f"Chiffrement impossible : {e}")
+
+
+def unseal(data: bytes, dunikey: Path) -> Optional[bytes]:
+    """Déchiffre un message scellé avec la clé PubSec `dunikey`. None si illisible."""
+    seed, _ = read_pubsec(dunikey)
+    pk, sk = _nacl.crypto_sign_seed_keypair(seed)
+    try:
+        return _nacl.crypto_box_seal_open(
+            data,
+            _nacl.crypto_sign_ed25519_pk_to_curve25519(pk),
+            _nacl.crypto_sign_ed25519_sk_to_curve25519(sk),
+        )
+    except Exception as e:
+        logger.warning(f"natools unseal failed ({Path(dunikey).parent.name}): {e}")
+        return None
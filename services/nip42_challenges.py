@@ -0,0 +1,201 @@
+"""
+services/nip42_challenges.py
+────────────────────────────
+Nonces NIP-42 à usage unique émis par GET /api/nip42/challenge.
+
+services/nostr.py les gardait dans un dict de module sans limite, purgé
+seulement quand le même pubkey était relu : une rafale de demandes avec des
+npubs aléatoires faisait grossir la mémoire sans fin, et un nonce émis par un
+worker uvicorn était inconnu des autres. ChallengeStore :
+
+  - capacité dure settings.NIP42_CHALLENGE_CAPACITY : au-delà, les nonces les
+    plus anciens sont évincés ;
+  - expiration par créneaux de settings.NIP42_CHALLENGE_BUCKET secondes : les
+    nonces sont rangés par créneau d'émission et un créneau entièrement
+    expiré est supprimé d'un bloc (mémoire : un seul dict par créneau ;
+    SQLite : un DELETE sur la colonne indexée `bucket`) ;
+  - settings.NIP42_CHALLENGE_DB (fichier SQLite local, WAL) partage les
+    nonces entre workers ; la consommation y est un DELETE … RETURNING,
+    donc un nonce ne sert qu'une fois même si deux workers le réclament.
+    Non défini : stockage en mémoire du processus.
+
+bench_nip42_challenges.py mesure les deux variantes avec 100 000 nonces en
+attente.
+"""
+
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from core.config import settings
+
+NIP42_CHALLENGE_TTL = 120  # seconds
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS challenges (
+    pubkey  TEXT PRIMARY KEY,
+    nonce   TEXT NOT NULL,
+    issued  REAL NOT NULL,
+    bucket  INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS challenges_bucket ON challenges (bucket, issued);
+"""
+
+
+class ChallengeStore:
+    def __init__(self, capacity: Optional[int] = None, ttl: float = NIP42_CHALLENGE_TTL,
+                 bucket: Optional[float] = None, db_path: Optional[Path] = None):
+        self.capacity = capacity or settings.NIP42_CHALLENGE_CAPACITY
+        self.ttl = ttl
+        self.bucket = bucket or settings.NIP42_CHALLENGE_BUCKET
+        self._db_path = db_path if db_path is not None else settings.NIP42_CHALLENGE_DB
+        self._lock = threading.Lock()
+        # Mémoire : {créneau: {pubkey: (nonce, émis à)}}, créneaux par ordre d'émission
+        self._buckets: "OrderedDict[int, Dict[str, Tuple[str, float]]]" = OrderedDict()
+        self._slot: Dict[str, int] = {}            # pubkey → créneau courant
+        # SQLite
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_size = 0                          # estimation, recalée à chaque purge
+        self._next_purge = 0.0
+
+    def _bucket_of(self, ts: float) -> int:
+        return int(ts // self.bucket)
+
+    # ── API ─────────────────────────────────────────────────────────────────
+
+    def issue(self, hex_pubkey: str) -> str:
+        """Émet un nouveau nonce pour `hex_pubkey` (remplace le précédent)."""
+        nonce = secrets.token_hex(32)
+        now = time.time()
+        with self._lock:
+            if self._db_path:
+                self._db_issue(hex_pubkey, nonce, now)
+            else:
+                self._mem_issue(hex_pubkey, nonce, now)
+        return nonce
+
+    def peek(self, hex_pubkey: str) -> Optional[str]:
+        """Nonce actif de `hex_pubkey` sans le consommer, ou None."""
+        with self._lock:
+            if self._db_path:
+                row = self._db().execute(
+                    "SELECT nonce, issued FROM challenges WHERE pubkey = ?", (hex_pubkey,)
+                ).fetchone()
+            else:
+                slot = self._slot.get(hex_pubkey)
+                row = None if slot is None else self._buckets[slot][hex_pubkey]
+        return self._fresh(row)
+
+    def consume(self, hex_pubkey: str) -> Optional[str]:
+        """Retourne et supprime le nonce (usage unique), ou None."""
+        with self._lock:
+            if self._db_path:
+                row = self._db().execute(
+                    "DELETE FROM challenges WHERE pubkey = ? RETURNING nonce, issued", (hex_pubkey,)
+                ).fetchone()
+            else:
+                slot = self._slot.pop(hex_pubkey, None)
+                row = None if slot is None else self._buckets[slot].pop(hex_pubkey)
+        return self._fresh(row)
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._db_path:
+                return self._db().execute("SELECT COUNT(*) FROM challenges").fetchone()[0]
+            return len(self._slot)
+
+    def _fresh(self, row) -> Optional[str]:
+        if row is None:
+            return None
+        nonce, issued = row
+        return nonce if time.time() - issued <= self.ttl else None
+
+    # ── Mémoire ─────────────────────────────────────────────────────────────
+
+    def _mem_issue(self, hex_pubkey: str, nonce: str, now: float) -> None:
+        old = self._slot.pop(hex_pubkey, None)
+        if old is not None:
+            del self._buckets[old][hex_pubkey]
+        self._mem_expire(now)
+        while len(self._slot) >= self.capacity:
+            self._mem_evict_oldest()
+        slot = self._bucket_of(now)
+        if slot not in self._buckets:
+            self._buckets[slot] = {}
+        self._buckets[slot][hex_pubkey] = (nonce, now)
+        self._slot[hex_pubkey] = slot
+
+    def _mem_expire(self, now: float) -> None:
+        """Supprime les créneaux dont tous les nonces ont expiré."""
+        horizon = self._bucket_of(now - self.ttl)
+        while self._buckets:
+            slot = next(iter(self._buckets))
+            if slot >= horizon:
+                break
+            for hex_pubkey in self._buckets.pop(slot):
+                del self._slot[hex_pubkey]
+
+    def _mem_evict_oldest(self) -> None:
+        slot = next(iter(self._buckets))
+        entries = self._buckets[slot]
+        if not entries:
+            del self._buckets[slot]
+            return
+        hex_pubkey = next(iter(entries))
+        del entries[hex_pubkey]
+        del self._slot[hex_pubkey]
+
+    # ── SQLite ──────────────────────────────────────────────────────────────
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            path = Path(self._db_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(path), timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            self._db_size = conn.execute("SELECT COUNT(*) FROM challenges").fetchone()[0]
+        return self._conn
+
+    def _db_issue(self, hex_pubkey: str, nonce: str, now: float) -> None:
+        conn = self._db()
+        # Les autres workers insèrent aussi : la taille n'est qu'estimée ici,
+        # la purge (créneaux expirés puis plus anciens au-delà de la capacité)
+        # la recale au plus tard chaque seconde.
+        if now >= self._next_purge or self._db_size >= self.capacity:
+            self._db_purge(conn, now)
+        conn.execute(
+            "INSERT OR REPLACE INTO challenges (pubkey, nonce, issued, bucket) VALUES (?, ?, ?, ?)",
+            (hex_pubkey, nonce, now, self._bucket_of(now)),
+        )
+        self._db_size += 1
+
+    def _db_purge(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM challenges WHERE bucket < ?", (self._bucket_of(now - self.ttl),))
+            size = conn.execute("SELECT COUNT(*) FROM challenges").fetchone()[0]
+            # Sous saturation, on libère 1 % de marge pour ne pas recompter à
+            # chaque émission.
+            excess = size - self.capacity + max(1, self.capacity // 100) if size >= self.capacity else 0
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM challenges WHERE pubkey IN "
+                    "(SELECT pubkey FROM challenges ORDER BY bucket, issued LIMIT ?)", (excess,),
+                )
+                size -= excess
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._db_size = size
+        self._next_purge = now + 1.0
+
+
+challenge_store = ChallengeStore()
@@ -0,0 +1,232 @@
+"""
+services/nip42_sessions.py
+──────────────────────────
+Table mémoire des authentifications NIP-42 (kind 22242), par clé hex.
+
+verify_nostr_auth → check_nip42_auth_local_marker résolvait le répertoire
+utilisateur, faisait un stat() puis lisait et parsait le marker
+.nip42_auth_<hex> à chaque requête authentifiée. Ici :
+
+  - nip42_sessions.check(hex) répond depuis {hex: Nip42Session}, sans accès
+    disque ; une session porte son expiration, l'id de l'événement 22242 et
+    le répertoire utilisateur où le marker a été trouvé — celui du MULTIPASS
+    propriétaire de la clé (utils.security.find_email_by_hex), un marker
+    posé dans le répertoire d'un autre compte est ignoré ;
+  - la table est alimentée par :
+      · un scan de fond (settings.NIP42_SCAN_INTERVAL) : un répertoire
+        ~/.zen/game/nostr/<email> n'est relu que si son mtime a changé,
+        les markers connus sont re-stat()és (réécrit → rechargé,
+        supprimé → session révoquée) ;
+      · la socket Unix settings.NIP42_NOTIFY_SOCKET, où le filtre du relai
+        peut pousser une ligne JSON par événement :
+            {"pubkey": "<hex>", "event_hash": "<id>", "created_at": <ts>}
+            {"pubkey": "<hex>", "revoke": true}
+      · check_nip42_auth_local_marker (chemin lent, après un échec mémoire) ;
+  - l'expiration suit une roue temporelle à créneaux d'une seconde, avancée
+    par la même tâche de fond.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+from services.nostr import NIP42_MARKER_MAX_AGE, NIP42_MARKER_PREFIX, read_nip42_marker
+
+logger = logging.getLogger(__name__)
+
+_HEX_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+@dataclass
+class Nip42Session:
+    expires: float
+    event_hash: str = ""
+    user_dir: Optional[Path] = None
+
+
+class Nip42Sessions:
+    def __init__(self):
+        self._sessions: Dict[str, Nip42Session] = {}
+        self._wheel: Dict[int, Set[str]] = {}     # seconde d'expiration → clés
+        self._cursor = int(time.time())           # dernier créneau traité
+        self._dirs: Dict[str, int] = {}           # répertoire email → mtime_ns
+        self._markers: Dict[str, int] = {}        # chemin du marker → mtime_ns
+        self._task: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # ── Table ───────────────────────────────────────────────────────────────
+
+    def grant(self, hex_pubkey: str, expires: float, event_hash: str = "",
+              user_dir: Optional[Path] = None) -> None:
+        hex_pubkey = hex_pubkey.lower()
+        if expires <= time.time():
+            return
+        self._sessions[hex_pubkey] = Nip42Session(expires, event_hash, user_dir)
+        self._wheel.setdefault(math.ceil(expires), set()).add(hex_pubkey)
+
+    def revoke(self, hex_pubkey: str) -> None:
+        if self._sessions.pop(hex_pubkey.lower(), None) is not None:
+            logger.info(f"NIP-42 session révoquée pour {hex_pubkey[:16]}…")
+
+    def get(self, hex_pubkey: str) -> Optional[Nip42Session]:
+        session = self._sessions.get(hex_pubkey.lower())
+        if session is None or session.expires <= time.time():
+            return None
+        return session
+
+    def check(self, hex_pubkey: str) -> bool:
+        return self.get(hex_pubkey) is not None
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Avance la roue jusqu'à `now` ; retourne le nombre de sessions retirées."""
+        now = time.time() if now is None else now
+        target = int(now)
+        if target - self._cursor > len(self._wheel):
+            slots = [s for s in self._wheel if s <= target]
+        else:
+            slots = range(self._cursor + 1, target + 1)
+        removed = 0
+        for slot in slots:
+            for hex_pubkey in self._wheel.pop(slot, ()):
+                session = self._sessions.get(hex_pubkey)
+                # Session renouvelée entre-temps : elle a son propre créneau
+                if session is not None and session.expires <= now:
+                    del self._sessions[hex_pubkey]
+                    removed += 1
+        self._cursor = max(self._cursor, target)
+        return removed
+
+    # ── Markers ─────────────────────────────────────────────────────────────
+
+    def _scan_markers(self) -> List[Tuple[str, Optional[Nip42Session]]]:
+        """(hex, session | None pour révoquer) des markers nouveaux, modifiés ou
+        supprimés depuis le dernier passage. Exécuté dans un thread."""
+        from utils.security import find_email_by_hex
+        base = settings.GAME_PATH / "nostr"
+        try:
+            with os.scandir(base) as it:
+                for entry in it:
+                    if "@" not in entry.name or not entry.is_dir():
+                        continue
+                    mtime = entry.stat().st_mtime_ns
+                    if self._dirs.get(entry.path) == mtime:
+                        continue
+                    self._dirs[entry.path] = mtime
+                    with os.scandir(entry.path) as files:
+                        for f in files:
+                            if f.name.startswith(NIP42_MARKER_PREFIX):
+                                self._markers.setdefault(f.path, 0)
+        except OSError as e:
+            logger.debug(f"NIP-42 scan {base}: {e}")
+
+        changes: List[Tuple[str, Optional[Nip42Session]]] = []
+        for path, known in list(self._markers.items()):
+            hex_pubkey = os.path.basename(path)[len(NIP42_MARKER_PREFIX):].lower()
+            if not _HEX_RE.match(hex_pubkey):
+                del self._markers[path]
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._markers[path]
+                changes.append((hex_pubkey, None))
+                continue
+            if st.st_mtime_ns == known:
+                continue
+            self._markers[path] = st.st_mtime_ns
+            expires = st.st_mtime + NIP42_MARKER_MAX_AGE
+            if expires <= time.time():
+                continue
+            user_dir = Path(path).parent
+            if find_email_by_hex(hex_pubkey) != user_dir.name:
+                logger.warning(f"NIP-42 marker hors du MULTIPASS de {hex_pubkey[:16]}… ignoré : {path}")
+                continue
+            event_hash = read_nip42_marker(Path(path), hex_pubkey)
+            session = None if event_hash is None else Nip42Session(expires, event_hash, user_dir)
+            changes.append((hex_pubkey, session))
+        return changes
+
+    async def scan(self) -> None:
+        for hex_pubkey, session in await asyncio.to_thread(self._scan_markers):
+            if session is None:
+                self.revoke(hex_pubkey)
+            else:
+                self.grant(hex_pubkey, session.expires, session.event_hash, session.user_dir)
+
+    # ── Notifications du relai ──────────────────────────────────────────────
+
+    def notify(self, message: dict) -> None:
+        hex_pubkey = str(message.get("pubkey", "")).lower()
+        if not _HEX_RE.match(hex_pubkey):
+            return
+        if message.get("revoke"):
+            self.revoke(hex_pubkey)
+            return
+        event_hash = str(message.get("event_hash", "")).lower()
+        if event_hash and not _HEX_RE.match(event_hash):
+            return
+        created_at = min(float(message.get("created_at") or time.time()), time.time())
+        self.grant(hex_pubkey, created_at + NIP42_MARKER_MAX_AGE, event_hash)
+
+    async def _on_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            async for line in reader:
+                try:
+                    self.notify(json.loads(line))
+                except (ValueError, TypeError, AttributeError):
+                    logger.debug(f"NIP-42 notification ignorée : {line[:120]!r}")
+        finally:
+            writer.close()
+
+    async def _listen(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            path.unlink()
+        self._server = await asyncio.start_unix_server(self._on_client, path=str(path))
+        os.chmod(path, 0o600)
+
+    # ── Cycle de vie ────────────────────────────────────────────────────────
+
+    async def _loop(self) -> None:
+        next_scan = 0.0
+        while True:
+            try:
+                now = time.time()
+                self.expire(now)
+                if now >= next_scan:
+                    next_scan = now + settings.NIP42_SCAN_INTERVAL
+                    await self.scan()
+            except Exception as e:
+                logger.error(f"NIP-42 sessions : {e}")
+            await asyncio.sleep(1.0)
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        try:
+            await self._listen(settings.NIP42_NOTIFY_SOCKET)
+        except OSError as e:
+            logger.warning(f"NIP-42 socket {settings.NIP42_NOTIFY_SOCKET} indisponible : {e}")
+        self._cursor = int(time.time())
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+nip42_sessions = Nip42Sessions()
@@ -2,7 +2,6 @@ import json
 import os
 import re
 import time
-import secrets
 import logging
 logger = logging.getLogger(__name__)
 import asyncio
@@ -12,7 +11,8 @@ from datetime import datetime, timezone
 from fastapi import HTTPException, Form, Depends, Request
 
 from core.config import settings
-from core.state import app_state
+from services.cache import named_cache
+from services.nostr_profiles import profile_store
 
 # ── NIP-42 local-marker constants ────────────────────────────────────────────
 # Marker filename includes the hex pubkey to prevent pubkey-confusion attacks.
@@ -20,45 +20,32 @@ NIP42_MARKER_PREFIX  = ".nip42_auth_"   # + hex_pubkey  → e.g. .nip42_auth_3bf
 NIP42_MARKER_MAX_AGE = 3600             # 1 heure – délai raisonnable pour uploads volumineux
 
 # ── Dynamic challenge store ────────────────────────────────────────────────────
-# Maps hex_pubkey → (nonce, issued_at_unix).
-# A fresh nonce is generated per authentication demand; it is consumed once.
-# TTL: 120 s (the client must sign and respond within 2 minutes).
-_nip42_challenge_store: Dict[str, Tuple[str, float]] = {}
-NIP42_CHALLENGE_TTL = 120  # seconds
+# One fresh nonce per authentication demand, consumed once; the client must
+# sign and respond within NIP42_CHALLENGE_TTL. Storage (bounded, expiring,
+# optionally shared between workers) lives in services/nip42_challenges.py.
+from services.nip42_challenges import NIP42_CHALLENGE_TTL, challenge_store
 
 
 def generate_nip42_challenge(hex_pubkey: str) -> str:
-    """Generate a one-time nonce for a pubkey and store it in memory.
+    """Generate a one-time nonce for a pubkey and store it.
 
     The caller (e.g. GET /api/nip42/challenge) sends this nonce to the client.
     The client must embed it in the ``challenge`` tag of a kind-22242 event,
     sign the event, and return the event_id.  The API then verifies the marker.
     """
-    nonce = secrets.token_hex(32)          # 64-char cryptographically random hex
-    _nip42_challenge_store[hex_pubkey] = (nonce, time.time())
+    nonce = challenge_store.issue(hex_pubkey)
     logger.info(f"🔑 NIP-42 challenge issued for {hex_pubkey[:16]}…: {nonce[:16]}…")
     return nonce
 
 
 def get_nip42_challenge(hex_pubkey: str) -> Optional[str]:
     """Return the active challenge for *hex_pubkey*, or None if expired/absent."""
-    entry = _nip42_challenge_store.get(hex_pubkey)
-    if not entry:
-        return None
-    nonce, issued_at = entry
-    if time.time() - issued_at > NIP42_CHALLENGE_TTL:
-        _nip42_challenge_store.pop(hex_pubkey, None)
-        logger.debug(f"NIP-42 challenge expired for {hex_pubkey[:16]}…")
-        return None
-    return nonce
+    return challenge_store.peek(hex_pubkey)
 
 
 def consume_nip42_challenge(hex_pubkey: str) -> Optional[str]:
     """Return and *delete* the challenge (one-time-use semantics)."""
-    nonce = get_nip42_challenge(hex_pubkey)
-    _nip42_challenge_store.pop(hex_pubkey, None)
-    return nonce
-
+    return challenge_store.consume(hex_pubkey)
 
 
 def get_nostr_relay_url() -> str:
@@ -335,6 +322,46 @@ def validate_nip42_event(event: Dict[str, Any], expected_relay_url: str) -> bool
         logger.error(f"Erreur lors de la validation de l'événement NIP42: {e}")
         return False
 
+def read_nip42_marker(auth_marker, hex_pubkey: str) -> Optional[str]:
+    """Contenu d'un marker ``.nip42_auth_<hex>`` : event_hash ("" si absent ou
+    format legacy vide/non-JSON), ou None si le marker doit être rejeté."""
+    try:
+        raw = auth_marker.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    if not raw:
+        # Empty file – legacy support, accept but log warning
+        logger.warning(
+            f"⚠️  NIP-42 marker is EMPTY for {hex_pubkey[:16]}… "
+            f"— legacy format accepted (upgrade ajouter_media.sh)"
+        )
+        return ""
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        # Non-JSON file – legacy support, accept but log warning
+        logger.warning(
+            f"⚠️  NIP-42 marker is non-JSON for {hex_pubkey[:16]}… "
+            f"— legacy format accepted (upgrade ajouter_media.sh)"
+        )
+        return ""
+    stored_pubkey = data.get("pubkey", "").lower().strip()
+    if stored_pubkey != hex_pubkey.lower():
+        logger.warning(
+            f"⚠️  NIP-42 marker pubkey mismatch for {hex_pubkey[:16]}… "
+            f"(stored: {stored_pubkey[:16]}…) — possible tampering"
+        )
+        return None
+    event_hash = data.get("event_hash", "")
+    if event_hash and not (len(event_hash) == 64 and all(c in "0123456789abcdef" for c in event_hash)):
+        logger.warning(
+            f"⚠️  NIP-42 marker event_hash invalid for {hex_pubkey[:16]}… "
+            f"— rejecting"
+        )
+        return None
+    return event_hash
+
+
 async def check_nip42_auth_local_marker(hex_pubkey: str) -> bool:
     """
     Fallback NIP-42 auth: check for a secure local marker file written by
@@ -372,7 +399,8 @@ async def check_nip42_auth_local_marker(hex_pubkey: str) -> bool:
             return False
 
         # ── B. TTL check ──────────────────────────────────────────────────────
-        marker_age = time.time() - auth_marker.stat().st_mtime
+        mtime = auth_marker.stat().st_mtime
+        marker_age = time.time() - mtime
         if marker_age >= NIP42_MARKER_MAX_AGE:
             logger.warning(
                 f"⚠️  NIP-42 marker expired for {hex_pubkey[:16]}… "
@@ -381,49 +409,16 @@ async def check_nip42_auth_local_marker(hex_pubkey: str) -> bool:
             return False
 
         # ── C. JSON content validation ────────────────────────────────────────
-        try:
-            raw = auth_marker.read_text(encoding="utf-8").strip()
-            if raw:
-                data = json.loads(raw)
-                stored_pubkey = data.get("pubkey", "").lower().strip()
-                if stored_pubkey != hex_pubkey.lower():
-                    logger.warning(
-                        f"⚠️  NIP-42 marker pubkey mismatch for {hex_pubkey[:16]}… "
-                        f"(stored: {stored_pubkey[:16]}…) — possible tampering"
-                    )
-                    return False
-                event_hash = data.get("event_hash", "")
-                if event_hash:
-                    if len(event_hash) == 64 and all(c in "0123456789abcdef" for c in event_hash):
-                        logger.info(
-                            f"✅ NIP-42 local-marker auth OK for {hex_pubkey[:16]}… "
-                            f"(age: {marker_age:.0f}s, event: {event_hash[:16]}…)"
-                        )
-                    else:
-                        logger.warning(
-                            f"⚠️  NIP-42 marker event_hash invalid for {hex_pubkey[:16]}… "
-                            f"— rejecting"
-                        )
-                        return False
-                else:
-                    # No event hash in JSON – acceptable (hash is optional)
-                    logger.info(
-                        f"✅ NIP-42 local-marker auth OK for {hex_pubkey[:16]}… "
-                        f"(age: {marker_age:.0f}s, no event_hash)"
-                    )
-            else:
-                # Empty file – legacy support, accept but log warning
-                logger.warning(
-                    f"⚠️  NIP-42 marker is EMPTY for {hex_pubkey[:16]}… "
-                    f"— legacy format accepted (upgrade ajouter_media.sh)"
-                )
-        except json.JSONDecodeError:
-            # Non-JSON file – legacy support, accept but log warning
-            logger.warning(
-                f"⚠️  NIP-42 marker is non-JSON for {hex_pubkey[:16]}… "
-                f"— legacy format accepted (upgrade ajouter_media.sh)"
-            )
+        event_hash = read_nip42_marker(auth_marker, hex_pubkey)
+        if event_hash is None:
+            return False
+        logger.info(
+            f"✅ NIP-42 local-marker auth OK for {hex_pubkey[:16]}… "
+            f"(age: {marker_age:.0f}s, event: {event_hash[:16] or 'none'}…)"
+        )
 
+        from services.nip42_sessions import nip42_sessions
+        nip42_sessions.grant(hex_pubkey, mtime + NIP42_MARKER_MAX_AGE, event_hash, user_dir)
         return True
 
     except Exception as e:
@@ -567,9 +562,6 @@ async def verify_nostr_auth(npub: Optional[str], force_check: bool = False) -> b
     if not npub:
         return False
     
-    if not force_check and npub in app_state.nostr_auth_cache:
-        return app_state.nostr_auth_cache[npub]
-    
     if len(npub) == 64:
         from utils.crypto import npub_to_hex
         hex_pubkey = npub_to_hex(npub)
@@ -581,13 +573,19 @@ async def verify_nostr_auth(npub: Optional[str], force_check: bool = False) -> b
     
     if not hex_pubkey:
         return False
-    
+
+    # Session NIP-42 en mémoire (services/nip42_sessions.py) : aucun accès disque
+    from services.nip42_sessions import nip42_sessions
+    if not force_check and nip42_sessions.check(hex_pubkey):
+        return True
+
     auth_result = await check_nip42_auth(hex_pubkey)
 
-    # Ne mettre en cache que les résultats positifs : un False peut changer
-    # dès que le client envoie son kind 22242 (marker créé par 22242.sh)
-    if auth_result:
-        app_state.nostr_auth_cache[npub] = True
+    # Seuls les succès sont retenus : un échec peut changer dès que le client
+    # envoie son kind 22242. Le marker local inscrit déjà sa propre session ;
+    # un succès via le relai vaut NOSTR_CACHE_TTL.
+    if auth_result and not nip42_sessions.check(hex_pubkey):
+        nip42_sessions.grant(hex_pubkey, time.time() + settings.NOSTR_CACHE_TTL)
 
     return auth_result
 
@@ -600,7 +598,43 @@ import base64
 NIP98_MAX_AGE = 120  # seconds
 
 
-def _decode_and_verify_nip98_event(auth_header: str) -> dict:
+# Events NIP-98 déjà vérifiés, par id : {id: (pubkey, méthode, chemin u)}.
+# Un client qui renvoie le même header (upload par morceaux, polling) ne paie
+# la vérification Schnorr (Python pur) qu'une fois ; une entrée vit autant que
+# la fenêtre created_at ± NIP98_MAX_AGE dans laquelle l'event reste recevable.
+_nip98_verified = named_cache("nip98_verified", maxsize=settings.NIP98_CACHE_SIZE, ttl=2 * NIP98_MAX_AGE)
+
+
+def _nip98_scope(auth_event: dict) -> Tuple[Optional[str], Optional[str]]:
+    """(méthode, chemin) déclarés par les tags method/u de l'event."""
+    from urllib.parse import urlsplit
+
+    tags = {t[0]: t[1] for t in auth_event.get("tags", []) if isinstance(t, list) and len(t) >= 2}
+    method = tags.get("method")
+    path = (urlsplit(tags["u"]).path.rstrip("/") or "/") if "u" in tags else None
+    return (method.upper() if method else None), path
+
+
+def _check_nip98_scope(scope: Tuple[Optional[str], Optional[str]],
+                       method: Optional[str], path: Optional[str]) -> None:
+    """Refuse un event présenté hors de la route pour laquelle il a été signé.
+
+    Le chemin de la requête doit terminer le chemin du tag u : un proxy peut
+    retirer un préfixe (/upassport/api/x → /api/x), pas changer de route.
+    """
+    if not settings.NIP98_CHECK_SCOPE:
+        return
+    event_method, event_path = scope
+    if method and event_method and method.upper() != event_method:
+        raise ValueError(f"NIP-98 event signed for {event_method}, replayed on {method.upper()}")
+    if path and event_path:
+        path = path.rstrip("/") or "/"
+        if not event_path.endswith(path):
+            raise ValueError(f"NIP-98 event signed for {event_path}, replayed on {path}")
+
+
+def _decode_and_verify_nip98_event(auth_header: str, method: Optional[str] = None,
+                                   path: Optional[str] = None) -> dict:
     """Décode un header 'Authorization: Nostr <base64>' et vérifie RÉELLEMENT
     l'event NIP-98 (kind 27235) : id NIP-01 (SHA-256) + signature Schnorr
     BIP-340 (via utils.crypto.verify_nostr_event) + fraîcheur (created_at).
@@ -611,12 +645,14 @@ def _decode_and_verify_nip98_event(auth_header: str) -> dict:
     par GET /api/nostr/admin/captain_info) pouvait forger un faux event non
     signé et se faire passer pour ce pubkey. Lève ValueError si invalide.
 
-    Ne vérifie PAS les tags u/method (l'infra est derrière des proxies qui
-    peuvent réécrire l'URL vue par la requête) — seule la preuve de
-    possession de la clé privée est garantie ici, ce qui est la propriété
-    recherchée pour l'auth admin (cf. _is_captain_signed_request).
+    La signature n'est vérifiée qu'à la première présentation d'un event : les
+    suivantes recalculent seulement l'id (contenu inchangé) et répondent depuis
+    _nip98_verified. Si `method`/`path` (ceux de la requête) sont fournis, ils
+    doivent correspondre aux tags method/u de l'event — un event rejoué sur une
+    autre route est refusé, qu'il soit en cache ou non. Le tag payload n'est
+    pas comparé au corps (non lu par les dépendances FastAPI).
     """
-    from utils.crypto import verify_nostr_event
+    from utils.crypto import nostr_event_id, verify_nostr_event
 
     if not auth_header or not auth_header.startswith("Nostr "):
         raise ValueError("Missing or invalid NIP-98 Authorization header")
@@ -631,11 +667,21 @@ def _decode_and_verify_nip98_event(auth_header: str) -> dict:
 
     if auth_event.get("kind") != 27235:
         raise ValueError("Invalid NIP-98 event kind (must be 27235)")
-    if not verify_nostr_event(auth_event):
-        raise ValueError("Invalid NIP-98 signature")
     created_at = auth_event.get("created_at", 0)
     if abs(time.time() - created_at) > NIP98_MAX_AGE:
         raise ValueError(f"NIP-98 event too old/in the future (created_at={created_at})")
+
+    event_id = auth_event.get("id")
+    cached = _nip98_verified.get(event_id) if isinstance(event_id, str) else None
+    if cached is not None and cached[0] == auth_event.get("pubkey") and nostr_event_id(auth_event) == event_id:
+        _check_nip98_scope(cached[1:], method, path)
+        return auth_event
+
+    if not verify_nostr_event(auth_event):
+        raise ValueError("Invalid NIP-98 signature")
+    scope = _nip98_scope(auth_event)
+    _nip98_verified[event_id] = (auth_event["pubkey"], *scope)
+    _check_nip98_scope(scope, method, path)
     return auth_event
 
 
@@ -647,7 +693,9 @@ async def require_nostr_auth(request: Request, npub: Optional[str] = Form(None),
     """
     # 1. Try NIP-98 Auth first
     try:
-        auth_event = _decode_and_verify_nip98_event(request.headers.get("Authorization", ""))
+        auth_event = _decode_and_verify_nip98_event(
+            request.headers.get("Authorization", ""), request.method, request.url.path
+        )
         user_pubkey_hex = auth_event["pubkey"]
         from utils.crypto import npub_to_hex, hex_to_npub
         if npub is None:
@@ -685,7 +733,9 @@ async def verify_nip98_auth(request: Request) -> str:
     Returns the authenticated pubkey or raises HTTPException.
     """
     try:
-        auth_event = _decode_and_verify_nip98_event(request.headers.get("Authorization", ""))
+        auth_event = _decode_and_verify_nip98_event(
+            request.headers.get("Authorization", ""), request.method, request.url.path
+        )
         return auth_event["pubkey"]
     except ValueError as e:
         raise HTTPException(status_code=401, detail=f"NIP-98 Auth failed: {e}")
@@ -693,124 +743,17 @@ async def verify_nip98_auth(request: Request) -> str:
         logger.error(f"NIP-98 Auth error: {e}")
         raise HTTPException(status_code=401, detail=f"NIP-98 Auth failed: {str(e)}")
 
-# Cache pour les profils NOSTR (évite les requêtes répétées)
-# Maps pubkey (hex) -> (profile_data, timestamp)
-nostr_profile_cache = {}
-NOSTR_PROFILE_CACHE_TTL = 3600  # 1 hour
-
 async def fetch_nostr_profiles(pubkeys: List[str]) -> Dict[str, Dict[str, Any]]:
     """
-    Fetch NOSTR profiles (kind 0) for a list of pubkeys with caching (1 hour TTL)
+    Fetch NOSTR profiles (kind 0) for a list of pubkeys (services/nostr_profiles.py:
+    cached, missing authors fetched in one relay round-trip).
     Returns a dictionary mapping pubkey -> profile data
     """
-    profiles = {}
-    if not pubkeys:
-        return profiles
-    
-    # Check cache first
-    current_time = time.time()
-    pubkeys_to_fetch = []
-    for pubkey in pubkeys:
-        if pubkey in nostr_profile_cache:
-            cached_data, cached_time = nostr_profile_cache[pubkey]
-            if current_time - cached_time < NOSTR_PROFILE_CACHE_TTL:
-                profiles[pubkey] = cached_data
-                logger.debug(f"✅ Profile cache hit for {pubkey[:12]}...")
-                continue
-        pubkeys_to_fetch.append(pubkey)
-    
-    if not pubkeys_to_fetch:
-        logger.info(f"✅ All {len(pubkeys)} profiles found in cache")
-        return profiles
-    
-    logger.info(f"📡 Fetching {len(pubkeys_to_fetch)} profiles from NOSTR (cache: {len(profiles)})")
-    
     try:
-        from pathlib import Path
-        import json
-        
-        # Path to nostr_get_events.sh
-        nostr_script_path = settings.ZEN_PATH / "Astroport.ONE" / "tools" / "nostr_get_events.sh"
-        
-        if not nostr_script_path.exists():
-            logger.warning(f"nostr_get_events.sh not found, skipping profile enrichment")
-            return profiles
-        
-        # Fetch profiles in batches to avoid command line length issues
-        batch_size = 50
-        for i in range(0, len(pubkeys), batch_size):
-            batch = pubkeys[i:i + batch_size]
-            
-            # Build command to fetch profile events (kind 0) for these pubkeys
-            cmd = [
-                str(nostr_script_path),
-                "--kind", "0",
-                "--authors", ",".join(batch),
-                "--output", "json"
-            ]
-            
-            try:
-                process = await asyncio.create_subprocess_exec(
-                    *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                    cwd=str(nostr_script_path.parent)
-                )
-                
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(),
-                    timeout=10.0
-                )
-                
-                if process.returncode == 0 and stdout:
-                    # Parse JSON events (one per line)
-                    for line in stdout.decode('utf-8', errors='ignore').strip().split('\n'):
-                        if not line.strip():
-                            continue
-                        
-                        try:
-                            event = json.loads(line)
-                            pubkey = event.get('pubkey', '')
-                            
-                            if pubkey and pubkey in batch:
-                                # Parse profile content (JSON string)
-                                content = event.get('content', '{}')
-                                try:
-                                    profile_data = json.loads(content) if content else {}
-                                    
-                                    # Convert hex pubkey to npub (bech32)
-                                    from utils.crypto import hex_to_npub
-                                    npub = hex_to_npub(pubkey)
-                                    
-                                    profile_data_dict = {
-                                        'npub': npub,
-                                        'email': profile_data.get('email') or profile_data.get('lud16') or profile_data.get('lud06'),
-                                        'display_name': profile_data.get('display_name') or profile_data.get('displayName'),
-                                        'name': profile_data.get('name'),
-                                        'picture': profile_data.get('picture'),
-                                        'about': profile_data.get('about')
-                                    }
-                                    profiles[pubkey] = profile_data_dict
-                                    # Cache the profile
-                                    nostr_profile_cache[pubkey] = (profile_data_dict, current_time)
-                                except json.JSONDecodeError:
-                                    # Profile content is not valid JSON, skip
-                                    pass
-                        except json.JSONDecodeError:
-                            # Invalid event JSON, skip
-                            continue
-                            
-            except asyncio.TimeoutError:
-                logger.warning(f"Timeout fetching profiles for batch {i//batch_size + 1}")
-            except Exception as e:
-                logger.warning(f"Error fetching profiles batch: {e}")
-        
-        logger.info(f"✅ Fetched {len(profiles)} profiles (cached: {len([p for p in profiles if p in nostr_profile_cache])}, new: {len([p for p in profiles if p not in nostr_profile_cache])})")
-        
+        return await profile_store.get_many(pubkeys)
     except Exception as e:
         logger.warning(f"Error in fetch_nostr_profiles: {e}")
-    
-    return profiles
+        return {}
 
 async def get_n1_follows(pubkey_hex: str) -> List[str]:
     """Récupérer la liste N1 (personnes suivies) d'une clé publique"""
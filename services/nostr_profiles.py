@@ -0,0 +1,220 @@
+"""
+services/nostr_profiles.py
+──────────────────────────
+Profils NOSTR (kind 0) par pubkey, pour /api/getN2 et les listes de
+titulaires (/api/permit/.../masters).
+
+fetch_nostr_profiles lançait nostr_get_events.sh par lots de 50 auteurs,
+l'un après l'autre (10 s max chacun) : un graphe N2 de 2 000 nœuds coûtait
+40 sous-processus en série. Ici :
+
+  - les profils connus sont servis depuis le cache nommé "nostr_profiles"
+    (persistant, TTL settings.NOSTR_PROFILE_CACHE_TTL) ;
+  - tous les auteurs absents partent en une seule fois vers settings.myRELAY
+    sur la connexion de services/relay_pool.py : un REQ par tranche de
+    _AUTHORS_PER_REQ auteurs (taille de message acceptée par strfry), tous
+    envoyés d'affilée → un seul aller-retour ;
+  - relai injoignable, ou tranche sans EOSE (délai, CLOSED) → les auteurs
+    restés sans réponse passent par nostr_get_events.sh, lots lancés en
+    parallèle ;
+  - kind 0 est remplaçable : pour un même auteur seul l'événement au
+    created_at le plus récent est retenu, y compris face au cache ;
+  - les auteurs sans profil sont retenus comme absents pendant
+    _MISSING_TTL secondes (pas de nouvelle requête à chaque graphe),
+    seulement si le relai a confirmé la fin des résultats (EOSE) ;
+  - created_at sert à la comparaison en cache et n'est pas servi ;
+  - les demandes simultanées d'un même auteur partagent la même requête.
+
+API publique
+------------
+  await profile_store.get_many(pubkeys)  → {hex: profil}
+  profile_store.put_event(event)         → profil retenu (ou None)
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from core.config import settings
+from services.cache import named_cache
+from services.relay_pool import QueryIncomplete, relay_pool
+from utils.crypto import hex_to_npub
+
+logger = logging.getLogger(__name__)
+
+_AUTHORS_PER_REQ = 500     # ~33 Ko par REQ (strfry : maxWebsocketPayloadSize 128 Ko)
+_SCRIPT_BATCH = 500        # auteurs par appel à nostr_get_events.sh
+_SCRIPT_TIMEOUT = 10.0     # s par appel
+_MISSING_TTL = 120         # s — auteurs sans kind 0 non redemandés
+
+
+def parse_profile(event: dict) -> Optional[Dict[str, Any]]:
+    """Profil d'un événement kind 0 (champs servis par l'API), ou None."""
+    pubkey = event.get("pubkey")
+    if event.get("kind") != 0 or not isinstance(pubkey, str):
+        return None
+    try:
+        data = json.loads(event.get("content") or "{}")
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    return {
+        "npub": hex_to_npub(pubkey),
+        "email": data.get("email") or data.get("lud16") or data.get("lud06"),
+        "display_name": data.get("display_name") or data.get("displayName"),
+        "name": data.get("name"),
+        "picture": data.get("picture"),
+        "about": data.get("about"),
+        "created_at": int(event.get("created_at") or 0),
+    }
+
+
+def _public(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Profil tel que servi par l'API (sans created_at, gardé en cache)."""
+    return {k: v for k, v in profile.items() if k != "created_at"}
+
+
+class ProfileStore:
+    def __init__(self):
+        self._profiles = named_cache(
+            "nostr_profiles", maxsize=5000, ttl=settings.NOSTR_PROFILE_CACHE_TTL, persist=True,
+        )
+        self._missing = named_cache("nostr_profiles_missing", maxsize=20000, ttl=_MISSING_TTL)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def get(self, pubkey: str) -> Optional[Dict[str, Any]]:
+        return self._profiles.get(pubkey)
+
+    def put_event(self, event: dict) -> Optional[Dict[str, Any]]:
+        """Retient le profil de `event` s'il est plus récent que celui en cache."""
+        profile = parse_profile(event)
+        if profile is None:
+            return None
+        pubkey = event["pubkey"]
+        current = self._profiles.get(pubkey)
+        if current is not None and current.get("created_at", 0) >= profile["created_at"]:
+            return current
+        self._profiles[pubkey] = profile
+        self._missing.pop(pubkey, None)
+        return profile
+
+    async def get_many(self, pubkeys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Profils connus de `pubkeys` ; les absents du cache sont demandés en
+        une seule requête. Les auteurs sans profil n'apparaissent pas."""
+        profiles: Dict[str, Dict[str, Any]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        to_fetch: List[str] = []
+        for pubkey in dict.fromkeys(pubkeys):
+            profile = self._profiles.get(pubkey)
+            if profile is not None:
+                profiles[pubkey] = profile
+            elif pubkey in self._missing:
+                continue
+            elif pubkey in self._inflight:
+                waiting[pubkey] = self._inflight[pubkey]
+            else:
+                to_fetch.append(pubkey)
+
+        if to_fetch:
+            loop = asyncio.get_running_loop()
+            futures = {pubkey: loop.create_future() for pubkey in to_fetch}
+            self._inflight.update(futures)
+            fetched: Dict[str, Dict[str, Any]] = {}
+            try:
+                logger.info(f"📡 Profils NOSTR : {len(to_fetch)} à demander (cache : {len(profiles)})")
+                fetched = await self._fetch(to_fetch)
+            finally:
+                for pubkey, fut in futures.items():
+                    self._inflight.pop(pubkey, None)
+                    fut.set_result(fetched.get(pubkey))
+            profiles.update(fetched)
+
+        for pubkey, fut in waiting.items():
+            profile = await asyncio.shield(fut)
+            if profile is not None:
+                profiles[pubkey] = profile
+        return {pubkey: _public(profile) for pubkey, profile in profiles.items()}
+
+    async def _fetch(self, pubkeys: List[str]) -> Dict[str, Dict[str, Any]]:
+        wanted = set(pubkeys)
+        events, answered, unanswered = await self._query_relay(pubkeys)
+        if unanswered:
+            events += await self._query_script(unanswered)
+
+        fetched: Dict[str, Dict[str, Any]] = {}
+        for event in sorted(events, key=lambda ev: ev.get("created_at") or 0):
+            if event.get("pubkey") in wanted:
+                profile = self.put_event(event)
+                if profile is not None:
+                    fetched[event["pubkey"]] = profile
+        for pubkey in answered.difference(fetched):
+            self._missing[pubkey] = True
+        logger.info(f"✅ Profils NOSTR : {len(fetched)}/{len(pubkeys)} reçus")
+        return fetched
+
+    async def _query_relay(self, pubkeys: List[str]) -> Tuple[List[dict], Set[str], List[str]]:
+        """(événements reçus, auteurs des tranches terminées par EOSE, auteurs
+        sans réponse à redemander à nostr_get_events.sh)."""
+        chunks = [pubkeys[i:i + _AUTHORS_PER_REQ] for i in range(0, len(pubkeys), _AUTHORS_PER_REQ)]
+        results = await asyncio.gather(*(
+            relay_pool.query(settings.myRELAY, [{"kinds": [0], "authors": chunk}],
+                             timeout=settings.NOSTR_PROFILE_QUERY_TIMEOUT)
+            for chunk in chunks
+        ), return_exceptions=True)
+        events: List[dict] = []
+        answered: Set[str] = set()
+        unanswered: List[str] = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, ConnectionError):
+                logger.warning(f"Profils NOSTR : {result} — repli sur nostr_get_events.sh")
+                partial = result.events if isinstance(result, QueryIncomplete) else []
+                found = {event.get("pubkey") for event in partial}
+                events.extend(partial)
+                unanswered.extend(pubkey for pubkey in chunk if pubkey not in found)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                events.extend(result)
+                answered.update(chunk)
+        return events, answered, unanswered
+
+    async def _query_script(self, pubkeys: List[str]) -> List[dict]:
+        script = settings.ZEN_PATH / "Astroport.ONE" / "tools" / "nostr_get_events.sh"
+        if not script.exists():
+            logger.warning("nostr_get_events.sh introuvable, profils non enrichis")
+            return []
+
+        async def run(batch: List[str]) -> List[dict]:
+            cmd = [str(script), "--kind", "0", "--authors", ",".join(batch), "--output", "json"]
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                    cwd=str(script.parent),
+                )
+                try:
+                    stdout, _ = await asyncio.wait_for(process.communicate(), timeout=_SCRIPT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    logger.warning(f"Profils NOSTR : nostr_get_events.sh > {_SCRIPT_TIMEOUT:.0f}s ({len(batch)} auteurs)")
+                    return []
+            except OSError as e:
+                logger.warning(f"Profils NOSTR : nostr_get_events.sh : {e}")
+                return []
+            events = []
+            for line in stdout.decode("utf-8", errors="ignore").splitlines():
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(event, dict):
+                    events.append(event)
+            return events
+
+        batches = [pubkeys[i:i + _SCRIPT_BATCH] for i in range(0, len(pubkeys), _SCRIPT_BATCH)]
+        results = await asyncio.gather(*(run(batch) for batch in batches))
+        return [event for events in results for event in events]
+
+
+profile_store = ProfileStore()
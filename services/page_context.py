@@ -0,0 +1,129 @@
+"""
+services/page_context.py
+────────────────────────
+Assemblage concurrent du contexte des pages utilisateur (/mailjet,
+/atom4love/profile).
+
+Chaque page appelait ses chargeurs bloquants (état mémoire, profil LifeOS,
+scrapers…) l'un après l'autre : le temps de rendu était la SOMME des
+chargeurs. Ici :
+
+  - build_context() lance tous les chargeurs indépendants en parallèle
+    (fonctions bloquantes via asyncio.to_thread, coroutines telles quelles),
+    chacun borné par settings.PAGE_LOADER_TIMEOUT : un chargeur lent ou en
+    erreur prend sa valeur par défaut et son nom est listé dans `degraded`
+    — la page est rendue partiellement au lieu d'échouer ou d'attendre.
+  - snapshot() : cache partagé et court (settings.PAGE_SNAPSHOT_TTL) des
+    vues par utilisateur, commun à toutes les pages. Un chargeur qui dépasse
+    son délai continue en arrière-plan et alimente quand même le cache : le
+    rendu suivant est complet.
+  - invalidate_user(email) après toute écriture sur le profil : vues en
+    cache oubliées, et chargements déjà en cours écartés (leur résultat,
+    antérieur à l'écriture, n'est plus mis en cache).
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+from core.config import settings
+from services.cache import named_cache
+
+logger = logging.getLogger(__name__)
+
+_snapshots = named_cache("page_snapshots", maxsize=2048, ttl=settings.PAGE_SNAPSHOT_TTL)
+_inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+
+
+@dataclass
+class Loader:
+    """Chargeur de contexte : `func(*args)` (bloquant ou coroutine) → valeur.
+    `snapshot` : nom de la vue partagée (cache par utilisateur), sinon None."""
+    func: Callable[..., Any]
+    args: tuple = ()
+    default: Any = None
+    snapshot: Optional[str] = None
+    user: str = ""
+    timeout: Optional[float] = None
+
+
+@dataclass
+class PageContext:
+    values: Dict[str, Any] = field(default_factory=dict)
+    degraded: List[str] = field(default_factory=list)
+
+
+def _call(func: Callable[..., Any], args: tuple) -> Awaitable[Any]:
+    if asyncio.iscoroutinefunction(func):
+        return func(*args)
+    return asyncio.to_thread(func, *args)
+
+
+def _snapshot_task(name: str, user: str, func: Callable[..., Any], args: tuple) -> asyncio.Task:
+    """Tâche (partagée entre requêtes) qui charge puis met en cache la vue."""
+    key = (name, user)
+    task = _inflight.get(key)
+    if task is None:
+        async def run():
+            me = asyncio.current_task()
+            try:
+                value = await _call(func, args)
+                if _inflight.get(key) is me:   # sinon écarté par invalidate_user
+                    _snapshots[key] = value
+                return value
+            finally:
+                if _inflight.get(key) is me:
+                    _inflight.pop(key, None)
+        task = asyncio.ensure_future(run())
+        # Erreur consommée même si plus personne n'attend (délai dépassé)
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        _inflight[key] = task
+    return task
+
+
+async def snapshot(name: str, user: str, func: Callable[..., Any], *args) -> Any:
+    """Vue `name` de l'utilisateur depuis le cache partagé, sinon func(*args)."""
+    key = (name, user)
+    if key in _snapshots:
+        return _snapshots[key]
+    return await asyncio.shield(_snapshot_task(name, user, func, args))
+
+
+def invalidate_user(user: str) -> None:
+    """Oublie toutes les vues en cache de cet utilisateur (après une écriture)
+    et écarte ses chargements en cours : le prochain appel relance un chargement."""
+    for key in [k for k in list(_snapshots) if k[1] == user]:
+        _snapshots.pop(key, None)
+    for key in [k for k in list(_inflight) if k[1] == user]:
+        _inflight.pop(key, None)
+
+
+async def _load(name: str, loader: Loader) -> Tuple[str, Any, bool]:
+    timeout = loader.timeout or settings.PAGE_LOADER_TIMEOUT
+    try:
+        if loader.snapshot:
+            key = (loader.snapshot, loader.user)
+            if key in _snapshots:
+                return name, _snapshots[key], True
+            awaitable = asyncio.shield(_snapshot_task(loader.snapshot, loader.user, loader.func, loader.args))
+        else:
+            awaitable = _call(loader.func, loader.args)
+        return name, await asyncio.wait_for(awaitable, timeout=timeout), True
+    except asyncio.TimeoutError:
+        logger.warning(f"[page_context] {name} > {timeout}s — rendu partiel")
+    except Exception as e:
+        logger.warning(f"[page_context] {name} en erreur : {e}")
+    return name, loader.default, False
+
+
+async def build_context(loaders: Dict[str, Loader]) -> PageContext:
+    """Exécute tous les chargeurs en parallèle ; durée ≈ le plus lent (borné)."""
+    results = await asyncio.gather(*(_load(name, loader) for name, loader in loaders.items()))
+    ctx = PageContext()
+    for name, value, ok in results:
+        ctx.values[name] = value
+        if not ok:
+            ctx.degraded.append(name)
+    return ctx
@@ -0,0 +1,230 @@
+"""
+services/relay_pool.py
+──────────────────────
+Connexions WebSocket persistantes vers les relais NOSTR (publication et
+requêtes).
+
+Chaque publication ouvrait son propre websockets.connect() (poignée de main
+TCP/WS à chaque événement). Ici, comme services/substrate_rpc.py :
+
+  - une connexion par URL de relai, ouverte à la demande et partagée par
+    toutes les coroutines ;
+  - une tâche lectrice unique par connexion dispatche les ["OK", id, …]
+    vers les Futures des publications en attente ;
+  - une reconnexion en cas d'échec d'envoi ; sans réponse OK dans le délai,
+    la publication est considérée acceptée (même politique que nostr_sign) ;
+  - les requêtes REQ partagent la même connexion : plusieurs abonnements
+    envoyés d'affilée ne coûtent qu'un aller-retour ;
+  - au plus _MAX_RELAYS connexions : au-delà, et après _IDLE_TIMEOUT sans
+    usage, les connexions inactives (ni publication ni requête en cours)
+    sont fermées. Les appelants restent responsables du choix des relais
+    (routers/nostr_sign.py n'accepte que ceux de la configuration).
+
+API publique
+------------
+  relay_pool.publish(event, relays, timeout)  → {relay: bool}
+  relay_pool.query(relay, filters, timeout)   → [event] (jusqu'à EOSE ;
+                                                QueryIncomplete sinon)
+"""
+
+import asyncio
+import json
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_CONNECT_TIMEOUT = 5.0  # s — ouverture WebSocket
+_OK_TIMEOUT = 5.0       # s — attente du ["OK", …] du relai
+_MAX_RELAYS = 32        # connexions gardées
+_IDLE_TIMEOUT = 600     # s — connexion inactive fermée au-delà
+
+
+class QueryIncomplete(ConnectionError):
+    """REQ terminé sans EOSE (délai expiré, CLOSED) ; `events` : reçus jusque-là."""
+
+    def __init__(self, message: str, events: List[dict]):
+        super().__init__(message)
+        self.events = events
+
+
+class _RelayConnection:
+    def __init__(self, url: str):
+        self.url = url
+        self._ws = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        # id d'abonnement → (événements reçus, Future : True à EOSE, False à CLOSED)
+        self._subs: Dict[str, Tuple[List[dict], asyncio.Future]] = {}
+        self._connect_lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    @property
+    def idle(self) -> bool:
+        return not self._pending and not self._subs and not self._connect_lock.locked()
+
+    async def _connect(self):
+        if self._ws is not None:
+            return self._ws
+        async with self._connect_lock:
+            if self._ws is None:
+                import websockets
+                ws = await asyncio.wait_for(websockets.connect(self.url), timeout=_CONNECT_TIMEOUT)
+                self._ws = ws
+                self._reader = asyncio.create_task(self._read_loop(ws))
+                logger.info(f"Relai NOSTR connecté : {self.url}")
+        return self._ws
+
+    async def _read_loop(self, ws) -> None:
+        try:
+            async for message in ws:
+                try:
+                    msg = json.loads(message)
+                except ValueError:
+                    continue
+                if not isinstance(msg, list) or len(msg) < 2:
+                    continue
+                if msg[0] == "EVENT" and len(msg) >= 3:
+                    sub = self._subs.get(msg[1])
+                    if sub is not None and isinstance(msg[2], dict):
+                        sub[0].append(msg[2])
+                elif msg[0] in ("EOSE", "CLOSED"):
+                    sub = self._subs.get(msg[1])
+                    if sub is not None and not sub[1].done():
+                        sub[1].set_result(msg[0] == "EOSE")
+                        if msg[0] == "CLOSED":
+                            logger.warning(f"Relai {self.url} a fermé la requête : {msg[2:]}")
+                elif msg[0] == "OK" and len(msg) >= 3:
+                    fut = self._pending.pop(msg[1], None)
+                    if fut is not None and not fut.done():
+                        fut.set_result(msg[2] is True)
+                        if msg[2] is not True:
+                            logger.warning(f"Relai {self.url} a refusé {msg[1][:12]}… : {msg[3:]}")
+        except Exception as exc:
+            logger.debug(f"Relai {self.url} lecture interrompue : {exc}")
+        finally:
+            self._drop(ws)
+
+    def _drop(self, ws) -> None:
+        if self._ws is not ws:
+            return
+        self._ws = None
+        pending, self._pending = self._pending, {}
+        subs, self._subs = self._subs, {}
+        futures = list(pending.values()) + [fut for _, fut in subs.values()]
+        for fut in futures:
+            if not fut.done():
+                fut.set_exception(ConnectionError(f"Relai {self.url} connexion perdue"))
+
+    async def publish(self, event: dict, timeout: float) -> bool:
+        for attempt in range(2):
+            try:
+                ws = await self._connect()
+            except Exception as exc:
+                logger.warning(f"Relai {self.url} injoignable : {exc}")
+                return False
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[event["id"]] = fut
+            try:
+                await ws.send(json.dumps(["EVENT", event]))
+            except Exception as exc:
+                self._pending.pop(event["id"], None)
+                logger.debug(f"Relai {self.url} envoi échoué : {exc}")
+                self._drop(ws)
+                continue
+            try:
+                return await asyncio.wait_for(fut, timeout=timeout)
+            except asyncio.TimeoutError:
+                self._pending.pop(event["id"], None)
+                logger.warning(f"Relai {self.url} pas de réponse OK dans les {timeout:.0f}s")
+                return True  # optimiste : l'événement a peut-être été accepté
+            except ConnectionError:
+                continue
+        return False
+
+    async def query(self, filters: List[dict], timeout: float) -> List[dict]:
+        """Événements correspondant à `filters` jusqu'à EOSE. Lève
+        QueryIncomplete (avec les événements déjà reçus) sans EOSE dans le
+        délai ou si le relai ferme la requête, ConnectionError s'il est
+        injoignable."""
+        try:
+            ws = await self._connect()
+        except Exception as exc:
+            raise ConnectionError(f"Relai {self.url} injoignable : {exc}") from exc
+        sub_id = secrets.token_hex(8)
+        events: List[dict] = []
+        fut = asyncio.get_running_loop().create_future()
+        self._subs[sub_id] = (events, fut)
+        try:
+            await ws.send(json.dumps(["REQ", sub_id, *filters]))
+            if not await asyncio.wait_for(fut, timeout=timeout):
+                raise QueryIncomplete(f"Relai {self.url} a fermé la requête", events)
+        except asyncio.TimeoutError:
+            logger.warning(f"Relai {self.url} pas d'EOSE dans les {timeout:.0f}s ({len(events)} événements)")
+            raise QueryIncomplete(f"Relai {self.url} pas d'EOSE dans les {timeout:.0f}s", events) from None
+        except ConnectionError:
+            raise
+        except Exception as exc:
+            self._drop(ws)
+            raise ConnectionError(f"Relai {self.url} envoi échoué : {exc}") from exc
+        finally:
+            if self._subs.pop(sub_id, None) is not None and self._ws is ws:
+                try:
+                    await ws.send(json.dumps(["CLOSE", sub_id]))
+                except Exception:
+                    pass
+        return events
+
+    async def close(self) -> None:
+        ws = self._ws
+        if ws is not None:
+            self._drop(ws)
+            await ws.close()
+
+
+class RelayPool:
+    def __init__(self):
+        self._relays: "OrderedDict[str, _RelayConnection]" = OrderedDict()
+
+    def _relay(self, url: str) -> _RelayConnection:
+        conn = self._relays.get(url)
+        if conn is None:
+            conn = self._relays[url] = _RelayConnection(url)
+        self._relays.move_to_end(url)
+        conn.last_used = time.monotonic()
+        self._evict(keep=conn)
+        return conn
+
+    def _evict(self, keep: _RelayConnection) -> None:
+        """Ferme les connexions inactives trop anciennes ou en surnombre
+        (les moins récemment utilisées d'abord)."""
+        now = time.monotonic()
+        for url, conn in list(self._relays.items()):
+            over = len(self._relays) > _MAX_RELAYS
+            if not over and now - conn.last_used < _IDLE_TIMEOUT:
+                break
+            if conn is not keep and conn.idle:
+                del self._relays[url]
+                asyncio.create_task(conn.close())
+
+    async def publish(self, event: dict, relays: Iterable[str], timeout: float = _OK_TIMEOUT) -> Dict[str, bool]:
+        """Publie un événement signé sur plusieurs relais en parallèle."""
+        urls = list(dict.fromkeys(relays))
+        results = await asyncio.gather(
+            *(self._relay(url).publish(event, timeout) for url in urls), return_exceptions=True,
+        )
+        return {url: r is True for url, r in zip(urls, results)}
+
+    async def query(self, relay: str, filters: List[dict], timeout: float = _OK_TIMEOUT) -> List[dict]:
+        """REQ `filters` sur `relay` ; voir _RelayConnection.query."""
+        return await self._relay(relay).query(filters, timeout)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(c.close() for c in self._relays.values()), return_exceptions=True)
+        self._relays.clear()
+
+
+relay_pool = RelayPool()
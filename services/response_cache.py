@@ -0,0 +1,189 @@
+"""
+services/response_cache.py
+──────────────────────────
+Réponses JSON pré-encodées pour les GET chauds (/, /api/ustats, /youtube,
+/api/getN2, /api/permit/definitions, /check_balance).
+
+  - dumps() : encodeur rapide (orjson si installé, sinon json stdlib) ; les
+    modèles pydantic sont sérialisés via model_dump().
+  - encode() : les octets JSON sont produits UNE fois avec leur ETag et, au-delà
+    de settings.JSON_COMPRESS_MIN_BYTES, leurs variantes gzip (et brotli si le
+    module est présent) : chaque hit renvoie ces octets tels quels selon
+    l'Accept-Encoding du client, ou un 304 sur If-None-Match.
+  - ResponseCache : cache par clé, stale-while-revalidate, rafraîchissement
+    single-flight :
+      entrée fraîche (âge < ttl)            → servie directement ;
+      entrée périmée (âge < ttl + stale)    → servie immédiatement, un
+                                              rafraîchissement part en fond ;
+      absente / trop vieille                → le producteur est attendu.
+    Tous les appelants d'une même clé partagent le rafraîchissement en cours ;
+    en cas d'échec, l'entrée périmée reste servie jusqu'à la fin de sa fenêtre.
+  - fast_json() : même chemin pour une réponse non mise en cache (encodeur
+    rapide + ETag, sans pré-compression).
+
+Usage :
+    cache = ResponseCache("ustats", ttl=60, stale_ttl=600)
+    entry = await cache.get(key, lambda: produire(key))
+    return json_response(request, entry, max_age=60)
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from core.config import settings
+from services.cache import Cache, register
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"{type(obj).__name__} non sérialisable en JSON")
+
+
+def dumps(data: Any) -> bytes:
+    """JSON compact UTF-8 (orjson si disponible)."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=_ORJSON_OPTS)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    created: float
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+
+def encode(data: Any, compress: bool = True, meta: Optional[Dict[str, Any]] = None) -> CachedResponse:
+    body = dumps(data)
+    etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+    gz = br = None
+    if compress and len(body) >= settings.JSON_COMPRESS_MIN_BYTES:
+        gz = gzip.compress(body, compresslevel=6, mtime=0)
+        if brotli is not None:
+            br = brotli.compress(body, quality=5)
+    return CachedResponse(body=body, etag=etag, created=time.time(), gzip=gz, br=br, meta=meta or {})
+
+
+class ResponseCache:
+    """Réponses JSON pré-encodées par clé, stale-while-revalidate.
+    `meta(data)` : petits champs gardés à côté des octets (ex. compteurs)."""
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float, maxsize: int = 256,
+                 meta: Optional[Callable[[Any], Dict[str, Any]]] = None):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._meta = meta
+        self._entries = register(Cache(f"response_{name}", maxsize=maxsize))
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def peek(self, key: Hashable) -> Optional[CachedResponse]:
+        return self._entries.get(key)
+
+    def put(self, key: Hashable, data: Any) -> CachedResponse:
+        entry = encode(data, meta=self._meta(data) if self._meta else None)
+        self._entries[key] = entry
+        return entry
+
+    def invalidate(self, key: Hashable = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def refresh(self, key: Hashable, producer: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Lance (ou rejoint) le rafraîchissement de `key`."""
+        task = self._inflight.get(key)
+        if task is None:
+            async def run():
+                try:
+                    return self.put(key, await producer())
+                finally:
+                    self._inflight.pop(key, None)
+            task = asyncio.ensure_future(run())
+            task.add_done_callback(self._log_failure)
+            self._inflight[key] = task
+        return task
+
+    def _log_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"[{self.name}] rafraîchissement échoué : {task.exception()}")
+
+    async def get(self, key: Hashable, producer: Callable[[], Awaitable[Any]]) -> CachedResponse:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.time() - entry.created
+            if age < self.ttl:
+                return entry
+            if age < self.ttl + self.stale_ttl:
+                self.refresh(key, producer)
+                return entry
+        return await asyncio.shield(self.refresh(key, producer))
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def json_response(request: Request, entry: CachedResponse, max_age: int = 0,
+                  status_code: int = 200) -> Response:
+    """Réponse HTTP des octets pré-encodés ; 304 si l'ETag du client correspond."""
+    headers = {"ETag": entry.etag, "Cache-Control": f"public, max-age={int(max_age)}"}
+    if entry.gzip is not None:
+        headers["Vary"] = "Accept-Encoding"
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    body = entry.body
+    accept_encoding = request.headers.get("accept-encoding", "")
+    if entry.br is not None and _accepts(accept_encoding, "br"):
+        body, headers["Content-Encoding"] = entry.br, "br"
+    elif entry.gzip is not None and _accepts(accept_encoding, "gzip"):
+        body, headers["Content-Encoding"] = entry.gzip, "gzip"
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def fast_json(request: Request, data: Any, max_age: int = 0) -> Response:
+    """Réponse JSON ponctuelle (non mise en cache) : encodeur rapide + ETag."""
+    return json_response(request, encode(data, compress=False), max_age=max_age)
@@ -3,48 +3,26 @@ services/roaming.py — Résolution de la station Home réelle d'un utilisateur
 
 Extrait de routers/geo.py (aucune logique modifiée) pour être réutilisable depuis
 plusieurs routers (geo.py::/api/myGPS, mailjet.py::/mailjet/auth) sans import
-router → router.
+router → router. Le cache swarm est lu via services/swarm_index.py.
 """
 
-import json
 from typing import Optional, Dict
 from pathlib import Path
 
-from core.config import settings
+from services.swarm_index import swarm_index
 
 
 def _find_home_station_json(home_ipfsnodeid: Optional[str], user_email: Optional[str]) -> Optional[Path]:
     """Localise le `12345.json` mis en cache localement par le swarm P2P (Astroport.ONE)
     pour la home station d'un utilisateur roaming. Retourne None si non (encore)
-    synchronisé dans le swarm local."""
-    swarm_dir = settings.ZEN_PATH / "tmp" / "swarm"
-    if not swarm_dir.exists():
-        return None
-    try:
-        station_dirs = [d for d in swarm_dir.iterdir() if d.is_dir()]
-    except Exception:
-        return None
-
-    # 1. Match rapide : dossier swarm nommé exactement d'après le peer IPFS
-    if home_ipfsnodeid:
-        direct = swarm_dir / home_ipfsnodeid / "12345.json"
-        if direct.exists():
-            return direct
+    synchronisé dans le swarm local.
 
-    # 2. Fallback : scan des 12345.json, match par ipfsnodeid déclaré ou par TW/<email>
-    for station_dir in station_dirs:
-        station_12345 = station_dir / "12345.json"
-        if not station_12345.exists():
-            continue
-        try:
-            data = json.loads(station_12345.read_text())
-        except Exception:
-            continue
-        matches_id    = home_ipfsnodeid and data.get("ipfsnodeid") == home_ipfsnodeid
-        matches_email = user_email and (station_dir / "TW" / user_email).exists()
-        if matches_id or matches_email:
-            return station_12345
-    return None
+    Match par dossier nommé d'après le peer IPFS, puis par ipfsnodeid déclaré
+    ou par TW/<email> — via services.swarm_index (plus de scan par requête)."""
+    station_id = swarm_index.find_station(home_ipfsnodeid, user_email)
+    if station_id is None:
+        return None
+    return swarm_index.swarm_dir / station_id / "12345.json"
 
 
 def resolve_home_station(home_ipfsnodeid: Optional[str], user_email: Optional[str]) -> Dict[str, Optional[str]]:
@@ -63,12 +41,9 @@ def resolve_home_station(home_ipfsnodeid: Optional[str], user_email: Optional[st
 
     Retourne `{"uSPOT": ..., "myIPFS": ...}` (valeurs `None` si absentes/non résolvable).
     """
-    station_json = _find_home_station_json(home_ipfsnodeid, user_email)
-    if not station_json:
-        return {"uSPOT": None, "myIPFS": None}
-    try:
-        data = json.loads(station_json.read_text())
-    except Exception:
+    station_id = swarm_index.find_station(home_ipfsnodeid, user_email)
+    data = swarm_index.station(station_id) if station_id else None
+    if not data:
         return {"uSPOT": None, "myIPFS": None}
     return {
         "uSPOT": data.get("uSPOT") or None,
@@ -0,0 +1,244 @@
+"""
+services/substrate_rpc.py
+─────────────────────────
+Client JSON-RPC asyncio natif pour Duniter v2 (Substrate) — sans
+SubstrateInterface, sans thread executor.
+
+- Une connexion WebSocket persistante par processus (websockets), partagée
+  par toutes les coroutines : chaque requête reçoit un id, une tâche lectrice
+  unique dispatche les réponses vers les Futures en attente. Sûr en usage
+  concurrent (aucun état muté hors de la boucle asyncio).
+- Clés de stockage `System.Account` encodées localement :
+    twox128("System") ++ twox128("Account") ++ blake2_128_concat(AccountId32)
+  Le préfixe twox128 est une constante Substrate (identique sur toutes les
+  chaînes FRAME) — seul le suffixe blake2 dépend du compte.
+- `state_queryStorageAt` : N comptes en UNE requête (batch), au lieu d'un
+  `SubstrateInterface.query` par compte.
+- Bascule de nœud : une connexion impossible ou perdue fait passer au nœud
+  suivant de get_rpc_nodes() (ordre latence duniter_nodes.json) — une seule
+  rotation par connexion perdue, quel que soit le nombre de requêtes en vol.
+  Un délai de réponse dépassé n'échoue que la requête concernée ; un nœud
+  muet est détecté par le keepalive ping de websockets, qui ferme la socket.
+
+API publique
+------------
+  account_storage_key(g1pub)                → str   (0x…)
+  decode_account_balance(hex_value)         → int   (free + reserved, centimes)
+  rpc_client.get_balance(g1pub)             → int   (centimes) | None
+  rpc_client.get_balances(g1pubs)           → dict  {g1pub: centimes} | None
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import struct
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# twox128("System") ++ twox128("Account")
+_SYSTEM_ACCOUNT_PREFIX = "26aa394eea5630e07c48ae0c9558cef7b99d880ec681799c0cf30e8886371da9"
+
+_CONNECT_TIMEOUT = 5.0    # s — ouverture WebSocket par nœud
+_REQUEST_TIMEOUT = 8.0    # s — réponse à une requête JSON-RPC
+_MAX_KEYS_PER_CALL = 500  # clés par state_queryStorageAt
+
+
+def _account_id(g1pub: str) -> Optional[bytes]:
+    """AccountId32 (32 octets) depuis une g1pub v1 (Base58) ou une adresse SS58."""
+    from services.g1_squid import _b58decode
+    try:
+        raw = _b58decode(g1pub)
+    except ValueError:
+        return None
+    if len(raw) == 32:
+        return raw
+    # SS58 : préfixe réseau (1 ou 2 octets) + 32 octets + checksum 2 octets
+    if len(raw) in (35, 36):
+        prefix_len = 1 if raw[0] < 64 else 2
+        return raw[prefix_len:prefix_len + 32]
+    return None
+
+
+def account_storage_key(g1pub: str) -> Optional[str]:
+    """Clé de stockage System.Account[g1pub] (hex 0x…), ou None si invalide."""
+    account = _account_id(g1pub)
+    if account is None:
+        return None
+    hashed = hashlib.blake2b(account, digest_size=16).digest() + account
+    return "0x" + _SYSTEM_ACCOUNT_PREFIX + hashed.hex()
+
+
+def decode_account_balance(value: Optional[str]) -> int:
+    """Décode un AccountInfo SCALE et retourne free + reserved (centimes).
+
+    AccountInfo = nonce, consumers, providers, sufficients (4 × u32) puis
+    AccountData Duniter : free, reserved, fee_frozen (u64) + linked_idty
+    (Option<u32>). Les runtimes plus anciens préfixaient AccountData d'un
+    `random_id: Option<H256>` — détecté par la longueur totale.
+    """
+    if not value:
+        return 0
+    data = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    offset = 16
+    # 16 + 24 + Option<u32> → 41 / 45 octets ; +1 (None) ou +33 (Some(H256))
+    # si random_id est présent.
+    if len(data) in (42, 46) and data[16] == 0:
+        offset += 1
+    elif len(data) in (74, 78) and data[16] == 1:
+        offset += 33
+    if len(data) < offset + 16:
+        return 0
+    free, reserved = struct.unpack_from("<QQ", data, offset)
+    return free + reserved
+
+
+class SubstrateRpcClient:
+    """Connexion JSON-RPC WebSocket persistante, multiplexée entre coroutines."""
+
+    def __init__(self):
+        self._ws = None
+        self._url: Optional[str] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock: Optional[asyncio.Lock] = None
+        # Décalage dans get_rpc_nodes() : incrémenté à chaque connexion perdue
+        self._node_offset = 0
+
+    async def _connect(self):
+        """Ouvre (une seule fois) la connexion vers le premier nœud joignable."""
+        if self._ws is not None:
+            return self._ws
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._ws is not None:
+                return self._ws
+            import websockets
+            from services.g1_squid import get_rpc_nodes, _resolve_rpc_url
+            nodes = get_rpc_nodes()
+            start = self._node_offset % max(len(nodes), 1)
+            for node in nodes[start:] + nodes[:start]:
+                url = await _resolve_rpc_url(node)
+                try:
+                    ws = await asyncio.wait_for(
+                        websockets.connect(url, max_size=2 ** 24),
+                        timeout=_CONNECT_TIMEOUT,
+                    )
+                except Exception as exc:
+                    logger.debug("Substrate RPC connexion échouée sur %s : %s", url, exc)
+                    continue
+                self._ws, self._url = ws, url
+                self._reader = asyncio.create_task(self._read_loop(ws))
+                logger.info("Substrate RPC connecté : %s", url)
+                return ws
+        return None
+
+    async def _read_loop(self, ws):
+        try:
+            async for message in ws:
+                try:
+                    msg = json.loads(message)
+                except ValueError:
+                    continue
+                fut = self._pending.pop(msg.get("id"), None)
+                if fut is not None and not fut.done():
+                    fut.set_result(msg)
+        except Exception as exc:
+            logger.debug("Substrate RPC lecture interrompue (%s) : %s", self._url, exc)
+        finally:
+            self._drop(ws)
+
+    def _drop(self, ws, lost: bool = True) -> None:
+        """Oublie la connexion et réveille les appelants en attente. Une
+        connexion perdue (`lost`) fait passer au nœud suivant, une seule fois."""
+        if self._ws is not ws:
+            return
+        self._ws = None
+        if lost:
+            self._node_offset += 1
+        pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError("Substrate RPC connexion perdue"))
+
+    async def request(self, method: str, params: list):
+        """Requête JSON-RPC ; une reconnexion (nœud suivant) si la connexion est
+        perdue. Lève TimeoutError sans toucher à la connexion partagée si la
+        réponse dépasse _REQUEST_TIMEOUT."""
+        for attempt in range(2):
+            ws = await self._connect()
+            if ws is None:
+                raise ConnectionError("Aucun nœud RPC Duniter joignable")
+            req_id = next(self._ids)
+            payload = json.dumps({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params})
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[req_id] = fut
+            try:
+                await ws.send(payload)
+                msg = await asyncio.wait_for(fut, timeout=_REQUEST_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Substrate RPC {method} : pas de réponse en {_REQUEST_TIMEOUT}s") from None
+            except Exception as exc:
+                # Envoi impossible ou connexion tombée pendant l'attente (_drop)
+                logger.debug("Substrate RPC %s échec sur %s : %s", method, self._url, exc)
+                self._drop(ws)
+                try:
+                    await ws.close()
+                except Exception:
+                    pass
+                continue
+            finally:
+                self._pending.pop(req_id, None)
+            if "error" in msg:
+                raise RuntimeError(msg["error"].get("message", "RPC error"))
+            return msg.get("result")
+        raise ConnectionError(f"Substrate RPC {method} : échec après reconnexion")
+
+    async def get_balance(self, g1pub: str) -> Optional[int]:
+        """Solde (centimes) d'une g1pub via state_getStorage.
+        Retourne None si la clé est invalide ou si aucun nœud n'a répondu."""
+        key = account_storage_key(g1pub)
+        if key is None:
+            return None
+        try:
+            return decode_account_balance(await self.request("state_getStorage", [key]))
+        except Exception as exc:
+            logger.debug("Substrate RPC state_getStorage échec pour %s… : %s", g1pub[:12], exc)
+            return None
+
+    async def get_balances(self, g1pubs: List[str]) -> Optional[Dict[str, int]]:
+        """Soldes (centimes) de plusieurs g1pub via state_queryStorageAt.
+        Retourne None si aucun nœud RPC n'a répondu."""
+        key_to_pub: Dict[str, str] = {}
+        for g1pub in g1pubs:
+            key = account_storage_key(g1pub)
+            if key:
+                key_to_pub[key] = g1pub
+        result = {g1pub: 0 for g1pub in g1pubs}
+        keys = list(key_to_pub)
+        try:
+            for i in range(0, len(keys), _MAX_KEYS_PER_CALL):
+                chunk = keys[i:i + _MAX_KEYS_PER_CALL]
+                change_sets = await self.request("state_queryStorageAt", [chunk]) or []
+                for change_set in change_sets:
+                    for key, value in change_set.get("changes", []):
+                        g1pub = key_to_pub.get(key)
+                        if g1pub:
+                            result[g1pub] = decode_account_balance(value)
+        except Exception as exc:
+            logger.warning("Substrate RPC batch échec (%d comptes) : %s", len(keys), exc)
+            return None
+        return result
+
+    async def close(self) -> None:
+        if self._ws is not None:
+            ws = self._ws
+            self._drop(ws, lost=False)
+            await ws.close()
+
+
+rpc_client = SubstrateRpcClient()
@@ -0,0 +1,264 @@
+"""
+services/swarm_index.py
+───────────────────────
+Index du cache swarm P2P (~/.zen/tmp/swarm/<station>/…) partagé par tous les
+résolveurs roaming (services/roaming.py, mailjet._check_roaming,
+finance._resolve_g1pubnostr_from_swarm, media_upload._resolve_home_node_hex,
+nostr.admin_constellation_delete).
+
+Chacun parcourait l'arborescence (glob "**/NPUB", "*/TW/<email>/…") à chaque
+requête, pour un coût qui croît avec la constellation. Ici :
+
+  - Une station est indexée une fois : champs utiles de 12345.json, HEX/NPUB
+    du nœud, et pour chaque compte TW/<email>/ ses NPUB, HEX et G1PUBNOSTR.
+  - refresh() (au plus toutes les settings.SWARM_INDEX_REFRESH secondes) ne
+    fait qu'un scandir + quelques stat() par station : seules les stations
+    dont la signature (mtime du dossier, de TW/, de 12345.json, HEX, NPUB) a
+    changé — i.e. réécrites par la synchro swarm — sont relues.
+  - L'index est persisté en JSON compact (~/.zen/tmp/swarm_index.json) :
+    au redémarrage, seules les stations modifiées entre-temps sont relues.
+
+Recherches (toutes en mémoire) :
+  find_station(ipfsnodeid, email)  → id de la home station (dossier swarm)
+  station(station_id)              → champs de son 12345.json
+  accounts(email)                  → [{station, npub, hex, g1}, …]
+  find_pubkey(npub_ou_hex, …)      → (station, email | None)
+  node_hexes()                     → NODEHEX publiés par les stations
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Champs de 12345.json conservés dans l'index (cf. _12345.sh)
+STATION_FIELDS = (
+    "ipfsnodeid", "NODEHEX", "uSPOT", "myIPFS", "hostname",
+    "PAF", "NODEZEN", "captainZEN", "MACHINE_VALUE_ZEN", "NCARD", "ZCARD",
+)
+_INDEX_VERSION = 1
+
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _signature(station_path: str) -> List[int]:
+    return [
+        _mtime(station_path),
+        _mtime(os.path.join(station_path, "TW")),
+        _mtime(os.path.join(station_path, "12345.json")),
+        _mtime(os.path.join(station_path, "HEX")),
+        _mtime(os.path.join(station_path, "NPUB")),
+    ]
+
+
+def _read(path: Path) -> str:
+    try:
+        return path.read_text().strip()
+    except (OSError, UnicodeDecodeError):
+        return ""
+
+
+def _index_station(station_dir: Path, sig: List[int]) -> dict:
+    """Relit une station du cache swarm (appelé uniquement si sa signature change)."""
+    info = None
+    if sig[2]:
+        try:
+            data = json.loads((station_dir / "12345.json").read_text())
+            info = {k: data[k] for k in STATION_FIELDS if k in data}
+        except (OSError, ValueError) as e:
+            logger.debug(f"[swarm_index] {station_dir.name}/12345.json illisible : {e}")
+            info = {}
+    accounts: Dict[str, Dict[str, str]] = {}
+    if sig[1]:
+        try:
+            entries = list(os.scandir(station_dir / "TW"))
+        except OSError:
+            entries = []
+        for entry in entries:
+            if "@" not in entry.name or not entry.is_dir():
+                continue
+            account_dir = Path(entry.path)
+            accounts[entry.name] = {
+                k: v for k, v in (
+                    ("npub", _read(account_dir / "NPUB")),
+                    ("hex", _read(account_dir / "HEX")),
+                    ("g1", _read(account_dir / "G1PUBNOSTR")),
+                ) if v
+            }
+    return {
+        "sig": sig,
+        "info": info,
+        "hex": _read(station_dir / "HEX") if sig[3] else "",
+        "npub": _read(station_dir / "NPUB") if sig[4] else "",
+        "accounts": accounts,
+    }
+
+
+class SwarmIndex:
+    """Index incrémental station ↔ comptes du cache swarm local."""
+
+    def __init__(self, swarm_dir: Optional[Path] = None, index_path: Optional[Path] = None):
+        self._swarm_dir = swarm_dir
+        self._index_path = index_path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._checked = 0.0
+        self._stations: Dict[str, dict] = {}
+        self._by_key: Dict[str, Tuple[str, Optional[str]]] = {}
+        self._by_email: Dict[str, List[str]] = {}
+        self._by_nodeid: Dict[str, str] = {}
+
+    @property
+    def swarm_dir(self) -> Path:
+        return self._swarm_dir or settings.ZEN_PATH / "tmp" / "swarm"
+
+    @property
+    def index_path(self) -> Path:
+        return self._index_path or settings.ZEN_PATH / "tmp" / "swarm_index.json"
+
+    # ── Persistance ─────────────────────────────────────────────────────────
+
+    def _load(self) -> None:
+        self._loaded = True
+        try:
+            data = json.loads(self.index_path.read_text())
+            if data.get("v") == _INDEX_VERSION:
+                self._stations = data.get("stations", {})
+                self._rebuild()
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"[swarm_index] index {self.index_path} ignoré : {e}")
+
+    def _save(self) -> None:
+        tmp = self.index_path.with_suffix(".tmp")
+        try:
+            tmp.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(
+                {"v": _INDEX_VERSION, "stations": self._stations}, separators=(",", ":")))
+            os.replace(tmp, self.index_path)
+        except OSError as e:
+            logger.warning(f"[swarm_index] écriture {self.index_path} : {e}")
+
+    # ── Mise à jour ─────────────────────────────────────────────────────────
+
+    def _rebuild(self) -> None:
+        by_key: Dict[str, Tuple[str, Optional[str]]] = {}
+        by_email: Dict[str, List[str]] = {}
+        by_nodeid: Dict[str, str] = {}
+        for sid in sorted(self._stations):
+            st = self._stations[sid]
+            nodeid = (st.get("info") or {}).get("ipfsnodeid")
+            if nodeid:
+                by_nodeid.setdefault(nodeid, sid)
+            for key in (st.get("npub"), st.get("hex")):
+                if key:
+                    by_key.setdefault(key, (sid, None))
+            for email, account in st.get("accounts", {}).items():
+                by_email.setdefault(email, []).append(sid)
+                for key in (account.get("npub"), account.get("hex")):
+                    if key:
+                        by_key.setdefault(key, (sid, email))
+        self._by_key, self._by_email, self._by_nodeid = by_key, by_email, by_nodeid
+
+    def refresh(self, force: bool = False) -> None:
+        """Relit les stations ajoutées/modifiées depuis le dernier contrôle."""
+        if not force and self._loaded and time.monotonic() - self._checked < settings.SWARM_INDEX_REFRESH:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            elif not force and time.monotonic() - self._checked < settings.SWARM_INDEX_REFRESH:
+                return
+            self._checked = time.monotonic()
+            try:
+                entries = [e for e in os.scandir(self.swarm_dir) if e.is_dir()]
+            except OSError:
+                entries = []
+            stations: Dict[str, dict] = {}
+            changed = False
+            for entry in entries:
+                sig = _signature(entry.path)
+                previous = self._stations.get(entry.name)
+                if previous is not None and previous.get("sig") == sig:
+                    stations[entry.name] = previous
+                else:
+                    stations[entry.name] = _index_station(Path(entry.path), sig)
+                    changed = True
+            if changed or stations.keys() != self._stations.keys():
+                self._stations = stations
+                self._rebuild()
+                self._save()
+
+    # ── Recherches ──────────────────────────────────────────────────────────
+
+    def station(self, station_id: str) -> Optional[dict]:
+        """Champs 12345.json de la station, None si absente ou sans 12345.json."""
+        self.refresh()
+        st = self._stations.get(station_id)
+        if st is None or st.get("info") is None:
+            return None
+        return st["info"]
+
+    def find_station(self, ipfsnodeid: Optional[str] = None, email: Optional[str] = None) -> Optional[str]:
+        """Station (dossier swarm avec 12345.json) : nommée d'après le peer,
+        déclarant ce ipfsnodeid, ou hébergeant TW/<email>."""
+        self.refresh()
+        if ipfsnodeid:
+            if (self._stations.get(ipfsnodeid) or {}).get("info") is not None:
+                return ipfsnodeid
+            if ipfsnodeid in self._by_nodeid:
+                return self._by_nodeid[ipfsnodeid]
+        if email:
+            for sid in self._by_email.get(email, []):
+                if (self._stations.get(sid) or {}).get("info") is not None:
+                    return sid
+        return None
+
+    def accounts(self, email: str) -> List[dict]:
+        """Copies du compte `email` dans le swarm : [{station, npub, hex, g1}, …]."""
+        self.refresh()
+        stations = self._stations
+        return [
+            {"station": sid, **stations[sid]["accounts"][email]}
+            for sid in self._by_email.get(email, [])
+            if email in stations.get(sid, {}).get("accounts", {})
+        ]
+
+    def find_pubkey(self, *keys: str) -> Optional[Tuple[str, Optional[str]]]:
+        """(station, email) du premier NPUB/HEX connu parmi `keys` ; email None
+        pour une clé de nœud."""
+        self.refresh()
+        for key in keys:
+            if key and key in self._by_key:
+                return self._by_key[key]
+        return None
+
+    def node_hexes(self) -> List[str]:
+        """NODEHEX (fichier HEX) valides publiés par les stations du swarm."""
+        self.refresh()
+        hexes = []
+        for sid in sorted(self._stations):
+            nodehex = self._stations[sid].get("hex", "")
+            if len(nodehex) == 64:
+                try:
+                    int(nodehex, 16)
+                except ValueError:
+                    continue
+                hexes.append(nodehex)
+        return hexes
+
+
+swarm_index = SwarmIndex()
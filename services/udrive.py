@@ -0,0 +1,320 @@
+"""
+services/udrive.py
+──────────────────
+Construction incrémentale du uDRIVE (~/.zen/game/nostr/<email>/APP/uDRIVE).
+
+generate_ipfs_structure.sh reste la référence ; il ré-ajoute tout le disque
+à IPFS à chaque dépôt : le coût suit la taille du uDRIVE, pas celle du
+changement. Cette construction incrémentale est livrée DÉSACTIVÉE
+(settings.UDRIVE_INCREMENTAL = False) : la parité des CID avec le script n'a
+pas encore été vérifiée contre un Kubo réel. À activer une fois
+`pytest -m live_ipfs tests/test_udrive.py` passé sur une station (Kubo
+démarré, Astroport.ONE installé). Ici :
+
+  - .udrive_state.json (à la racine du uDRIVE) mémorise, par fichier,
+    (taille, mtime_ns, CID, taille DAG) et, par répertoire, (signature, CID).
+    Seuls les fichiers nouveaux ou modifiés passent par `ipfs add`.
+  - Chaque répertoire est un nœud UnixFS dag-pb construit à partir des CID
+    de ses enfants (`dag/put`) ; un répertoire dont aucun enfant n'a changé
+    (même signature) garde son CID sans appel à Kubo — seul le chemin du
+    fichier modifié jusqu'à la racine est réécrit.
+  - manifest.json est fusionné (les champs existants des entrées sont gardés),
+    puis ajouté comme un fichier ordinaire.
+  - Le pin de la racine suit les reconstructions (`pin/update`).
+  - Les répertoires restent des nœuds simples : au-delà du seuil où Kubo
+    passerait en HAMT, UDriveTooLarge est levée et l'appelant
+    (services/ipfs.py) se replie sur le script.
+  - find_file() résout un CID en chemin via cet état, ou à défaut via le
+    manifest.json du script (publication /webcam).
+  - rebuild() regroupe les dépôts arrivant dans settings.UDRIVE_COALESCE_WINDOW
+    en une seule reconstruction par uDRIVE, bornée par UDRIVE_BUILD_TIMEOUT.
+
+Les fichiers cachés (dont l'état) et le lien generate_ipfs_structure.sh ne
+font pas partie du DAG.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+from services.kubo import KuboError, kubo
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = ".udrive_state.json"
+MANIFEST = "manifest.json"
+_SCRIPT = "generate_ipfs_structure.sh"
+_STATE_VERSION = 1
+# Données UnixFS d'un répertoire (Type=Directory), en base64 sans padding
+_UNIXFS_DIR = "CAE"
+# Taille estimée (noms + CID des liens) à partir de laquelle Kubo sharde un
+# répertoire en HAMT (Internal.UnixFSShardingSizeThreshold, 256 Kio)
+_HAMT_THRESHOLD = 256 * 1024
+
+
+class UDriveError(Exception):
+    """Échec d'un appel Kubo pendant la construction."""
+
+
+class UDriveTooLarge(UDriveError):
+    """Répertoire que Kubo sharderait (HAMT) : non construit ici."""
+
+
+def _estimated_size(links: List[dict]) -> int:
+    """Estimation de Kubo : longueur du nom + longueur binaire du CID
+    (34 octets en CIDv0, 36 en CIDv1 sha2-256)."""
+    return sum(len(l["name"].encode()) + (34 if l["cid"].startswith("Qm") else 36) for l in links)
+
+
+def _scan(root: Path, top: bool = True) -> dict:
+    """Arborescence {"f": {nom: (taille, mtime_ns)}, "d": {nom: sous-arbre}}.
+    À la racine, manifest.json est exclu : il est régénéré après les ajouts."""
+    node = {"f": {}, "d": {}}
+    skip = {_SCRIPT, MANIFEST} if top else {_SCRIPT}
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.name.startswith(".") or entry.name in skip:
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    node["d"][entry.name] = _scan(Path(entry.path), top=False)
+                elif entry.is_file():
+                    st = entry.stat()
+                    node["f"][entry.name] = (st.st_size, st.st_mtime_ns)
+            except OSError as e:
+                logger.warning(f"[uDRIVE] {entry.path} ignoré : {e}")
+    return node
+
+
+class UDriveBuilder:
+    """Reconstruction incrémentale d'un uDRIVE ; une instance par répertoire."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.state_path = root / STATE_FILE
+
+    # ── Kubo (surchargés dans les tests) ────────────────────────────────────
+
+    async def _add_file(self, path: Path) -> Tuple[str, int]:
+        try:
+            res = await kubo.add_file(path, pin=False)
+            return res["Hash"], res["Size"]
+        except KuboError as e:
+            raise UDriveError(str(e)) from e
+
+    async def _put_dir(self, links: List[dict]) -> str:
+        node = {"Data": {"/": {"bytes": _UNIXFS_DIR}}, "Links": [
+            {"Hash": {"/": l["cid"]}, "Name": l["name"], "Tsize": l["size"]} for l in links
+        ]}
+        try:
+            return await kubo.dag_put(node)
+        except KuboError as e:
+            raise UDriveError(str(e)) from e
+
+    async def _pin(self, old: Optional[str], new: str) -> None:
+        if old:
+            try:
+                await kubo.pin_update(old, new)
+                return
+            except KuboError:
+                pass  # ancienne racine non épinglée (premier build, pin retiré à la main)
+        try:
+            await kubo.pin_add(new)
+        except KuboError as e:
+            raise UDriveError(str(e)) from e
+
+    # ── État ────────────────────────────────────────────────────────────────
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if state.get("v") == _STATE_VERSION:
+                return state
+        except (OSError, ValueError):
+            pass
+        return {"v": _STATE_VERSION, "root": None, "files": {}, "dirs": {}}
+
+    def _save_state(self, state: dict) -> None:
+        tmp = self.state_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp, self.state_path)
+
+    def _write_manifest(self, files: Dict[str, list]) -> None:
+        path = self.root / MANIFEST
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+            if not isinstance(manifest, dict):
+                manifest = {}
+        except (OSError, ValueError):
+            manifest = {}
+        previous = {e.get("path"): e for e in manifest.get("files", []) if isinstance(e, dict)}
+        entries = []
+        for rel in sorted(files):
+            size, mtime_ns, cid, _ = files[rel]
+            entries.append({
+                **previous.get(rel, {}),
+                "name": rel.rsplit("/", 1)[-1],
+                "path": rel,
+                "size": size,
+                "ipfs_cid": cid,
+                "last_modified": datetime.fromtimestamp(mtime_ns / 1e9, timezone.utc).isoformat(),
+            })
+        if manifest.get("files") == entries:
+            return
+        manifest.update({
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "total_files": len(entries),
+            "total_size": sum(e["size"] for e in entries),
+            "files": entries,
+        })
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    # ── Construction ────────────────────────────────────────────────────────
+
+    async def build(self) -> dict:
+        state = await asyncio.to_thread(self._load_state)
+        tree = await asyncio.to_thread(_scan, self.root)
+        old_files, old_dirs = state["files"], state["dirs"]
+        files: Dict[str, list] = {}
+        dirs: Dict[str, list] = {}
+        stats = {"added": 0, "reused": 0}
+
+        async def file_entry(rel: str, size: int, mtime_ns: int) -> list:
+            cached = old_files.get(rel)
+            if cached and cached[0] == size and cached[1] == mtime_ns:
+                stats["reused"] += 1
+                return cached
+            cid, dag_size = await self._add_file(self.root / rel)
+            stats["added"] += 1
+            return [size, mtime_ns, cid, dag_size]
+
+        async def add_files(rel_dir: str, node: dict) -> None:
+            for name, (size, mtime_ns) in node["f"].items():
+                rel = f"{rel_dir}{name}"
+                files[rel] = await file_entry(rel, size, mtime_ns)
+            for name, child in node["d"].items():
+                await add_files(f"{rel_dir}{name}/", child)
+
+        async def dir_cid(rel_dir: str, node: dict, extra: List[dict] = ()) -> Tuple[str, int]:
+            links = [{"name": name, "cid": files[f"{rel_dir}{name}"][2], "size": files[f"{rel_dir}{name}"][3]}
+                     for name in node["f"]]
+            for name, child in node["d"].items():
+                cid, size = await dir_cid(f"{rel_dir}{name}/", child)
+                links.append({"name": name, "cid": cid, "size": size})
+            links.extend(extra)
+            if _estimated_size(links) >= _HAMT_THRESHOLD:
+                raise UDriveTooLarge(f"{rel_dir or '.'} : {len(links)} entrées, répertoire à sharder")
+            # Ordre canonique dag-pb : liens triés par nom (octets)
+            links.sort(key=lambda l: l["name"].encode())
+            signature = hashlib.sha256(json.dumps(links, separators=(",", ":")).encode()).hexdigest()
+            total = sum(l["size"] for l in links)
+            cached = old_dirs.get(rel_dir)
+            cid = cached[1] if cached and cached[0] == signature else await self._put_dir(links)
+            dirs[rel_dir] = [signature, cid]
+            return cid, total
+
+        await add_files("", tree)
+        await asyncio.to_thread(self._write_manifest, files)
+        st = await asyncio.to_thread((self.root / MANIFEST).stat)
+        manifest = await file_entry(MANIFEST, st.st_size, st.st_mtime_ns)
+        root_cid, _ = await dir_cid("", tree, [{"name": MANIFEST, "cid": manifest[2], "size": manifest[3]}])
+        if root_cid != state.get("root"):
+            await self._pin(state.get("root"), root_cid)
+
+        files[MANIFEST] = manifest
+        await asyncio.to_thread(self._save_state, {
+            "v": _STATE_VERSION, "root": root_cid, "files": files, "dirs": dirs,
+        })
+        return {"final_cid": root_cid, "total_files": len(files) - 1, **stats}
+
+
+# ── Index CID → fichier ───────────────────────────────────────────────────────
+
+# {racine: (mtime_ns de la source, {CID: (chemin relatif, taille)})}
+_indexes: Dict[Path, Tuple[int, Dict[str, Tuple[str, int]]]] = {}
+
+
+def _load_index(root: Path) -> Optional[Tuple[int, Dict[str, Tuple[str, int]]]]:
+    """Index CID → (chemin, taille) de la source la plus récente :
+    .udrive_state.json, ou le manifest.json de generate_ipfs_structure.sh."""
+    sources = []
+    for name in (STATE_FILE, MANIFEST):
+        try:
+            sources.append(((root / name).stat().st_mtime_ns, name))
+        except OSError:
+            pass
+    if not sources:
+        return None
+    mtime_ns, name = max(sources)
+    cached = _indexes.get(root)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached
+    if name == STATE_FILE:
+        files = UDriveBuilder(root)._load_state()["files"]
+        index = {e[2]: (rel, e[0]) for rel, e in files.items()}
+    else:
+        try:
+            with open(root / name) as f:
+                entries = json.load(f).get("files", [])
+            index = {e["ipfs_cid"]: (e["path"], int(e.get("size") or 0)) for e in entries
+                     if isinstance(e, dict) and e.get("ipfs_cid") and e.get("path")}
+        except (OSError, ValueError, TypeError, AttributeError):
+            return None
+    cached = _indexes[root] = (mtime_ns, index)
+    return cached
+
+
+async def find_file(root: Path, cid: str) -> Optional[Tuple[str, int]]:
+    """(chemin relatif, taille) du fichier de CID `cid` dans le uDRIVE `root`
+    (index relu hors de la boucle, seulement quand sa source change)."""
+    cached = await asyncio.to_thread(_load_index, Path(root))
+    return cached[1].get(cid) if cached else None
+
+
+# ── Reconstructions regroupées par uDRIVE ─────────────────────────────────────
+
+_pending: Dict[Path, asyncio.Future] = {}
+_locks: Dict[Path, asyncio.Lock] = {}
+_tasks: set = set()
+
+
+async def _run(root: Path, fut: asyncio.Future) -> None:
+    await asyncio.sleep(settings.UDRIVE_COALESCE_WINDOW)
+    # Les dépôts suivants déclencheront une nouvelle reconstruction
+    _pending.pop(root, None)
+    try:
+        async with _locks.setdefault(root, asyncio.Lock()):
+            started = time.monotonic()
+            result = await asyncio.wait_for(UDriveBuilder(root).build(), settings.UDRIVE_BUILD_TIMEOUT)
+            logger.info(f"[uDRIVE] {root} → {result['final_cid']} "
+                        f"({result['added']} ajouté(s), {result['reused']} réutilisé(s), "
+                        f"{time.monotonic() - started:.2f}s)")
+        fut.set_result(result)
+    except Exception as e:
+        fut.set_exception(e)
+
+
+async def rebuild(root: Path) -> dict:
+    """Reconstruit le uDRIVE `root` ; les appels rapprochés partagent le résultat."""
+    root = Path(root).resolve()
+    fut = _pending.get(root)
+    if fut is None:
+        fut = asyncio.get_running_loop().create_future()
+        _pending[root] = fut
+        task = asyncio.create_task(_run(root, fut))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+    return await asyncio.shield(fut)
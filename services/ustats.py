@@ -0,0 +1,98 @@
+"""
+services/ustats.py
+──────────────────
+Statistiques de station (Astroport.ONE/Ustats.sh) servies par GET / et
+/api/ustats via services/response_cache.py.
+
+Clé de cache = cellule de grille normalisée (LAT, LON au format UMAP %.2f,
+deg) — ou () pour la vue globale. Les coordonnées normalisées sont aussi
+celles transmises au script, si bien que deux requêtes dans la même cellule
+partagent la même exécution. La vue globale est maintenue chaude par
+refresh_loop() (lancée au lifespan).
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+from typing import Optional, Tuple
+
+from core.config import settings
+from services.geogrid import umap_coords
+from services.response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_KEY: Tuple = ()
+
+ustats_cache = ResponseCache(
+    "ustats", ttl=settings.USTATS_CACHE_TTL, stale_ttl=settings.USTATS_STALE_TTL,
+)
+
+
+class UstatsError(Exception):
+    """Échec de Ustats.sh (code retour, délai ou sortie illisible)."""
+
+
+def grid_key(lat: Optional[str], lon: Optional[str], deg: Optional[str]) -> Tuple:
+    """Cellule normalisée (lat, lon, deg). Lève ValueError si non numérique,
+    non fini (nan, inf) ou hors plage (lat ∈ [-90, 90], lon ∈ [-180, 180])."""
+    if lat is None or lon is None:
+        return GLOBAL_KEY
+    lat_f, lon_f = float(lat), float(lon)
+    # nan échoue aux deux comparaisons ; inf ferait déborder round() dans umap_coords
+    if not (-90 <= lat_f <= 90 and -180 <= lon_f <= 180):
+        raise ValueError(f"Coordonnées hors plage : {lat}, {lon}")
+    lat_s, lon_s = umap_coords(lat_f, lon_f)
+    deg_f = float(deg) if deg not in (None, "") else None
+    if deg_f is not None and not math.isfinite(deg_f):
+        raise ValueError(f"deg non fini : {deg}")
+    deg_s = f"{deg_f:g}" if deg_f is not None else ""
+    return (lat_s, lon_s, deg_s)
+
+
+def _read_output(last_line: str):
+    path = last_line.strip()
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return json.loads(last_line)
+
+
+async def fetch_ustats(key: Tuple):
+    """Exécute Ustats.sh pour la cellule `key` et retourne son JSON."""
+    from utils.helpers import run_script
+    script_path = settings.ZEN_PATH / "Astroport.ONE" / "Ustats.sh"
+    try:
+        return_code, last_line = await run_script(
+            script_path, *key, timeout=settings.USTATS_SCRIPT_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        raise UstatsError(f"Ustats.sh > {settings.USTATS_SCRIPT_TIMEOUT}s")
+    except OSError as e:
+        raise UstatsError(f"Ustats.sh : {e}")
+    if return_code != 0:
+        raise UstatsError(f"Ustats.sh rc={return_code}")
+    try:
+        return await asyncio.to_thread(_read_output, last_line)
+    except (OSError, ValueError) as e:
+        raise UstatsError(f"Sortie Ustats.sh illisible : {e}")
+
+
+async def get_ustats(key: Tuple):
+    return await ustats_cache.get(key, lambda: fetch_ustats(key))
+
+
+async def refresh_loop() -> None:
+    """Garde la vue globale chaude (un rafraîchissement par USTATS_CACHE_TTL)."""
+    if not (settings.ZEN_PATH / "Astroport.ONE" / "Ustats.sh").exists():
+        logger.warning("⚠️  Ustats.sh introuvable — cache désactivé")
+        return
+    while True:
+        try:
+            await ustats_cache.refresh(GLOBAL_KEY, lambda: fetch_ustats(GLOBAL_KEY))
+            logger.info("✅ Cache Ustats.sh rafraîchi")
+        except Exception as e:
+            logger.warning(f"⚠️  Rafraîchissement Ustats.sh échoué : {e}")
+        await asyncio.sleep(settings.USTATS_CACHE_TTL)
@@ -0,0 +1,136 @@
+"""
+services/video_publish.py
+─────────────────────────
+Publication NIP-71 d'une vidéo déjà ajoutée à IPFS, sans script externe.
+
+/webcam lançait publish_nostr_video.sh (jusqu'à 90 s dans la requête). Ici
+l'événement est construit et signé en Python (utils.crypto) puis remis au
+pool de connexions relais persistantes (services.relay_pool) :
+
+  - le relai local (settings.myRELAY) est attendu : c'est lui qui alimente
+    les listings et /theater ;
+  - les autres relais de settings.NOSTR_RELAYS sont servis en arrière-plan.
+
+Les tags sont ceux que lisent parse_video_metadata() et /theater : url,
+imeta, thumbnail_ipfs/image, gifanim_ipfs, info, x, upload_chain, duration,
+dim, t Channel-<player>, i source:<type>.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Iterable, List, Optional, Union
+
+from core.config import settings
+from services.relay_pool import relay_pool
+from utils.crypto import sign_nostr_event
+
+logger = logging.getLogger(__name__)
+
+KIND_VIDEO = 21        # NIP-71 : vidéo
+KIND_SHORT_VIDEO = 22  # NIP-71 : vidéo courte verticale
+
+_background: set = set()
+
+
+def _dimensions(value: Union[str, dict, None]) -> str:
+    if isinstance(value, dict):
+        w, h = value.get("width"), value.get("height")
+        return f"{w}x{h}" if w and h else ""
+    return str(value or "")
+
+
+def _is_vertical(dim: str) -> bool:
+    try:
+        w, h = (int(x) for x in dim.lower().split("x", 1))
+        return h > w
+    except ValueError:
+        return False
+
+
+def build_video_event(
+    *,
+    cid: str,
+    filename: str,
+    title: str,
+    description: str = "",
+    mime_type: str = "video/webm",
+    file_hash: str = "",
+    file_size: int = 0,
+    duration: float = 0,
+    dimensions: Union[str, dict, None] = "",
+    thumbnail_ipfs: str = "",
+    gifanim_ipfs: str = "",
+    info_cid: str = "",
+    upload_chain: str = "",
+    latitude: float = 0.0,
+    longitude: float = 0.0,
+    channel: str = "",
+    source_type: str = "webcam",
+    genres: Iterable[str] = (),
+    created_at: Optional[int] = None,
+) -> dict:
+    """Événement NIP-71 non signé (kind 22 si la vidéo est verticale, 21 sinon)."""
+    now = int(created_at or time.time())
+    url = f"/ipfs/{cid}/{filename}"
+    dim = _dimensions(dimensions)
+    seconds = str(int(round(float(duration or 0))))
+
+    imeta: List[str] = ["imeta", f"url {url}", f"m {mime_type}"]
+    tags: List[list] = [
+        ["title", title],
+        ["published_at", str(now)],
+        ["alt", description or title],
+        ["url", url],
+        ["m", mime_type],
+    ]
+    if file_hash:
+        tags.append(["x", file_hash])
+        imeta.append(f"x {file_hash}")
+    if file_size:
+        tags.append(["size", str(file_size)])
+        imeta.append(f"size {file_size}")
+    if dim:
+        tags.append(["dim", dim])
+        imeta.append(f"dim {dim}")
+    tags.append(["duration", seconds])
+    imeta.append(f"duration {seconds}")
+    if thumbnail_ipfs:
+        tags += [["thumbnail_ipfs", thumbnail_ipfs], ["image", f"/ipfs/{thumbnail_ipfs}"]]
+        imeta.append(f"image /ipfs/{thumbnail_ipfs}")
+    if gifanim_ipfs:
+        tags.append(["gifanim_ipfs", gifanim_ipfs])
+    if info_cid:
+        tags.append(["info", info_cid])
+    if upload_chain:
+        tags.append(["upload_chain", upload_chain])
+    tags.append(imeta)
+    tags += [["latitude", f"{latitude:.2f}"], ["longitude", f"{longitude:.2f}"]]
+    if channel:
+        tags.append(["t", f"Channel-{channel}"])
+    tags += [["t", source_type], ["i", f"source:{source_type}"]]
+    tags += [["t", g] for g in dict.fromkeys(genres) if g]
+
+    return {
+        "kind": KIND_SHORT_VIDEO if _is_vertical(dim) else KIND_VIDEO,
+        "created_at": now,
+        "tags": tags,
+        "content": f"🎬 {title}\n{description}".rstrip(),
+    }
+
+
+async def publish_video_event(event: dict, seckey: bytes) -> Optional[str]:
+    """Signe et publie ; retourne l'id si le relai local l'a accepté, sinon None."""
+    sign_nostr_event(event, seckey)
+    local = settings.myRELAY
+    others = [r for r in settings.NOSTR_RELAYS.split() if r != local]
+    if others:
+        task = asyncio.create_task(relay_pool.publish(event, others))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+    accepted = await relay_pool.publish(event, [local])
+    if not accepted.get(local):
+        logger.warning(f"Vidéo {event['id'][:12]}… refusée par {local}")
+        return None
+    logger.info(f"Vidéo kind={event['kind']} {event['id'][:12]}… publiée sur {local}")
+    return event["id"]
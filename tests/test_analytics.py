@@ -0,0 +1,43 @@
+"""
+Tests for services.analytics — bounded ingestion queue and periodic
+aggregation behind POST /ping.
+"""
+
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import analytics
+from services.analytics import AnalyticsPipeline
+
+
+class TestPipeline:
+    def test_bounded_queue_still_counts(self):
+        pipeline = AnalyticsPipeline(max_queue=2)
+        results = [pipeline.ingest({"type": "page_view", "current_url": "/a"}) for _ in range(3)]
+        assert results == [True, True, False]
+        assert len(pipeline._events) == 2
+        assert pipeline._counts[("page_view", "unknown", "/a")] == 3
+
+    async def test_flush_stores_raw_events_and_publishes_one_summary(self, tmp_path):
+        pipeline = AnalyticsPipeline(max_queue=100)
+        for url in ("/a", "/a", "/b"):
+            pipeline.ingest({"type": "page_view", "source": "web", "current_url": url})
+        pipeline.ingest({"type": "video_play", "source": "web"}, referer="https://x/y")
+        publish = AsyncMock()
+        with patch.object(analytics, "ANALYTICS_DIR", tmp_path), \
+             patch.object(pipeline, "_publish", publish):
+            summary = await pipeline.flush()
+            assert await pipeline.flush() is None
+            day = next(tmp_path.glob("*.jsonl")).stem
+            stored = list(analytics.load_events(day))
+        publish.assert_awaited_once()
+        assert summary["total"] == 4
+        assert summary["by_type"] == {"page_view": 3, "video_play": 1}
+        assert summary["top"][0] == {"type": "page_view", "source": "web", "url": "/a", "count": 2}
+        assert len(stored) == 4
+        assert stored[3]["referer"] == "https://x/y"
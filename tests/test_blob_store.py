@@ -0,0 +1,129 @@
+"""
+Tests for services.blob_store: dedup/ownership, persisted index and
+single-range parsing used by GET /<sha256>.
+"""
+
+import sys
+import asyncio
+import hashlib
+from pathlib import Path
+
+import pytest
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+import services.ipfs as ipfs
+from services.blob_store import BlobResponse, BlobStore, parse_range
+
+
+@pytest.fixture
+def kubo(monkeypatch):
+    calls = {"add": 0, "rm": []}
+
+    async def add(data, filename="data", pin=True):
+        calls["add"] += 1
+        return "bafy" + filename[:8]
+
+    async def pin_rm(cid):
+        calls["rm"].append(cid)
+        return True
+
+    monkeypatch.setattr(ipfs, "kubo_add_bytes", add)
+    monkeypatch.setattr(ipfs, "kubo_pin_rm", pin_rm)
+    return calls
+
+
+def _blob(data=b"blossom" * 50):
+    return hashlib.sha256(data).hexdigest(), data
+
+
+class TestBlobStore:
+    async def test_duplicate_upload_is_deduplicated(self, tmp_path, kubo):
+        store = BlobStore(tmp_path)
+        sha, data = _blob()
+
+        results = await asyncio.gather(
+            store.put(sha, data, "image/png", "alice"),
+            store.put(sha, data, "image/png", "bob"),
+            store.put(sha, data, "image/png", "alice"),
+        )
+        assert [created for _, created in results] == [True, False, False]
+        assert kubo["add"] == 1
+        assert store.get(sha)["o"] == ["alice", "bob"]
+        assert store.path(sha).read_bytes() == data
+
+    async def test_blob_removed_with_last_owner(self, tmp_path, kubo):
+        store = BlobStore(tmp_path)
+        sha, data = _blob()
+        await store.put(sha, data, "image/png", "alice")
+        await store.put(sha, data, "image/png", "bob")
+
+        assert await store.remove(sha, "mallory") is False
+        assert await store.remove(sha, "alice") is True
+        assert store.path(sha).exists() and kubo["rm"] == []
+        assert await store.remove(sha, "bob") is True
+        assert not store.path(sha).exists()
+        assert kubo["rm"] == ["bafy" + sha[:8]]
+        assert store.get(sha) is None
+
+    async def test_anonymous_blob_cannot_be_deleted(self, tmp_path, kubo):
+        store = BlobStore(tmp_path)
+        sha, data = _blob()
+        await store.put(sha, data, "image/png")
+        assert await store.remove(sha, "") is False
+        assert store.path(sha).exists()
+
+    async def test_index_survives_restart(self, tmp_path, kubo):
+        sha, data = _blob()
+        other, other_data = _blob(b"other")
+        store = BlobStore(tmp_path)
+        await store.put(sha, data, "image/png", "alice")
+        await store.put(other, other_data, "text/plain", "alice")
+        await store.remove(other, "alice")
+
+        reloaded = BlobStore(tmp_path)
+        assert reloaded.get(sha)["c"] == "bafy" + sha[:8]
+        assert reloaded.get(other) is None
+        _, created = await reloaded.put(sha, data, "image/png", "bob")
+        assert created is False and kubo["add"] == 2
+
+
+class TestServedType:
+    def test_active_content_is_served_as_octet_stream(self, tmp_path):
+        for mime in ("text/html", "image/svg+xml", "application/javascript"):
+            response = BlobResponse(tmp_path / "blob", {"s": "a" * 64, "n": 10, "t": mime})
+            assert response.headers["content-type"] == "application/octet-stream"
+            assert response.headers["x-content-type-options"] == "nosniff"
+            assert response.headers["content-security-policy"] == "sandbox"
+
+    def test_allowed_type_is_kept(self, tmp_path):
+        response = BlobResponse(tmp_path / "blob", {"s": "a" * 64, "n": 10, "t": "image/png"})
+        assert response.headers["content-type"] == "image/png"
+
+
+class TestRange:
+    def test_single_ranges(self):
+        assert parse_range("bytes=0-99", 1000) == (0, 99)
+        assert parse_range("bytes=900-", 1000) == (900, 999)
+        assert parse_range("bytes=-100", 1000) == (900, 999)
+        assert parse_range("bytes=990-2000", 1000) == (990, 999)
+
+    def test_ignored_headers_serve_full_blob(self):
+        assert parse_range(None, 1000) is None
+        assert parse_range("bytes=0-1,5-9", 1000) is None
+        assert parse_range("items=0-1", 1000) is None
+        assert parse_range("bytes=abc-", 1000) is None
+
+    def test_unsatisfiable_range_is_416(self, tmp_path):
+        with pytest.raises(ValueError):
+            parse_range("bytes=1000-", 1000)
+        rec = {"s": "a" * 64, "n": 1000, "t": "image/png"}
+        response = BlobResponse(tmp_path / "blob", rec, range_header="bytes=1000-")
+        assert response.status_code == 416
+        assert response.headers["content-range"] == "bytes */1000"
+        partial = BlobResponse(tmp_path / "blob", rec, range_header="bytes=-10")
+        assert partial.status_code == 206
+        assert partial.headers["content-range"] == "bytes 990-999/1000"
+        assert partial.headers["content-length"] == "10"
@@ -0,0 +1,132 @@
+"""
+Tests for services.cache: counters, TTL expiry, single-flight loads with
+negative caching, per-name overrides and disk persistence.
+"""
+
+import sys
+import asyncio
+import time
+from pathlib import Path
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import cache as cache_module
+from services.cache import Cache, named_cache
+
+
+class TestCounters:
+    def test_hits_misses_and_evictions(self):
+        c = Cache("t", maxsize=2)
+        c["a"], c["b"] = 1, 2
+        assert c.get("a") == 1 and c.get("zz") is None
+        c["c"] = 3  # évince "b" (moins récemment utilisé)
+        assert "b" not in c and c["a"] == 1
+        m = c.metrics()
+        assert (m["hits"], m["misses"], m["evictions"], m["size"]) == (2, 1, 1, 2)
+
+    def test_ttl_expiry_is_counted(self):
+        c = Cache("t", maxsize=10, ttl=0.05)
+        c["a"] = 1
+        time.sleep(0.1)
+        assert c.get("a") is None
+        c["b"] = 2
+        assert c.metrics()["expirations"] == 1 and len(c) == 1
+
+    def test_size_bound_in_bytes(self):
+        c = Cache("t", maxsize=10, getsizeof=len)
+        c["a"], c["b"] = b"x" * 6, b"y" * 6
+        assert "a" not in c and c.currsize == 6
+
+
+class TestGetOrLoad:
+    async def test_concurrent_loads_share_one_call(self):
+        c = Cache("t", maxsize=10)
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"v": 1}
+
+        results = await asyncio.gather(*(c.get_or_load("k", loader) for _ in range(5)))
+        assert len(calls) == 1 and all(r is results[0] for r in results)
+        assert c.metrics()["loads"] == 1
+
+    async def test_missing_value_is_remembered(self):
+        c = Cache("t", maxsize=10, miss_ttl=60)
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return None
+
+        assert await c.get_or_load("k", loader, default={}) == {}
+        assert await c.get_or_load("k", loader, default={}) == {}
+        assert len(calls) == 1
+
+    async def test_failure_reaches_every_waiter_and_is_not_cached(self):
+        c = Cache("t", maxsize=10)
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(*(c.get_or_load("k", loader) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert "k" not in c and c.metrics()["load_errors"] == 1
+
+    async def test_waiters_take_over_when_the_loading_caller_is_cancelled(self):
+        c = Cache("t", maxsize=10)
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return len(calls)
+
+        first = asyncio.create_task(c.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(c.get_or_load("k", loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await asyncio.gather(*waiters) == [2, 2, 2]
+        assert first.cancelled() and len(calls) == 2
+
+    async def test_cancelled_waiter_leaves_the_load_running(self):
+        c = Cache("t", maxsize=10)
+
+        async def loader():
+            await asyncio.sleep(0.02)
+            return "v"
+
+        first = asyncio.create_task(c.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(c.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        assert await first == "v" and waiter.cancelled()
+
+
+class TestRegistry:
+    def test_settings_override_bounds(self, monkeypatch):
+        monkeypatch.setattr(cache_module, "_registry", {})
+        monkeypatch.setattr(cache_module.settings, "CACHE_SIZES", {"small": 3})
+        c = named_cache("small", maxsize=1000, ttl=60)
+        assert c.maxsize == 3 and named_cache("small", maxsize=5) is c
+        assert set(cache_module.cache_metrics()) == {"small"}
+
+    def test_persisted_entries_keep_their_age(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cache_module.settings, "CACHE_DIR", tmp_path)
+        c = Cache("profiles", maxsize=10, ttl=0.4, persist=True)
+        c["alice"] = {"name": "Alice"}
+        c.save()
+
+        time.sleep(0.2)
+        restored = Cache("profiles", maxsize=10, ttl=0.4, persist=True)
+        assert restored.load() == 1 and restored["alice"] == {"name": "Alice"}
+        time.sleep(0.3)  # 0,5 s depuis l'écriture d'origine : expirée
+        assert restored.get("alice") is None
+        assert Cache("profiles", maxsize=10, ttl=0.4, persist=True).load() == 0
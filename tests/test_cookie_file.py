@@ -0,0 +1,90 @@
+"""
+Tests for services.cookie_file (single-pass Netscape parsing, LCA domain,
+host-only splits) and the batched cookie_store.store_cookies_encrypted.
+"""
+
+import sys
+import json
+from pathlib import Path
+
+import pytest
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import cookie_store
+from services.cookie_file import CookieFileError, parse_cookie_file
+
+
+def _row(domain, flag="TRUE", name="SID"):
+    return f"{domain}\t{flag}\t/\tTRUE\t1999999999\t{name}\tvalue"
+
+
+GOOGLE = "\n".join([
+    "# Netscape HTTP Cookie File",
+    "# exported",
+    "",
+    _row(".google.com"),
+    _row("notebooklm.google.com", "FALSE", "NB"),
+    _row("notebooklm.google.com", "FALSE", "NB2"),
+    _row(".google.com", name="HSID"),
+]).encode()
+
+
+class TestParse:
+    def test_lca_and_rows(self):
+        parsed = parse_cookie_file(GOOGLE)
+        assert parsed.domain == "google.com"
+        assert len(parsed.rows["google.com"]) == 2
+        assert len(parsed.rows["notebooklm.google.com"]) == 2
+
+    def test_single_subdomain_is_its_own_lca(self):
+        data = "\n".join([_row("notebooklm.google.com"), _row(".notebooklm.google.com")]).encode()
+        assert parse_cookie_file(data).domain == "notebooklm.google.com"
+
+    def test_host_only_split(self):
+        files = parse_cookie_file(GOOGLE).files()
+        assert set(files) == {"google.com", "notebooklm.google.com"}
+        assert files["google.com"] == GOOGLE
+        split = files["notebooklm.google.com"].decode()
+        assert split.startswith("# Netscape HTTP Cookie File\n# exported\n\n")
+        assert "NB2" in split and "HSID" not in split
+
+    def test_not_a_cookie_file(self):
+        assert parse_cookie_file(b"just some notes\nabout cookies") is None
+        assert parse_cookie_file(b"\xff\xfe binary") is None
+
+    def test_multi_domain_rejected(self):
+        with pytest.raises(CookieFileError):
+            parse_cookie_file("\n".join([_row(".google.com"), _row(".youtube.com")]).encode())
+
+    def test_marker_without_rows_rejected(self):
+        with pytest.raises(CookieFileError):
+            parse_cookie_file(b"# Netscape HTTP Cookie File\n# empty\n")
+
+
+class TestBatchedStore:
+    async def test_one_add_and_one_publish_for_all_domains(self, tmp_path, monkeypatch):
+        adds, publishes = [], []
+
+        async def seal(content, pubkey):
+            return b"sealed:" + content
+
+        async def add_many(items, pin=True):
+            adds.append(sorted(items))
+            return {name: f"Qm{i}" for i, name in enumerate(sorted(items))}
+
+        monkeypatch.setattr(cookie_store, "get_user_pubkey", lambda d: "G1PUB")
+        monkeypatch.setattr(cookie_store, "_seal", seal)
+        monkeypatch.setattr(cookie_store, "kubo_add_many", add_many)
+        monkeypatch.setattr(cookie_store, "schedule_manifest_publish", publishes.append)
+
+        files = parse_cookie_file(GOOGLE).files()
+        cids = await cookie_store.store_cookies_encrypted(tmp_path, files)
+
+        assert adds == [["google.com.enc", "notebooklm.google.com.enc"]]
+        assert publishes == [tmp_path]
+        assert cids == {"google.com": "Qm0", "notebooklm.google.com": "Qm1"}
+        manifest = json.loads((tmp_path / cookie_store.MANIFEST).read_text())
+        assert manifest["notebooklm.google.com"]["size"] == len(files["notebooklm.google.com"])
@@ -0,0 +1,96 @@
+"""
+Tests for services.g1_balance — request coalescing and shared TTL cache
+behind /check_balance, /check_balances and utils.helpers.check_balance.
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import g1_balance
+from services.g1_balance import G1BalanceService, format_balance, zen_from_centimes
+
+
+def _batch_result(g1pubs, total=250):
+    return {p: {"pending": 0, "blockchain": total, "total": total} for p in g1pubs}
+
+
+class TestCoalescing:
+    """Concurrent lookups share one get_g1_balances_batch call."""
+
+    async def test_concurrent_gets_make_one_batch(self):
+        service = G1BalanceService(window=0.01)
+        batch = AsyncMock(side_effect=lambda pubs: _batch_result(pubs))
+        with patch("services.g1_balance.get_g1_balances_batch", batch):
+            results = await asyncio.gather(
+                service.get("A" * 44), service.get("B" * 44), service.get("A" * 44),
+            )
+        assert batch.await_count == 1
+        assert sorted(batch.await_args.args[0]) == ["A" * 44, "B" * 44]
+        assert all(r["total"] == 250 for r in results)
+
+    async def test_cache_shared_between_single_and_multi(self):
+        service = G1BalanceService(window=0)
+        batch = AsyncMock(side_effect=lambda pubs: _batch_result(pubs))
+        with patch("services.g1_balance.get_g1_balances_batch", batch):
+            await service.get_many(["A" * 44, "B" * 44])
+            single = await service.get("A" * 44)
+        assert batch.await_count == 1
+        assert single["total"] == 250
+        assert service.stats["hits"] == 1
+
+    async def test_exact_lookup_falls_back_on_missing_account(self):
+        service = G1BalanceService(window=0)
+        batch = AsyncMock(side_effect=lambda pubs: _batch_result(pubs, total=0))
+        native = AsyncMock(return_value={"balances": {"pending": 0, "blockchain": 900, "total": 900}})
+        with patch("services.g1_balance.get_g1_balances_batch", batch), \
+             patch("services.g1_balance.get_g1_balance_native", native):
+            exact = await service.get("A" * 44)
+            multi = await service.get_many(["B" * 44])
+        assert exact["total"] == 900
+        assert multi["B" * 44]["total"] == 0
+        native.assert_awaited_once_with("A" * 44)
+
+
+class TestExactEntries:
+    """A 0 from the batch alone never answers an exact lookup."""
+
+    async def test_multi_zero_does_not_answer_exact_lookup(self):
+        service = G1BalanceService(window=0)
+        batch = AsyncMock(side_effect=lambda pubs: _batch_result(pubs, total=0))
+        native = AsyncMock(return_value={"balances": {"pending": 0, "blockchain": 900, "total": 900}})
+        with patch("services.g1_balance.get_g1_balances_batch", batch), \
+             patch("services.g1_balance.get_g1_balance_native", native):
+            assert (await service.get_many(["A" * 44]))["A" * 44]["total"] == 0
+            assert (await service.get("A" * 44))["total"] == 900
+            assert (await service.get("A" * 44))["total"] == 900
+        native.assert_awaited_once_with("A" * 44)
+
+    async def test_refresh_ahead_keeps_the_fallback_chain(self, monkeypatch):
+        monkeypatch.setattr(g1_balance, "HOT_HITS", 1)
+        service = G1BalanceService(ttl=30, window=0)
+        batch = AsyncMock(side_effect=lambda pubs: _batch_result(pubs, total=0))
+        native = AsyncMock(return_value={"balances": {"pending": 0, "blockchain": 900, "total": 900}})
+        with patch("services.g1_balance.get_g1_balances_batch", batch), \
+             patch("services.g1_balance.get_g1_balance_native", native):
+            await service.get("A" * 44)
+            service.cache["A" * 44]["fetched_at"] -= 29  # proche de l'expiration
+            assert (await service.get("A" * 44))["total"] == 900
+            for _ in range(5):
+                await asyncio.sleep(0.01)
+            assert service.stats["refreshes"] == 1 and native.await_count == 2
+            assert (await service.get("A" * 44))["total"] == 900
+
+
+class TestFormatting:
+    def test_format_balance(self):
+        assert format_balance(248) == "2.48 Ğ1"
+
+    def test_zen_from_centimes(self):
+        assert zen_from_centimes(248) == 14.8
+        assert zen_from_centimes(50) == 0.0
@@ -0,0 +1,105 @@
+"""
+Tests for services.g1_history — per-wallet local store with cursor-based
+incremental sync (Squid calls are mocked).
+"""
+
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+import services.g1_history as g1_history
+from services.g1_balance import balance_service
+
+G1PUB = "DsEx1pS33vzYZg4MroyBV9hCw98j1gtHEhwiZ5tK7ech"
+
+
+def _squid(received=(), sent=()):
+    def node(tid, block, amount, other):
+        return {"id": tid, "fromId": other, "toId": other, "amount": amount,
+                "timestamp": "2026-03-01T10:00:00", "blockNumber": block, "comment": None}
+    return {"data": {
+        "received": {"nodes": [node(*r) for r in received]},
+        "sent": {"nodes": [node(*r) for r in sent]},
+    }}
+
+
+def _seed_balance(total):
+    """Remplace balance_service.get : inscrit `total` dans le cache des soldes."""
+    async def get(g1pub, exact=True):
+        balances = {"pending": 0, "blockchain": total, "total": total}
+        balance_service.cache[g1pub] = {"balances": balances, "fetched_at": 0, "hits": 0, "exact": True}
+        return balances
+    return AsyncMock(side_effect=get)
+
+
+class TestIncrementalSync:
+    def setup_method(self):
+        g1_history._stores.clear()
+        balance_service.cache.clear()
+
+    async def test_initial_then_idle_then_incremental(self, tmp_path):
+        fetch = AsyncMock(return_value=_squid(received=[("t2", 20, 500, "A"), ("t1", 10, 100, "B")]))
+        with patch.object(g1_history, "HISTORY_DIR", tmp_path), \
+             patch.object(g1_history, "_fetch_range", fetch), \
+             patch.object(balance_service, "get", _seed_balance(600)):
+            first = await g1_history.get_wallet_history(G1PUB)
+            assert [r["id"] for r in first["history"]] == ["t2", "t1"]
+            assert first["complete"] is True
+
+            # Idle wallet within SYNC_INTERVAL: served from the store, no network
+            await g1_history.get_wallet_history(G1PUB)
+            assert fetch.await_count == 1
+
+            # Next sync only asks for blocks above the cursor
+            g1_history._get_store(g1_history.g1pub_to_ss58(G1PUB)).meta["last_sync"] = 0
+            fetch.return_value = _squid(sent=[("t3", 30, 200, "C")])
+            third = await g1_history.get_wallet_history(G1PUB)
+            after = fetch.await_args.args[1]
+            assert after == 20
+            assert [r["id"] for r in third["history"]] == ["t3", "t2", "t1"]
+
+        # The append-only file reloads into the same store
+        g1_history._stores.clear()
+        with patch.object(g1_history, "HISTORY_DIR", tmp_path):
+            store = g1_history._get_store(g1_history.g1pub_to_ss58(G1PUB))
+            await store.load()
+        assert len(store.records) == 3
+
+    async def test_stale_store_syncs_only_when_balance_moved(self, tmp_path, monkeypatch):
+        fetch = AsyncMock(return_value=_squid(received=[("t1", 10, 100, "B")]))
+        get_balance = _seed_balance(100)
+        monkeypatch.setattr(g1_history, "HISTORY_DIR", tmp_path)
+        monkeypatch.setattr(g1_history, "_fetch_range", fetch)
+        monkeypatch.setattr(balance_service, "get", get_balance)
+        await g1_history.get_wallet_history(G1PUB)
+        store = g1_history._get_store(g1_history.g1pub_to_ss58(G1PUB))
+        assert store.meta["balance"] == 100 and fetch.await_count == 1
+
+        # Past SYNC_INTERVAL, balance entry expired: one balance read, no Squid
+        store.meta["last_sync"] -= g1_history.SYNC_INTERVAL
+        balance_service.cache.clear()
+        await g1_history.get_wallet_history(G1PUB)
+        assert fetch.await_count == 1 and get_balance.await_count == 2
+        await g1_history.get_wallet_history(G1PUB)
+        assert fetch.await_count == 1 and get_balance.await_count == 2
+
+        # Balance moved: the next call syncs
+        balance_service.cache[G1PUB]["balances"]["total"] = 300
+        fetch.return_value = _squid(received=[("t2", 20, 200, "A")])
+        history = await g1_history.get_wallet_history(G1PUB)
+        assert fetch.await_count == 2
+        assert [r["id"] for r in history["history"]] == ["t2", "t1"]
+        assert store.meta["balance"] == 300
+
+    async def test_summary_aggregates(self, tmp_path):
+        fetch = AsyncMock(return_value=_squid(received=[("t1", 10, 1000, "A")], sent=[("t2", 11, 250, "A")]))
+        with patch.object(g1_history, "HISTORY_DIR", tmp_path), \
+             patch.object(g1_history, "_fetch_range", fetch), \
+             patch.object(balance_service, "get", _seed_balance(750)):
+            summary = await g1_history.get_wallet_summary(G1PUB)
+        assert summary["monthly"]["2026-03"] == {"received": 10.0, "sent": 2.5, "count": 2}
+        assert summary["counterparties"]["A"]["count"] == 2
@@ -24,22 +24,17 @@ async def async_client():
 import asyncio
 
 @pytest.mark.asyncio
-@patch('asyncio.create_subprocess_exec')
-async def test_get_umap_geolinks(mock_exec, async_client):
-    mock_process = MagicMock()
-    
-    async def mock_communicate():
-        return (b'{"umaps": {"here": "test", "north": "test", "south": "test", "east": "test", "west": "test", "northeast": "test", "northwest": "test", "southeast": "test", "southwest": "test"}, "sectors": {"here": "test", "north": "test", "south": "test", "east": "test", "west": "test", "northeast": "test", "northwest": "test", "southeast": "test", "southwest": "test"}, "regions": {"here": "test", "north": "test", "south": "test", "east": "test", "west": "test", "northeast": "test", "northwest": "test", "southeast": "test", "southwest": "test"}}', b'')
-        
-    mock_process.communicate = mock_communicate
-    mock_process.returncode = 0
-    mock_exec.return_value = mock_process
-
-    response = await async_client.get("/api/geo/umap?lat=48.8566&lon=2.3522")
-    # The endpoint might not exist exactly like this, but we test the function logic if possible
-    # Assuming there's an endpoint that calls get_umap_geolinks
-    # If not, we can test the function directly
-    from routers.geo import get_umap_geolinks
-    result = await get_umap_geolinks(48.8566, 2.3522)
+async def test_get_umap_geolinks(async_client):
+    cells = {d: "test" for d in ["here", "north", "south", "east", "west",
+                                 "northeast", "northwest", "southeast", "southwest"]}
+    links = {"umaps": dict(cells), "sectors": dict(cells), "regions": dict(cells)}
+
+    async def mock_get_geolinks(lat, lon):
+        return links
+
+    with patch("services.geogrid.get_geolinks", mock_get_geolinks):
+        from routers.geo import get_umap_geolinks
+        result = await get_umap_geolinks(48.8566, 2.3522)
     assert result["success"] == True
     assert "umaps" in result
+    assert result["total_adjacentes"] == 8
@@ -0,0 +1,101 @@
+"""
+Tests for services.geogrid — arithmetic UMAP/SECTOR/REGION grid and the
+per-cell key store behind /api/umap/geolinks.
+"""
+
+import sys
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import geogrid, keyderive
+
+
+class TestGrid:
+    def test_umap_sector_region_labels(self):
+        assert geogrid.umap_coords(43.6, 1.44) == ("43.60", "1.44")
+        assert geogrid.neighbours("sector", 43.6, 1.44)["northeast"] == ("43.7", "1.5")
+        assert geogrid.neighbours("region", 43.6, 1.44)["southwest"] == ("42", "0")
+
+    def test_negative_cells_keep_truncated_sign(self):
+        # ${LAT::-1} de "-0.05" → "-0.0" : cellule distincte de "0.0"
+        sector = geogrid.neighbours("sector", -0.05, -12.34)
+        assert sector["here"] == ("-0.0", "-12.3")
+        assert sector["north"][0] == "0.0"
+        assert sector["south"][0] == "-0.1"
+
+
+class TestKeyStore:
+    async def test_cells_derived_once_and_persisted(self, tmp_path):
+        pool = ThreadPoolExecutor(max_workers=2)
+        calls = []
+
+        def fake_many(pairs):
+            calls.append(len(pairs))
+            return [f"{salt}|{pepper}" for salt, pepper in pairs]
+
+        with patch.object(geogrid, "GEOGRID_DIR", tmp_path), \
+             patch.object(keyderive, "_executor", pool), \
+             patch.object(keyderive, "_nostr_hex_many", fake_many):
+            store = geogrid.GeoKeyStore("UP")
+
+            first, second = await asyncio.gather(
+                store.resolve([("umap", "43.60", "1.44")]),
+                store.resolve([("umap", "43.60", "1.44"), ("sector", "43.6", "1.4")]),
+            )
+            assert first["umap:43.60:1.44"] == "UP43.60|UP1.44"
+            assert second["sector:43.6:1.4"] == "UP_43.6_1.4|UP_43.6_1.4"
+            assert sum(calls) == 2
+            # Rechargé depuis le store JSONL, sans nouvelle dérivation
+            again = geogrid.GeoKeyStore("UP")
+            assert again.keys == store.keys
+        pool.shutdown()
+
+    async def test_store_is_bounded_in_memory_and_on_disk(self, tmp_path, monkeypatch):
+        pool = ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(geogrid, "GEOGRID_DIR", tmp_path)
+        monkeypatch.setattr(keyderive, "_executor", pool)
+        monkeypatch.setattr(keyderive, "_nostr_hex_many", lambda pairs: [s for s, _ in pairs])
+        monkeypatch.setattr(geogrid.settings, "GEOGRID_MAX_KEYS", 3)
+        store = geogrid.GeoKeyStore("UP")
+        for i in range(10):
+            await store.resolve([("region", str(i), "0")])
+        assert len(store.keys) == 3
+        assert len(store.path.read_text().splitlines()) <= 6
+        # Rechargement : les cellules les plus récentes sont conservées
+        again = geogrid.GeoKeyStore("UP")
+        assert "region:9:0" in again.keys and "region:0:0" not in again.keys
+        pool.shutdown()
+
+    async def test_geolinks_are_charged_to_the_caller_ip(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(geogrid, "GEOGRID_DIR", tmp_path)
+        monkeypatch.setattr(geogrid, "get_uplanetname", lambda: "UP")
+        monkeypatch.setattr(geogrid, "_store", None)
+        monkeypatch.setattr(keyderive.settings, "KEYDERIVE_MAX_PER_IP", 1)
+        with keyderive.admitted("198.51.100.8"):
+            with pytest.raises(keyderive.KeyDerivationBusy):
+                await geogrid.get_geolinks(43.6, 1.44, "198.51.100.8")
+        assert keyderive._pending_by_ip == {}
+
+    async def test_bbox_limits(self):
+        with pytest.raises(ValueError):
+            await geogrid.resolve_bbox(40, 0, 45, 5, "umap")
+        with pytest.raises(ValueError):
+            await geogrid.resolve_bbox(45, 0, 40, 5, "region")
+
+    async def test_bbox_is_charged_to_the_caller_ip(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(geogrid, "GEOGRID_DIR", tmp_path)
+        monkeypatch.setattr(geogrid, "get_uplanetname", lambda: "UP")
+        monkeypatch.setattr(geogrid, "_store", None)
+        monkeypatch.setattr(keyderive.settings, "KEYDERIVE_MAX_PER_IP", 1)
+        with keyderive.admitted("198.51.100.7"):
+            with pytest.raises(keyderive.KeyDerivationBusy):
+                await geogrid.resolve_bbox(43.6, 1.44, 43.61, 1.45, "umap", "198.51.100.7")
+        assert keyderive._pending_by_ip == {}
@@ -0,0 +1,143 @@
+"""
+Tests for services.jobs: idempotent enqueue, retries with backoff,
+persistence across restarts and per-file status.
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import jobs
+from services.jobs import JobQueue
+
+
+class TestJobQueue:
+    async def test_same_key_enqueued_once(self, tmp_path):
+        queue = JobQueue(tmp_path / "jobs.sqlite")
+        seen = []
+
+        @queue.handler("upload.publish")
+        async def publish(payload):
+            seen.append(payload["n"])
+            return {"published": True}
+
+        first = await queue.enqueue("upload.publish", {"n": 1}, key="p:abc", group="abc")
+        again = await queue.enqueue("upload.publish", {"n": 2}, key="p:abc", group="abc")
+        while await queue.run_one():
+            pass
+        status = await queue.status("abc")
+        assert first == again and seen == [1]
+        assert [(j["status"], j["result"]) for j in status] == [("done", {"published": True})]
+
+    async def test_failure_is_retried_then_marked_failed(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(jobs.settings, "JOB_RETRY_BASE", 0)
+        monkeypatch.setattr(jobs.settings, "JOB_MAX_ATTEMPTS", 3)
+        queue = JobQueue(tmp_path / "jobs.sqlite")
+        attempts = []
+
+        @queue.handler("upload.roaming_dm")
+        async def dm(payload):
+            attempts.append(1)
+            raise RuntimeError("relay down")
+
+        await queue.enqueue("upload.roaming_dm", {}, key="dm:abc", group="abc")
+        while await queue.run_one():
+            pass
+        (job,) = await queue.status("abc")
+        assert len(attempts) == 3
+        assert job["status"] == "failed" and job["attempts"] == 3
+        assert job["error"] == "relay down"
+
+    async def test_retry_waits_for_backoff(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(jobs.settings, "JOB_RETRY_BASE", 60)
+        queue = JobQueue(tmp_path / "jobs.sqlite")
+
+        @queue.handler("flaky")
+        async def flaky(payload):
+            raise RuntimeError("later")
+
+        await queue.enqueue("flaky", {}, group="g")
+        ran = await queue.run_one()
+        ran_again = await queue.run_one()
+        (job,) = await queue.status("g")
+        assert ran is True and ran_again is False
+        assert job["status"] == "queued" and job["attempts"] == 1
+
+    async def test_interrupted_jobs_resume_after_restart(self, tmp_path):
+        db = tmp_path / "jobs.sqlite"
+        crashed = JobQueue(db)
+        await crashed.enqueue("upload.publish", {"n": 1}, key="p:abc", group="abc")
+        await crashed._claim()  # worker tué pendant l'exécution
+
+        restarted = JobQueue(db)
+        done = []
+
+        @restarted.handler("upload.publish")
+        async def publish(payload):
+            done.append(payload["n"])
+
+        restarted.start()
+        for _ in range(50):
+            if done:
+                break
+            await asyncio.sleep(0.01)
+        await restarted.stop()
+        assert done == [1]
+
+    async def test_failed_job_is_rearmed_by_a_new_upload(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(jobs.settings, "JOB_MAX_ATTEMPTS", 1)
+        queue = JobQueue(tmp_path / "jobs.sqlite")
+        outcomes = [RuntimeError("down"), None]
+
+        @queue.handler("upload.publish")
+        async def publish(payload):
+            outcome = outcomes.pop(0)
+            if outcome:
+                raise outcome
+            return {"n": payload["n"]}
+
+        first = await queue.enqueue("upload.publish", {"n": 1}, key="p:abc", group="abc")
+        await queue.run_one()
+        again = await queue.enqueue("upload.publish", {"n": 2}, key="p:abc", group="abc")
+        await queue.run_one()
+        (job,) = await queue.status("abc")
+        assert first == again and job["status"] == "done" and job["result"] == {"n": 2}
+
+    async def test_chained_job_waits_for_the_previous_one(self, tmp_path):
+        queue = JobQueue(tmp_path / "jobs.sqlite")
+        order = []
+
+        @queue.handler("upload.publish")
+        async def publish(payload):
+            order.append("publish")
+
+        @queue.handler("upload.roaming_dm")
+        async def dm(payload):
+            order.append("dm")
+
+        await queue.enqueue("upload.publish", {}, key="p:abc", group="abc", delay=0.05)
+        await queue.enqueue("upload.roaming_dm", {}, key="dm:abc", group="abc", after="p:abc")
+        assert await queue.run_one() is False  # dm bloquée par la publication différée
+        await asyncio.sleep(0.06)
+        while await queue.run_one():
+            pass
+        assert order == ["publish", "dm"]
+
+    async def test_status_is_scoped_to_owner_and_old_jobs_are_purged(self, tmp_path):
+        queue = JobQueue(tmp_path / "jobs.sqlite")
+
+        @queue.handler("upload.publish")
+        async def publish(payload):
+            return None
+
+        await queue.enqueue("upload.publish", {}, key="p:abc:alice", group="abc", owner="alice")
+        await queue.enqueue("upload.publish", {}, key="p:abc:bob", group="abc", owner="bob")
+        assert [j["id"] for j in await queue.status("abc", owner="alice")] == [1]
+        while await queue.run_one():
+            pass
+        assert await queue.purge(older_than=-1) == 2
+        assert await queue.status("abc") == []
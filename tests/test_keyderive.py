@@ -0,0 +1,109 @@
+"""
+Tests for services.keyderive — admission control, per-IP fairness and
+result reuse of the dedicated key-derivation pool.
+"""
+
+import sys
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import keyderive
+
+
+def _slow_upper(value: str) -> str:
+    time.sleep(0.05)
+    return value.upper()
+
+
+class TestAdmission:
+    def setup_method(self):
+        keyderive._results.clear()
+
+    async def test_per_ip_limit_and_reuse(self):
+        pool = ThreadPoolExecutor(max_workers=4)
+
+        with patch.object(keyderive, "_executor", pool), \
+             patch.object(keyderive.settings, "KEYDERIVE_MAX_PER_IP", 1):
+            first = asyncio.ensure_future(keyderive.run_derivation("t", _slow_upper, ("a",), "1.2.3.4"))
+            await asyncio.sleep(0)
+            with pytest.raises(keyderive.KeyDerivationBusy) as busy:
+                await keyderive.run_derivation("t", _slow_upper, ("b",), "1.2.3.4")
+            assert busy.value.retry_after >= 1
+            # Another IP is still admitted; identical input joins the in-flight job
+            other = await keyderive.run_derivation("t", _slow_upper, ("c",), "5.6.7.8")
+            same = await keyderive.run_derivation("t", _slow_upper, ("a",), "9.9.9.9")
+            assert (await first, other, same) == ("A", "C", "A")
+            # Cached afterwards: no pool slot needed
+            assert keyderive.get_cached("t", "a") == "A"
+        pool.shutdown()
+
+    async def test_global_queue_bound(self):
+        pool = ThreadPoolExecutor(max_workers=1)
+
+        with patch.object(keyderive, "_executor", pool), \
+             patch.object(keyderive.settings, "KEYDERIVE_MAX_PENDING", 1):
+            job = asyncio.ensure_future(keyderive.run_derivation("g", _slow_upper, ("x",), "1.1.1.1"))
+            await asyncio.sleep(0)
+            with pytest.raises(keyderive.KeyDerivationBusy):
+                await keyderive.run_derivation("g", _slow_upper, ("y",), "2.2.2.2")
+            assert await job == "X"
+        pool.shutdown()
+
+    def test_pbkdf2_matches_stdlib(self):
+        import base64, hashlib
+        expected = base64.urlsafe_b64encode(
+            hashlib.pbkdf2_hmac("sha256", b"s", b"uplanet-a4l-v1", 600000)
+        ).rstrip(b"=").decode()
+        assert keyderive._pbkdf2("s") == expected
+
+    async def test_salt_and_pepper_stretched_in_parallel_under_one_slot(self, monkeypatch):
+        pool = ThreadPoolExecutor(max_workers=2)
+        both_running = threading.Barrier(2, timeout=2)
+
+        def fake_pbkdf2(value):
+            both_running.wait()   # BrokenBarrierError si les deux jobs ne tournent pas ensemble
+            return value.upper()
+
+        monkeypatch.setattr(keyderive, "_executor", pool)
+        monkeypatch.setattr(keyderive, "_pbkdf2", fake_pbkdf2)
+        monkeypatch.setattr(keyderive.settings, "KEYDERIVE_MAX_PER_IP", 1)
+        assert await keyderive.stretch_credentials("salt", "pepper", "1.2.3.4") == ("SALT", "PEPPER")
+        pool.shutdown()
+
+    async def test_waiter_takes_over_when_owner_is_cancelled(self):
+        pool = ThreadPoolExecutor(max_workers=2)
+
+        with patch.object(keyderive, "_executor", pool):
+            owner = asyncio.ensure_future(keyderive.run_derivation("w", _slow_upper, ("z",), "1.1.1.1"))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(keyderive.run_derivation("w", _slow_upper, ("z",), "2.2.2.2"))
+            await asyncio.sleep(0)
+            owner.cancel()
+            assert await waiter == "Z"
+            assert owner.cancelled()
+            assert keyderive._inflight == {} and keyderive._pending_by_ip == {}
+        pool.shutdown()
+
+
+class TestNostrKeygen:
+    def test_npub_matches_reference_secp256k1(self):
+        pynostr_key = pytest.importorskip("pynostr.key")
+        seed = keyderive._credentials_seed("stretched-salt", "stretched-pepper")
+        expected = pynostr_key.PrivateKey(seed).public_key.bech32()
+        assert keyderive._nostr_npub("stretched-salt", "stretched-pepper") == expected
+
+    def test_seed_uses_duniterpy_scrypt_params(self):
+        import hashlib
+        assert keyderive._credentials_seed("s", "p") == hashlib.scrypt(
+            b"p", salt=b"s", n=4096, r=16, p=1, dklen=32
+        )
@@ -0,0 +1,138 @@
+"""
+Tests for services.kubo: add options from settings, only-hash dry runs,
+streamed cat to file, concurrency limit and per-operation metrics.
+"""
+
+import sys
+import asyncio
+import json
+from pathlib import Path
+
+import httpx
+import pytest
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import kubo as kubo_module
+from services.kubo import KuboClient, KuboError
+
+
+def _client(handler) -> KuboClient:
+    client = KuboClient()
+    client._client = httpx.AsyncClient(
+        base_url="http://kubo/api/v0", transport=httpx.MockTransport(handler),
+    )
+    return client
+
+
+def _added(*names):
+    return "\n".join(json.dumps({"Name": n, "Hash": f"Qm{n}", "Size": "42"}) for n in names)
+
+
+class TestAdd:
+    async def test_options_come_from_settings(self, monkeypatch):
+        monkeypatch.setattr(kubo_module.settings, "IPFS_CHUNKER", "size-1048576")
+        monkeypatch.setattr(kubo_module.settings, "IPFS_RAW_LEAVES", True)
+        monkeypatch.setattr(kubo_module.settings, "IPFS_CID_VERSION", 1)
+        seen = []
+
+        def handler(request):
+            seen.append(dict(request.url.params))
+            return httpx.Response(200, text=_added("a.bin"))
+
+        cid = await _client(handler).add_bytes(b"data", "a.bin")
+        assert cid == "Qma.bin"
+        assert seen == [{"pin": "true", "chunker": "size-1048576", "raw-leaves": "true", "cid-version": "1"}]
+
+    async def test_node_defaults_when_unset(self):
+        def handler(request):
+            assert dict(request.url.params) == {"pin": "false", "only-hash": "true"}
+            return httpx.Response(200, text=_added("a.bin"))
+
+        client = _client(handler)
+        assert await client.add_bytes(b"data", "a.bin", only_hash=True) == "Qma.bin"
+        assert client.metrics()["add.only_hash"]["count"] == 1
+
+    async def test_disk_and_memory_entries_in_one_request(self, tmp_path):
+        (tmp_path / "big.webm").write_bytes(b"x" * 200_000)
+        requests = []
+
+        def handler(request):
+            body = request.read()
+            requests.append(body)
+            assert body.count(b'name="file"') == 2
+            return httpx.Response(200, text=_added("big.webm", "note.txt"))
+
+        res = await _client(handler).add({"big.webm": tmp_path / "big.webm", "note.txt": b"hi"})
+        assert len(requests) == 1
+        assert res == {"big.webm": {"Hash": "Qmbig.webm", "Size": 42}, "note.txt": {"Hash": "Qmnote.txt", "Size": 42}}
+
+    async def test_names_are_url_escaped_and_files_streamed(self, tmp_path):
+        (tmp_path / "a b%+.webm").write_bytes(b"x" * 600_000)
+        bodies = []
+
+        def handler(request):
+            bodies.append(request.read())
+            return httpx.Response(200, text=_added("a b%+.webm"))
+
+        res = await _client(handler).add({"a b%+.webm": tmp_path / "a b%+.webm"})
+        assert res["a b%+.webm"]["Hash"] == "Qma b%+.webm"
+        assert b'filename="a%20b%25%2B.webm"' in bodies[0]
+        assert bodies[0].count(b"x") == 600_000
+
+
+class TestCat:
+    async def test_cat_to_file(self, tmp_path):
+        def handler(request):
+            assert request.url.params["arg"] == "/ipfs/QmDir/clip.webm"
+            return httpx.Response(200, content=b"video" * 1000)
+
+        target = tmp_path / "clip.webm"
+        size = await _client(handler).cat_to_file("/ipfs/QmDir/clip.webm", target)
+        assert size == 5000 and target.read_bytes() == b"video" * 1000
+
+    async def test_failed_download_leaves_nothing(self, tmp_path):
+        client = _client(lambda request: httpx.Response(500, text="not found"))
+        with pytest.raises(KuboError):
+            await client.cat_to_file("/ipfs/QmGone", tmp_path / "gone.bin")
+        assert list(tmp_path.iterdir()) == []
+        assert client.metrics()["cat.stream"]["errors"] == 1
+
+    async def test_slow_download_times_out(self, tmp_path):
+        async def handler(request):
+            await asyncio.sleep(1)
+            return httpx.Response(200, content=b"late")
+
+        with pytest.raises(KuboError) as exc:
+            await _client(handler).cat_to_file("/ipfs/QmSlow", tmp_path / "slow.bin", timeout=0.05)
+        assert isinstance(exc.value.__cause__, TimeoutError)
+        assert list(tmp_path.iterdir()) == []
+
+    async def test_stat_tells_directories_apart(self):
+        def handler(request):
+            assert request.url.path == "/api/v0/files/stat"
+            return httpx.Response(200, json={"Hash": "QmDir", "Type": "directory", "CumulativeSize": 99})
+
+        node = await _client(handler).stat("/ipfs/QmDir")
+        assert node["Type"] == "directory"
+
+
+class TestConcurrency:
+    async def test_calls_are_bounded(self, monkeypatch):
+        monkeypatch.setattr(kubo_module.settings, "KUBO_MAX_CONCURRENCY", 2)
+        active, peak = [0], [0]
+
+        async def handler(request):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+            return httpx.Response(200, content=b"ok")
+
+        client = _client(handler)
+
+        assert await asyncio.gather(*(client.cat(f"Qm{i}") for i in range(6))) == [b"ok"] * 6
+        assert peak[0] == 2
+        assert client.metrics()["cat"]["count"] == 6
@@ -0,0 +1,78 @@
+"""
+Tests for services.memory_status — per-file results cached by (mtime, size)
+and Qdrant counts served from cache / refreshed for active accounts.
+"""
+
+import sys
+import json
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import memory_status
+
+
+class TestFileCache:
+    def test_unchanged_file_is_not_reparsed(self, tmp_path):
+        slot = tmp_path / "slot0.json"
+        slot.write_text(json.dumps({"messages": [1, 2, 3]}))
+        assert memory_status._json_message_count(slot) == 3
+        with patch.object(memory_status.json, "loads", side_effect=AssertionError("re-parsed")):
+            assert memory_status._json_message_count(slot) == 3
+
+    def test_modified_file_is_recounted(self, tmp_path):
+        slot = tmp_path / "slot1.json"
+        slot.write_text(json.dumps({"messages": [1]}))
+        assert memory_status._json_message_count(slot) == 1
+        slot.write_text(json.dumps({"messages": [1, 2]}))
+        st = slot.stat()
+        os.utime(slot, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        assert memory_status._json_message_count(slot) == 2
+
+
+class TestQdrantCounts:
+    def setup_method(self):
+        memory_status._qdrant_cache.clear()
+        memory_status._recently_viewed.clear()
+
+    def test_counts_cached_and_refreshed_for_active_accounts(self):
+        calls = []
+
+        def fake_counts(email, slots):
+            calls.append(email)
+            return {"13": len(calls)}
+
+        with patch.object(memory_status, "_qdrant_slot_counts", fake_counts), \
+             patch.object(memory_status.settings, "MEMORY_STATUS_QDRANT_TTL", 0):
+            assert memory_status._qdrant_counts_cached("a@b.c") == {"13": 1}
+            # TTL échu : la tâche de fond rafraîchit, la lecture reste en cache
+            assert memory_status.refresh_active_qdrant_counts() == 1
+        with patch.object(memory_status, "_qdrant_slot_counts", fake_counts):
+            assert memory_status._qdrant_counts_cached("a@b.c") == {"13": 2}
+        assert calls == ["a@b.c", "a@b.c"]
+
+    def test_reset_memory_drops_cached_counts(self, tmp_path):
+        memory_status._qdrant_cache["a@b.c"] = (0, {"13": 5})
+        with patch.object(memory_status.settings, "GAME_PATH", tmp_path), \
+             patch.object(memory_status.settings, "ZEN_PATH", tmp_path), \
+             patch.object(memory_status, "_delete_qdrant_slots"):
+            memory_status.reset_memory("a@b.c", "bro_memory")
+        assert "a@b.c" not in memory_status._qdrant_cache
+
+
+class TestFallback:
+    def test_empty_status_has_the_same_shape_as_a_real_one(self, tmp_path):
+        def shape(value):
+            return {k: shape(v) for k, v in value.items()} if isinstance(value, dict) else None
+
+        with patch.object(memory_status.settings, "GAME_PATH", tmp_path), \
+             patch.object(memory_status.settings, "ZEN_PATH", tmp_path), \
+             patch.object(memory_status, "_qdrant_counts_cached", return_value={}):
+            real = memory_status.get_memory_status("a@b.c")
+        empty = memory_status.empty_memory_status("a@b.c")
+        real["qdrant"]["slots"] = {}
+        assert shape(empty) == shape(real)
@@ -0,0 +1,97 @@
+"""
+Tests for services.natools — in-process sealed box compatible with
+natools.py (PubSec .dunikey) used by the cookie vault.
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+nacl_bindings = pytest.importorskip("nacl.bindings")
+
+from services import natools, cookie_store
+
+_B58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def _b58encode(raw: bytes) -> str:
+    n = int.from_bytes(raw, "big")
+    out = ""
+    while n:
+        n, r = divmod(n, 58)
+        out = _B58[r] + out
+    return "1" * (len(raw) - len(raw.lstrip(b"\0"))) + out
+
+
+def _write_dunikey(path: Path, seed: bytes) -> str:
+    pk, sk = nacl_bindings.crypto_sign_seed_keypair(seed)
+    g1pub = _b58encode(pk)
+    path.write_text(f"Type: PubSec\nVersion: 1\npub: {g1pub}\nsec: {_b58encode(sk)}\n")
+    return g1pub
+
+
+class TestSealedBox:
+    def test_seal_unseal_roundtrip(self, tmp_path):
+        g1pub = _write_dunikey(tmp_path / ".secret.dunikey", b"\x07" * 32)
+        sealed = natools.seal(b"# Netscape HTTP Cookie File\n", g1pub)
+        # crypto_box_seal : 32 (clé éphémère) + 16 (MAC) octets d'en-tête
+        assert len(sealed) == 48 + 28
+        assert natools.unseal(sealed, tmp_path / ".secret.dunikey") == b"# Netscape HTTP Cookie File\n"
+
+    def test_wrong_key_returns_none(self, tmp_path):
+        g1pub = _write_dunikey(tmp_path / "a.dunikey", b"\x01" * 32)
+        _write_dunikey(tmp_path / "b.dunikey", b"\x02" * 32)
+        assert natools.unseal(natools.seal(b"x", g1pub), tmp_path / "b.dunikey") is None
+
+
+class TestCookieVault:
+    async def test_pin_and_read_without_temp_files(self, tmp_path):
+        g1pub = _write_dunikey(tmp_path / ".secret.dunikey", b"\x09" * 32)
+        stored = {}
+
+        async def fake_add(data, filename="data", pin=True):
+            stored["blob"] = data
+            return "QmCookie"
+
+        with patch.object(cookie_store, "kubo_add_bytes", fake_add), \
+             patch.object(cookie_store, "kubo_cat", AsyncMock(side_effect=lambda cid: stored["blob"])), \
+             patch.object(cookie_store.tempfile, "TemporaryDirectory", side_effect=AssertionError):
+            assert await cookie_store.encrypt_and_pin(b"cookie-data", g1pub) == "QmCookie"
+            assert b"cookie-data" not in stored["blob"]
+            assert await cookie_store.decrypt_from_ipfs("QmCookie", tmp_path) == b"cookie-data"
+
+
+class TestCookieCacheAndPublish:
+    async def test_reads_served_from_encrypted_cache(self, tmp_path):
+        cat = AsyncMock(return_value=b"plain-cookie")
+        with patch.object(cookie_store, "decrypt_from_ipfs", cat):
+            first = await cookie_store.get_cookie_content("QmA", tmp_path)
+            second = await cookie_store.get_cookie_content("QmA", tmp_path)
+            key = f"{tmp_path.name}:QmA"
+            assert b"plain-cookie" not in cookie_store._plain_cache[key]
+            cookie_store.forget_cookie("QmA", tmp_path)
+            await cookie_store.get_cookie_content("QmA", tmp_path)
+        assert first == second == b"plain-cookie"
+        assert cat.await_count == 2
+
+    async def test_manifest_publish_is_debounced(self, tmp_path):
+        publish = AsyncMock()
+        cookie_store.save_manifest(tmp_path, {"a.org": {"cid": "Qm1"}})
+
+        with patch.object(cookie_store, "publish_manifest_to_nostr", publish), \
+             patch.object(cookie_store.settings, "COOKIE_MANIFEST_DEBOUNCE", 0.01):
+            for domain in ("a.org", "b.org", "c.org"):
+                manifest = cookie_store.load_manifest(tmp_path)
+                manifest[domain] = {"cid": "Qm" + domain}
+                cookie_store.save_manifest(tmp_path, manifest)
+                cookie_store.schedule_manifest_publish(tmp_path)
+            await asyncio.sleep(0.05)
+        publish.assert_awaited_once()
+        assert set(publish.await_args.args[1]) == {"a.org", "b.org", "c.org"}
@@ -136,34 +136,31 @@ class TestCheckNip42AuthLocalMarker:
 
     HEX = "d" * 64
 
-    def _run(self, coro):
-        return asyncio.get_event_loop().run_until_complete(coro)
-
     def setup_method(self):
         from services.nostr import check_nip42_auth_local_marker
         self.check = check_nip42_auth_local_marker
 
     # ── A. pubkey-bound filename ───────────────────────────────────────────────
 
-    def test_fresh_marker_returns_true(self, tmp_path):
+    async def test_fresh_marker_returns_true(self, tmp_path):
         """A fresh, correctly-named JSON marker must be accepted."""
         marker = tmp_path / _marker_name(self.HEX)
         _write_secure_marker(marker, self.HEX)
 
         with patch("utils.security.find_user_directory_by_hex", return_value=tmp_path):
-            result = self._run(self.check(self.HEX))
+            result = await self.check(self.HEX)
         assert result is True
 
-    def test_old_generic_marker_is_rejected(self, tmp_path):
+    async def test_old_generic_marker_is_rejected(self, tmp_path):
         """Legacy .nip42_auth (without hex suffix) must NOT grant access."""
         old_marker = tmp_path / ".nip42_auth"
         old_marker.touch()   # old format – no pubkey in name, no JSON
 
         with patch("utils.security.find_user_directory_by_hex", return_value=tmp_path):
-            result = self._run(self.check(self.HEX))
+            result = await self.check(self.HEX)
         assert result is False, "Old generic marker must not authenticate"
 
-    def test_marker_for_different_pubkey_is_rejected(self, tmp_path):
+    async def test_marker_for_different_pubkey_is_rejected(self, tmp_path):
         """Marker for Alice must not authenticate Bob (pubkey-confusion guard)."""
         alice_hex = "a" * 64
         bob_hex   = "b" * 64
@@ -172,12 +169,12 @@ class TestCheckNip42AuthLocalMarker:
         _write_secure_marker(marker, alice_hex)
 
         with patch("utils.security.find_user_directory_by_hex", return_value=tmp_path):
-            result = self._run(self.check(bob_hex))
+            result = await self.check(bob_hex)
         assert result is False, "Alice's marker must not authenticate Bob"
 
     # ── B. TTL (300 s) ────────────────────────────────────────────────────────
 
-    def test_expired_marker_returns_false(self, tmp_path):
+    async def test_expired_marker_returns_false(self, tmp_path):
         """Marker older than 300 s (5 min) must be rejected."""
         marker = tmp_path / _marker_name(self.HEX)
         _write_secure_marker(marker, self.HEX)
@@ -186,10 +183,10 @@ class TestCheckNip42AuthLocalMarker:
         os.utime(marker, (old_mtime, old_mtime))
 
         with patch("utils.security.find_user_directory_by_hex", return_value=tmp_path):
-            result = self._run(self.check(self.HEX))
+            result = await self.check(self.HEX)
         assert result is False
 
-    def test_marker_within_300s_is_valid(self, tmp_path):
+    async def test_marker_within_300s_is_valid(self, tmp_path):
         """Marker aged 299 s (just under 5 min) must still be valid."""
         marker = tmp_path / _marker_name(self.HEX)
         _write_secure_marker(marker, self.HEX)
@@ -197,12 +194,12 @@ class TestCheckNip42AuthLocalMarker:
         os.utime(marker, (recent, recent))
 
         with patch("utils.security.find_user_directory_by_hex", return_value=tmp_path):
-            result = self._run(self.check(self.HEX))
+            result = await self.check(self.HEX)
         assert result is True
 
     # ── C. JSON content validation ────────────────────────────────────────────
 
-    def test_pubkey_mismatch_in_json_rejected(self, tmp_path):
+    async def test_pubkey_mismatch_in_json_rejected(self, tmp_path):
         """Marker whose JSON pubkey doesn't match the filename pubkey is rejected."""
         marker = tmp_path / _marker_name(self.HEX)
         # Write JSON with a *different* pubkey than the filename
@@ -213,10 +210,10 @@ class TestCheckNip42AuthLocalMarker:
         }))
 
         with patch("utils.security.find_user_directory_by_hex", return_value=tmp_path):
-            result = self._run(self.check(self.HEX))
+            result = await self.check(self.HEX)
         assert result is False, "JSON pubkey mismatch must be rejected"
 
-    def test_invalid_event_hash_rejected(self, tmp_path):
+    async def test_invalid_event_hash_rejected(self, tmp_path):
         """A marker with a malformed event_hash must be rejected."""
         marker = tmp_path / _marker_name(self.HEX)
         marker.write_text(json.dumps({
@@ -226,29 +223,29 @@ class TestCheckNip42AuthLocalMarker:
         }))
 
         with patch("utils.security.find_user_directory_by_hex", return_value=tmp_path):
-            result = self._run(self.check(self.HEX))
+            result = await self.check(self.HEX)
         assert result is False, "Invalid event_hash must be rejected"
 
-    def test_empty_marker_accepted_with_legacy_warning(self, tmp_path):
+    async def test_empty_marker_accepted_with_legacy_warning(self, tmp_path):
         """An empty marker (legacy/shell fallback) is accepted but logs a warning."""
         marker = tmp_path / _marker_name(self.HEX)
         marker.write_text("")   # empty – legacy format
 
         with patch("utils.security.find_user_directory_by_hex", return_value=tmp_path):
-            result = self._run(self.check(self.HEX))
+            result = await self.check(self.HEX)
         assert result is True, "Empty legacy marker should still be accepted"
 
     # ── Other edge cases ──────────────────────────────────────────────────────
 
-    def test_no_marker_returns_false(self, tmp_path):
+    async def test_no_marker_returns_false(self, tmp_path):
         with patch("utils.security.find_user_directory_by_hex", return_value=tmp_path):
-            result = self._run(self.check(self.HEX))
+            result = await self.check(self.HEX)
         assert result is False
 
-    def test_nonexistent_directory_returns_false(self):
+    async def test_nonexistent_directory_returns_false(self):
         with patch("utils.security.find_user_directory_by_hex",
                    side_effect=Exception("user not found")):
-            result = self._run(self.check(self.HEX))
+            result = await self.check(self.HEX)
         assert result is False
 
 
@@ -262,16 +259,13 @@ class TestCheckNip42Auth:
     VALID_NPUB = "npub180cvv07tjdrrgpa0j7j7tmnyl2yr6yr7l8j4s3evf6u64th6gkwsyjh6w6"
     VALID_HEX  = "3bf0c63fcb93463407af97a5e5ee64fa883d107ef9e558472c4eb9aaaefa459d"
 
-    def _run(self, coro):
-        return asyncio.get_event_loop().run_until_complete(coro)
-
     def setup_method(self):
         from services.nostr import check_nip42_auth
         self.check = check_nip42_auth
 
     # ── local marker path ──────────────────────────────────────────────────
 
-    def test_local_marker_shortcircuits_relay_check(self, tmp_path):
+    async def test_local_marker_shortcircuits_relay_check(self, tmp_path):
         """A fresh local marker should succeed without touching the relay."""
         marker = tmp_path / _marker_name(self.VALID_HEX)
         _write_secure_marker(marker, self.VALID_HEX)
@@ -282,10 +276,10 @@ class TestCheckNip42Auth:
             # relay should never be called
             with patch("services.nostr.asyncio.create_subprocess_exec",
                        side_effect=AssertionError("Should not reach relay")):
-                result = self._run(self.check(self.VALID_HEX))
+                result = await self.check(self.VALID_HEX)
         assert result is True
 
-    def test_no_marker_falls_through_to_relay(self, tmp_path):
+    async def test_no_marker_falls_through_to_relay(self, tmp_path):
         """Without a marker, check_nip42_auth should try nostr_get_events.sh."""
         with patch("services.nostr.check_nip42_auth_local_marker",
                    new_callable=AsyncMock, return_value=False):
@@ -307,10 +301,10 @@ class TestCheckNip42Auth:
                         ]
                     )
                     mock_ws.return_value = ctx
-                    result = self._run(self.check(self.VALID_HEX))
+                    result = await self.check(self.VALID_HEX)
         assert result is False
 
-    def test_nostr_get_events_finds_valid_event(self, tmp_path):
+    async def test_nostr_get_events_finds_valid_event(self, tmp_path):
         """If nostr_get_events.sh returns a valid kind-22242 event, auth passes."""
         event = _make_nip42_event(pubkey=self.VALID_HEX)
         event_json_line = json.dumps(event)
@@ -326,15 +320,15 @@ class TestCheckNip42Auth:
                        return_value=mock_proc):
                 # script_path.exists() must return True
                 with patch("pathlib.Path.exists", return_value=True):
-                    result = self._run(self.check(self.VALID_HEX))
+                    result = await self.check(self.VALID_HEX)
         assert result is True
 
-    def test_invalid_npub_returns_false(self):
-        result = self._run(self.check("not_a_valid_npub"))
+    async def test_invalid_npub_returns_false(self):
+        result = await self.check("not_a_valid_npub")
         assert result is False
 
-    def test_empty_npub_returns_false(self):
-        result = self._run(self.check(""))
+    async def test_empty_npub_returns_false(self):
+        result = await self.check("")
         assert result is False
 
 
@@ -489,9 +483,6 @@ class TestKind22242RelayBehaviour:
     HEX     = "3bf0c63fcb93463407af97a5e5ee64fa883d107ef9e558472c4eb9aaaefa459d"
     RELAY   = "ws://127.0.0.1:7777"
 
-    def _run(self, coro):
-        return asyncio.get_event_loop().run_until_complete(coro)
-
     @pytest.mark.live_relay
     def test_kind22242_not_stored_in_strfry(self):
         """
@@ -528,7 +519,7 @@ class TestKind22242RelayBehaviour:
         )
 
     @pytest.mark.live_relay
-    def test_local_marker_auth_works_end_to_end(self, tmp_path):
+    async def test_local_marker_auth_works_end_to_end(self, tmp_path):
         """
         Create the secure `.nip42_auth_<hex>` marker JSON (as filter/22242.sh
         or ajouter_media.sh does), then call check_nip42_auth and expect True
@@ -539,6 +530,6 @@ class TestKind22242RelayBehaviour:
 
         with patch("utils.security.find_user_directory_by_hex", return_value=tmp_path):
             from services.nostr import check_nip42_auth
-            result = self._run(check_nip42_auth(self.HEX))
+            result = await check_nip42_auth(self.HEX)
 
         assert result is True, "Expected True with fresh secure local marker"
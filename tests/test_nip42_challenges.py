@@ -0,0 +1,77 @@
+"""
+Tests for services.nip42_challenges: one-time nonces, hard capacity,
+bucketed expiry and the SQLite store shared between workers.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import nip42_challenges as challenges_module
+from services.nip42_challenges import ChallengeStore
+
+ALICE = "a" * 64
+BOB = "b" * 64
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    db = tmp_path / "challenges.sqlite" if request.param == "sqlite" else None
+
+    def make(**kw):
+        return ChallengeStore(db_path=db, **kw)
+    return make
+
+
+class TestChallengeStore:
+    def test_nonce_is_consumed_once(self, make_store):
+        store = make_store()
+        nonce = store.issue(ALICE)
+        assert store.peek(ALICE) == nonce
+        assert store.consume(ALICE) == nonce
+        assert store.consume(ALICE) is None and store.peek(ALICE) is None
+
+    def test_reissue_replaces_nonce(self, make_store):
+        store = make_store()
+        store.issue(ALICE)
+        nonce = store.issue(ALICE)
+        assert store.peek(ALICE) == nonce and len(store) == 1
+
+    def test_expired_nonce_is_refused_then_purged(self, make_store, monkeypatch):
+        store = make_store(ttl=120, bucket=10)
+        store.issue(ALICE)
+        later = time.time() + 200
+        monkeypatch.setattr(challenges_module.time, "time", lambda: later)
+        assert store.peek(ALICE) is None
+        store.issue(BOB)
+        assert len(store) == 1
+
+    def test_capacity_evicts_oldest(self, make_store):
+        store = make_store(capacity=100)
+        keys = [f"{i:064x}" for i in range(250)]
+        for k in keys:
+            store.issue(k)
+        assert len(store) <= 100
+        assert store.peek(keys[0]) is None and store.peek(keys[-1]) is not None
+
+
+class TestSharedStore:
+    def test_nonce_issued_by_one_worker_consumed_by_another(self, tmp_path):
+        db = tmp_path / "challenges.sqlite"
+        worker_a, worker_b = ChallengeStore(db_path=db), ChallengeStore(db_path=db)
+        nonce = worker_a.issue(ALICE)
+        assert worker_b.peek(ALICE) == nonce
+        assert worker_b.consume(ALICE) == nonce
+        assert worker_a.consume(ALICE) is None
+
+    def test_settings_select_backing(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(challenges_module.settings, "NIP42_CHALLENGE_DB", tmp_path / "c.sqlite")
+        store = ChallengeStore()
+        store.issue(ALICE)
+        assert (tmp_path / "c.sqlite").exists()
@@ -0,0 +1,168 @@
+"""
+Tests for services.nip42_sessions: in-memory NIP-42 sessions, timer-wheel
+expiry, marker scanning (new / rewritten / deleted) and relay notifications
+over the local Unix socket.
+"""
+
+import sys
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import nip42_sessions as sessions_module
+from services.nip42_sessions import Nip42Sessions
+from services.nostr import NIP42_MARKER_MAX_AGE, NIP42_MARKER_PREFIX
+
+ALICE = "a" * 64
+BOB = "b" * 64
+
+
+def _marker(user_dir: Path, hex_pubkey: str, mtime: float = None) -> Path:
+    path = user_dir / f"{NIP42_MARKER_PREFIX}{hex_pubkey}"
+    path.write_text(json.dumps({"pubkey": hex_pubkey, "event_hash": "e" * 64}))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+class TestTimerWheel:
+    def test_session_expires_when_wheel_reaches_its_slot(self):
+        table = Nip42Sessions()
+        now = time.time()
+        table.grant(ALICE, now + 5, "e" * 64)
+        table.grant(BOB, now + 60)
+        assert table.check(ALICE) and table.check(BOB)
+
+        assert table.expire(now + 10) == 1
+        assert ALICE not in table._sessions and table.check(BOB)
+
+    def test_renewed_session_survives_its_old_slot(self):
+        table = Nip42Sessions()
+        now = time.time()
+        table.grant(ALICE, now + 5)
+        table.grant(ALICE, now + 100)
+        table.expire(now + 10)
+        assert table.check(ALICE)
+
+    def test_expired_grant_is_ignored(self):
+        table = Nip42Sessions()
+        table.grant(ALICE, time.time() - 1)
+        assert not table.check(ALICE)
+
+
+@pytest.fixture
+def multipass(tmp_path, monkeypatch):
+    """Crée ~/.zen/game/nostr/<email>/HEX sous tmp_path, index hex → email vierge."""
+    import utils.security as security
+    monkeypatch.setattr(sessions_module.settings, "GAME_PATH", tmp_path)
+    monkeypatch.setattr(security, "hex_to_email_cache", {})
+    monkeypatch.setattr(security, "hex_indexed_dirs", set())
+    monkeypatch.setattr(security, "hex_pending_dirs", set())
+    monkeypatch.setattr(security, "hex_cache_built", False)
+
+    def create(email: str, hex_pubkey: str) -> Path:
+        user_dir = tmp_path / "nostr" / email
+        user_dir.mkdir(parents=True)
+        (user_dir / "HEX").write_text(hex_pubkey)
+        return user_dir
+    return create
+
+
+class TestMarkerScan:
+    async def test_new_rewritten_and_deleted_markers(self, multipass):
+        user_dir = multipass("alice@example.org", ALICE)
+        table = Nip42Sessions()
+
+        marker = _marker(user_dir, ALICE)
+        await table.scan()
+        session = table.get(ALICE)
+        assert session.user_dir == user_dir and session.event_hash == "e" * 64
+
+        # Marker réécrit avec un pubkey étranger : session révoquée
+        marker.write_text(json.dumps({"pubkey": BOB}))
+        os.utime(marker, (time.time() + 1, time.time() + 1))
+        await table.scan()
+        assert not table.check(ALICE)
+
+        _marker(user_dir, ALICE, time.time() + 2)
+        await table.scan()
+        assert table.check(ALICE)
+
+        marker.unlink()
+        await table.scan()
+        assert not table.check(ALICE)
+
+    async def test_expired_marker_not_loaded(self, multipass):
+        user_dir = multipass("alice@example.org", ALICE)
+        _marker(user_dir, ALICE, time.time() - NIP42_MARKER_MAX_AGE - 10)
+        table = Nip42Sessions()
+        await table.scan()
+        assert not table.check(ALICE)
+
+    async def test_marker_outside_owner_directory_is_ignored(self, multipass):
+        multipass("alice@example.org", ALICE)
+        mallory_dir = multipass("mallory@example.org", BOB)
+        # Marker au nom d'ALICE déposé dans le répertoire d'un autre compte
+        _marker(mallory_dir, ALICE)
+        _marker(mallory_dir, "c" * 64)
+        table = Nip42Sessions()
+        await table.scan()
+        assert not table.check(ALICE)
+        assert not table.check("c" * 64)
+
+
+class TestRelayNotifications:
+    async def test_socket_grant_and_revoke(self, tmp_path):
+        table = Nip42Sessions()
+        sock = tmp_path / "nip42.sock"
+
+        await table._listen(sock)
+        assert sock.stat().st_mode & 0o777 == 0o600
+        _, writer = await asyncio.open_unix_connection(str(sock))
+        writer.write(json.dumps({"pubkey": ALICE, "event_hash": "e" * 64}).encode() + b"\n")
+        writer.write(b"not json\n")
+        writer.write(json.dumps({"pubkey": BOB, "event_hash": "e" * 64}).encode() + b"\n")
+        writer.write(json.dumps({"pubkey": BOB, "revoke": True}).encode() + b"\n")
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+        for _ in range(50):
+            if table.check(ALICE):
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.02)
+        await table.stop()
+        assert table.get(ALICE).event_hash == "e" * 64
+        assert not table.check(BOB)
+
+
+class TestVerifyNostrAuth:
+    async def test_session_hit_answers_from_memory(self, monkeypatch):
+        from services import nostr
+
+        table = Nip42Sessions()
+        table.grant(ALICE, time.time() + 60)
+        monkeypatch.setattr(sessions_module, "nip42_sessions", table)
+        slow = AsyncMock(return_value=False)
+        with patch.object(nostr, "check_nip42_auth", slow):
+            assert await nostr.verify_nostr_auth(ALICE) is True
+        slow.assert_not_called()
+
+    async def test_relay_success_opens_a_session(self, monkeypatch):
+        from services import nostr
+
+        table = Nip42Sessions()
+        monkeypatch.setattr(sessions_module, "nip42_sessions", table)
+        with patch.object(nostr, "check_nip42_auth", AsyncMock(return_value=True)) as slow:
+            assert await nostr.verify_nostr_auth(BOB) is True
+            assert await nostr.verify_nostr_auth(BOB) is True
+        assert slow.await_count == 1
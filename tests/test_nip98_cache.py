@@ -0,0 +1,98 @@
+"""
+Tests for the verified NIP-98 event cache in services.nostr: one Schnorr
+verification per event, route binding (tags u/method) and tampered or stale
+events presented under a cached id.
+"""
+
+import sys
+import base64
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+import utils.crypto as crypto
+from services import nostr
+from services.cache import Cache
+from services.nostr import _decode_and_verify_nip98_event
+from utils.crypto import sign_nostr_event
+
+SECKEY = bytes.fromhex("b7e151628aed2a6abf7158809cf4f3c762e7160f38b4da56a784d9045190cfef")
+
+
+def _header(event: dict) -> str:
+    return "Nostr " + base64.b64encode(json.dumps(event).encode()).decode()
+
+
+def _event(url="https://u.example.org/upassport/api/fileupload", method="POST", created_at=None):
+    ev = {
+        "kind": 27235,
+        "created_at": int(created_at or time.time()),
+        "tags": [["u", url], ["method", method]],
+        "content": "",
+    }
+    sign_nostr_event(ev, SECKEY)
+    return ev
+
+
+@pytest.fixture(autouse=True)
+def verify_calls(monkeypatch):
+    monkeypatch.setattr(nostr, "_nip98_verified", Cache("nip98_verified", maxsize=64, ttl=240))
+    calls = []
+    real = crypto.verify_nostr_event
+
+    def counting(ev):
+        calls.append(ev["id"])
+        return real(ev)
+
+    monkeypatch.setattr(crypto, "verify_nostr_event", counting)
+    return calls
+
+
+class TestVerifiedCache:
+    def test_signature_checked_once_per_event(self, verify_calls):
+        header = _header(_event())
+        for _ in range(5):
+            ev = _decode_and_verify_nip98_event(header, "POST", "/api/fileupload")
+        assert ev["pubkey"] == crypto.nostr_pubkey(SECKEY)
+        assert len(verify_calls) == 1
+
+    def test_tampered_event_with_cached_id_is_rejected(self, verify_calls):
+        ev = _event()
+        _decode_and_verify_nip98_event(_header(ev), "POST", "/api/fileupload")
+        forged = dict(ev, content="other")
+        with pytest.raises(ValueError, match="signature"):
+            _decode_and_verify_nip98_event(_header(forged), "POST", "/api/fileupload")
+        assert len(verify_calls) == 2
+
+    def test_stale_event_rejected_even_when_cached(self, verify_calls, monkeypatch):
+        header = _header(_event())
+        _decode_and_verify_nip98_event(header)
+        later = time.time() + nostr.NIP98_MAX_AGE + 10
+        monkeypatch.setattr(nostr.time, "time", lambda: later)
+        with pytest.raises(ValueError, match="too old"):
+            _decode_and_verify_nip98_event(header)
+
+
+class TestScope:
+    def test_replay_on_another_route_is_rejected(self, verify_calls):
+        header = _header(_event())
+        _decode_and_verify_nip98_event(header, "POST", "/api/fileupload")
+        with pytest.raises(ValueError, match="replayed"):
+            _decode_and_verify_nip98_event(header, "POST", "/api/delete")
+        with pytest.raises(ValueError, match="replayed"):
+            _decode_and_verify_nip98_event(header, "DELETE", "/api/fileupload")
+        assert len(verify_calls) == 1
+
+    def test_scope_checked_on_first_sight(self):
+        with pytest.raises(ValueError, match="replayed"):
+            _decode_and_verify_nip98_event(_header(_event()), "POST", "/api/delete")
+
+    def test_scope_check_can_be_disabled(self, monkeypatch):
+        monkeypatch.setattr(nostr.settings, "NIP98_CHECK_SCOPE", False)
+        _decode_and_verify_nip98_event(_header(_event()), "GET", "/api/delete")
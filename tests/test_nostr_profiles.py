@@ -0,0 +1,181 @@
+"""
+Tests for services.nostr_profiles: one relay round-trip for every missing
+author, newest kind 0 wins, absent authors remembered only after EOSE,
+concurrent requests shared, and REQ/EOSE handling in services.relay_pool.
+"""
+
+import sys
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+import websockets
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import cache as cache_module
+from services import nostr_profiles
+from services.nostr_profiles import ProfileStore
+from services import relay_pool as relay_pool_module
+from services.relay_pool import QueryIncomplete, RelayPool
+
+
+def _pk(i):
+    return f"{i:064x}"
+
+
+def _kind0(pubkey, name, created_at=1000):
+    return {"pubkey": pubkey, "kind": 0, "created_at": created_at,
+            "content": json.dumps({"name": name, "lud16": f"{name}@example.org"})}
+
+
+class FakePool:
+    def __init__(self, events, delay=0.0):
+        self.events = events
+        self.delay = delay
+        self.calls = []
+
+    async def query(self, relay, filters, timeout):
+        self.calls.append(filters[0]["authors"])
+        await asyncio.sleep(self.delay)
+        wanted = set(filters[0]["authors"])
+        return [ev for ev in self.events if ev["pubkey"] in wanted]
+
+
+def _store(monkeypatch, pool):
+    monkeypatch.setattr(cache_module, "_registry", {})
+    monkeypatch.setattr(nostr_profiles, "relay_pool", pool)
+    return ProfileStore()
+
+
+class TestProfileStore:
+    async def test_large_graph_is_one_round_trip_then_cached(self, monkeypatch):
+        pubkeys = [_pk(i) for i in range(2000)]
+        pool = FakePool([_kind0(pk, f"n{i}") for i, pk in enumerate(pubkeys[:1500])])
+        store = _store(monkeypatch, pool)
+
+        profiles = await store.get_many(pubkeys)
+        assert len(profiles) == 1500 and profiles[_pk(3)]["email"] == "n3@example.org"
+        assert sum(len(c) for c in pool.calls) == 2000
+        assert all(len(c) <= nostr_profiles._AUTHORS_PER_REQ for c in pool.calls)
+
+        pool.calls.clear()
+        assert len(await store.get_many(pubkeys)) == 1500
+        assert pool.calls == []  # profils en cache, absents retenus
+
+    async def test_newest_kind0_wins(self, monkeypatch):
+        pk = _pk(1)
+        pool = FakePool([_kind0(pk, "new", 2000), _kind0(pk, "old", 1000)])
+        store = _store(monkeypatch, pool)
+        assert (await store.get_many([pk]))[pk]["name"] == "new"
+        assert store.put_event(_kind0(pk, "older", 500))["name"] == "new"
+        assert store.put_event(_kind0(pk, "newer", 3000))["name"] == "newer"
+
+    async def test_concurrent_requests_share_the_query(self, monkeypatch):
+        pks = [_pk(i) for i in range(3)]
+        pool = FakePool([_kind0(pk, "x") for pk in pks], delay=0.02)
+        store = _store(monkeypatch, pool)
+
+        first, second = await asyncio.gather(store.get_many(pks), store.get_many(pks[1:]))
+        assert len(first) == 3 and len(second) == 2 and len(pool.calls) == 1
+
+    async def test_unreachable_relay_falls_back_to_script(self, monkeypatch):
+        class DownPool:
+            async def query(self, relay, filters, timeout):
+                raise ConnectionError("down")
+
+        store = _store(monkeypatch, DownPool())
+
+        async def script(pubkeys):
+            return [_kind0(pubkeys[0], "fallback")]
+
+        monkeypatch.setattr(store, "_query_script", script)
+        assert (await store.get_many([_pk(7)]))[_pk(7)]["name"] == "fallback"
+
+    async def test_timeout_does_not_mark_authors_missing(self, monkeypatch):
+        answered, silent = _pk(1), _pk(2)
+
+        class SlowPool:
+            calls = 0
+
+            async def query(self, relay, filters, timeout):
+                self.calls += 1
+                raise QueryIncomplete("pas d'EOSE", [_kind0(answered, "partial")])
+
+        pool = SlowPool()
+        store = _store(monkeypatch, pool)
+        asked = []
+
+        async def script(pubkeys):
+            asked.append(pubkeys)
+            return []
+
+        monkeypatch.setattr(store, "_query_script", script)
+        profiles = await store.get_many([answered, silent])
+        assert profiles[answered]["name"] == "partial" and asked == [[silent]]
+        # Sans EOSE l'auteur n'est pas retenu comme absent : redemandé
+        await store.get_many([silent])
+        assert pool.calls == 2 and asked == [[silent], [silent]]
+
+    async def test_created_at_is_not_served(self, monkeypatch):
+        pk = _pk(1)
+        store = _store(monkeypatch, FakePool([_kind0(pk, "x", 2000)]))
+        assert "created_at" not in (await store.get_many([pk]))[pk]
+        assert "created_at" not in (await store.get_many([pk]))[pk]
+        assert store.get(pk)["created_at"] == 2000
+
+
+class TestRelayQuery:
+    async def test_events_until_eose(self):
+        async def relay(ws, *args):
+            async for raw in ws:
+                msg = json.loads(raw)
+                if msg[0] == "REQ":
+                    for pk in msg[2]["authors"]:
+                        await ws.send(json.dumps(["EVENT", msg[1], _kind0(pk, "r")]))
+                    await ws.send(json.dumps(["EOSE", msg[1]]))
+
+        async with websockets.serve(relay, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            pool = RelayPool()
+            try:
+                results = await asyncio.gather(*(
+                    pool.query(f"ws://127.0.0.1:{port}", [{"kinds": [0], "authors": [_pk(i), _pk(i + 10)]}], 2)
+                    for i in range(3)
+                ))
+            finally:
+                await pool.close()
+        assert [sorted(ev["pubkey"] for ev in r) for r in results] == [
+            sorted([_pk(i), _pk(i + 10)]) for i in range(3)
+        ]
+
+    @pytest.mark.parametrize("reply", ["silence", "closed"])
+    async def test_missing_eose_raises_with_partial_events(self, reply):
+        async def relay(ws, *args):
+            async for raw in ws:
+                msg = json.loads(raw)
+                if msg[0] == "REQ":
+                    await ws.send(json.dumps(["EVENT", msg[1], _kind0(_pk(1), "r")]))
+                    if reply == "closed":
+                        await ws.send(json.dumps(["CLOSED", msg[1], "error: too many"]))
+
+        async with websockets.serve(relay, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            pool = RelayPool()
+            try:
+                with pytest.raises(QueryIncomplete) as exc:
+                    await pool.query(f"ws://127.0.0.1:{port}", [{"kinds": [0], "authors": [_pk(1)]}], 0.2)
+            finally:
+                await pool.close()
+        assert [ev["pubkey"] for ev in exc.value.events] == [_pk(1)]
+
+    async def test_idle_connections_are_bounded(self, monkeypatch):
+        monkeypatch.setattr(relay_pool_module, "_MAX_RELAYS", 2)
+        pool = RelayPool()
+        for i in range(5):
+            pool._relay(f"ws://relay{i}.invalid")
+        assert list(pool._relays) == ["ws://relay3.invalid", "ws://relay4.invalid"]
+        await pool.close()
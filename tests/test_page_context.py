@@ -0,0 +1,94 @@
+"""
+Tests for services.page_context — concurrent loaders with per-loader
+timeout (partial render) and the shared per-user snapshot cache.
+"""
+
+import sys
+import asyncio
+import time
+from pathlib import Path
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import page_context
+from services.page_context import Loader, build_context, invalidate_user, snapshot
+
+
+class TestBuildContext:
+    def setup_method(self):
+        page_context._snapshots.clear()
+        page_context._inflight.clear()
+
+    async def test_loaders_run_concurrently(self):
+        def slow(value):
+            time.sleep(0.2)
+            return value
+
+        start = time.monotonic()
+        ctx = await build_context({name: Loader(slow, (name,)) for name in ("a", "b", "c")})
+        assert time.monotonic() - start < 0.5
+        assert ctx.values == {"a": "a", "b": "b", "c": "c"}
+        assert ctx.degraded == []
+
+    async def test_slow_or_failing_loader_degrades(self):
+        async def stuck():
+            await asyncio.sleep(5)
+
+        def broken():
+            raise RuntimeError("boom")
+
+        ctx = await build_context({
+            "ok": Loader(lambda: 1),
+            "stuck": Loader(stuck, default={}, timeout=0.05),
+            "broken": Loader(broken, default=[]),
+        })
+        assert ctx.values == {"ok": 1, "stuck": {}, "broken": []}
+        assert sorted(ctx.degraded) == ["broken", "stuck"]
+
+
+class TestSnapshot:
+    def setup_method(self):
+        page_context._snapshots.clear()
+        page_context._inflight.clear()
+
+    async def test_snapshot_is_shared_until_invalidated(self):
+        calls = []
+
+        def load(email):
+            calls.append(email)
+            return {"email": email, "n": len(calls)}
+
+        first = await snapshot("memory_status", "a@x.org", load, "a@x.org")
+        ctx = await build_context({
+            "mem": Loader(load, ("a@x.org",), snapshot="memory_status", user="a@x.org"),
+        })
+        invalidate_user("a@x.org")
+        third = await snapshot("memory_status", "a@x.org", load, "a@x.org")
+        assert first == ctx.values["mem"] == {"email": "a@x.org", "n": 1}
+        assert third["n"] == 2
+
+    async def test_timed_out_snapshot_still_fills_cache(self):
+        async def slow():
+            await asyncio.sleep(0.1)
+            return "ready"
+
+        loader = Loader(slow, default="", snapshot="view", user="u", timeout=0.01)
+        partial = await build_context({"view": loader})
+        await asyncio.sleep(0.2)
+        full = await build_context({"view": loader})
+        assert partial.degraded == ["view"] and partial.values["view"] == ""
+        assert full.degraded == [] and full.values["view"] == "ready"
+
+    async def test_load_in_flight_is_discarded_by_invalidation(self):
+        async def load(value):
+            await asyncio.sleep(0.1 if value == "before" else 0.01)
+            return value
+
+        stale = asyncio.ensure_future(snapshot("view", "u", load, "before"))
+        await asyncio.sleep(0)
+        invalidate_user("u")
+        assert await snapshot("view", "u", load, "after") == "after"
+        assert await stale == "before"
+        assert page_context._snapshots[("view", "u")] == "after"
@@ -0,0 +1,136 @@
+"""
+Tests for services.response_cache (stale-while-revalidate, single-flight,
+ETag) and the Ustats grid-cell key normalisation.
+"""
+
+import sys
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import response_cache
+from services.response_cache import ResponseCache, dumps, encode, json_response
+from services.ustats import GLOBAL_KEY, grid_key
+
+
+class TestResponseCache:
+    async def test_concurrent_misses_share_one_run(self):
+        cache = ResponseCache("t", ttl=60, stale_ttl=60)
+        runs = []
+
+        async def produce():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return {"n": len(runs)}
+
+        entries = await asyncio.gather(*(cache.get("k", produce) for _ in range(5)))
+        assert len(runs) == 1
+        assert {e.body for e in entries} == {b'{"n":1}'}
+
+    async def test_stale_entry_served_while_revalidating(self):
+        cache = ResponseCache("t", ttl=0, stale_ttl=60)
+        values = iter([{"v": 1}, {"v": 2}])
+
+        async def produce():
+            return next(values)
+
+        first = await cache.get("k", produce)
+        stale = await cache.get("k", produce)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        refreshed = cache.peek("k")
+        assert stale is first
+        assert json.loads(refreshed.body) == {"v": 2}
+
+    async def test_failed_refresh_keeps_stale_entry(self):
+        cache = ResponseCache("t", ttl=0, stale_ttl=60)
+        cache.put("k", {"v": 1})
+
+        async def broken():
+            raise RuntimeError("script failed")
+
+        entry = await cache.get("k", broken)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert json.loads(entry.body) == {"v": 1}
+        assert json.loads(cache.peek("k").body) == {"v": 1}
+
+    def test_etag_revalidation_returns_304(self):
+        entry = ResponseCache("t", ttl=60, stale_ttl=0).put("k", {"v": 1})
+        full = json_response(SimpleNamespace(headers={}), entry, max_age=60)
+        assert full.status_code == 200 and full.body == entry.body
+        assert full.headers["etag"] == entry.etag
+        cached = json_response(SimpleNamespace(headers={"if-none-match": f"W/{entry.etag}"}), entry)
+        assert cached.status_code == 304 and cached.body == b""
+
+
+class TestEncoding:
+    def test_dumps_matches_stdlib_shape(self):
+        from models.schemas import N2NetworkNode
+        data = {"n": 1, 2: "int key", "node": N2NetworkNode(pubkey="ab", level=1), "é": [True, None]}
+        assert json.loads(dumps(data)) == {
+            "n": 1, "2": "int key", "node": N2NetworkNode(pubkey="ab", level=1).model_dump(), "é": [True, None],
+        }
+
+    def test_large_payload_served_precompressed(self, monkeypatch):
+        import gzip
+        monkeypatch.setattr(response_cache.settings, "JSON_COMPRESS_MIN_BYTES", 64)
+        entry = encode({"videos": ["x" * 50] * 20})
+        plain = json_response(SimpleNamespace(headers={}), entry)
+        packed = json_response(SimpleNamespace(headers={"accept-encoding": "br;q=0, gzip"}), entry)
+        assert "content-encoding" not in plain.headers and plain.body == entry.body
+        assert packed.headers["content-encoding"] == "gzip"
+        assert packed.headers["vary"] == "Accept-Encoding"
+        assert gzip.decompress(packed.body) == entry.body
+
+    def test_small_payload_not_compressed(self):
+        entry = encode({"v": 1})
+        assert entry.gzip is None
+        response = json_response(SimpleNamespace(headers={"accept-encoding": "gzip"}), entry)
+        assert "content-encoding" not in response.headers
+
+
+class TestUstatsKey:
+    def test_nearby_points_share_a_cell(self):
+        assert grid_key("43.6047", "1.4442", "0.01") == grid_key("43.601", "1.441", "0.010")
+        assert grid_key("43.6047", "1.4442", None) == ("43.60", "1.44", "")
+        assert grid_key(None, "1.44", None) == GLOBAL_KEY
+
+    def test_non_numeric_rejected(self):
+        with pytest.raises(ValueError):
+            grid_key("north", "1.44", None)
+
+    @pytest.mark.parametrize("lat, lon, deg", [
+        ("inf", "1.44", None), ("nan", "1.44", None), ("43.6", "-inf", None),
+        ("91", "1.44", None), ("43.6", "180.5", None), ("43.6", "1.44", "inf"),
+    ])
+    def test_non_finite_or_out_of_range_rejected(self, lat, lon, deg):
+        with pytest.raises(ValueError):
+            grid_key(lat, lon, deg)
+
+
+class TestYoutubeProducer:
+    async def test_relay_failure_keeps_last_good_entry(self, monkeypatch):
+        from routers import media_library
+
+        async def fetch(relay, limit):
+            raise ConnectionError("relay down")
+
+        fake = SimpleNamespace(fetch_and_process_nostr_events=fetch, create_channel_playlist=None)
+        monkeypatch.setitem(sys.modules, "create_video_channel", fake)
+        filters = (None,) * 11
+        with pytest.raises(media_library._RelayUnavailable):
+            await media_library._youtube_json(*filters)
+
+        cache = ResponseCache("yt", ttl=0, stale_ttl=60)
+        cache.put(filters, {"total_videos": 3})
+        entry = await cache.get(filters, lambda: media_library._youtube_json(*filters))
+        await asyncio.sleep(0.01)
+        assert json.loads(cache.peek(filters).body) == {"total_videos": 3} == json.loads(entry.body)
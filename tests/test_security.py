@@ -27,3 +27,50 @@ def test_sanitize_filename_python():
     assert sanitize_filename_python("file/with/slashes.txt") == "slashes.txt"
     assert sanitize_filename_python("file<with>invalid:chars.txt") == "file_with_invalid_chars.txt"
     assert sanitize_filename_python("file\0with\0nulls.txt") == "filewithnulls.txt"
+
+
+def test_find_email_by_hex_follows_new_and_removed_multipass(tmp_path, monkeypatch):
+    import os, time, shutil
+    import utils.security as security
+    from core.config import settings
+    monkeypatch.setattr(settings, "GAME_PATH", tmp_path)
+    monkeypatch.setattr(security, "hex_to_email_cache", {})
+    monkeypatch.setattr(security, "hex_indexed_dirs", set())
+    monkeypatch.setattr(security, "hex_pending_dirs", set())
+    monkeypatch.setattr(security, "hex_cache_built", False)
+    nostr = tmp_path / "nostr"
+    (nostr / "a@b.c").mkdir(parents=True)
+    (nostr / "a@b.c" / "HEX").write_text("AA" * 32)
+    assert security.find_email_by_hex("aa" * 32) == "a@b.c"
+
+    # Nouveau MULTIPASS créé après la construction de l'index
+    (nostr / "d@e.f").mkdir()
+    (nostr / "d@e.f" / "HEX").write_text("bb" * 32)
+    os.utime(nostr, (time.time() + 5, time.time() + 5))
+    assert security.find_email_by_hex("bb" * 32) == "d@e.f"
+
+    # MULTIPASS supprimé
+    shutil.rmtree(nostr / "a@b.c")
+    assert security.find_email_by_hex("aa" * 32) is None
+
+
+def test_multipass_directory_indexed_once_hex_is_written(tmp_path, monkeypatch):
+    import os, time
+    import utils.security as security
+    from core.config import settings
+    monkeypatch.setattr(settings, "GAME_PATH", tmp_path)
+    monkeypatch.setattr(security, "hex_to_email_cache", {})
+    monkeypatch.setattr(security, "hex_indexed_dirs", set())
+    monkeypatch.setattr(security, "hex_pending_dirs", set())
+    monkeypatch.setattr(security, "hex_cache_built", False)
+    nostr = tmp_path / "nostr"
+    nostr.mkdir()
+    assert security.find_email_by_hex("cc" * 32) is None
+
+    # Répertoire créé (mtime de nostr/ modifié) avant l'écriture de HEX
+    (nostr / "g@h.i").mkdir()
+    os.utime(nostr, (time.time() + 5, time.time() + 5))
+    assert security.find_email_by_hex("cc" * 32) is None
+    # HEX écrit ensuite : le mtime de nostr/ ne bouge pas
+    (nostr / "g@h.i" / "HEX").write_text("cc" * 32)
+    assert security.find_email_by_hex("cc" * 32) == "g@h.i"
@@ -0,0 +1,149 @@
+"""
+Tests for services.substrate_rpc — System.Account storage key encoding,
+AccountInfo SCALE decoding, RPC node URL resolution and the multiplexed
+WebSocket client (against local websockets servers only).
+"""
+
+import sys
+import json
+import asyncio
+import struct
+from pathlib import Path
+
+import pytest
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import g1_squid
+from services.cache import Cache
+from services.g1_squid import g1pub_to_ss58
+from services import substrate_rpc
+from services.substrate_rpc import SubstrateRpcClient, account_storage_key, decode_account_balance
+
+G1PUB_V1 = "DsEx1pS33vzYZg4MroyBV9hCw98j1gtHEhwiZ5tK7ech"
+
+
+class TestStorageKey:
+    def test_prefix_is_system_account(self):
+        key = account_storage_key(G1PUB_V1)
+        assert key.startswith("0x26aa394eea5630e07c48ae0c9558cef7b99d880ec681799c0cf30e8886371da9")
+        # prefix (32 bytes) + blake2_128 (16) + AccountId32 (32)
+        assert len(key) == 2 + 2 * (32 + 16 + 32)
+
+    def test_v1_and_ss58_map_to_same_key(self):
+        assert account_storage_key(G1PUB_V1) == account_storage_key(g1pub_to_ss58(G1PUB_V1))
+
+    def test_invalid_pubkey(self):
+        assert account_storage_key("not-base58-0OIl") is None
+
+
+class TestDecodeAccountBalance:
+    def _info(self, free, reserved, extra=b""):
+        return "0x" + (bytes(16) + extra + struct.pack("<QQQ", free, reserved, 0) + b"\x00").hex()
+
+    def test_current_layout(self):
+        assert decode_account_balance(self._info(1234, 10)) == 1244
+
+    def test_legacy_random_id_none(self):
+        assert decode_account_balance(self._info(500, 0, extra=b"\x00")) == 500
+
+    def test_legacy_random_id_some(self):
+        assert decode_account_balance(self._info(700, 1, extra=b"\x01" + bytes(32))) == 701
+
+    def test_missing_account(self):
+        assert decode_account_balance(None) == 0
+
+
+class TestRpcUrlResolution:
+    async def test_unreachable_node_is_not_cached(self, monkeypatch):
+        monkeypatch.setattr(g1_squid, "_rpc_url_cache", Cache("t", maxsize=8))
+        answers = [None, "wss://node.example/ws"]
+
+        async def probe(url):
+            return answers.pop(0)
+
+        monkeypatch.setattr(g1_squid, "_probe_rpc_url", probe)
+        assert await g1_squid._resolve_rpc_url("wss://node.example") == "wss://node.example"
+        assert "wss://node.example" not in g1_squid._rpc_url_cache
+        # Probe retentée : la résolution réussie est retenue
+        assert await g1_squid._resolve_rpc_url("wss://node.example") == "wss://node.example/ws"
+        assert await g1_squid._resolve_rpc_url("wss://node.example") == "wss://node.example/ws"
+        assert answers == []
+
+
+@pytest.fixture
+async def rpc_nodes(monkeypatch):
+    """Démarre des nœuds JSON-RPC locaux : handler(ws, msg) par nœud → URLs."""
+    websockets = pytest.importorskip("websockets")
+    servers = []
+
+    async def start(*handlers):
+        urls = []
+        for handler in handlers:
+            async def serve(ws, handler=handler):
+                async for message in ws:
+                    asyncio.ensure_future(handler(ws, json.loads(message)))
+            server = await websockets.serve(serve, "127.0.0.1", 0)
+            servers.append(server)
+            urls.append(f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+
+        async def resolve(url):
+            return url
+
+        monkeypatch.setattr(g1_squid, "get_rpc_nodes", lambda: list(urls))
+        monkeypatch.setattr(g1_squid, "_resolve_rpc_url", resolve)
+        return urls
+
+    yield start
+    for server in servers:
+        server.close()
+        await server.wait_closed()
+
+
+async def _answer(ws, msg, delay=0.0):
+    await asyncio.sleep(delay)
+    await ws.send(json.dumps({"jsonrpc": "2.0", "id": msg["id"], "result": msg["params"][0]}))
+
+
+class TestRpcClient:
+    async def test_concurrent_requests_share_one_socket(self, rpc_nodes, monkeypatch):
+        monkeypatch.setattr(substrate_rpc, "_REQUEST_TIMEOUT", 0.3)
+
+        async def node(ws, msg):
+            if msg["method"] == "silent":
+                return
+            # Réponses dans le désordre : la plus ancienne arrive en dernier
+            await _answer(ws, msg, delay=0.1 / (1 + msg["params"][0]))
+
+        await rpc_nodes(node)
+        client = SubstrateRpcClient()
+        results = await asyncio.gather(
+            *(client.request("echo", [i]) for i in range(5)),
+            client.request("silent", [0]),
+            return_exceptions=True,
+        )
+        assert results[:5] == [0, 1, 2, 3, 4]
+        assert isinstance(results[5], TimeoutError)
+        # Le délai n'a échoué que sa propre requête : même socket, même nœud
+        ws = client._ws
+        assert ws is not None and client._node_offset == 0
+        assert await client.request("echo", [7]) == 7
+        assert client._ws is ws and client._pending == {}
+        await client.close()
+
+    async def test_lost_connection_rotates_node_once(self, rpc_nodes):
+        async def dying(ws, msg):
+            await ws.close()
+
+        async def healthy(ws, msg):
+            await _answer(ws, msg)
+
+        await rpc_nodes(dying, healthy)
+        client = SubstrateRpcClient()
+        results = await asyncio.gather(*(client.request("echo", [i]) for i in range(4)))
+        assert results == [0, 1, 2, 3]
+        assert client._node_offset == 1
+        await client.close()
+        assert client._node_offset == 1
@@ -0,0 +1,92 @@
+"""
+Tests for services.swarm_index — incremental index of ~/.zen/tmp/swarm
+shared by the roaming resolvers.
+"""
+
+import sys
+import json
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import swarm_index as swarm_mod
+from services.swarm_index import SwarmIndex
+
+NODEHEX = "ab" * 32
+
+
+def _station(swarm: Path, sid: str, emails=(), nodehex=NODEHEX) -> Path:
+    station = swarm / sid
+    station.mkdir(parents=True)
+    (station / "12345.json").write_text(json.dumps({
+        "ipfsnodeid": sid, "NODEHEX": nodehex, "uSPOT": f"https://u.{sid}", "myIPFS": f"https://ipfs.{sid}",
+    }))
+    (station / "HEX").write_text(nodehex + "\n")
+    for email in emails:
+        account = station / "TW" / email
+        account.mkdir(parents=True)
+        (account / "NPUB").write_text(f"npub_{email}\n")
+        (account / "HEX").write_text(f"hex_{email}\n")
+        (account / "G1PUBNOSTR").write_text(f"g1_{email}\n")
+    return station
+
+
+def _index(tmp_path: Path) -> SwarmIndex:
+    return SwarmIndex(swarm_dir=tmp_path / "swarm", index_path=tmp_path / "swarm_index.json")
+
+
+class TestLookups:
+    def test_resolves_accounts_pubkeys_and_stations(self, tmp_path):
+        _station(tmp_path / "swarm", "12D3KooA", emails=("alice@x.org",))
+        _station(tmp_path / "swarm", "12D3KooB", nodehex="cd" * 32)
+        index = _index(tmp_path)
+
+        assert index.find_station("12D3KooA") == "12D3KooA"
+        assert index.find_station(None, "alice@x.org") == "12D3KooA"
+        assert index.find_station("unknown", None) is None
+        assert index.station("12D3KooA")["uSPOT"] == "https://u.12D3KooA"
+        assert index.accounts("alice@x.org") == [{
+            "station": "12D3KooA", "npub": "npub_alice@x.org", "hex": "hex_alice@x.org", "g1": "g1_alice@x.org",
+        }]
+        assert index.find_pubkey("nope", "hex_alice@x.org") == ("12D3KooA", "alice@x.org")
+        assert index.find_pubkey(NODEHEX) == ("12D3KooA", None)
+        assert index.node_hexes() == [NODEHEX, "cd" * 32]
+
+
+class TestIncremental:
+    def test_only_changed_stations_are_reread(self, tmp_path):
+        swarm = tmp_path / "swarm"
+        _station(swarm, "A", emails=("a@x.org",))
+        _station(swarm, "B", emails=("b@x.org",))
+        index = _index(tmp_path)
+        index.refresh(force=True)
+
+        _station(swarm, "C", emails=("c@x.org",))
+        with patch.object(swarm_mod, "_index_station", wraps=swarm_mod._index_station) as reread:
+            index.refresh(force=True)
+        assert [call.args[0].name for call in reread.call_args_list] == ["C"]
+        assert index.find_station(None, "c@x.org") == "C"
+
+    def test_persisted_index_survives_restart(self, tmp_path):
+        _station(tmp_path / "swarm", "A", emails=("a@x.org",))
+        _index(tmp_path).refresh(force=True)
+        assert (tmp_path / "swarm_index.json").exists()
+
+        with patch.object(swarm_mod, "_index_station", side_effect=AssertionError("re-read")):
+            assert _index(tmp_path).accounts("a@x.org")[0]["g1"] == "g1_a@x.org"
+
+    def test_resynced_station_is_reindexed(self, tmp_path):
+        station = _station(tmp_path / "swarm", "A", emails=("a@x.org",))
+        index = _index(tmp_path)
+        index.refresh(force=True)
+
+        (station / "TW" / "new@x.org").mkdir()
+        (station / "TW" / "new@x.org" / "G1PUBNOSTR").write_text("g1_new")
+        st = (station / "TW").stat()
+        os.utime(station / "TW", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        index.refresh(force=True)
+        assert index.accounts("new@x.org") == [{"station": "A", "g1": "g1_new"}]
@@ -0,0 +1,166 @@
+"""
+Tests for services.udrive: incremental uDRIVE builds (unchanged files and
+directories reuse their cached CIDs), coalescing of close rebuilds, fallback
+to generate_ipfs_structure.sh, and (live_ipfs) parity with the script.
+"""
+
+import sys
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import ipfs, udrive
+from services.kubo import kubo
+from services.udrive import UDriveBuilder, UDriveTooLarge
+
+
+class FakeBuilder(UDriveBuilder):
+    """Kubo simulé : CID = hash du contenu / des liens."""
+    calls = None
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.calls = {"add": [], "dag": 0, "pin": []}
+
+    async def _add_file(self, path):
+        self.calls["add"].append(path.relative_to(self.root).as_posix())
+        data = path.read_bytes()
+        return "Qm" + hashlib.sha256(data).hexdigest()[:20], len(data)
+
+    async def _put_dir(self, links):
+        self.calls["dag"] += 1
+        return "bafy" + hashlib.sha256(json.dumps(links).encode()).hexdigest()[:20]
+
+    async def _pin(self, old, new):
+        self.calls["pin"].append((old, new))
+
+
+def _drive(tmp_path):
+    (tmp_path / "Images").mkdir()
+    (tmp_path / "Music" / "Live").mkdir(parents=True)
+    (tmp_path / "Images" / "a.jpg").write_bytes(b"a" * 10)
+    (tmp_path / "Music" / "Live" / "b.mp3").write_bytes(b"b" * 20)
+    (tmp_path / "generate_ipfs_structure.sh").write_text("#!/bin/sh\n")
+    return tmp_path
+
+
+class TestIncrementalBuild:
+    async def test_first_build_adds_every_file(self, tmp_path):
+        builder = FakeBuilder(_drive(tmp_path))
+        result = await builder.build()
+        assert sorted(builder.calls["add"]) == ["Images/a.jpg", "Music/Live/b.mp3", "manifest.json"]
+        assert builder.calls["dag"] == 4
+        assert builder.calls["pin"] == [(None, result["final_cid"])]
+        manifest = json.loads((tmp_path / "manifest.json").read_text())
+        assert [f["path"] for f in manifest["files"]] == ["Images/a.jpg", "Music/Live/b.mp3"]
+
+    async def test_new_file_costs_one_add(self, tmp_path):
+        first = FakeBuilder(_drive(tmp_path))
+        root = (await first.build())["final_cid"]
+
+        (tmp_path / "Images" / "c.jpg").write_bytes(b"c" * 5)
+        second = FakeBuilder(tmp_path)
+        result = await second.build()
+        # Le fichier ajouté + le manifest ; Music/ et Music/Live/ inchangés
+        assert sorted(second.calls["add"]) == ["Images/c.jpg", "manifest.json"]
+        assert second.calls["dag"] == 2
+        assert result["final_cid"] != root
+        assert second.calls["pin"] == [(root, result["final_cid"])]
+
+    async def test_unchanged_drive_makes_no_kubo_call(self, tmp_path):
+        root = (await FakeBuilder(_drive(tmp_path)).build())["final_cid"]
+        again = FakeBuilder(tmp_path)
+        assert (await again.build())["final_cid"] == root
+        assert again.calls == {"add": [], "dag": 0, "pin": []}
+
+    async def test_modified_file_is_re_added(self, tmp_path):
+        await FakeBuilder(_drive(tmp_path)).build()
+        target = tmp_path / "Music" / "Live" / "b.mp3"
+        target.write_bytes(b"B" * 21)
+        os.utime(target, ns=(1, 1))
+        builder = FakeBuilder(tmp_path)
+        await builder.build()
+        assert sorted(builder.calls["add"]) == ["Music/Live/b.mp3", "manifest.json"]
+
+
+class TestCoalescing:
+    async def test_close_rebuilds_share_one_build(self, tmp_path, monkeypatch):
+        builds = []
+
+        class Counting(FakeBuilder):
+            async def build(self):
+                builds.append(self.root)
+                return await super().build()
+
+        monkeypatch.setattr(udrive, "UDriveBuilder", Counting)
+        monkeypatch.setattr(udrive.settings, "UDRIVE_COALESCE_WINDOW", 0.05)
+        _drive(tmp_path)
+
+        results = await asyncio.gather(*(udrive.rebuild(tmp_path) for _ in range(4)))
+        assert len(builds) == 1
+        assert len({r["final_cid"] for r in results}) == 1
+
+
+class TestScriptFallback:
+    async def test_directory_kubo_would_shard_is_refused(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(udrive, "_HAMT_THRESHOLD", 200)
+        for i in range(5):
+            (tmp_path / f"{'x' * 20}{i}.txt").write_bytes(b"%d" % i)
+        with pytest.raises(UDriveTooLarge):
+            await FakeBuilder(tmp_path).build()
+        assert not (tmp_path / udrive.STATE_FILE).exists()
+
+    async def test_script_is_the_default(self, tmp_path, monkeypatch):
+        tools = tmp_path / "zen" / "Astroport.ONE" / "tools"
+        tools.mkdir(parents=True)
+        (tools / "generate_ipfs_structure.sh").write_text("#!/bin/sh\necho QmScript\n")
+        monkeypatch.setattr(ipfs.settings, "ZEN_PATH", tmp_path / "zen")
+
+        async def rebuild(root):
+            raise UDriveTooLarge("Images : 9000 entrées, répertoire à sharder")
+
+        monkeypatch.setattr(udrive, "rebuild", rebuild)
+        drive = tmp_path / "uDRIVE"
+
+        monkeypatch.setattr(ipfs.settings, "UDRIVE_INCREMENTAL", False)
+        assert (await ipfs.run_uDRIVE_generation_script(drive))["final_cid"] == "QmScript"
+        # Opt-in : un répertoire à sharder repasse par le script
+        monkeypatch.setattr(ipfs.settings, "UDRIVE_INCREMENTAL", True)
+        assert (await ipfs.run_uDRIVE_generation_script(drive))["final_cid"] == "QmScript"
+
+
+_SCRIPT = ipfs.settings.ZEN_PATH / "Astroport.ONE" / "tools" / "generate_ipfs_structure.sh"
+
+
+@pytest.mark.live_ipfs
+@pytest.mark.skipif(not _SCRIPT.exists(), reason="generate_ipfs_structure.sh absent")
+class TestParityWithScript:
+    async def test_same_file_and_directory_cids(self, tmp_path):
+        """Les CID des fichiers et sous-répertoires sont ceux du script (la
+        racine diffère : manifest.json contient sa date de génération)."""
+        script_drive, built_drive = _drive(tmp_path / "script"), _drive(tmp_path / "built")
+        for drive in (script_drive, built_drive):
+            (drive / "Images" / "big.bin").write_bytes(bytes(range(256)) * 12288)  # plusieurs blocs
+
+        script_root = (await ipfs.run_uDRIVE_generation_script(script_drive))["final_cid"]
+        await UDriveBuilder(built_drive).build()
+        state = json.loads((built_drive / udrive.STATE_FILE).read_text())
+        try:
+            for rel, entry in state["files"].items():
+                if rel != udrive.MANIFEST:
+                    resolved = await kubo._post("resolve", "/resolve", {"arg": f"/ipfs/{script_root}/{rel}"})
+                    assert resolved["Path"] == f"/ipfs/{entry[2]}", rel
+            for rel, (_, cid) in state["dirs"].items():
+                if rel:
+                    resolved = await kubo._post("resolve", "/resolve", {"arg": f"/ipfs/{script_root}/{rel}"})
+                    assert resolved["Path"] == f"/ipfs/{cid}", rel
+        finally:
+            await kubo.close()
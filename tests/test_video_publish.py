@@ -0,0 +1,130 @@
+"""
+Tests for the /webcam publishing pipeline: NIP-71 event building and signing
+(services.video_publish), the shared info.json cache (services.ipfs) and the
+uDRIVE CID index (services.udrive.find_file).
+"""
+
+import sys
+import asyncio
+import json
+import os
+from pathlib import Path
+
+UPASSPORT_DIR = Path(__file__).parent.parent
+if str(UPASSPORT_DIR) not in sys.path:
+    sys.path.insert(0, str(UPASSPORT_DIR))
+
+from services import ipfs, udrive, video_publish
+from services.cache import Cache
+from services.video_publish import build_video_event, publish_video_event
+from utils.crypto import nostr_pubkey, verify_nostr_event
+
+SECKEY = bytes.fromhex("b7e151628aed2a6abf7158809cf4f3c762e7160f38b4da56a784d9045190cfef")
+
+
+def _tags(event, name):
+    return [t[1] for t in event["tags"] if t[0] == name]
+
+
+class TestBuildVideoEvent:
+    def test_tags_read_by_listings(self):
+        ev = build_video_event(
+            cid="QmDir", filename="clip.webm", title="Clip", description="Hello",
+            file_hash="ab" * 32, file_size=1234, duration=12.6, dimensions="640x480",
+            thumbnail_ipfs="QmThumb", info_cid="QmInfo", channel="alice@example.org",
+            genres=["music", "music", "live"], created_at=1700000000,
+        )
+        assert ev["kind"] == video_publish.KIND_VIDEO
+        assert _tags(ev, "url") == ["/ipfs/QmDir/clip.webm"]
+        assert _tags(ev, "x") == ["ab" * 32]
+        assert _tags(ev, "duration") == ["13"]
+        assert _tags(ev, "info") == ["QmInfo"]
+        assert _tags(ev, "image") == ["/ipfs/QmThumb"]
+        assert _tags(ev, "t") == ["Channel-alice@example.org", "webcam", "music", "live"]
+        assert _tags(ev, "i") == ["source:webcam"]
+        assert ev["content"] == "🎬 Clip\nHello"
+
+    def test_vertical_video_is_short(self):
+        ev = build_video_event(cid="Qm", filename="v.mp4", title="V", dimensions={"width": 720, "height": 1280})
+        assert ev["kind"] == video_publish.KIND_SHORT_VIDEO
+        assert _tags(ev, "dim") == ["720x1280"]
+
+
+class TestPublishVideoEvent:
+    async def test_signed_and_sent_to_local_relay(self, monkeypatch):
+        calls = []
+
+        class FakePool:
+            async def publish(self, event, relays, timeout=5.0):
+                calls.append(list(relays))
+                return {r: True for r in relays}
+
+        monkeypatch.setattr(video_publish, "relay_pool", FakePool())
+        monkeypatch.setattr(video_publish.settings, "myRELAY", "ws://local")
+        monkeypatch.setattr(video_publish.settings, "NOSTR_RELAYS", "ws://local wss://remote")
+
+        ev = build_video_event(cid="Qm", filename="v.webm", title="V")
+        event_id = await publish_video_event(ev, SECKEY)
+        await asyncio.gather(*video_publish._background)
+        assert event_id == ev["id"]
+        assert ev["pubkey"] == nostr_pubkey(SECKEY)
+        assert verify_nostr_event(ev)
+        assert sorted(calls) == [["ws://local"], ["wss://remote"]]
+
+
+class TestInfoJsonCache:
+    async def test_concurrent_fetches_share_one_load(self, monkeypatch):
+        monkeypatch.setattr(ipfs, "_info_json_cache", Cache("info_json", maxsize=8))
+        loads = []
+
+        async def load(cid):
+            loads.append(cid)
+            await asyncio.sleep(0.01)
+            return {"file": {"name": "clip.webm"}}
+
+        monkeypatch.setattr(ipfs, "_load_info_json", load)
+
+        first = await asyncio.gather(*(ipfs.fetch_info_json("/ipfs/QmInfo") for _ in range(5)))
+        again = await ipfs.fetch_info_json("QmInfo")
+        assert loads == ["QmInfo"]
+        assert all(r["file"]["name"] == "clip.webm" for r in first) and again is first[0]
+
+    async def test_missing_info_json_is_remembered(self, monkeypatch):
+        monkeypatch.setattr(ipfs, "_info_json_cache", Cache("info_json", maxsize=8, miss_ttl=60))
+        loads = []
+
+        async def load(cid):
+            loads.append(cid)
+            return None
+
+        monkeypatch.setattr(ipfs, "_load_info_json", load)
+        assert await ipfs.fetch_info_json("QmGone") == {}
+        assert await ipfs.fetch_info_json("QmGone") == {}
+        assert loads == ["QmGone"]
+
+
+class TestUDriveIndex:
+    def _write_state(self, root, files, mtime_ns):
+        path = root / udrive.STATE_FILE
+        path.write_text(json.dumps({"v": 1, "root": "QmRoot", "files": files, "dirs": {}}))
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    async def test_lookup_by_cid_follows_state_changes(self, tmp_path):
+        self._write_state(tmp_path, {"Videos/a.webm": [10, 1, "QmA", 20]}, 1_000_000_000)
+        assert await udrive.find_file(tmp_path, "QmA") == ("Videos/a.webm", 10)
+        assert await udrive.find_file(tmp_path, "QmB") is None
+
+        self._write_state(tmp_path, {
+            "Videos/a.webm": [10, 1, "QmA", 20],
+            "Videos/b.webm": [30, 2, "QmB", 40],
+        }, 2_000_000_000)
+        assert await udrive.find_file(tmp_path, "QmB") == ("Videos/b.webm", 30)
+
+    async def test_script_manifest_when_no_state(self, tmp_path):
+        (tmp_path / udrive.MANIFEST).write_text(json.dumps({"files": [
+            {"name": "a.webm", "path": "Videos/a.webm", "size": 10, "ipfs_cid": "QmA"},
+        ]}))
+        assert await udrive.find_file(tmp_path, "QmA") == ("Videos/a.webm", 10)
+
+    async def test_no_state_no_match(self, tmp_path):
+        assert await udrive.find_file(tmp_path, "QmA") is None
@@ -129,14 +129,68 @@ def schnorr_verify(msg: bytes, pk32: bytes, sig64: bytes) -> bool:
     return R is not None and R[1] % 2 == 0 and R[0] == r
 
 
+def schnorr_sign(msg: bytes, seckey_bytes: bytes) -> bytes:
+    """Signature Schnorr BIP-340 déterministe (aux = 32 octets nuls)."""
+    d = int.from_bytes(seckey_bytes, "big") % _SECP256K1_N
+    if d == 0:
+        raise ValueError("Clé secrète nulle")
+    P = _pt_mul(_SECP256K1_G, d)
+    if P[1] % 2 != 0:
+        d = _SECP256K1_N - d
+    Px = P[0].to_bytes(32, "big")
+    t = (d ^ int.from_bytes(_tagged_hash("BIP0340/aux", b"\x00" * 32), "big")).to_bytes(32, "big")
+    k = int.from_bytes(_tagged_hash("BIP0340/nonce", t + Px + msg), "big") % _SECP256K1_N
+    if k == 0:
+        raise ValueError("Nonce nul")
+    R = _pt_mul(_SECP256K1_G, k)
+    if R[1] % 2 != 0:
+        k = _SECP256K1_N - k
+    Rx = R[0].to_bytes(32, "big")
+    e = int.from_bytes(_tagged_hash("BIP0340/challenge", Rx + Px + msg), "big") % _SECP256K1_N
+    return Rx + ((k + e * d) % _SECP256K1_N).to_bytes(32, "big")
+
+
+def decode_nsec(nsec: str) -> bytes:
+    """Décode nsec1... bech32 → 32 octets de clé privée (ValueError sinon)."""
+    try:
+        import bech32
+        hrp, data = bech32.bech32_decode(nsec.strip())
+        if hrp != "nsec" or data is None:
+            raise ValueError(f"HRP invalide : {hrp}")
+        decoded = bech32.convertbits(data, 5, 8, False)
+        if decoded is None or len(decoded) != 32:
+            raise ValueError(f"Longueur invalide : {len(decoded) if decoded else 'None'}")
+        return bytes(decoded)
+    except Exception as e:
+        raise ValueError(f"Décodage nsec impossible : {e}")
+
+
+def nostr_event_id(ev: dict) -> str:
+    """SHA-256 canonique (NIP-01) d'un événement NOSTR."""
+    serial = json.dumps(
+        [0, ev["pubkey"], ev["created_at"], ev["kind"], ev["tags"], ev["content"]],
+        separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(serial.encode()).hexdigest()
+
+
+def nostr_pubkey(seckey_bytes: bytes) -> str:
+    """Clé publique x-only (hex) associée à une clé privée."""
+    return _pt_mul(_SECP256K1_G, int.from_bytes(seckey_bytes, "big") % _SECP256K1_N)[0].to_bytes(32, "big").hex()
+
+
+def sign_nostr_event(ev: dict, seckey_bytes: bytes) -> dict:
+    """Complète pubkey/id/sig d'un événement NOSTR non signé (modifié en place)."""
+    ev["pubkey"] = nostr_pubkey(seckey_bytes)
+    ev["id"] = nostr_event_id(ev)
+    ev["sig"] = schnorr_sign(bytes.fromhex(ev["id"]), seckey_bytes).hex()
+    return ev
+
+
 def verify_nostr_event(ev: dict) -> bool:
     """Vérifie l'ID (SHA-256 NIP-01) et la signature Schnorr d'un événement NOSTR."""
     try:
-        serial = json.dumps(
-            [0, ev["pubkey"], ev["created_at"], ev["kind"], ev["tags"], ev["content"]],
-            separators=(",", ":"), ensure_ascii=False,
-        )
-        if ev.get("id") != hashlib.sha256(serial.encode()).hexdigest():
+        if ev.get("id") != nostr_event_id(ev):
             return False
         return schnorr_verify(
             bytes.fromhex(ev["id"]),
@@ -59,12 +59,13 @@ def render_page(request: Request, template_name: str, context: dict = None):
         base_context.update(context)
     return templates.TemplateResponse(request, template_name, base_context)
 
-async def run_script(script_path, *args, log_file_path=None):
+async def run_script(script_path, *args, log_file_path=None, timeout=None):
     if log_file_path is None:
         from core.config import settings
         log_file_path = settings.ZEN_PATH / "tmp" / "54321.log"
     """
-    Fonction générique pour exécuter des scripts shell avec gestion des logs
+    Fonction générique pour exécuter des scripts shell avec gestion des logs.
+    timeout (s) : au-delà le script est tué et asyncio.TimeoutError est levée.
     """
     logging.info(f"Running script: {script_path} with args: {args}")
 
@@ -85,21 +86,34 @@ async def run_script(script_path, *args, log_file_path=None):
     )
 
     last_line = ""
-    try:
-        async with aiofiles.open(log_file_path, "a") as log_file:
+
+    async def _consume():
+        nonlocal last_line
+        try:
+            async with aiofiles.open(log_file_path, "a") as log_file:
+                async for line in process.stdout:
+                    line = line.decode().strip()
+                    last_line = line
+                    await log_file.write(line + "\n")
+                    logging.info(f"Script output: {line}")
+        except Exception as e:
+            logging.error(f"Error writing to log file {log_file_path}: {e}")
             async for line in process.stdout:
                 line = line.decode().strip()
                 last_line = line
-                await log_file.write(line + "\n")
-                logging.info(f"Script output: {line}")
-    except Exception as e:
-        logging.error(f"Error writing to log file {log_file_path}: {e}")
-        async for line in process.stdout:
-            line = line.decode().strip()
-            last_line = line
-            logging.info(f"Script output (no log file): {line}")
+                logging.info(f"Script output (no log file): {line}")
+        return await process.wait()
 
-    return_code = await process.wait()
+    try:
+        return_code = await asyncio.wait_for(_consume(), timeout=timeout)
+    except asyncio.TimeoutError:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+        logging.warning(f"Script timeout after {timeout}s: {script_path}")
+        raise
     logging.info(f"Script finished with return code: {return_code}")
 
     return return_code, last_line
@@ -166,11 +180,12 @@ async def get_env_from_mysh(var_name: str, default: str = "") -> str:
 
 
 async def send_server_side_analytics(analytics_data: dict, request) -> None:
-    """Send analytics data server-side (for clients without JavaScript)"""
+    """Send analytics data server-side (for clients without JavaScript).
+    Queued directly in services.analytics — no HTTP round-trip to /ping."""
     import logging
-    import asyncio
     from datetime import datetime, timezone
     from core.middleware import get_client_ip
+    from services.analytics import analytics_pipeline
     try:
         analytics_data.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
         analytics_data.setdefault("source", "server")
@@ -182,18 +197,7 @@ async def send_server_side_analytics(analytics_data: dict, request) -> None:
         if client_ip:
             analytics_data["client_ip"] = client_ip
         
-        import httpx
-        base_url = str(request.base_url).rstrip('/')
-        ping_url = f"{base_url}/ping"
-        
-        async def send_ping():
-            try:
-                async with httpx.AsyncClient(timeout=2.0) as client:
-                    await client.post(ping_url, json=analytics_data)
-            except Exception as e:
-                logging.debug(f"Analytics ping failed (non-blocking): {e}")
-        
-        asyncio.create_task(send_ping())
+        analytics_pipeline.ingest(analytics_data)
     except Exception as e:
         logging.debug(f"Server-side analytics error (non-blocking): {e}")
 
@@ -275,20 +279,18 @@ async def check_balance(g1pub: str) -> str:
     """
     Vérifier le solde d'une g1pub donnée.
 
-    Implémentation native Python (httpx → Squid Duniter v2) via
-    services.g1_squid.get_g1_balance_native — pas de processus OS, ~10× plus rapide
-    que l'ancien appel à G1check.sh / G1balance.sh.
+    Implémentation native Python (httpx → Squid Duniter v2) via le service
+    partagé services.g1_balance : cache TTL commun à /check_balance et
+    /check_balances, coalescence des appels concurrents en un seul batch
+    Squid, puis chaîne de fallback get_g1_balance_native pour les comptes
+    absents (RPC, gcli, G1check.sh).
 
     Retourne une chaîne "2.48 Ğ1" compatible avec convert_g1_to_zen().
-    Utilise le cache ~/.zen/tmp/duniter_nodes.json (TTL 1h) produit par
-    duniter_getnode.sh pour sélectionner le Squid le plus réactif.
     """
     try:
-        from services.g1_squid import get_g1_balance_native
-        result = await get_g1_balance_native(g1pub)
-        centimes = result.get("balances", {}).get("total", 0)
-        g1_value = centimes / 100
-        return f"{g1_value:.2f} Ğ1"
+        from services.g1_balance import balance_service, format_balance
+        balances = await balance_service.get(g1pub)
+        return format_balance(balances.get("total", 0))
     except Exception as e:
         logging.error(f"Erreur check_balance natif pour {g1pub}: {e}")
         raise ValueError(f"Erreur: {e}")
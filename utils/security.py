@@ -8,6 +8,7 @@ import unicodedata
 from pathlib import Path
 from typing import Optional, Dict, Any
 from fastapi import UploadFile, Request, HTTPException
+from services.cache import named_cache
 
 
 def _json_nesting_depth(raw: bytes) -> int:
@@ -341,14 +342,42 @@ def extract_nsec_from_keyfile(keyfile_path: str) -> str:
     
     raise ValueError("No NSEC key found in keyfile")
 
-# Cache pour le mapping hex -> email (MULTIPASS detection)
-# Maps hex_pubkey (lowercase) -> email directory name
-hex_to_email_cache = {}
-# Cache pour les répertoires utilisateur (évite les scans répétés)
-# Maps hex_pubkey (lowercase) -> Path to user directory
-hex_to_directory_cache = {}
+# Index hex -> email (MULTIPASS detection) : hex_pubkey (lowercase) -> email.
+# Index complet, non borné : une entrée évincée ne serait plus relue (son
+# répertoire est déjà dans hex_indexed_dirs).
+hex_to_email_cache = named_cache("hex_to_email", maxsize=float("inf"))
+# Répertoires utilisateur (évite les scans répétés) : hex_pubkey -> Path
+hex_to_directory_cache = named_cache("hex_to_directory", maxsize=1000, ttl=3600)
 hex_cache_lock = threading.Lock()
 hex_cache_built = False
+# Répertoires déjà indexés + mtime de nostr/ au dernier passage : un nouveau
+# MULTIPASS modifie le mtime du parent → seuls les nouveaux répertoires sont lus
+hex_indexed_dirs = set()
+hex_index_mtime = 0.0
+# Répertoires vus sans HEX (création en cours) : écrire HEX ne change pas le
+# mtime de nostr/, ils sont donc relus à chaque passage jusqu'à indexation
+hex_pending_dirs = set()
+
+
+def _index_email_dir(email_dir: Path) -> bool:
+    """Ajoute ~/.zen/game/nostr/<email>/HEX à l'index. Appelé sous hex_cache_lock.
+    Un répertoire sans HEX lisible (création en cours) est mis dans
+    hex_pending_dirs, relu par chaque _refresh_hex_index."""
+    hex_file_path = email_dir / "HEX"
+    stored_hex = ""
+    if hex_file_path.exists():
+        try:
+            with open(hex_file_path, 'r') as f:
+                stored_hex = f.read().strip().lower()
+        except Exception as e:
+            logging.warning(f"⚠️  Error reading {hex_file_path}: {e}")
+    if stored_hex:
+        hex_to_email_cache[stored_hex] = email_dir.name
+        hex_indexed_dirs.add(email_dir.name)
+        hex_pending_dirs.discard(email_dir.name)
+        return True
+    hex_pending_dirs.add(email_dir.name)
+    return False
 
 def _build_hex_index() -> None:
     """
@@ -356,7 +385,7 @@ def _build_hex_index() -> None:
     This is called once (lazy initialization) and the cache is reused for all subsequent calls.
     Thread-safe with lock.
     """
-    global hex_to_email_cache, hex_cache_built
+    global hex_to_email_cache, hex_cache_built, hex_index_mtime
     
     with hex_cache_lock:
         # Double-check pattern: another thread might have built it while we waited
@@ -372,27 +401,69 @@ def _build_hex_index() -> None:
             hex_cache_built = True
             return
         
+        hex_index_mtime = nostr_base_path.stat().st_mtime
         count = 0
         for email_dir in nostr_base_path.iterdir():
             if email_dir.is_dir() and '@' in email_dir.name:
-                hex_file_path = email_dir / "HEX"
-                
-                if hex_file_path.exists():
-                    try:
-                        with open(hex_file_path, 'r') as f:
-                            stored_hex = f.read().strip().lower()
-                        
-                        if stored_hex:
-                            hex_to_email_cache[stored_hex] = email_dir.name
-                            count += 1
-                            
-                    except Exception as e:
-                        logging.warning(f"⚠️  Error reading {hex_file_path}: {e}")
-                        continue
+                if _index_email_dir(email_dir):
+                    count += 1
         
         hex_cache_built = True
         logging.info(f"✅ Hex index cache built: {count} users indexed")
 
+def _refresh_hex_index() -> None:
+    """Indexe les répertoires MULTIPASS créés depuis le dernier passage, et
+    relit ceux encore sans HEX. Ne liste ~/.zen/game/nostr/ que si son mtime
+    a changé."""
+    global hex_index_mtime
+    from core.config import settings
+    nostr_base_path = settings.GAME_PATH / "nostr"
+    with hex_cache_lock:
+        for name in list(hex_pending_dirs):
+            email_dir = nostr_base_path / name
+            if not email_dir.is_dir():
+                hex_pending_dirs.discard(name)
+            else:
+                _index_email_dir(email_dir)
+        try:
+            mtime = nostr_base_path.stat().st_mtime
+        except OSError:
+            return
+        if mtime == hex_index_mtime:
+            return
+        hex_index_mtime = mtime
+        for email_dir in nostr_base_path.iterdir():
+            if email_dir.name not in hex_indexed_dirs and '@' in email_dir.name and email_dir.is_dir():
+                _index_email_dir(email_dir)
+
+
+def find_email_by_hex(hex_pubkey: str) -> Optional[str]:
+    """
+    Email du MULTIPASS propriétaire de cette clé hex, ou None.
+
+    Lookup O(1) dans l'index hex -> email ; en cas d'absence, l'index est
+    complété avec les répertoires apparus depuis (création de MULTIPASS),
+    et une entrée dont le répertoire a été supprimé est oubliée.
+    """
+    if not hex_pubkey:
+        return None
+    hex_pubkey = hex_pubkey.lower().strip()
+    if not hex_cache_built:
+        _build_hex_index()
+    email = hex_to_email_cache.get(hex_pubkey)
+    if email is None:
+        _refresh_hex_index()
+        email = hex_to_email_cache.get(hex_pubkey)
+    if email is not None:
+        from core.config import settings
+        if not (settings.GAME_PATH / "nostr" / email / "HEX").exists():
+            with hex_cache_lock:
+                hex_to_email_cache.pop(hex_pubkey, None)
+                hex_indexed_dirs.discard(email)
+            return None
+    return email
+
+
 def is_multipass_user(hex_pubkey: str) -> bool:
     """
     Verify if a user is recognized as MULTIPASS by checking if their account exists in ~/.zen/game/nostr/.
@@ -418,8 +489,8 @@ def is_multipass_user(hex_pubkey: str) -> bool:
         _build_hex_index()
     
     # O(1) lookup in cache
-    if hex_pubkey in hex_to_email_cache:
-        email = hex_to_email_cache[hex_pubkey]
+    email = hex_to_email_cache.get(hex_pubkey)
+    if email is not None:
         logging.info(f"✅ User is recognized MULTIPASS (650MB quota) - found in {email}")
         return True
     
@@ -436,19 +507,18 @@ def find_user_directory_by_hex(hex_pubkey: str) -> Path:
     # Normaliser la clé hex
     hex_pubkey = hex_pubkey.lower().strip()
     
-    from core.state import app_state
     from core.config import settings
     
     # Check cache first
-    if hex_pubkey in app_state.hex_to_directory_cache:
-        cached_dir = app_state.hex_to_directory_cache[hex_pubkey]
+    cached_dir = hex_to_directory_cache.get(hex_pubkey)
+    if cached_dir is not None:
         # Verify cache is still valid (directory still exists)
         if cached_dir.exists():
             logging.info(f"✅ Répertoire trouvé dans le cache pour {hex_pubkey}: {cached_dir}")
             return cached_dir
         else:
             # Cache invalid, remove it
-            del app_state.hex_to_directory_cache[hex_pubkey]
+            hex_to_directory_cache.pop(hex_pubkey, None)
             logging.warning(f"Cache invalide pour {hex_pubkey}, répertoire n'existe plus")
     
     # Chemin de base pour les utilisateurs NOSTR
@@ -494,7 +564,7 @@ def find_user_directory_by_hex(hex_pubkey: str) -> Path:
                                 logging.warning(f"Script générique non trouvé dans {generic_script}")
                         
                         # Cache the result
-                        app_state.hex_to_directory_cache[hex_pubkey] = email_dir
+                        hex_to_directory_cache[hex_pubkey] = email_dir
                         
                         return email_dir
                         
@@ -513,7 +583,7 @@ def find_user_directory_by_hex(hex_pubkey: str) -> Path:
                         stored_hex = f.read().strip().lower()
                     if stored_hex == hex_pubkey:
                         logging.info(f"✅ Répertoire éphémère trouvé pour {hex_pubkey[:16]}: {pubkey_dir}")
-                        app_state.hex_to_directory_cache[hex_pubkey] = pubkey_dir
+                        hex_to_directory_cache[hex_pubkey] = pubkey_dir
                         return pubkey_dir
                 except Exception as e:
                     logging.warning(f"Erreur lecture {hex_file_path}: {e}")